@@ -0,0 +1,23 @@
+# blitzhub/celery.py - Celery Application
+
+"""
+Celery application for the background tasks (inventory.tasks).
+
+Configured from the CELERY_* Django settings, including the beat schedule:
+
+    celery -A blitzhub worker -l info
+    celery -A blitzhub beat -l info
+
+Without a broker the same tasks run through
+`python manage.py run_scheduled_tasks`.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blitzhub.settings')
+
+app = Celery('blitzhub')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -389,6 +389,18 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'inventory.tasks.cleanup_old_data',
         'schedule': 604800.0,  # Weekly
     },
+    'refresh-offline-catalog': {
+        'task': 'inventory.tasks.refresh_offline_catalog',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    'flush-notification-digests': {
+        'task': 'inventory.tasks.flush_notification_digests',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    'detect-duplicates': {
+        'task': 'inventory.tasks.detect_duplicates',
+        'schedule': 3600.0,  # Every hour
+    },
 }
 
 # =====================================
@@ -672,14 +684,26 @@ INVENTORY_SETTINGS = {
     'EXCEL_IMPORT_MAX_ROWS': 10000,
     'CSV_EXPORT_ENCODING': 'utf-8-sig',
     'BACKUP_RETENTION_DAYS': 30,
+    'BACKUP_DIR': BASE_DIR / 'backups' / 'inventory',
     
     # Performance settings
     'CACHE_PRODUCT_CALCULATIONS': True,
     'CACHE_TIMEOUT_SECONDS': 300,  # 5 minutes
     'PAGINATE_PRODUCTS_BY': 25,
     
+    # Mobile sync
+    'SYNC_CHANGE_RETENTION_DAYS': 30,
+    'IMPORT_SESSION_RETENTION_DAYS': 90,
+    
+    # Background tasks: 'celery' sends them to the broker, 'local' runs them
+    # in process (run_scheduled_tasks replaces beat)
+    'TASK_BACKEND': os.environ.get('INVENTORY_TASK_BACKEND', 'local'),
+    
     # Supplier integration
     'AUTO_UPDATE_EXCHANGE_RATES': False,
+    'EXCHANGE_RATE_PROVIDER': 'inventory.fx.HTTPRateProvider',  # or inventory.fx.FileRateProvider
+    'EXCHANGE_RATE_URL': 'https://api.exchangerate.host/latest?base=USD',
+    'EXCHANGE_RATE_FILE': os.environ.get('EXCHANGE_RATE_FILE', ''),
     'EXCHANGE_RATE_API_KEY': os.environ.get('EXCHANGE_RATE_API_KEY', ''),
     'SUPPLIER_EMAIL_TEMPLATES_DIR': 'inventory/emails/',
     
@@ -693,9 +717,19 @@ INVENTORY_SETTINGS = {
     'ENABLE_ABC_ANALYSIS': True,
     'ENABLE_INVENTORY_TURNOVER_ANALYSIS': True,
     'GENERATE_DAILY_REPORTS': True,
+    'REPORT_DIR': BASE_DIR / 'reports' / 'inventory',
     'REPORT_EMAIL_RECIPIENTS': os.environ.get('REPORT_EMAILS', '').split(','),
 }
 
+# Deferred signal side effects (core.events): 'celery' runs them on the Celery
+# workers, 'sync' inline after commit. 'thread' runs them on an in-process
+# worker pool after commit and is best effort only: events still queued when
+# the worker is recycled or redeployed are lost.
+SIDE_EFFECTS_BACKEND = os.environ.get(
+    'SIDE_EFFECTS_BACKEND', 'celery' if INVENTORY_SETTINGS['TASK_BACKEND'] == 'celery' else 'sync'
+)
+SIDE_EFFECTS_WORKERS = int(os.environ.get('SIDE_EFFECTS_WORKERS', '4'))
+
 # =====================================
 # REST FRAMEWORK CONFIGURATION
 # =====================================
@@ -81,13 +81,11 @@ def auth_context(request):
     # Add dynamic data that shouldn't be cached
     context.update(cached_context)
     
-    # Add notification count (this changes frequently, so don't cache)
+    # Add notification count (kept current by the notification dispatcher)
     if context.get('is_employee'):
         try:
-            from core.models import Notification
-            context['unread_notification_count'] = Notification.objects.filter(
-                user=user, is_read=False
-            ).count()
+            from core.notifications import unread_count
+            context['unread_notification_count'] = unread_count(user.id)
         except Exception as e:
             logger.error(f"Error getting notification count for user {user_id}: {e}")
             context['unread_notification_count'] = 0
@@ -0,0 +1,156 @@
+"""
+Deferred side effects for model signals core/events.py
+
+Signal handlers used to send notifications, write CRM interactions and
+recompute lead scores inside the writer's transaction, holding its locks
+for the whole time and adding their latency to every save. Handlers now
+defer a typed event instead:
+
+    defer('crm.client_engagement', key=client.pk)
+
+- an event is dispatched only after the transaction commits
+  (transaction.on_commit), so a rollback drops it, including one deferred
+  inside a savepoint that is rolled back
+- events of the same kind and key deferred in one transaction are
+  coalesced: the handler runs once, with the first event's payload, and
+  reads the current state itself (one lead score recompute per client per
+  transaction, however many interactions were saved)
+- dispatch runs inline after the commit, goes to Celery or to a worker
+  thread pool, depending on settings.SIDE_EFFECTS_BACKEND ('sync',
+  'celery', 'thread'); the thread pool is best effort, since events still
+  queued in it are lost when the process exits
+
+Handlers are registered with @handles(kind) and called as
+handler(key, **payload); payloads must be JSON-serializable for Celery.
+A failing handler is logged and counted, never raised into the writer.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+try:
+    from celery import shared_task
+except ImportError:  # Celery is optional; events then run inline
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+# Registered handlers by event kind
+HANDLERS = {}
+
+# In-process counters and handler time per event kind
+STATS = defaultdict(lambda: {'deferred': 0, 'coalesced': 0, 'dispatched': 0, 'failed': 0, 'seconds': 0.0})
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def handles(kind):
+    """Register the handler of an event kind"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class _Batch:
+    """Events of one transaction, for coalescing; closed once its commit runs"""
+
+    __slots__ = ('seen', 'closed')
+
+    def __init__(self):
+        self.seen = set()
+        self.closed = False
+
+
+def _current_batch():
+    batch = getattr(_local, 'batch', None)
+    if batch is None or batch.closed:
+        batch = _local.batch = _Batch()
+    return batch
+
+
+def defer(kind, key=None, using=None, **payload):
+    """
+    Dispatch an event after the current transaction commits.
+
+    Args:
+        kind: Registered event kind, e.g. 'crm.client_engagement'
+        key: Coalescing key; events with the same kind and key in one
+            transaction are handled once (None never coalesces)
+        using: Database alias of the transaction
+        **payload: Handler keyword arguments
+    """
+    if kind not in HANDLERS:
+        raise KeyError(f'No handler registered for event {kind!r}')
+
+    STATS[kind]['deferred'] += 1
+    batch = _current_batch()
+
+    def on_commit():
+        batch.closed = True
+        if key is not None:
+            if (kind, key) in batch.seen:
+                STATS[kind]['coalesced'] += 1
+                return
+            batch.seen.add((kind, key))
+        _dispatch(kind, key, payload)
+
+    transaction.on_commit(on_commit, using=using)
+
+
+def _dispatch(kind, key, payload):
+    backend = getattr(settings, 'SIDE_EFFECTS_BACKEND', 'sync')
+    if backend == 'celery' and shared_task:
+        dispatch_event.delay(kind, key, payload)
+    elif backend == 'thread':
+        _pool().submit(_run_in_thread, kind, key, payload)
+    else:
+        run_event(kind, key, payload)
+
+
+def _pool():
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SIDE_EFFECTS_WORKERS', 4),
+                    thread_name_prefix='side-effects'
+                )
+    return _executor
+
+
+def _run_in_thread(kind, key, payload):
+    try:
+        run_event(kind, key, payload)
+    finally:
+        # Worker threads hold their own connections
+        close_old_connections()
+
+
+def run_event(kind, key, payload):
+    """Run an event's handler now; errors are logged, not raised"""
+    started = time.perf_counter()
+    try:
+        HANDLERS[kind](key, **payload)
+        STATS[kind]['dispatched'] += 1
+    except Exception as e:
+        STATS[kind]['failed'] += 1
+        logger.error(f"Side effect {kind} ({key}) failed: {str(e)}")
+    finally:
+        STATS[kind]['seconds'] += time.perf_counter() - started
+
+
+if shared_task:
+    @shared_task(name='core.events.dispatch_event', ignore_result=True)
+    def dispatch_event(kind, key, payload):
+        run_event(kind, key, payload)
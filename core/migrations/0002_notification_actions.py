@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='action_text',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='action_url',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('security', 'Security Alert'), ('role_change', 'Role Assignment'), ('approval', 'Approval Request'), ('system', 'System Notification'), ('welcome', 'Welcome Message'), ('info', 'Information'), ('success', 'Success'), ('warning', 'Warning'), ('quote', 'Quote Update')], max_length=20),
+        ),
+    ]
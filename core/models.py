@@ -345,12 +345,18 @@ class Notification(models.Model):
         ('approval', 'Approval Request'),
         ('system', 'System Notification'),
         ('welcome', 'Welcome Message'),
+        ('info', 'Information'),
+        ('success', 'Success'),
+        ('warning', 'Warning'),
+        ('quote', 'Quote Update'),
     )
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     title = models.CharField(max_length=200)
     message = models.TextField()
+    action_url = models.CharField(max_length=500, blank=True)
+    action_text = models.CharField(max_length=50, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -0,0 +1,207 @@
+"""
+Notification fan-out core/notifications.py
+
+Event notifications used to be created one create_notification() call per
+recipient (an INSERT and a cache delete each) and the bulk helper passed a
+field the model does not have, so most of them never arrived.
+NotificationDispatcher delivers them in bulk instead:
+
+- send() writes one event's notification for every recipient with a single
+  bulk_create; deliver() does the same for notifications that differ per
+  recipient
+- digest() rate-limits repetitive event kinds: the first event of a window
+  is delivered as usual, the rest of the window's events are only counted,
+  and once the window has passed recipients get one summary ("37 products
+  added in the last 10 minutes"); flush_digests() delivers the summaries of
+  windows no new event has closed
+- unread counters (user_notifications:<id>) are raised with cache.incr after
+  the commit instead of being deleted, and recounted from the database only
+  when missing
+
+Digest state lives in the cache, so it is shared by every process using the
+same cache backend; counts are best effort if the cache is cleared.
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+UNREAD_KEY = 'user_notifications:{}'
+UNREAD_TIMEOUT = 3600
+DIGEST_WINDOW = 600
+DIGEST_KEY = 'notifications:digest:{}'
+DIGEST_COUNT_KEY = 'notifications:digest:{}:count'
+DIGEST_PENDING_KEY = 'notifications:digest:{}:pending'
+DIGEST_LOCK_KEY = 'notifications:digest:{}:lock'
+DIGEST_KINDS_KEY = 'notifications:digest_kinds'
+
+
+def unread_count(user_id):
+    """Unread notifications of a user, from the cached counter when present"""
+    from .models import Notification
+
+    key = UNREAD_KEY.format(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def raise_unread_counts(counts):
+    """Add new notifications (user id to number) to the cached unread counters"""
+    for user_id, count in counts.items():
+        try:
+            cache.incr(UNREAD_KEY.format(user_id), count)
+        except ValueError:
+            # Not cached; the next read counts from the database
+            pass
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications to many recipients at once
+    """
+
+    @classmethod
+    def send(cls, users, title, message, notification_type='info', action_url='', action_text=''):
+        """
+        Notify every recipient of one event.
+
+        Args:
+            users: Users, user ids or a queryset of either
+            title: Notification title
+            message: Notification message
+            notification_type: Notification type, e.g. 'info' or 'warning'
+            action_url: Optional URL of the notification's action
+            action_text: Optional label of the action button
+
+        Returns:
+            The created Notification objects
+        """
+        from .models import Notification
+
+        return cls.deliver([
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                action_url=action_url or '',
+                action_text=action_text or '',
+            )
+            for user_id in cls._user_ids(users)
+        ])
+
+    @classmethod
+    def deliver(cls, notifications):
+        """
+        Save prepared Notification objects with one bulk_create and raise
+        their recipients' unread counters once committed.
+        """
+        from .models import Notification
+
+        if not notifications:
+            return []
+        try:
+            created = Notification.objects.bulk_create(notifications, batch_size=500)
+        except Exception as e:
+            logger.error(f"Error creating {len(notifications)} notifications: {str(e)}")
+            return []
+
+        counts = {}
+        for notification in notifications:
+            counts[notification.user_id] = counts.get(notification.user_id, 0) + 1
+        transaction.on_commit(lambda: raise_unread_counts(counts))
+
+        logger.info(f"Created {len(created)} notifications for {len(counts)} users")
+        return created
+
+    @classmethod
+    def digest(cls, kind, users, title, message, summary, notification_type='info',
+               action_url='', action_text='', summary_action_url='', summary_action_text='',
+               window=DIGEST_WINDOW):
+        """
+        Notify recipients of a repetitive event, at most once per window.
+
+        Args:
+            kind: Event kind the window is kept for, e.g. 'inventory.product_created'
+            users, title, message, notification_type, action_url, action_text:
+                As for send(), for this event
+            summary: Message of the window's summary, formatted with count
+                (events in the window) and minutes, e.g.
+                '{count} products added in the last {minutes} minutes'
+            summary_action_url, summary_action_text: Action of the summary
+                (default: the event's)
+            window: Window length in seconds
+
+        Returns:
+            'sent' when the event was delivered, 'digested' when it was
+            counted towards the summary
+        """
+        cls._flush(kind)
+
+        if cache.add(DIGEST_KEY.format(kind), time.time(), window):
+            cache.set(DIGEST_COUNT_KEY.format(kind), 1, None)
+            cls._remember(kind)
+            cls.send(users, title, message, notification_type, action_url, action_text)
+            return 'sent'
+
+        cache.set(DIGEST_PENDING_KEY.format(kind), {
+            'users': cls._user_ids(users),
+            'title': title,
+            'message': summary.format(count='{count}', minutes=max(1, round(window / 60))),
+            'notification_type': notification_type,
+            'action_url': summary_action_url or action_url,
+            'action_text': summary_action_text or action_text,
+        }, None)
+        try:
+            cache.incr(DIGEST_COUNT_KEY.format(kind))
+        except ValueError:
+            # Counter lost (cache cleared); restart it with the window's first two events
+            cache.set(DIGEST_COUNT_KEY.format(kind), 2, None)
+        return 'digested'
+
+    @classmethod
+    def flush_digests(cls):
+        """Send the summaries of every window that has passed; returns how many were sent"""
+        return sum(1 for kind in cache.get(DIGEST_KINDS_KEY, ()) if cls._flush(kind))
+
+    @classmethod
+    def _flush(cls, kind):
+        """Send a passed window's summary, if events were held back in it"""
+        if cache.get(DIGEST_KEY.format(kind)) is not None:
+            return False
+        pending = cache.get(DIGEST_PENDING_KEY.format(kind))
+        if not pending or not cache.add(DIGEST_LOCK_KEY.format(kind), 1, 60):
+            return False
+
+        try:
+            count = cache.get(DIGEST_COUNT_KEY.format(kind)) or 0
+            cache.delete_many([DIGEST_PENDING_KEY.format(kind), DIGEST_COUNT_KEY.format(kind)])
+            if count > 1:
+                cls.send(
+                    pending['users'], pending['title'], pending['message'].format(count=count),
+                    pending['notification_type'], pending['action_url'], pending['action_text']
+                )
+                return True
+            return False
+        finally:
+            cache.delete(DIGEST_LOCK_KEY.format(kind))
+
+    @staticmethod
+    def _remember(kind):
+        """Record a digest kind for flush_digests()"""
+        kinds = cache.get(DIGEST_KINDS_KEY, ())
+        if kind not in kinds:
+            cache.set(DIGEST_KINDS_KEY, tuple(kinds) + (kind,), None)
+
+    @staticmethod
+    def _user_ids(users):
+        if hasattr(users, 'values_list') and users.model._meta.model_name == 'user':
+            return list(users.values_list('pk', flat=True).distinct())
+        return list(dict.fromkeys(getattr(user, 'pk', user) for user in users))
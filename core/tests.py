@@ -1,12 +1,13 @@
 # core/tests.py - Comprehensive test suite
 
-from django.test import TestCase, TransactionTestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.conf import settings
 from django.core import mail
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from unittest.mock import patch, MagicMock
 from datetime import timedelta
 from .allauth_forms import CustomSignupForm
@@ -703,6 +704,120 @@ class PerformanceTest(TestCase):
         
         self.assertEqual(response.status_code, 200)
 
+@override_settings(SIDE_EFFECTS_BACKEND='sync')
+class DeferredSideEffectsTest(TestCase):
+    """Signal side effects run after commit, once per key per transaction"""
+
+    def setUp(self):
+        from . import events
+
+        self.events = events
+        self.calls = []
+        events.handles('tests.recorded')(lambda key, **payload: self.calls.append((key, payload)))
+        self.addCleanup(events.HANDLERS.pop, 'tests.recorded', None)
+
+    def test_events_coalesce_per_key_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for note in ('a', 'b', 'c'):
+                    self.events.defer('tests.recorded', key=1, note=note)
+                self.events.defer('tests.recorded', key=2, note='d')
+                self.assertEqual(self.calls, [])
+
+        self.assertEqual(self.calls, [(1, {'note': 'a'}), (2, {'note': 'd'})])
+
+    def test_rolled_back_savepoint_drops_its_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        self.events.defer('tests.recorded', key=1, note='rolled back')
+                        raise ValueError
+                except ValueError:
+                    pass
+                self.events.defer('tests.recorded', key=2, note='kept')
+
+        self.assertEqual(self.calls, [(2, {'note': 'kept'})])
+
+    def test_interactions_recompute_lead_score_once(self):
+        from crm.models import Client as CrmClient, CustomerInteraction
+
+        user = User.objects.create_user(username='crmuser', email='crm@blitztechelectronics.co.zw', password='x')
+        crm_client = CrmClient.objects.create(name='Acme', email='acme@example.com', customer_type='corporate')
+        stats = self.events.STATS['crm.client_engagement']
+        dispatched, coalesced = stats['dispatched'], stats['coalesced']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for subject in ('Call', 'Email', 'Meeting'):
+                    CustomerInteraction.objects.create(
+                        client=crm_client, interaction_type='call', subject=subject, notes='-', created_by=user
+                    )
+
+        self.assertEqual(stats['dispatched'] - dispatched, 1)
+        self.assertEqual(stats['coalesced'] - coalesced, 2)
+        crm_client.refresh_from_db()
+        self.assertEqual(crm_client.lead_score, 35)
+        self.assertIsNotNone(crm_client.last_contacted)
+
+
+class NotificationDispatcherTest(TestCase):
+    """Bulk notification fan-out, digests and unread counters"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        self.users = [
+            User.objects.create_user(username=f'manager{i}', email=f'manager{i}@blitztechelectronics.co.zw', password='x')
+            for i in range(3)
+        ]
+        # Leave out the welcome notifications
+        Notification.objects.all().delete()
+        cache.clear()
+
+    def test_bulk_notifications_raise_unread_counters(self):
+        from .notifications import unread_count
+        from .utils import create_bulk_notifications
+
+        self.assertEqual(unread_count(self.users[0].id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                created = create_bulk_notifications(
+                    self.users, 'Price Change', 'Price increased', notification_type='info',
+                    action_url='/inventory/products/1/', action_text='View Product'
+                )
+
+        self.assertEqual(len(created), 3)
+        notification = Notification.objects.get(user=self.users[0])
+        self.assertEqual((notification.notification_type, notification.action_text), ('info', 'View Product'))
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.users[0].id), 1)
+        self.assertEqual(unread_count(self.users[1].id), 1)
+
+    def test_repeated_events_are_digested(self):
+        from django.core.cache import cache
+        from .notifications import DIGEST_KEY, NotificationDispatcher
+
+        results = [
+            NotificationDispatcher.digest(
+                'tests.product_created', self.users, 'New Product Added', f'Product {i} added',
+                summary='{count} products added in the last {minutes} minutes'
+            )
+            for i in range(4)
+        ]
+        self.assertEqual(results, ['sent', 'digested', 'digested', 'digested'])
+        self.assertEqual(Notification.objects.filter(user=self.users[0]).count(), 1)
+        self.assertEqual(NotificationDispatcher.flush_digests(), 0)
+
+        cache.delete(DIGEST_KEY.format('tests.product_created'))  # the window passes
+        self.assertEqual(NotificationDispatcher.flush_digests(), 1)
+        self.assertEqual(NotificationDispatcher.flush_digests(), 0)
+
+        summary = Notification.objects.filter(user=self.users[0]).order_by('-pk').first()
+        self.assertEqual(summary.message, '4 products added in the last 10 minutes')
+        self.assertEqual(Notification.objects.count(), 6)
+
+
 class BlitzTechTestRunner:
     """Custom test runner for BlitzTech Electronics"""
     
@@ -402,6 +402,8 @@ def create_notification(user, title, message, notification_type='info', action_u
     from .models import Notification
     
     try:
+        from .notifications import raise_unread_counts
+        
         notification = Notification.objects.create(
             user=user,
             title=title,
@@ -411,8 +413,8 @@ def create_notification(user, title, message, notification_type='info', action_u
             action_text=action_text or ''
         )
         
-        # Invalidate notification cache
-        cache.delete(f'user_notifications:{user.id}')
+        # Count it in the cached unread counter once committed
+        transaction.on_commit(lambda: raise_unread_counts({user.id: 1}))
         
         logger.info(f"Notification created for {user.username}: {title}")
         return notification
@@ -426,11 +428,8 @@ def get_unread_notifications_count(user):
     if not user.is_authenticated:
         return 0
     
-    from .models import Notification
-    return Notification.objects.filter(
-        user=user,
-        is_read=False
-    ).count()
+    from .notifications import unread_count
+    return unread_count(user.id)
 
 # =====================================
 # DASHBOARD UTILITIES
@@ -616,34 +615,14 @@ def create_bulk_notifications(users, title, message, notification_type='info', a
     Returns:
         List of created Notification objects
     """
-    try:
-        # Use bulk_create for better performance
-        with transaction.atomic():
-            notifications = []
-            for user in users:
-                notification = Notification(
-                    user=user,
-                    title=title,
-                    message=message,
-                    type=notification_type,
-                    action_url=action_url,
-                    action_text=action_text
-                )
-                notifications.append(notification)
-            
-            created_notifications = Notification.objects.bulk_create(notifications)
-            
-            # Update notification caches for all users
-            for user in users:
-                cache_key = f"user_notifications:{user.id}"
-                cached_count = cache.get(cache_key, 0)
-                cache.set(cache_key, cached_count + 1, 3600)
-            
-            logger.info(f"Bulk notifications created for {len(users)} users: {title}")
-            return created_notifications
-    except Exception as e:
-        logger.error(f"Error creating bulk notifications: {str(e)}")
-        return []
+    from .notifications import NotificationDispatcher
+    
+    return NotificationDispatcher.send(
+        users, title, message,
+        notification_type=notification_type,
+        action_url=action_url,
+        action_text=action_text
+    )
 
 def create_quote_notification(user, title, message, quote_id=None, notification_type="quote"):
     """
@@ -1858,6 +1858,7 @@ def mark_all_notifications_read(request):
     Supports both POST (AJAX) and GET (simple link).
     """
     Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    cache.delete(f"user_notifications:{request.user.id}")
     # Support AJAX or plain link
     if request.is_ajax() or request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
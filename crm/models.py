@@ -526,19 +526,30 @@ class CRMSettings(models.Model):
 # Signal handlers for automatic updates
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from core.events import defer, handles
 
 @receiver(post_save, sender=CustomerInteraction)
 def update_client_on_interaction(sender, instance, created, **kwargs):
     """Update client analytics when interaction is created/updated"""
     if created:
-        client = instance.client
-        client.last_contacted = instance.created_at
-        if instance.next_followup:
-            client.followup_date = instance.next_followup
-        
-        # Recalculate lead score
-        client.calculate_lead_score()
-        client.update_analytics()
+        # Once per client per transaction, after the commit
+        defer('crm.client_engagement', key=instance.client_id)
+
+@handles('crm.client_engagement')
+def refresh_client_engagement(client_id):
+    """Recalculate a client's follow-up date, lead score and analytics from its interactions"""
+    client = Client.objects.filter(pk=client_id).first()
+    if client is None:
+        return
+    
+    followup = client.customerinteraction_set.exclude(next_followup__isnull=True).order_by('-created_at').first()
+    if followup and followup.next_followup != client.followup_date:
+        client.followup_date = followup.next_followup
+        client.save(update_fields=['followup_date'])
+    
+    # Recalculate lead score
+    client.calculate_lead_score()
+    client.update_analytics()
 
 @receiver(post_save, sender=Deal)
 def update_client_on_deal(sender, instance, created, **kwargs):
@@ -561,11 +572,21 @@ def update_client_on_deal(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Task)
 def create_task_notification(sender, instance, created, **kwargs):
     """Create notification when task is assigned"""
-    if created and instance.assigned_to:
-        from core.utils import create_notification
-        create_notification(
-            user=instance.assigned_to,
-            title=f"New Task Assigned: {instance.title}",
-            message=f"You have been assigned a new task related to {instance.client.name if instance.client else 'general'}",
-            notification_type="info"
-        )
+    if created and instance.assigned_to_id:
+        defer('crm.task_assigned', key=instance.pk)
+
+@handles('crm.task_assigned')
+def notify_task_assignee(task_id):
+    """Notify a new task's assignee"""
+    from core.utils import create_notification
+    
+    task = Task.objects.select_related('assigned_to', 'client').filter(pk=task_id).first()
+    if task is None or task.assigned_to is None:
+        return
+    
+    create_notification(
+        user=task.assigned_to,
+        title=f"New Task Assigned: {task.title}",
+        message=f"You have been assigned a new task related to {task.client.name if task.client else 'general'}",
+        notification_type="info"
+    )
@@ -174,41 +174,57 @@ class CRMAutomation:
     @staticmethod
     def auto_assign_leads():
         """Auto-assign unassigned leads to available team members"""
+        from django.db import transaction
         from .models import Client
-        from core.models import UserProfile
-        
-        # Get unassigned leads
-        unassigned_leads = Client.objects.filter(
-            status='lead',
-            assigned_to__isnull=True
-        )
+        from core.models import Notification
+        from core.notifications import NotificationDispatcher
         
         # Get available sales team members
-        sales_team = User.objects.filter(
+        sales_team = list(User.objects.filter(
             profile__user_type__in=['employee', 'blitzhub_admin'],
             profile__department='sales',
             is_active=True
-        )
+        ).order_by('pk'))
         
-        if not sales_team.exists():
+        if not sales_team:
             return 0
         
-        assigned_count = 0
+        # Round-robin assignment of the unassigned leads
+        assignments = {}
+        unassigned_leads = Client.objects.filter(
+            status='lead',
+            assigned_to__isnull=True
+        ).order_by('pk').values_list('pk', 'name')
         for i, lead in enumerate(unassigned_leads):
-            # Round-robin assignment
-            assignee = sales_team[i % sales_team.count()]
-            lead.assigned_to = assignee
-            lead.save()
-            
-            # Notify the assignee
-            create_notification(
-                user=assignee,
-                title="New Lead Assigned",
-                message=f"You have been assigned a new lead: {lead.name}",
-                notification_type="info"
-            )
+            assignments.setdefault(sales_team[i % len(sales_team)], []).append(lead)
+        
+        assigned_count = 0
+        notifications = []
+        with transaction.atomic():
+            for assignee, leads in assignments.items():
+                assigned = Client.objects.filter(
+                    pk__in=[lead_id for lead_id, _ in leads],
+                    assigned_to__isnull=True
+                ).update(assigned_to=assignee, updated_at=timezone.now())
+                assigned_count += assigned
+                
+                # One notification per assignee, not per lead
+                names = [name for _, name in leads]
+                if len(names) == 1:
+                    message = f"You have been assigned a new lead: {names[0]}"
+                else:
+                    listed = ', '.join(names[:5]) + (f" and {len(names) - 5} more" if len(names) > 5 else '')
+                    message = f"You have been assigned {len(names)} new leads: {listed}"
+                notifications.append(Notification(
+                    user=assignee,
+                    title="New Lead Assigned" if len(names) == 1 else "New Leads Assigned",
+                    message=message,
+                    notification_type="info",
+                    action_url="/crm/clients/",
+                    action_text="View Leads"
+                ))
             
-            assigned_count += 1
+            NotificationDispatcher.deliver(notifications)
         
         return assigned_count
     
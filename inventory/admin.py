@@ -36,8 +36,8 @@ import csv
 import json
 
 from .models import (
-    Brand, Category, ComponentFamily, Currency, OverheadFactor, ProductAttributeDefinition, ProductStockLevel, StorageBin, StorageLocation, Supplier, Location, Product, StockLevel, StockMovement,
-    StockTake, StockTakeItem, PurchaseOrder, PurchaseOrderItem,
+    Brand, Category, ComponentFamily, Currency, ExchangeRateHistory, OverheadFactor, PriceHistory, ProductAttributeDefinition, ProductStockLevel, StorageBin, StorageLocation, Supplier, Location, Product, StockLevel, StockMovement,
+    StockTake, StockTakeItem, StockTransfer, StockTransferItem, PurchaseOrder, PurchaseOrderItem,
     ReorderAlert, SupplierCountry
 )
 
@@ -107,12 +107,34 @@ class CurrencyAdmin(ElectronicsAdminMixin, admin.ModelAdmin):
     get_rate_age.short_description = "Rate Age"
     
     def update_exchange_rates(self, request, queryset):
-        """Update exchange rates (placeholder for API integration)"""
-        # Here you would integrate with real exchange rate API
-        count = queryset.update(last_updated=timezone.now())
-        self.message_user(request, f"Updated {count} exchange rates")
+        """Fetch rates from the configured provider for the selected currencies"""
+        from .fx import ExchangeRateService
+        
+        try:
+            result = ExchangeRateService.refresh(currencies=queryset, force=True)
+        except Exception as e:
+            self.message_user(request, f"Exchange rate update failed: {e}", level=messages.ERROR)
+            return
+        
+        message = f"{len(result['updated'])} exchange rates changed, {result['unchanged']} unchanged"
+        if result['missing']:
+            message += f"; no rate for {', '.join(result['missing'])}"
+        self.message_user(request, message)
     update_exchange_rates.short_description = "Update exchange rates"
 
+@admin.register(ExchangeRateHistory)
+class ExchangeRateHistoryAdmin(admin.ModelAdmin):
+    """Append-only exchange rate provenance"""
+    list_display = ('currency', 'rate_to_usd', 'effective_at', 'source', 'recorded_at')
+    list_filter = ('currency', 'source')
+    date_hierarchy = 'effective_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(OverheadFactor)
 class OverheadFactorAdmin(ElectronicsAdminMixin, admin.ModelAdmin):
     """Configurable overhead factors for cost calculation"""
@@ -532,6 +554,8 @@ class CategoryAdmin(InventoryAdminMixin, admin.ModelAdmin):
         'default_reorder_level', 'get_total_value', 'is_active', 'created_at'
     )
     
+    list_select_related = ('parent',)
+    
     list_filter = (
         'is_active', 'parent', 'created_at', 'default_markup_percentage'
     )
@@ -986,6 +1010,21 @@ class ProductAdmin(ElectronicsAdminMixin, admin.ModelAdmin):
         self.message_user(request, f"Generated QR codes for {count} products")
     generate_qr_codes.short_description = "Generate QR codes"
 
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    """Selling price changes made by repricing rules"""
+    list_display = ('product', 'old_price', 'new_price', 'rule', 'rule_value', 'changed_by', 'changed_at')
+    list_filter = ('rule',)
+    search_fields = ('product__sku', 'product__name')
+    raw_id_fields = ('product',)
+    date_hierarchy = 'changed_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # =====================================
 # STOCK MOVEMENT TRACKING
 # =====================================
@@ -1035,6 +1074,60 @@ class StockMovementAdmin(admin.ModelAdmin):
         """Prevent deletion of stock movements for audit trail"""
         return request.user.is_superuser
 
+class StockTransferItemInline(admin.TabularInline):
+    """Lines of a transfer document"""
+    model = StockTransferItem
+    extra = 1
+    raw_id_fields = ('product',)
+    readonly_fields = ('quantity_received',)
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    """
+    Transfer documents between locations.
+    
+    Dispatch and receipt post every line of the selected transfers as one
+    batch (inventory.transfers).
+    """
+    
+    list_display = (
+        'transfer_number', 'from_location', 'to_location', 'status',
+        'created_at', 'dispatched_at', 'received_at'
+    )
+    list_filter = ('status', 'from_location', 'to_location')
+    search_fields = ('transfer_number', 'notes')
+    readonly_fields = (
+        'status', 'created_by', 'dispatched_at', 'dispatched_by', 'received_at', 'received_by'
+    )
+    inlines = [StockTransferItemInline]
+    actions = ['dispatch_transfers', 'receive_transfers']
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+    
+    def _post(self, request, queryset, step):
+        from .transfers import TransferError, TransferPoster
+        
+        posted = 0
+        for transfer in queryset:
+            try:
+                getattr(TransferPoster, step)(transfer, user=request.user)
+                posted += 1
+            except TransferError as e:
+                self.message_user(request, f"{transfer.transfer_number}: {e}", level=messages.ERROR)
+        if posted:
+            self.message_user(request, f"{posted} transfers posted", level=messages.SUCCESS)
+    
+    def dispatch_transfers(self, request, queryset):
+        self._post(request, queryset.filter(status='draft'), 'dispatch')
+    dispatch_transfers.short_description = "Dispatch selected transfers"
+    
+    def receive_transfers(self, request, queryset):
+        self._post(request, queryset.filter(status__in=['in_transit', 'partially_received']), 'receive')
+    receive_transfers.short_description = "Receive everything in transit"
+
 # =====================================
 # PURCHASE ORDER MANAGEMENT
 # =====================================
@@ -1180,50 +1273,16 @@ class ReorderAlertAdmin(admin.ModelAdmin):
     
     @admin.action(description='Create purchase orders from selected alerts')
     def create_purchase_orders(self, request, queryset):
-        """Generate purchase orders from reorder alerts"""
-        # Group alerts by supplier
-        alerts_by_supplier = {}
-        for alert in queryset.filter(status__in=['active', 'acknowledged']):
-            supplier = alert.suggested_supplier
-            if supplier not in alerts_by_supplier:
-                alerts_by_supplier[supplier] = []
-            alerts_by_supplier[supplier].append(alert)
-        
-        created_pos = 0
+        """Generate one draft purchase order per supplier from reorder alerts"""
+        from .purchasing import PurchaseOrderBuildError, PurchaseOrderBuilder
         
-        with transaction.atomic():
-            for supplier, alerts in alerts_by_supplier.items():
-                # Create PO
-                po = PurchaseOrder.objects.create(
-                    po_number=f"PO-{timezone.now().strftime('%Y%m%d')}-{supplier.supplier_code}",
-                    supplier=supplier,
-                    expected_delivery_date=timezone.now().date() + timezone.timedelta(
-                        days=supplier.average_lead_time_days
-                    ),
-                    payment_terms=supplier.payment_terms,
-                    currency=supplier.currency,
-                    delivery_location=Location.objects.filter(is_default=True).first(),
-                    created_by=request.user
-                )
-                
-                # Add items
-                for alert in alerts:
-                    PurchaseOrderItem.objects.create(
-                        purchase_order=po,
-                        product=alert.product,
-                        quantity_ordered=alert.suggested_order_quantity,
-                        unit_price=alert.product.cost_price
-                    )
-                    
-                    # Mark alert as ordered
-                    alert.status = 'ordered'
-                    alert.purchase_order = po
-                    alert.save()
-                
-                po.calculate_totals()
-                created_pos += 1
+        try:
+            summary = PurchaseOrderBuilder.build(queryset, user=request.user)
+        except PurchaseOrderBuildError as e:
+            messages.error(request, str(e))
+            return
         
-        messages.success(request, f'Created {created_pos} purchase orders from reorder alerts.')
+        messages.success(request, f"Created {len(summary['purchase_orders'])} purchase orders from reorder alerts.")
 
 # =====================================
 # STOCK TAKE MANAGEMENT
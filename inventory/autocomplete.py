@@ -0,0 +1,274 @@
+# inventory/autocomplete.py - In-Process Part Number Autocomplete
+
+"""
+Prefix index for SKU and part number autocomplete.
+
+Counter staff type partial SKUs and manufacturer part numbers, which fires
+several autocomplete requests per second per user. Rather than hitting the
+database for each keystroke, every worker process keeps a compact sorted
+array of (key, product_id) pairs over sku, manufacturer_part_number,
+supplier_sku and barcode and answers prefix lookups with bisect.
+
+Consistency:
+- The index is built lazily on first use and shared by all threads in the
+  process (guarded by a lock)
+- Product save/delete signals update it incrementally after commit and bump
+  a shared cache version; other workers see the version change and rebuild
+- The index is also rebuilt after CACHE_TIMEOUT_SECONDS to pick up bulk
+  writes (queryset.update, bulk_create) that bypass signals
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Product fields indexed for prefix lookups
+INDEXED_FIELDS = ('sku', 'manufacturer_part_number', 'supplier_sku', 'barcode')
+
+VERSION_CACHE_KEY = 'inventory:autocomplete_version'
+
+# How often (seconds) a worker checks the shared version
+VERSION_CHECK_INTERVAL = 1.0
+
+COMPACT_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(value):
+    """Upper-cased, trimmed lookup key"""
+    return (value or '').strip().upper()
+
+
+def compact(value):
+    """Key with separators removed so 'lm358dr' finds 'LM358-DR'"""
+    return COMPACT_PATTERN.sub('', normalize(value))
+
+
+class PartNumberIndex:
+    """
+    Sorted-array prefix index over product identifiers
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []      # sorted list of (key, product_id)
+        self._products = {}     # product_id -> {'sku', 'name', 'is_active', 'keys'}
+        self._sku_owner = {}    # exact sku -> product_id
+        self._built = False
+        self._built_at = 0.0
+        self._version = None
+        self._version_checked_at = 0.0
+
+    # ---- shared version ----
+
+    @staticmethod
+    def _shared_version():
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(VERSION_CACHE_KEY, 1, None)
+            version = cache.get(VERSION_CACHE_KEY, 1)
+        return version
+
+    def _bump_shared_version(self):
+        """Publish a change to other workers, keeping our copy current if we were"""
+        try:
+            new_version = cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 1, None)
+            new_version = cache.get(VERSION_CACHE_KEY, 1)
+
+        if self._version is not None and new_version == self._version + 1:
+            self._version = new_version
+        else:
+            # Someone else changed the catalog too; rebuild on next lookup
+            self._built = False
+
+    # ---- building ----
+
+    @staticmethod
+    def _product_keys(values):
+        keys = set()
+        for field_name in INDEXED_FIELDS:
+            value = values.get(field_name)
+            if value:
+                keys.add(normalize(value))
+                keys.add(compact(value))
+        keys.discard('')
+        return keys
+
+    def rebuild(self):
+        """Load every product's identifiers in one query"""
+        from .models import Product
+
+        started = time.perf_counter()
+        version = self._shared_version()
+        rows = Product.objects.values('id', 'name', 'is_active', *INDEXED_FIELDS)
+
+        entries = []
+        products = {}
+        sku_owner = {}
+        for row in rows.iterator(chunk_size=5000):
+            keys = self._product_keys(row)
+            products[row['id']] = {
+                'sku': row['sku'],
+                'name': row['name'],
+                'is_active': row['is_active'],
+                'keys': keys,
+            }
+            sku_owner[row['sku']] = row['id']
+            entries.extend((key, row['id']) for key in keys)
+        entries.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._products = products
+            self._sku_owner = sku_owner
+            self._version = version
+            self._built = True
+            self._built_at = time.monotonic()
+            self._version_checked_at = self._built_at
+
+        logger.info(
+            f"Autocomplete index built: {len(products)} products, {len(entries)} keys "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        max_age = getattr(settings, 'INVENTORY_SETTINGS', {}).get('CACHE_TIMEOUT_SECONDS', 300)
+
+        if self._built and now - self._built_at > max_age:
+            self._built = False
+        elif self._built and now - self._version_checked_at > VERSION_CHECK_INTERVAL:
+            self._version_checked_at = now
+            if self._shared_version() != self._version:
+                self._built = False
+
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.rebuild()
+
+    def invalidate(self, shared=False):
+        """
+        Drop the local copy; the next lookup rebuilds it.
+
+        Args:
+            shared: Also expire every other worker's copy (bulk catalog writes)
+        """
+        with self._lock:
+            if shared:
+                self._bump_shared_version()
+            self._built = False
+
+    # ---- incremental updates ----
+
+    def _remove_locked(self, product_id):
+        product = self._products.pop(product_id, None)
+        if not product:
+            return
+        for key in product['keys']:
+            position = bisect.bisect_left(self._entries, (key, product_id))
+            if position < len(self._entries) and self._entries[position] == (key, product_id):
+                del self._entries[position]
+        if self._sku_owner.get(product['sku']) == product_id:
+            del self._sku_owner[product['sku']]
+
+    def update_product(self, values):
+        """
+        Insert or replace one product.
+
+        Args:
+            values: Dict with id, name, is_active and the indexed fields
+        """
+        with self._lock:
+            if self._built:
+                product_id = values['id']
+                self._remove_locked(product_id)
+                keys = self._product_keys(values)
+                self._products[product_id] = {
+                    'sku': values['sku'],
+                    'name': values['name'],
+                    'is_active': values['is_active'],
+                    'keys': keys,
+                }
+                self._sku_owner[values['sku']] = product_id
+                for key in keys:
+                    bisect.insort(self._entries, (key, product_id))
+            self._bump_shared_version()
+
+    def remove_product(self, product_id):
+        """Remove one product"""
+        with self._lock:
+            if self._built:
+                self._remove_locked(product_id)
+            self._bump_shared_version()
+
+    # ---- lookups ----
+
+    def _prefix_ids(self, prefix, limit, seen, results, active_only):
+        position = bisect.bisect_left(self._entries, (prefix,))
+        entries = self._entries
+        while position < len(entries) and len(results) < limit:
+            key, product_id = entries[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            if active_only and not self._products[product_id]['is_active']:
+                continue
+            results.append(product_id)
+
+    def suggest(self, query, limit=10, active_only=True):
+        """
+        Products whose identifiers start with the query.
+
+        Exact identifier matches come first, then prefix matches in key order.
+
+        Returns:
+            List of dicts with id, sku and name
+        """
+        prefix = normalize(query)
+        compact_prefix = compact(query)
+        if not prefix:
+            return []
+
+        self._ensure_current()
+
+        with self._lock:
+            results = []
+            seen = set()
+            self._prefix_ids(prefix, limit, seen, results, active_only)
+            if compact_prefix and compact_prefix != prefix:
+                self._prefix_ids(compact_prefix, limit, seen, results, active_only)
+
+            def is_exact(product_id):
+                return prefix in self._products[product_id]['keys'] or compact_prefix in self._products[product_id]['keys']
+
+            results.sort(key=lambda product_id: not is_exact(product_id))
+            return [
+                {
+                    'id': product_id,
+                    'sku': self._products[product_id]['sku'],
+                    'name': self._products[product_id]['name'],
+                }
+                for product_id in results
+            ]
+
+    def sku_owner(self, sku):
+        """Id of the product using this exact SKU, or None"""
+        self._ensure_current()
+        with self._lock:
+            return self._sku_owner.get((sku or '').strip())
+
+
+# Process-wide index shared by all threads
+part_number_index = PartNumberIndex()
@@ -0,0 +1,491 @@
+# inventory/backup.py - Inventory Snapshot Backup and Restore
+
+"""
+Compressed, chunked snapshots of the inventory tables.
+
+A full dumpdata of the catalog is one huge JSON document that has to be
+built and parsed in memory. A snapshot is a directory instead:
+
+- manifest.json - format version, creation time, base snapshot, and per
+  model the columns, row count, highest primary key and chunk list
+- <app_label>.<model>.<n>.jsonl.zst (or .gz) - up to CHUNK_ROWS rows each,
+  one JSON array of column values per line, with a sha256 in the manifest
+
+Rows are streamed from values_list().iterator(), so memory is bounded by one
+chunk. Append-only tables (stock movements, audit log) are incremental: an
+incremental snapshot only holds rows added since the previous snapshot and
+names it as its base; restore walks the chain back to the last full one.
+
+Restore verifies every checksum and upserts rows by primary key with
+bulk_create in foreign key dependency order inside one transaction. Bulk
+writes fire no model signals, so the per-save side effects are skipped and
+the derived caches are expired once after commit instead, and mobile sync
+cursors are reset. Rows created after the snapshot are left in place, which
+keeps references from other apps (quotes) intact.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .sync import ChangeFeed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+# Rows per chunk file
+CHUNK_ROWS = 10000
+
+# Rows per bulk_create during restore
+RESTORE_BATCH_SIZE = 1000
+
+# Tables only ever appended to; snapshotted incrementally by primary key
+APPEND_ONLY_MODELS = ('inventory.StockMovement', 'core.AuditLog')
+
+# Derived tables left out of snapshots
+EXCLUDED_MODELS = ('inventory.SyncChange',)
+
+
+class SnapshotEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without the millisecond truncation of times"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class SnapshotError(Exception):
+    """Snapshot is missing, incomplete or corrupt"""
+
+
+def backup_root():
+    """Directory holding one sub-directory per snapshot"""
+    inventory_settings = getattr(settings, 'INVENTORY_SETTINGS', {})
+    return inventory_settings.get('BACKUP_DIR') or os.path.join(settings.BASE_DIR, 'backups', 'inventory')
+
+
+def snapshot_models():
+    """
+    Models included in a snapshot, parents before children.
+
+    Every inventory model (with auto-created many-to-many tables) plus the
+    append-only tables from other apps.
+    """
+    models = [
+        model for model in apps.get_app_config('inventory').get_models(include_auto_created=True)
+        if model._meta.label not in EXCLUDED_MODELS
+    ]
+    for label in APPEND_ONLY_MODELS:
+        model = apps.get_model(label)
+        if model not in models:
+            models.append(model)
+
+    ordered = []
+    pending = list(models)
+    while pending:
+        for model in pending:
+            parents = {
+                field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not model
+            }
+            if not parents & set(pending):
+                ordered.append(model)
+                pending.remove(model)
+                break
+        else:
+            # Circular references: keep the remaining declaration order
+            ordered.extend(pending)
+            break
+    return ordered
+
+
+def _compression():
+    return 'zstd' if zstandard else 'gzip'
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, compression):
+    if compression == 'zstd':
+        if not zstandard:
+            raise SnapshotError('Snapshot is zstd compressed but the zstandard package is not installed')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f'Cannot read snapshot manifest in {path}: {e}')
+    if manifest.get('format') != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+    return manifest
+
+
+def list_snapshots(root=None):
+    """Manifests of complete snapshots, newest first"""
+    root = root or backup_root()
+    if not os.path.isdir(root):
+        return []
+
+    snapshots = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not os.path.isfile(os.path.join(path, MANIFEST_NAME)):
+            continue
+        try:
+            manifest = _read_manifest(path)
+        except SnapshotError as e:
+            logger.warning(f"Skipping snapshot {name}: {e}")
+            continue
+        if manifest.get('name') != name:
+            logger.warning(f"Skipping snapshot {name}: manifest names {manifest.get('name')!r}")
+            continue
+        snapshots.append(manifest)
+    snapshots.sort(key=lambda manifest: manifest['created_at'], reverse=True)
+    return snapshots
+
+
+class SnapshotWriter:
+    """
+    Writes one snapshot directory
+
+    Args:
+        root: Backup directory (defaults to INVENTORY_SETTINGS['BACKUP_DIR'])
+        incremental: Only copy append-only rows added since the latest snapshot
+        user: Username recorded in the manifest
+    """
+
+    def __init__(self, root=None, incremental=False, user=None):
+        self.root = root or backup_root()
+        self.incremental = incremental
+        self.user = user
+        self.compression = _compression()
+
+    def write(self):
+        """
+        Create the snapshot.
+
+        Returns:
+            The manifest dict
+        """
+        created_at = timezone.now()
+        name = created_at.strftime('%Y%m%d-%H%M%S-%f')
+        base = None
+        if self.incremental:
+            previous = list_snapshots(self.root)
+            base = previous[0] if previous else None
+            if base is None:
+                logger.info("No previous snapshot; writing a full snapshot")
+
+        path = os.path.join(self.root, name)
+        os.makedirs(path)
+
+        manifest = {
+            'format': FORMAT_VERSION,
+            'name': name,
+            'created_at': created_at.isoformat(),
+            'created_by': self.user,
+            'compression': self.compression,
+            'base': base['name'] if base else None,
+            'models': [],
+        }
+
+        try:
+            # One consistent view of every table on databases with snapshot isolation
+            with transaction.atomic():
+                for model in snapshot_models():
+                    manifest['models'].append(self._write_model(path, model, base))
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+
+        # The manifest is written last; a directory without one is incomplete
+        with open(os.path.join(path, MANIFEST_NAME), 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        logger.info(
+            f"Inventory snapshot {name} written: "
+            f"{sum(entry['rows'] for entry in manifest['models'])} rows"
+            f"{' (incremental from ' + base['name'] + ')' if base else ''}"
+        )
+        return manifest
+
+    def _write_model(self, path, model, base):
+        label = model._meta.label
+        columns = [field.attname for field in model._meta.concrete_fields]
+        pk_column = model._meta.pk.attname
+
+        queryset = model._default_manager.order_by(pk_column)
+        incremental = False
+        if base and label in APPEND_ONLY_MODELS:
+            base_entry = next((entry for entry in base['models'] if entry['model'] == label), None)
+            if base_entry:
+                incremental = True
+                if base_entry['max_pk'] is not None:
+                    queryset = queryset.filter(pk__gt=base_entry['max_pk'])
+
+        entry = {
+            'model': label,
+            'columns': columns,
+            'incremental': incremental,
+            'rows': 0,
+            'max_pk': None,
+            'chunks': [],
+        }
+        if incremental:
+            entry['max_pk'] = base_entry['max_pk']
+
+        pk_position = columns.index(pk_column)
+        lines = []
+        for values in queryset.values_list(*columns).iterator(chunk_size=CHUNK_ROWS):
+            lines.append(json.dumps(values, cls=SnapshotEncoder))
+            entry['max_pk'] = values[pk_position]
+            if len(lines) >= CHUNK_ROWS:
+                self._write_chunk(path, entry, lines)
+                lines = []
+        if lines:
+            self._write_chunk(path, entry, lines)
+        return entry
+
+    def _write_chunk(self, path, entry, lines):
+        extension = 'zst' if self.compression == 'zstd' else 'gz'
+        file_name = f"{entry['model'].lower()}.{len(entry['chunks']):04d}.jsonl.{extension}"
+        data = _compress(('\n'.join(lines) + '\n').encode('utf-8'), self.compression)
+
+        with open(os.path.join(path, file_name), 'wb') as chunk_file:
+            chunk_file.write(data)
+
+        entry['chunks'].append({
+            'file': file_name,
+            'rows': len(lines),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        })
+        entry['rows'] += len(lines)
+
+
+@contextmanager
+def _original_timestamps(models):
+    """Keep snapshot values in auto_now/auto_now_add columns during bulk_create"""
+    switched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                switched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in switched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SnapshotRestorer:
+    """
+    Restores a snapshot (and, for append-only tables, its base chain)
+
+    Args:
+        name: Snapshot directory name
+        root: Backup directory (defaults to INVENTORY_SETTINGS['BACKUP_DIR'])
+    """
+
+    def __init__(self, name, root=None):
+        self.root = root or backup_root()
+        self.name = name
+
+    def chain(self):
+        """Manifests from the requested snapshot back to the last full one"""
+        # Names come from the request and from manifests; only directories
+        # listed in the backup root may be opened
+        known = {manifest['name'] for manifest in list_snapshots(self.root)}
+        chain = []
+        name = self.name
+        while name:
+            if name not in known:
+                raise SnapshotError(f'Unknown snapshot {name}')
+            if any(manifest['name'] == name for manifest in chain):
+                raise SnapshotError(f'Snapshot chain loops at {name}')
+            manifest = _read_manifest(os.path.join(self.root, name))
+            chain.append(manifest)
+            name = manifest['base']
+        return chain
+
+    def _chunks(self, manifest, entry):
+        path = os.path.realpath(os.path.join(self.root, manifest['name']))
+        for chunk in entry['chunks']:
+            chunk_path = os.path.realpath(os.path.join(path, chunk['file']))
+            if os.path.commonpath([path, chunk_path]) != path:
+                raise SnapshotError(f"Chunk {chunk['file']} is outside snapshot {manifest['name']}")
+            try:
+                with open(chunk_path, 'rb') as chunk_file:
+                    data = chunk_file.read()
+            except OSError as e:
+                raise SnapshotError(f"Missing chunk {chunk['file']} in {manifest['name']}: {e}")
+            if hashlib.sha256(data).hexdigest() != chunk['sha256']:
+                raise SnapshotError(f"Checksum mismatch for {chunk['file']} in {manifest['name']}")
+            yield _decompress(data, manifest['compression']).decode('utf-8').splitlines()
+
+    def verify(self):
+        """Check every chunk in the chain against its checksum; returns the chain"""
+        chain = self.chain()
+        for manifest in chain:
+            for entry in manifest['models']:
+                for _ in self._chunks(manifest, entry):
+                    pass
+        return chain
+
+    def _sources(self, chain, label):
+        """(manifest, entry) pairs holding the rows of one model, oldest first"""
+        sources = []
+        for manifest in chain:
+            entry = next((entry for entry in manifest['models'] if entry['model'] == label), None)
+            if entry is None:
+                break
+            sources.append((manifest, entry))
+            if not entry['incremental']:
+                break
+        return list(reversed(sources))
+
+    def restore(self):
+        """
+        Upsert every snapshot row.
+
+        Returns:
+            Dict mapping model label to restored row count
+        """
+        chain = self.verify()
+        latest = chain[0]
+
+        models = []
+        for entry in latest['models']:
+            try:
+                models.append(apps.get_model(entry['model']))
+            except LookupError:
+                logger.warning(f"Snapshot model {entry['model']} no longer exists; skipped")
+        order = {model: position for position, model in enumerate(snapshot_models())}
+        models.sort(key=lambda model: order.get(model, len(order)))
+
+        counts = {}
+        with transaction.atomic(), _original_timestamps(models):
+            for model in models:
+                counts[model._meta.label] = self._restore_model(chain, model)
+
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(), models)
+            if sequence_sql:
+                with connection.cursor() as cursor:
+                    for sql in sequence_sql:
+                        cursor.execute(sql)
+
+            # Devices can't apply a wholesale replacement as a delta
+            ChangeFeed.reset()
+            transaction.on_commit(self._invalidate_caches)
+
+        logger.info(f"Inventory snapshot {self.name} restored: {sum(counts.values())} rows")
+        return counts
+
+    def _restore_model(self, chain, model):
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        update_fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        restored = 0
+
+        for manifest, entry in self._sources(chain, model._meta.label):
+            columns = [column for column in entry['columns'] if column in fields]
+            positions = [entry['columns'].index(column) for column in columns]
+
+            for lines in self._chunks(manifest, entry):
+                objects = []
+                for line in lines:
+                    values = json.loads(line)
+                    objects.append(model(**{
+                        column: fields[column].to_python(values[position])
+                        for column, position in zip(columns, positions)
+                    }))
+                model._default_manager.bulk_create(
+                    objects,
+                    batch_size=RESTORE_BATCH_SIZE,
+                    update_conflicts=bool(update_fields),
+                    ignore_conflicts=not update_fields,
+                    unique_fields=['pk'] if update_fields else None,
+                    update_fields=update_fields or None,
+                )
+                restored += len(objects)
+        return restored
+
+    @staticmethod
+    def _invalidate_caches():
+        """Expire what the skipped save signals would have kept current"""
+        from .autocomplete import part_number_index
+        from .listing import invalidate_facets
+        from .models import Category, Product
+        from .scanning import ProductCardCache
+
+        try:
+            part_number_index.invalidate(shared=True)
+            invalidate_facets()
+            Category.invalidate_rollups()
+            for product_id in Product.objects.values_list('id', flat=True).iterator(chunk_size=5000):
+                ProductCardCache.invalidate(product_id)
+        except Exception as e:
+            logger.error(f"Error invalidating caches after snapshot restore: {e}")
+
+
+def prune_snapshots(root=None, retention_days=None):
+    """
+    Delete snapshots older than the retention period.
+
+    Snapshots still needed as the base of a kept incremental snapshot are
+    kept as well.
+
+    Returns:
+        Names of deleted snapshots
+    """
+    root = root or backup_root()
+    if retention_days is None:
+        retention_days = getattr(settings, 'INVENTORY_SETTINGS', {}).get('BACKUP_RETENTION_DAYS', 30)
+    cutoff = (timezone.now() - datetime.timedelta(days=retention_days)).isoformat()
+
+    snapshots = list_snapshots(root)
+    by_name = {manifest['name']: manifest for manifest in snapshots}
+    keep = set()
+    for manifest in snapshots:
+        if manifest['created_at'] >= cutoff:
+            name = manifest['name']
+            while name and name not in keep:
+                keep.add(name)
+                name = by_name.get(name, {}).get('base')
+
+    deleted = []
+    for manifest in snapshots:
+        if manifest['name'] not in keep:
+            shutil.rmtree(os.path.join(root, manifest['name']), ignore_errors=True)
+            deleted.append(manifest['name'])
+    if deleted:
+        logger.info(f"Pruned {len(deleted)} inventory snapshots")
+    return deleted
@@ -0,0 +1,243 @@
+# inventory/conversion.py - Currency Conversion Table
+
+"""
+In-process currency conversion.
+
+Conversions used to read Currency rows wherever they happened (product cost
+calculations, the cost calculator, the conversion APIs), so a page showing
+USD equivalents for a few hundred rows ran a query per row. Every process
+now holds one immutable RateTable, built from Currency in a single query:
+
+- the table is keyed by currency code and by currency id, so callers that
+  only hold a foreign key id convert without loading the Currency
+- a version number in the shared cache says whether the table is current;
+  it is checked at most once per request (request_started resets the
+  check), and at most every CHECK_INTERVAL seconds outside requests
+  (commands, workers)
+- anything that changes rates calls rates_changed(): the local table is
+  dropped at once and the shared version is bumped when the transaction
+  commits, so every other process rebuilds on its next check
+- convert_many() and annotate_usd() convert whole lists against one table
+
+Historical conversions (the rate valid at a past moment) are in
+inventory.fx.
+"""
+
+import logging
+import threading
+import time
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'USD'
+
+VERSION_CACHE_KEY = 'inventory:fx_table_version'
+CHECK_INTERVAL = 30
+
+_lock = threading.Lock()
+_table = None
+_state = threading.local()
+
+
+class UnknownCurrency(KeyError):
+    """No rate is known for a currency code or id"""
+
+
+class RateTable:
+    """
+    Immutable snapshot of the rates to USD
+    """
+
+    __slots__ = ('version', 'rates', 'codes_by_id')
+
+    def __init__(self, rates, codes_by_id, version=None):
+        self.version = version
+        self.rates = MappingProxyType(dict(rates))
+        self.codes_by_id = MappingProxyType(dict(codes_by_id))
+
+    @classmethod
+    def load(cls, version=None):
+        """Build the table from every Currency (inactive ones keep converting old records)"""
+        from .models import Currency
+
+        rows = list(Currency.objects.values_list('pk', 'code', 'exchange_rate_to_usd'))
+        rates = {code: rate for _, code, rate in rows}
+        rates.setdefault(BASE_CURRENCY, Decimal('1'))
+        return cls(rates, {pk: code for pk, code, _ in rows}, version)
+
+    def rate(self, code):
+        """Rate to USD of a currency code"""
+        try:
+            return self.rates[code.upper()]
+        except (KeyError, AttributeError):
+            raise UnknownCurrency(code)
+
+    def code(self, currency_id):
+        """Code of a currency id"""
+        try:
+            return self.codes_by_id[currency_id]
+        except KeyError:
+            raise UnknownCurrency(currency_id)
+
+    def convert(self, amount, from_code, to_code=BASE_CURRENCY):
+        """Convert an amount between two currency codes"""
+        amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+        if from_code == to_code:
+            return amount
+        return amount * self.rate(from_code) / self.rate(to_code)
+
+    def to_usd(self, amount, code):
+        return amount * self.rate(code) if code != BASE_CURRENCY else amount
+
+    def to_usd_by_id(self, amount, currency_id):
+        return self.to_usd(amount, self.code(currency_id))
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def rate_table():
+    """
+    The process-wide table, rebuilt when the shared version has moved.
+
+    The version is read at most once per request, or once every
+    CHECK_INTERVAL seconds outside a request.
+    """
+    global _table
+
+    table = _table
+    now = time.monotonic()
+    checked_at = getattr(_state, 'checked_at', None)
+    in_request = getattr(_state, 'in_request', False)
+    if table is not None and checked_at is not None and (in_request or now - checked_at < CHECK_INTERVAL):
+        return table
+
+    version = _current_version()
+    _state.checked_at = now
+    if table is not None and table.version == version:
+        return table
+
+    with _lock:
+        if _table is None or _table.version != version:
+            _table = RateTable.load(version)
+            logger.debug(f"Currency rate table loaded at version {version}: {len(_table.rates)} currencies")
+        return _table
+
+
+def start_request():
+    """Allow one version check in the request about to run"""
+    _state.in_request = True
+    _state.checked_at = None
+
+
+def finish_request():
+    _state.in_request = False
+
+
+def rates_changed():
+    """
+    Drop this process's table now and bump the shared version on commit.
+
+    Call after writing Currency rates.
+    """
+    global _table
+
+    _table = None
+
+    def bump():
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 1, None)
+
+    transaction.on_commit(bump)
+
+
+# =====================================
+# CONVERSION HELPERS
+# =====================================
+
+def convert(amount, from_code, to_code=BASE_CURRENCY):
+    """Convert an amount between currency codes with the current rates"""
+    return rate_table().convert(amount, from_code, to_code)
+
+
+def to_usd(amount, currency_id):
+    """
+    USD value of an amount in the currency with this id.
+
+    A currency created since the table was built triggers one rebuild.
+    """
+    global _table
+
+    table = rate_table()
+    if currency_id not in table.codes_by_id:
+        _table = None
+        table = rate_table()
+    return table.to_usd_by_id(amount, currency_id)
+
+
+def convert_many(amounts, from_codes, to_code=BASE_CURRENCY):
+    """
+    Convert a list of amounts against one table.
+
+    Args:
+        amounts: Amounts (None stays None)
+        from_codes: Currency code per amount, or one code for all
+        to_code: Target currency code
+
+    Returns:
+        List of converted Decimals aligned with amounts; None where the
+        amount is None or its currency is unknown
+    """
+    table = rate_table()
+    if isinstance(from_codes, str):
+        from_codes = [from_codes] * len(amounts)
+
+    target = table.rate(to_code)
+    factors = {}
+    converted = []
+    for amount, code in zip(amounts, from_codes):
+        if code not in factors:
+            rate = table.rates.get((code or '').upper())
+            factors[code] = rate / target if rate is not None else None
+        if amount is None or factors[code] is None:
+            converted.append(None)
+            continue
+        amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+        converted.append(amount * factors[code])
+    return converted
+
+
+def annotate_usd(objects, amount_field, currency_field, target_field=None):
+    """
+    Set the USD equivalent of amount_field on every object.
+
+    currency_field names the currency foreign key (its id is read, the
+    related row is never loaded). The result goes to target_field, by
+    default '<amount_field>_usd'; unknown currencies give None.
+
+    Returns:
+        The objects, for use in view code
+    """
+    table = rate_table()
+    target_field = target_field or f'{amount_field}_usd'
+    for obj in objects:
+        amount = getattr(obj, amount_field)
+        currency_id = getattr(obj, f'{currency_field}_id')
+        code = table.codes_by_id.get(currency_id)
+        value = None
+        if amount is not None and code is not None:
+            value = table.to_usd(amount, code)
+        setattr(obj, target_field, value)
+    return objects
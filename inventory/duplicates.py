@@ -0,0 +1,327 @@
+# inventory/duplicates.py - Duplicate Product Detection
+
+"""
+Duplicate product detection for BlitzTech Electronics inventory.
+
+Comparing every product with every other is O(n²), so the detector only
+scores pairs that share a blocking key:
+
+- the same normalized manufacturer part number
+- the same brand and normalized model number
+- a MinHash/LSH band over character 3-grams of the product name, so names
+  with high token overlap land in a shared bucket
+
+Candidate pairs are scored (name similarity, MPN match) and the ones above
+the threshold are stored as DuplicateCandidate rows, grouped into
+DuplicateCluster rows with union-find. Pairs a reviewer dismissed are never
+re-proposed.
+
+Runs are incremental by default: only products updated since the last scan
+are paired against the catalog, and blocking keys of unchanged products are
+reused from the cache. Use the detect_duplicates command (or the scheduled
+task) to run it in the background.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 0.8
+
+# MinHash / LSH parameters: 10 bands of 3 rows puts names with ~0.6 shingle
+# Jaccard similarity in a shared bucket about 90% of the time
+LSH_BANDS = 10
+LSH_ROWS = 3
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+SHINGLE_SIZE = 3
+
+# Blocks larger than this are too generic to be useful and are skipped
+MAX_BLOCK_SIZE = 200
+
+LAST_SCAN_CACHE_KEY = 'inventory:duplicates_last_scan'
+BLOCKING_KEYS_CACHE_KEY = 'inventory:duplicates_blocking_keys'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(1303)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_code(value):
+    """Part number with case and separators removed"""
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def normalize_name(value):
+    """Lower-cased name with punctuation collapsed to single spaces"""
+    return ' '.join(re.findall(r'\w+', (value or '').lower()))
+
+
+def _shingles(name):
+    if len(name) <= SHINGLE_SIZE:
+        return {name} if name else set()
+    return {name[i:i + SHINGLE_SIZE] for i in range(len(name) - SHINGLE_SIZE + 1)}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash_signature(name):
+    """MinHash signature over the name's character shingles"""
+    hashes = [_hash64(shingle) for shingle in _shingles(name)]
+    if not hashes:
+        return ()
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def blocking_keys(row):
+    """
+    Blocking keys for one product row.
+
+    Args:
+        row: Dict with name, manufacturer_part_number, model_number, brand_id
+    """
+    keys = []
+
+    mpn = normalize_code(row.get('manufacturer_part_number'))
+    if len(mpn) >= 3:
+        keys.append(f'mpn:{mpn}')
+
+    model = normalize_code(row.get('model_number'))
+    if len(model) >= 3 and row.get('brand_id'):
+        keys.append(f"model:{row['brand_id']}:{model}")
+
+    signature = minhash_signature(normalize_name(row.get('name')))
+    for band in range(LSH_BANDS if signature else 0):
+        chunk = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        keys.append(f"lsh:{band}:{_hash64(','.join(map(str, chunk)))}")
+
+    return keys
+
+
+def score_pair(a, b):
+    """
+    Similarity score and matched signals for two product rows.
+
+    Returns:
+        (score between 0 and 1, list of reasons)
+    """
+    reasons = []
+    name_similarity = SequenceMatcher(None, normalize_name(a['name']), normalize_name(b['name'])).ratio()
+    score = name_similarity
+    if name_similarity >= SIMILARITY_THRESHOLD:
+        reasons.append('similar_name')
+
+    mpn_a = normalize_code(a.get('manufacturer_part_number'))
+    if mpn_a and mpn_a == normalize_code(b.get('manufacturer_part_number')):
+        reasons.append('same_mpn')
+        score = max(score, 0.95)
+
+    for field_name in ('brand_id', 'supplier_id', 'category_id'):
+        if a.get(field_name) and a.get(field_name) == b.get(field_name):
+            reasons.append(f"same_{field_name[:-3]}")
+
+    return round(score, 4), reasons
+
+
+class DuplicateDetector:
+    """
+    Blocked duplicate detection with persisted candidate clusters
+    """
+
+    ROW_FIELDS = (
+        'id', 'name', 'manufacturer_part_number', 'model_number',
+        'brand_id', 'supplier_id', 'category_id', 'updated_at'
+    )
+
+    @classmethod
+    def _load_blocking_keys(cls, rows):
+        """Blocking keys per product, reusing cached keys for unchanged products"""
+        cached = cache.get(BLOCKING_KEYS_CACHE_KEY) or {}
+        keys_by_product = {}
+        for row in rows:
+            stamp = row['updated_at'].isoformat() if row['updated_at'] else ''
+            entry = cached.get(row['id'])
+            if entry and entry[0] == stamp:
+                keys_by_product[row['id']] = entry[1]
+            else:
+                keys_by_product[row['id']] = blocking_keys(row)
+        cache.set(
+            BLOCKING_KEYS_CACHE_KEY,
+            {
+                row['id']: (row['updated_at'].isoformat() if row['updated_at'] else '', keys_by_product[row['id']])
+                for row in rows
+            },
+            None
+        )
+        return keys_by_product
+
+    @classmethod
+    def candidate_pairs(cls, keys_by_product, dirty_ids=None):
+        """
+        Pairs of product ids sharing at least one block.
+
+        Args:
+            dirty_ids: When given, only pairs touching one of these ids are returned
+        """
+        blocks = defaultdict(list)
+        for product_id, keys in keys_by_product.items():
+            for key in keys:
+                blocks[key].append(product_id)
+
+        pairs = set()
+        skipped = 0
+        for key, members in blocks.items():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BLOCK_SIZE:
+                skipped += 1
+                continue
+            if dirty_ids is None:
+                pairs.update(combinations(sorted(members), 2))
+            else:
+                changed = [member for member in members if member in dirty_ids]
+                for product_id in changed:
+                    for other_id in members:
+                        if other_id != product_id:
+                            pairs.add((min(product_id, other_id), max(product_id, other_id)))
+
+        if skipped:
+            logger.info(f"Duplicate detection skipped {skipped} oversized blocks")
+        return pairs
+
+    @classmethod
+    def run(cls, full=False):
+        """
+        Scan for duplicates and refresh stored candidates and clusters.
+
+        Args:
+            full: Re-score the whole catalog instead of products changed since the last scan
+
+        Returns:
+            Dict of run statistics
+        """
+        from .models import DuplicateCandidate, Product
+
+        started = time.perf_counter()
+        scan_started_at = timezone.now()
+
+        last_scan = None if full else cache.get(LAST_SCAN_CACHE_KEY)
+        rows = list(Product.objects.filter(is_active=True).values(*cls.ROW_FIELDS))
+        rows_by_id = {row['id']: row for row in rows}
+
+        dirty_ids = None
+        if last_scan:
+            dirty_ids = {row['id'] for row in rows if row['updated_at'] and row['updated_at'] > last_scan}
+
+        keys_by_product = cls._load_blocking_keys(rows)
+        pairs = set() if dirty_ids == set() else cls.candidate_pairs(keys_by_product, dirty_ids)
+
+        dismissed = set(
+            DuplicateCandidate.objects.filter(status='dismissed').values_list('product_a_id', 'product_b_id')
+        )
+
+        matches = []
+        for a_id, b_id in pairs:
+            if (a_id, b_id) in dismissed:
+                continue
+            score, reasons = score_pair(rows_by_id[a_id], rows_by_id[b_id])
+            if score >= SIMILARITY_THRESHOLD:
+                matches.append(DuplicateCandidate(
+                    product_a_id=a_id, product_b_id=b_id, score=score, reasons=reasons
+                ))
+
+        with transaction.atomic():
+            stale = DuplicateCandidate.objects.filter(status='open')
+            if dirty_ids is not None:
+                stale = stale.filter(Q(product_a_id__in=dirty_ids) | Q(product_b_id__in=dirty_ids))
+            stale.delete()
+
+            # Products deactivated since they were paired
+            DuplicateCandidate.objects.filter(status='open').filter(
+                Q(product_a__is_active=False) | Q(product_b__is_active=False)
+            ).delete()
+
+            DuplicateCandidate.objects.bulk_create(matches, batch_size=1000, ignore_conflicts=True)
+            clusters = cls.rebuild_clusters()
+
+        cache.set(LAST_SCAN_CACHE_KEY, scan_started_at, None)
+
+        stats = {
+            'mode': 'full' if dirty_ids is None else 'incremental',
+            'products': len(rows),
+            'changed_products': len(rows) if dirty_ids is None else len(dirty_ids),
+            'candidate_pairs': len(pairs),
+            'duplicates_found': len(matches),
+            'clusters': clusters,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Duplicate scan completed: {stats}")
+        return stats
+
+    @staticmethod
+    def rebuild_clusters():
+        """Group open candidate pairs into clusters (union-find); returns cluster count"""
+        from .models import DuplicateCandidate, DuplicateCluster
+
+        candidates = list(
+            DuplicateCandidate.objects.filter(status='open').only('id', 'product_a_id', 'product_b_id', 'score')
+        )
+
+        parent = {}
+
+        def find(product_id):
+            parent.setdefault(product_id, product_id)
+            while parent[product_id] != product_id:
+                parent[product_id] = parent[parent[product_id]]
+                product_id = parent[product_id]
+            return product_id
+
+        for candidate in candidates:
+            root_a, root_b = find(candidate.product_a_id), find(candidate.product_b_id)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups = defaultdict(list)
+        for candidate in candidates:
+            groups[find(candidate.product_a_id)].append(candidate)
+
+        DuplicateCluster.objects.all().delete()
+
+        roots = list(groups)
+        clusters = DuplicateCluster.objects.bulk_create([
+            DuplicateCluster(
+                product_count=len({
+                    product_id
+                    for candidate in groups[root]
+                    for product_id in (candidate.product_a_id, candidate.product_b_id)
+                }),
+                best_score=max(candidate.score for candidate in groups[root]),
+            )
+            for root in roots
+        ])
+
+        for root, cluster in zip(roots, clusters):
+            for candidate in groups[root]:
+                candidate.cluster = cluster
+        DuplicateCandidate.objects.bulk_update(candidates, ['cluster'], batch_size=1000)
+
+        return len(clusters)
@@ -0,0 +1,356 @@
+# inventory/fx.py - Exchange Rates
+
+"""
+Exchange-rate refresh and historical rate lookups.
+
+Rates come from a RateProvider chosen by INVENTORY_SETTINGS
+['EXCHANGE_RATE_PROVIDER']:
+
+- HTTPRateProvider fetches a JSON rates document (exchangerate.host format),
+  sending the ETag/Last-Modified of the previous response back as
+  If-None-Match/If-Modified-Since
+- FileRateProvider reads the same document from a file, for offline
+  installations and tests
+
+A provider returns None when the rates have not changed since the last
+fetch (a 304, an unchanged file, or a body identical to the last one), and
+the refresh ends there. Otherwise ExchangeRateService.refresh() writes the
+currencies with one bulk_update and appends every changed rate to
+ExchangeRateHistory. That history is the provenance for historical
+conversions: rate_at() and convert_at() read the rate valid at a timestamp
+with one indexed lookup on (currency, effective_at). A rate takes effect when
+it is applied here, not at the provider's publication date, so history
+always describes the rates the system actually used.
+
+Refreshes run on a schedule (the update_exchange_rates command), not inside
+requests.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = 'USD'
+RATE_PLACES = Decimal('0.000001')
+
+DEFAULT_PROVIDER = 'inventory.fx.HTTPRateProvider'
+DEFAULT_RATES_URL = 'https://api.exchangerate.host/latest?base=USD'
+
+PROVIDER_STATE_PREFIX = 'inventory:fx_provider'
+
+
+class RateProviderError(Exception):
+    """The provider could not supply usable rates"""
+
+
+def _fx_setting(name, default=None):
+    return getattr(settings, 'INVENTORY_SETTINGS', {}).get(name, default) or default
+
+
+def parse_rates_document(data, source):
+    """
+    Rates from an exchangerate.host style document.
+
+    Accepts {"base": "EUR", "rates": {"USD": 1.08, ...}} as well as
+    {"source": "USD", "quotes": {"USDEUR": 0.92, ...}}, with the rates'
+    date as "timestamp" (epoch seconds) or "date" (YYYY-MM-DD).
+
+    Returns:
+        Quote dict: rates (units per USD, as Decimal), rates_date (the
+        provider's publication time) and source
+    """
+    base = (data.get('base') or data.get('source') or BASE_CURRENCY).upper()
+    raw = data.get('rates')
+    if raw is None and isinstance(data.get('quotes'), dict):
+        raw = {code[len(base):] if code.startswith(base) else code: value for code, value in data['quotes'].items()}
+    if not isinstance(raw, dict) or not raw:
+        raise RateProviderError(f'{source}: document has no rates')
+
+    try:
+        rates = {code.upper(): Decimal(str(value)) for code, value in raw.items()}
+    except (InvalidOperation, AttributeError) as e:
+        raise RateProviderError(f'{source}: invalid rate value ({e})')
+    rates[base] = Decimal('1')
+
+    # Re-base to USD
+    if base != BASE_CURRENCY:
+        usd = rates.get(BASE_CURRENCY)
+        if not usd:
+            raise RateProviderError(f'{source}: {base}-based document without a {BASE_CURRENCY} rate')
+        rates = {code: value / usd for code, value in rates.items()}
+
+    if data.get('timestamp'):
+        rates_date = datetime.fromtimestamp(int(data['timestamp']), tz=dt_timezone.utc)
+    elif data.get('date') and parse_date(str(data['date'])):
+        day = parse_date(str(data['date']))
+        rates_date = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+    else:
+        rates_date = None
+
+    return {
+        'rates': {code: value for code, value in rates.items() if value > 0},
+        'rates_date': rates_date,
+        'source': source,
+    }
+
+
+# =====================================
+# RATE PROVIDERS
+# =====================================
+
+class RateProvider:
+    """
+    Base class for exchange-rate sources.
+
+    Subclasses implement read(state), returning the document bytes (or None
+    when the source reports it unchanged) and the validators to send next
+    time.
+    """
+
+    name = 'provider'
+
+    @property
+    def state_key(self):
+        return f'{PROVIDER_STATE_PREFIX}:{self.name}'
+
+    def read(self, state):
+        raise NotImplementedError
+
+    def fetch(self, force=False):
+        """
+        Current rates, or None when unchanged since the last remembered fetch.
+
+        Returns:
+            Quote dict (see parse_rates_document) carrying the provider state
+            to remember() once the rates are stored
+        """
+        state = {} if force else (cache.get(self.state_key) or {})
+        body, validators = self.read(state)
+        if body is None:
+            return None
+
+        digest = hashlib.sha256(body).hexdigest()
+        if digest == state.get('digest'):
+            return None
+
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise RateProviderError(f'{self.name}: invalid JSON ({e})')
+        if not isinstance(data, dict) or data.get('success') is False:
+            raise RateProviderError(f'{self.name}: {data.get("error") if isinstance(data, dict) else "unexpected document"}')
+
+        quote = parse_rates_document(data, self.name)
+        quote['state'] = {**validators, 'digest': digest}
+        return quote
+
+    def remember(self, quote):
+        """Keep the validators of a stored quote for the next conditional fetch"""
+        cache.set(self.state_key, quote['state'], None)
+
+
+class HTTPRateProvider(RateProvider):
+    """Rates document over HTTP with conditional requests"""
+
+    name = 'http'
+
+    def __init__(self, url=None, api_key=None, timeout=10):
+        self.url = url or _fx_setting('EXCHANGE_RATE_URL', DEFAULT_RATES_URL)
+        self.api_key = api_key if api_key is not None else _fx_setting('EXCHANGE_RATE_API_KEY', '')
+        self.timeout = timeout
+
+    def read(self, state):
+        import requests
+
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+        response = requests.get(
+            self.url,
+            params={'access_key': self.api_key} if self.api_key else None,
+            headers=headers,
+            timeout=self.timeout,
+        )
+        if response.status_code == 304:
+            return None, state
+        response.raise_for_status()
+
+        return response.content, {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+
+class FileRateProvider(RateProvider):
+    """Rates document from a local file (offline installations, fixtures)"""
+
+    name = 'file'
+
+    def __init__(self, path=None):
+        self.path = path or _fx_setting('EXCHANGE_RATE_FILE')
+        if not self.path:
+            raise RateProviderError('No exchange rate file configured')
+
+    def read(self, state):
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            raise RateProviderError(f'{self.name}: {e}')
+        if state.get('mtime') == stat.st_mtime_ns:
+            return None, state
+
+        with open(self.path, 'rb') as rates_file:
+            return rates_file.read(), {'mtime': stat.st_mtime_ns}
+
+
+def get_provider():
+    """The provider configured in INVENTORY_SETTINGS['EXCHANGE_RATE_PROVIDER']"""
+    return import_string(_fx_setting('EXCHANGE_RATE_PROVIDER', DEFAULT_PROVIDER))()
+
+
+# =====================================
+# REFRESH
+# =====================================
+
+class ExchangeRateService:
+    """
+    Applies provider rates to Currency and the rate history
+    """
+
+    @staticmethod
+    def refresh(provider=None, currencies=None, force=False):
+        """
+        Fetch rates and store the ones that changed.
+
+        Args:
+            provider: RateProvider (default: the configured one)
+            currencies: Currency queryset to update (default: active
+                currencies with auto_update_enabled)
+            force: Fetch unconditionally and re-apply unchanged documents
+
+        Returns:
+            Dict with status ('updated' or 'not_modified'), updated
+            {code: rate}, unchanged count, missing codes and the provider's
+            rates_date
+        """
+        from .conversion import rates_changed
+        from .models import Currency, ExchangeRateHistory
+
+        provider = provider or get_provider()
+        quote = provider.fetch(force=force)
+        if quote is None:
+            logger.info(f"Exchange rates from {provider.name} not modified")
+            return {'status': 'not_modified', 'updated': {}, 'unchanged': 0, 'missing': [], 'rates_date': None}
+
+        if currencies is None:
+            currencies = Currency.objects.filter(is_active=True, auto_update_enabled=True)
+
+        now = timezone.now()
+        confirmed, changed, missing = [], [], []
+        for currency in currencies:
+            if currency.code == BASE_CURRENCY:
+                rate = Decimal('1')
+            elif currency.code in quote['rates']:
+                rate = (Decimal('1') / quote['rates'][currency.code]).quantize(RATE_PLACES)
+            else:
+                missing.append(currency.code)
+                continue
+
+            currency.last_updated = now
+            confirmed.append(currency)
+            if rate != currency.exchange_rate_to_usd:
+                currency.exchange_rate_to_usd = rate
+                changed.append(currency)
+
+        with transaction.atomic():
+            Currency.objects.bulk_update(confirmed, ['exchange_rate_to_usd', 'last_updated'])
+            ExchangeRateHistory.objects.bulk_create([
+                ExchangeRateHistory(
+                    currency=currency,
+                    rate_to_usd=currency.exchange_rate_to_usd,
+                    effective_at=now,
+                    source=quote['source'],
+                )
+                for currency in changed
+            ])
+            if changed:
+                rates_changed()
+            transaction.on_commit(lambda: provider.remember(quote))
+
+        if missing:
+            logger.warning(f"No {provider.name} rate for: {', '.join(missing)}")
+        logger.info(
+            f"Exchange rates from {provider.name}: {len(changed)} changed, "
+            f"{len(confirmed) - len(changed)} unchanged"
+        )
+        return {
+            'status': 'updated',
+            'updated': {currency.code: float(currency.exchange_rate_to_usd) for currency in changed},
+            'unchanged': len(confirmed) - len(changed),
+            'missing': missing,
+            'rates_date': quote['rates_date'].isoformat() if quote['rates_date'] else None,
+        }
+
+
+def record_rate(currency, source='manual', effective_at=None):
+    """Append a currency's current rate to the history if it differs from the latest entry"""
+    from .models import ExchangeRateHistory
+
+    latest = currency.rate_history.order_by('-effective_at').values_list('rate_to_usd', flat=True).first()
+    if latest == currency.exchange_rate_to_usd:
+        return None
+    return ExchangeRateHistory.objects.create(
+        currency=currency,
+        rate_to_usd=currency.exchange_rate_to_usd,
+        effective_at=effective_at or timezone.now(),
+        source=source,
+    )
+
+
+# =====================================
+# HISTORICAL LOOKUPS
+# =====================================
+
+def rate_at(currency, when=None):
+    """
+    Rate to USD valid at a moment.
+
+    Args:
+        currency: Currency instance or ISO code
+        when: Timestamp (default: now)
+
+    Returns:
+        Decimal rate; before the first history entry the oldest known rate
+    """
+    from .models import Currency, ExchangeRateHistory
+
+    if isinstance(currency, str):
+        currency = Currency.objects.get(code=currency.upper())
+    when = when or timezone.now()
+
+    history = ExchangeRateHistory.objects.filter(currency_id=currency.pk)
+    rate = history.filter(effective_at__lte=when).order_by('-effective_at').values_list('rate_to_usd', flat=True).first()
+    if rate is None:
+        rate = history.order_by('effective_at').values_list('rate_to_usd', flat=True).first()
+    return rate if rate is not None else currency.exchange_rate_to_usd
+
+
+def convert_at(amount, from_currency, to_currency, when=None):
+    """Convert an amount with the rates valid at a moment"""
+    amount = Decimal(str(amount))
+    return amount * rate_at(from_currency, when) / rate_at(to_currency, when)
@@ -0,0 +1,926 @@
+# inventory/importing.py - Bulk Product Import Engine
+
+"""
+Set-based product import engine used by the import_products command.
+
+Importing row by row costs several queries per product (category, supplier
+and SKU lookups, the save itself, cost calculation, stock level creation and
+a notification per manager). The engine instead:
+
+- preloads category, supplier, brand, currency, SKU and barcode maps once
+  per file
+- classifies each batch into create and update sets and writes them with
+  bulk_create/bulk_update inside one transaction
+- computes cost fields with Product.prepare_for_save() against overhead
+  rules loaded once per file
+- applies the post_save side effects in aggregate per batch: stock levels
+  for active locations, search vectors, reorder alerts and cache
+  invalidation; managers get one summary notification per import
+
+Files are streamed rather than loaded whole: CSV through csv.DictReader and
+Excel through openpyxl's read_only mode. Rows are cut into chunks that are
+cleaned and validated in a process pool (see clean_chunks), and the cleaned
+chunks come back in file order, so the writer sees the same batches and row
+numbers as a serial run while at most a few chunks are held in memory.
+
+Imports are tracked by ImportTracker so a failed run can be resumed and a
+rerun does no redundant work: every applied row leaves a content fingerprint
+keyed by SKU (or SKU and location for stock levels), rows whose fingerprint
+hasn't changed are skipped, and the session checkpoint records the last row
+of the committed batches. A file identical to one that already imported
+cleanly with the same options is recognised from its hash alone.
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRAND_NAME = 'Generic'
+
+# Row fields copied onto the product (stock totals are derived from stock levels)
+PRODUCT_FIELDS = (
+    'name', 'description', 'model_number', 'cost_price', 'selling_price',
+    'reorder_level', 'reorder_quantity', 'is_active',
+)
+
+# Fields written by bulk_update: row fields, relations and everything
+# Product.prepare_for_save() derives
+UPDATE_FIELDS = PRODUCT_FIELDS + (
+    'barcode', 'category', 'supplier', 'brand', 'supplier_currency', 'selling_currency',
+    'component_family', 'qr_code', 'cost_price_usd', 'total_import_cost_usd',
+    'overhead_cost_per_unit', 'total_cost_price_usd', 'markup_percentage',
+    'current_stock', 'available_stock',
+)
+
+# bulk_update builds one CASE per field over the whole batch, so it is kept
+# smaller than the insert batch
+UPDATE_BATCH_SIZE = 200
+
+# Selling price changes above this percentage are listed in the summary
+PRICE_CHANGE_NOTIFY_PERCENT = 10
+
+
+REQUIRED_COLUMNS = ('name', 'sku', 'category', 'supplier')
+OPTIONAL_TEXT_COLUMNS = (
+    'description', 'brand', 'model_number', 'barcode', 'supplier_currency', 'selling_currency',
+)
+
+# Column limits checked while cleaning, before anything reaches the database
+MAX_LENGTHS = {'name': 200, 'sku': 50, 'model_number': 100, 'barcode': 100}
+
+# Chunks queued per worker; bounds how much of the file is in memory at once
+CHUNKS_PER_WORKER = 2
+
+
+# =====================================
+# PARSING AND CLEANING
+# =====================================
+
+def _text(value):
+    """Cell value as stripped text; blanks, None and pandas/Excel NaN become ''"""
+    if value is None:
+        return ''
+    text = str(value).strip()
+    return '' if text.lower() == 'nan' else text
+
+
+def clean_decimal(value):
+    """Price cell to Decimal; currency symbols and thousands separators are ignored"""
+    text = _text(value).replace('$', '').replace(',', '')
+    if not text:
+        return Decimal('0.00')
+    try:
+        return Decimal(text)
+    except (InvalidOperation, ValueError):
+        return Decimal('0.00')
+
+
+def clean_integer(value):
+    """Quantity cell to int (0 when blank or invalid)"""
+    text = _text(value)
+    if not text:
+        return 0
+    try:
+        return int(float(text))
+    except (ValueError, TypeError):
+        return 0
+
+
+def clean_boolean(value):
+    """Yes/no cell to bool"""
+    if isinstance(value, bool):
+        return value
+    return str(value).lower().strip() in ['true', 'yes', '1', 'y', 'active', 'on']
+
+
+def clean_row(row):
+    """
+    Clean and validate one raw row.
+
+    Returns:
+        (cleaned dict, None) or (None, error message)
+    """
+    cleaned = {}
+    for field in REQUIRED_COLUMNS:
+        value = _text(row.get(field))
+        if not value:
+            return None, f'Missing required field "{field}"'
+        cleaned[field] = value
+
+    for field in OPTIONAL_TEXT_COLUMNS:
+        cleaned[field] = _text(row.get(field))
+
+    for field, limit in MAX_LENGTHS.items():
+        if len(cleaned[field]) > limit:
+            return None, f'{field} is longer than {limit} characters'
+
+    cleaned['cost_price'] = clean_decimal(row.get('cost_price', 0))
+    cleaned['selling_price'] = clean_decimal(row.get('selling_price', 0))
+    if cleaned['cost_price'] < 0 or cleaned['selling_price'] < 0:
+        return None, 'Prices cannot be negative'
+
+    cleaned['reorder_level'] = max(0, clean_integer(row.get('reorder_level', 10)))
+    cleaned['reorder_quantity'] = max(0, clean_integer(row.get('reorder_quantity', 50)))
+    cleaned['current_stock'] = clean_integer(row.get('current_stock', 0))
+    cleaned['is_active'] = clean_boolean(row.get('is_active', True))
+    return cleaned, None
+
+
+def clean_chunk(chunk):
+    """
+    Clean a chunk of (row_num, raw row) pairs.
+
+    Module level so it can run in a worker process.
+
+    Returns:
+        (list of (row_num, cleaned row), list of error strings)
+    """
+    batch, errors = [], []
+    for row_num, row in chunk:
+        try:
+            cleaned, error = clean_row(row)
+        except Exception as e:
+            cleaned, error = None, f'Data cleaning error - {str(e)}'
+        if error:
+            errors.append(f'Row {row_num}: {error}')
+        else:
+            batch.append((row_num, cleaned))
+    return batch, errors
+
+
+def chunked(rows, size):
+    """Group an iterable of rows into lists of at most size"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clean_chunks(rows, chunk_size, workers=1):
+    """
+    Clean rows chunk by chunk, in parallel when workers > 1.
+
+    At most workers * CHUNKS_PER_WORKER chunks are in flight, and results are
+    yielded in input order.
+
+    Args:
+        rows: Iterable of (row_num, raw row dict)
+        chunk_size: Rows per chunk (the writer's batch size)
+        workers: Worker processes; 1 cleans inline
+
+    Yields:
+        (raw chunk length, cleaned batch, errors)
+    """
+    if workers <= 1:
+        for chunk in chunked(rows, chunk_size):
+            yield (len(chunk),) + clean_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunked(rows, chunk_size):
+            pending.append((len(chunk), executor.submit(clean_chunk, chunk)))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                size, future = pending.popleft()
+                yield (size,) + future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield (size,) + future.result()
+
+
+def _check_headers(headers):
+    missing = [header for header in REQUIRED_COLUMNS if header not in headers]
+    if missing:
+        raise ValueError(f'Missing required headers: {", ".join(missing)}')
+
+
+def read_csv_rows(csvfile, delimiter=None):
+    """
+    Stream rows from an open CSV file.
+
+    Args:
+        csvfile: Text file object
+        delimiter: Column delimiter, or None to sniff it from the first 1KB
+
+    Returns:
+        (headers, iterator of (row_num, row dict))
+    """
+    if delimiter is None:
+        sample = csvfile.read(1024)
+        csvfile.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample).delimiter
+        except csv.Error:
+            delimiter = ','
+
+    reader = csv.DictReader(csvfile, delimiter=delimiter)
+    headers = reader.fieldnames or []
+    _check_headers(headers)
+    return headers, enumerate(reader, start=2)  # Row 1 is the header
+
+
+def read_excel_rows(file_path):
+    """
+    Stream rows from the first worksheet of an .xlsx file (openpyxl read_only).
+
+    Legacy .xls files can't be streamed and are read whole with pandas.
+
+    Returns:
+        (headers, iterator of (row_num, row dict))
+    """
+    if file_path.lower().endswith('.xls'):
+        import pandas as pd
+
+        df = pd.read_excel(file_path)
+        headers = [str(column) for column in df.columns]
+        _check_headers(headers)
+        return headers, enumerate(df.to_dict('records'), start=2)
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    worksheet = workbook.worksheets[0]
+    rows = worksheet.iter_rows(values_only=True)
+    headers = [_text(header) for header in next(rows, ())]
+    _check_headers(headers)
+
+    def iterate():
+        try:
+            for row_num, values in enumerate(rows, start=2):
+                if values is None or all(value is None for value in values):
+                    continue
+                yield row_num, dict(zip(headers, values))
+        finally:
+            workbook.close()
+
+    return headers, iterate()
+
+
+# =====================================
+# SESSIONS AND CHECKPOINTS
+# =====================================
+
+def file_digest(file_path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_fingerprint(values, salt=''):
+    """Stable content hash of a cleaned row"""
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha1(f'{salt}|{payload}'.encode('utf-8')).hexdigest()
+
+
+class ImportTracker:
+    """
+    Session, checkpoint and row fingerprints for one import run
+
+    Args:
+        kind: ImportSession kind ('products' or 'stock_levels')
+        file_path: File being imported
+        options: Dict of the options that change how rows apply; part of the
+                 session signature and of every row fingerprint
+        user: User running the import
+        resume: Continue the latest unfinished session for this file
+        full: Apply every row even if it is unchanged since the last import
+    """
+
+    def __init__(self, kind, file_path, options=None, user=None, resume=False, full=False):
+        self.kind = kind
+        self.file_path = file_path
+        self.user = user
+        self.resume = resume
+        self.full = full
+        self.signature = row_fingerprint(options or {}, salt=kind)
+        self.session = None
+        self.identical_to = None
+        self.resume_after = 0
+        self.checkpoint_broken = False
+
+    def start(self):
+        """
+        Hash the file and open (or reopen) the session.
+
+        Returns:
+            False when the file already imported cleanly with the same options
+            and there is nothing to do; nothing is written in that case
+        """
+        from .models import ImportSession
+
+        file_hash = file_digest(self.file_path)
+        sessions = ImportSession.objects.filter(kind=self.kind, file_hash=file_hash, signature=self.signature)
+
+        if self.resume:
+            # Anything but a clean completion: crashed, failed, or finished with rolled back batches
+            self.session = sessions.exclude(status='completed', error_count=0).first()
+            if self.session:
+                self.resume_after = self.session.last_committed_row
+                self.session.status = 'running'
+                self.session.error_message = ''
+                self.session.save(update_fields=['status', 'error_message', 'updated_at'])
+                return True
+
+        if not self.full:
+            self.identical_to = sessions.filter(status='completed', error_count=0).first()
+            if self.identical_to:
+                return False
+
+        self.session = ImportSession.objects.create(
+            kind=self.kind,
+            file_name=os.path.basename(self.file_path)[:255],
+            file_hash=file_hash,
+            signature=self.signature,
+            user=self.user,
+        )
+        return True
+
+    def fingerprint(self, values):
+        return row_fingerprint(values, salt=self.signature)
+
+    def unchanged(self, fingerprints, this_session=False):
+        """
+        Keys whose last applied fingerprint matches.
+
+        Args:
+            fingerprints: {key: fingerprint} for one batch (one query)
+            this_session: Only count rows applied by this session (a resumed
+                run of the same file). For rows holding absolute values that
+                other activity changes in between, such as stock counts, a
+                match from an earlier import does not mean nothing changed.
+        """
+        from .models import ImportRowFingerprint
+
+        if self.full or not fingerprints:
+            return set()
+        stored = ImportRowFingerprint.objects.filter(kind=self.kind, key__in=list(fingerprints))
+        if this_session:
+            stored = stored.filter(session=self.session)
+        stored = stored.values_list('key', 'fingerprint')
+        return {key for key, fingerprint in stored if fingerprints.get(key) == fingerprint}
+
+    def commit_batch(self, fingerprints, last_row, written=0, unchanged=0):
+        """
+        Record applied rows and advance the checkpoint.
+
+        Call inside the batch's transaction so the checkpoint can never run
+        ahead of the data.
+        """
+        from django.db.models import F
+
+        from .models import ImportRowFingerprint, ImportSession
+
+        if fingerprints:
+            ImportRowFingerprint.objects.bulk_create(
+                [
+                    ImportRowFingerprint(kind=self.kind, key=key[:200], fingerprint=fingerprint, session=self.session)
+                    for key, fingerprint in fingerprints.items()
+                ],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['kind', 'key'],
+                update_fields=['fingerprint', 'session', 'updated_at'],
+            )
+
+        updates = {
+            'rows_written': F('rows_written') + written,
+            'rows_unchanged': F('rows_unchanged') + unchanged,
+            'updated_at': timezone.now(),
+        }
+        if not self.checkpoint_broken:
+            updates['last_committed_row'] = last_row
+        ImportSession.objects.filter(pk=self.session.pk).update(**updates)
+
+    def batch_failed(self):
+        """Freeze the checkpoint; later batches still record their fingerprints"""
+        self.checkpoint_broken = True
+
+    def finish(self, error_count=0):
+        """Mark the session completed"""
+        from .models import ImportSession
+
+        ImportSession.objects.filter(pk=self.session.pk).update(
+            status='completed', error_count=error_count, finished_at=timezone.now(), updated_at=timezone.now()
+        )
+
+    def fail(self, message):
+        """Mark the session failed; --resume continues after its checkpoint"""
+        from .models import ImportSession
+
+        if self.session:
+            ImportSession.objects.filter(pk=self.session.pk).update(
+                status='failed', error_message=str(message)[:2000], updated_at=timezone.now()
+            )
+
+
+class ProductImporter:
+    """
+    Batch product importer for one file
+
+    Args:
+        user: User recorded as creator of new products (and categories/suppliers)
+        update_existing: Update products whose SKU already exists instead of skipping them
+        create_categories: Create categories missing from the catalog
+        create_suppliers: Create suppliers missing from the catalog
+        category_mapping: {file name: catalog name}
+        supplier_mapping: {file name: catalog name}
+        tracker: Optional ImportTracker; rows unchanged since they were last
+                 applied are skipped and each batch advances the checkpoint
+    """
+
+    def __init__(self, user=None, update_existing=False, create_categories=False,
+                 create_suppliers=False, category_mapping=None, supplier_mapping=None, tracker=None):
+        self.user = user
+        self.tracker = tracker
+        self.update_existing = update_existing
+        self.create_categories = create_categories
+        self.create_suppliers = create_suppliers
+        self.category_mapping = category_mapping or {}
+        self.supplier_mapping = supplier_mapping or {}
+
+        self.loaded = False
+        self.seen_skus = set()
+        self.created_ids = []
+        self.updated_ids = []
+        self.skipped_skus = []
+        self.price_changes = 0
+        self.started = time.perf_counter()
+
+    # ---- preloading ----
+
+    def load(self):
+        """Load every lookup map the file needs (a fixed number of queries)"""
+        from .models import Brand, Category, Currency, OverheadFactor, Product, Supplier
+
+        if self.loaded:
+            return
+
+        self.categories = {category.name: category for category in Category.objects.all()}
+        self.brands = {brand.name.lower(): brand for brand in Brand.objects.all()}
+        self.currencies = {currency.code: currency for currency in Currency.objects.filter(is_active=True)}
+        self.currencies_by_id = {currency.id: currency for currency in self.currencies.values()}
+
+        # Supplier names aren't unique; the oldest supplier wins, as .first() did
+        self.suppliers = {}
+        for supplier in Supplier.objects.order_by('-id'):
+            self.suppliers[supplier.name] = supplier
+
+        self.sku_ids = dict(Product.objects.values_list('sku', 'id'))
+        self.barcode_skus = dict(Product.objects.exclude(barcode='').values_list('barcode', 'sku'))
+
+        self.overhead_rules = OverheadFactor.active_rules()
+        self.barcode_prefix = getattr(settings, 'INVENTORY_SETTINGS', {}).get('BARCODE_PREFIX', 'BT')
+        self.loaded = True
+
+    # ---- row resolution ----
+
+    def _category(self, row_data):
+        name = self.category_mapping.get(row_data['category'], row_data['category'])
+        return name, self.categories.get(name)
+
+    def _supplier(self, row_data):
+        name = self.supplier_mapping.get(row_data['supplier'], row_data['supplier'])
+        return name, self.suppliers.get(name)
+
+    def _get_or_create_category(self, row_num, row_data, results):
+        from .models import Category
+
+        name, category = self._category(row_data)
+        if category is None and self.create_categories:
+            category = Category.objects.create(name=name, slug=slugify(name), created_by=self.user)
+            self.categories[name] = category
+            results['warnings'].append(f'Row {row_num}: Created category "{name}"')
+        elif category is None:
+            results['errors'].append(f'Row {row_num}: Category "{name}" does not exist')
+        return category
+
+    def _get_or_create_supplier(self, row_num, row_data, results):
+        from .models import Supplier, SupplierCountry
+
+        name, supplier = self._supplier(row_data)
+        if supplier is None and self.create_suppliers:
+            country = SupplierCountry.objects.order_by('id').first()
+            if country is None or 'USD' not in self.currencies:
+                results['errors'].append(
+                    f'Row {row_num}: Cannot create supplier "{name}" without a supplier country and USD currency'
+                )
+                return None
+            supplier = Supplier.objects.create(
+                name=name,
+                supplier_code=f"SUP-{slugify(name)[:40].upper()}",
+                supplier_type='distributor',
+                email=f"info@{name.lower().replace(' ', '')}.com",
+                country=country,
+                currency=self.currencies['USD'],
+                created_by=self.user,
+            )
+            self.suppliers[name] = supplier
+            results['warnings'].append(f'Row {row_num}: Created supplier "{name}"')
+        elif supplier is None:
+            results['errors'].append(f'Row {row_num}: Supplier "{name}" does not exist')
+        return supplier
+
+    def _get_or_create_brand(self, row_data):
+        from .models import Brand
+
+        name = row_data.get('brand') or DEFAULT_BRAND_NAME
+        brand = self.brands.get(name.lower())
+        if brand is None:
+            brand = Brand.objects.create(name=name, slug=slugify(name) or 'brand', created_by=self.user)
+            self.brands[name.lower()] = brand
+        return brand
+
+    def _currency(self, code, fallback, row_num, results):
+        if code:
+            currency = self.currencies.get(code.upper())
+            if currency is None:
+                results['errors'].append(f'Row {row_num}: Currency "{code}" does not exist')
+            return currency
+        if fallback is None:
+            results['errors'].append(f'Row {row_num}: No active currency to price the product in')
+        return fallback
+
+    def _barcode(self, row_num, row_data, results):
+        """Row barcode checked against other SKUs, or a generated unique one"""
+        barcode = row_data.get('barcode', '')
+        if barcode:
+            owner = self.barcode_skus.get(barcode)
+            if owner and owner != row_data['sku']:
+                results['errors'].append(f'Row {row_num}: Barcode "{barcode}" already belongs to {owner}')
+                return None
+            return barcode
+
+        base = f"{self.barcode_prefix}{row_data['sku']}"[:95]
+        barcode, suffix = base, 1
+        while barcode in self.barcode_skus:
+            suffix += 1
+            barcode = f'{base}-{suffix}'
+        return barcode
+
+    def _claim_sku(self, row_num, row_data, results):
+        """False if the SKU already appeared earlier in the file"""
+        sku = row_data['sku']
+        if sku in self.seen_skus:
+            results['errors'].append(f'Row {row_num}: Duplicate SKU "{sku}" in file')
+            return False
+        self.seen_skus.add(sku)
+        return True
+
+    # ---- dry run ----
+
+    def validate_batch(self, batch, results):
+        """Check a batch against the preloaded maps without writing anything"""
+        self.load()
+        for row_num, row_data in batch:
+            if not self._claim_sku(row_num, row_data, results):
+                continue
+            if row_data['sku'] in self.sku_ids:
+                results['warnings'].append(f'Row {row_num}: SKU "{row_data["sku"]}" already exists')
+
+            name, category = self._category(row_data)
+            if category is None:
+                results['warnings'].append(f'Row {row_num}: Category "{name}" does not exist')
+
+            name, supplier = self._supplier(row_data)
+            if supplier is None:
+                results['warnings'].append(f'Row {row_num}: Supplier "{name}" does not exist')
+
+            results['processed'] += 1
+
+    # ---- writing ----
+
+    def import_batch(self, batch, results, verbosity=1, stdout=None):
+        """
+        Create or update one batch of cleaned rows.
+
+        Args:
+            batch: List of (row_num, cleaned row dict)
+            results: Command results dict (counters, errors, warnings) updated in place
+        """
+        self.load()
+        self.skipped_skus = []
+
+        # Rows identical to what the last import applied never reach the database
+        fingerprints, same = {}, set()
+        if self.tracker:
+            for row_num, row_data in batch:
+                fingerprints.setdefault(row_data['sku'], self.tracker.fingerprint(row_data))
+            same = self.tracker.unchanged(fingerprints)
+            if same:
+                for row_num, row_data in batch:
+                    if row_data['sku'] in same:
+                        self._claim_sku(row_num, row_data, results)
+                batch_to_apply = [(row_num, row_data) for row_num, row_data in batch if row_data['sku'] not in same]
+            else:
+                batch_to_apply = batch
+        else:
+            batch_to_apply = batch
+
+        try:
+            with transaction.atomic():
+                to_create, to_update = self._classify(batch_to_apply, results)
+                created, updated, unchanged = self._write(to_create, to_update)
+                self._apply_side_effects(created, updated)
+
+                if self.tracker:
+                    applied = {product.sku for product in created + updated + unchanged}
+                    self.tracker.commit_batch(
+                        {sku: fingerprints[sku] for sku in applied},
+                        last_row=batch[-1][0],
+                        written=len(created) + len(updated),
+                        unchanged=len(unchanged) + len(same),
+                    )
+        except Exception as e:
+            first, last = batch[0][0], batch[-1][0]
+            logger.error(f"Product import batch failed (rows {first}-{last}): {str(e)}")
+            results['errors'].append(f'Rows {first}-{last}: batch rolled back - {str(e)}')
+            if self.tracker:
+                self.tracker.batch_failed()
+            # Maps may hold rows created inside the rolled back transaction
+            self.loaded = False
+            return
+
+        unchanged_count = len(unchanged) + len(same)
+        results['created'] += len(created)
+        results['updated'] += len(updated)
+        results['unchanged'] = results.get('unchanged', 0) + unchanged_count
+        results['processed'] += len(created) + len(updated) + unchanged_count
+        self.created_ids.extend(product.pk for product in created)
+        self.updated_ids.extend(product.pk for product in updated)
+
+        for product in created:
+            self.sku_ids[product.sku] = product.pk
+        for product in created + updated:
+            self.barcode_skus[product.barcode] = product.sku
+
+        if verbosity >= 2 and stdout is not None:
+            for product in created:
+                stdout.write(f'Created: {product.sku}')
+            for product in updated:
+                stdout.write(f'Updated: {product.sku}')
+            for sku in self.skipped_skus:
+                stdout.write(f'Skipped: {sku} (already exists)')
+
+    def _classify(self, batch, results):
+        """Resolve relations and split valid rows into new and existing products"""
+        from .models import Product
+
+        update_rows = []
+        to_create = []
+        for row_num, row_data in batch:
+            if not self._claim_sku(row_num, row_data, results):
+                continue
+
+            if row_data['sku'] in self.sku_ids and not self.update_existing:
+                results['skipped'] += 1
+                self.skipped_skus.append(row_data['sku'])
+                continue
+
+            category = self._get_or_create_category(row_num, row_data, results)
+            supplier = self._get_or_create_supplier(row_num, row_data, results)
+            barcode = self._barcode(row_num, row_data, results)
+            if category is None or supplier is None or barcode is None:
+                continue
+
+            supplier_currency = self._currency(
+                row_data.get('supplier_currency'), self.currencies_by_id.get(supplier.currency_id), row_num, results
+            )
+            selling_currency = self._currency(
+                row_data.get('selling_currency'), self.currencies.get('USD'), row_num, results
+            )
+            if supplier_currency is None or selling_currency is None:
+                continue
+
+            resolved = {
+                'category': category,
+                'supplier': supplier,
+                'brand': self._get_or_create_brand(row_data),
+                'supplier_currency': supplier_currency,
+                'selling_currency': selling_currency,
+                'barcode': barcode,
+            }
+            # Claim the barcode so later rows in the file can't take it
+            self.barcode_skus[barcode] = row_data['sku']
+
+            if row_data['sku'] in self.sku_ids:
+                update_rows.append((row_data, resolved))
+            else:
+                product = Product(
+                    sku=row_data['sku'],
+                    created_by=self.user,
+                    **{field: row_data[field] for field in PRODUCT_FIELDS},
+                    **resolved,
+                )
+                to_create.append(product)
+
+        to_update = []
+        if update_rows:
+            existing = Product.objects.in_bulk([row_data['sku'] for row_data, _ in update_rows], field_name='sku')
+            for row_data, resolved in update_rows:
+                product = existing.get(row_data['sku'])
+                if product is None:
+                    continue
+                original = self._snapshot(product)
+                old_price = product.selling_price
+                for field in PRODUCT_FIELDS:
+                    setattr(product, field, row_data[field])
+                if not row_data.get('barcode') and product.barcode:
+                    # Keep the existing barcode rather than generating a new one
+                    self.barcode_skus.pop(resolved['barcode'], None)
+                    resolved['barcode'] = product.barcode
+                for field, value in resolved.items():
+                    setattr(product, field, value)
+                if old_price and abs(product.selling_price - old_price) / old_price * 100 > PRICE_CHANGE_NOTIFY_PERCENT:
+                    self.price_changes += 1
+                to_update.append((product, original))
+
+        return to_create, to_update
+
+    @staticmethod
+    def _snapshot(product):
+        """UPDATE_FIELDS values as stored (decimals rounded to the column's places)"""
+        values = {}
+        for name in UPDATE_FIELDS:
+            field = product._meta.get_field(name)
+            value = getattr(product, field.attname)
+            if isinstance(field, models.DecimalField) and value is not None:
+                value = Decimal(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+            values[name] = value
+        return values
+
+    def _write(self, to_create, to_update):
+        """
+        bulk_create/bulk_update with cost fields computed in memory.
+
+        Existing products are only written when a stored value actually
+        changes, and only the changed columns are sent.
+
+        Returns:
+            (created products, updated products, unchanged products)
+        """
+        from .models import Product
+
+        for product in to_create:
+            product.prepare_for_save(self.overhead_rules)
+
+        now = timezone.now()
+        changed, unchanged = [], []
+        changed_fields = set()
+        for product, original in to_update:
+            product.prepare_for_save(self.overhead_rules)
+            current = self._snapshot(product)
+            fields = {name for name in UPDATE_FIELDS if current[name] != original[name]}
+            if fields:
+                # auto_now fields aren't applied by bulk_update
+                product.updated_at = now
+                product.last_cost_update = now
+                changed.append(product)
+                changed_fields |= fields
+            else:
+                unchanged.append(product)
+
+        created = Product.objects.bulk_create(to_create, batch_size=1000)
+        if created and created[0].pk is None:
+            # Backends that can't return ids from a bulk insert
+            ids = dict(Product.objects.filter(sku__in=[p.sku for p in created]).values_list('sku', 'id'))
+            for product in created:
+                product.pk = ids[product.sku]
+
+        if changed:
+            Product.objects.bulk_update(
+                changed,
+                sorted(changed_fields) + ['updated_at', 'last_cost_update'],
+                batch_size=UPDATE_BATCH_SIZE
+            )
+        return created, changed, unchanged
+
+    # ---- aggregate side effects ----
+
+    def _apply_side_effects(self, created, updated):
+        """What the Product post_save receivers do, once per batch"""
+        from .autocomplete import part_number_index
+        from .listing import invalidate_facets
+        from .models import Category, Location, StockLevel
+        from .reorder import ReorderAlertEvaluator
+        from .scanning import ProductCardCache
+        from .search import refresh_search_vectors
+        from .sync import record_changes
+
+        products = created + updated
+        if not products:
+            return
+
+        # Stock levels for every active location
+        location_ids = list(Location.objects.filter(is_active=True).values_list('id', flat=True))
+        StockLevel.objects.bulk_create(
+            [
+                StockLevel(product_id=product.pk, location_id=location_id, quantity=0)
+                for product in products if product.is_active
+                for location_id in location_ids
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+        refresh_search_vectors([product.pk for product in products])
+        ReorderAlertEvaluator.evaluate([product.pk for product in products])
+
+        record_changes('product', [product.pk for product in products])
+        if created:
+            record_changes('stock_level', StockLevel.objects.filter(
+                product_id__in=[product.pk for product in created]
+            ).values_list('id', flat=True))
+
+        updated_ids = [product.pk for product in updated]
+
+        def invalidate_caches():
+            part_number_index.invalidate(shared=True)
+            invalidate_facets()
+            Category.invalidate_rollups()
+            for product_id in updated_ids:
+                ProductCardCache.invalidate(product_id)
+
+        transaction.on_commit(invalidate_caches)
+
+    # ---- completion ----
+
+    def finish(self, results):
+        """Log the import and send managers one summary notification"""
+        seconds = round(time.perf_counter() - self.started, 2)
+        results['seconds'] = seconds
+        logger.info(
+            f"Product import finished in {seconds}s: {len(self.created_ids)} created, "
+            f"{len(self.updated_ids)} updated, {results['skipped']} skipped, {len(results['errors'])} errors"
+        )
+
+        if not self.created_ids and not self.updated_ids:
+            return
+
+        try:
+            from django.contrib.auth.models import User
+            from core.utils import create_bulk_notifications
+
+            managers = User.objects.filter(
+                profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
+                profile__is_active=True
+            )
+            if self.user:
+                managers = managers.exclude(id=self.user.id)
+
+            message = (
+                f"{len(self.created_ids)} products added and {len(self.updated_ids)} updated by "
+                f"{self.user.get_full_name() or self.user.username if self.user else 'System'}"
+            )
+            if self.price_changes:
+                message += f"; {self.price_changes} selling prices changed by more than {PRICE_CHANGE_NOTIFY_PERCENT}%"
+
+            create_bulk_notifications(
+                users=managers,
+                title="Product Import Completed",
+                message=message,
+                notification_type="info",
+                action_url="/inventory/products/",
+                action_text="View Products"
+            )
+        except Exception as e:
+            logger.error(f"Error sending product import notification: {str(e)}")
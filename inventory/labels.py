@@ -0,0 +1,337 @@
+# inventory/labels.py - Barcode Images and Label Sheets
+
+"""
+Barcode/QR image cache and label sheet rendering.
+
+Raster images (PNG for the screens and JSON APIs) are content addressed:
+the cache key is a digest of (symbology, payload, size), so an image is
+rendered once and served from the cache backend for every later request
+with the same content. Nothing needs invalidating - a changed barcode or QR
+payload is simply a different key.
+
+Printed labels skip rasterizing altogether. LabelSheetRenderer lays out
+Avery-style sheets with reportlab's vector Code128 and QR codes drawn as a
+single path from the qrcode module matrix, which print sharp at any printer
+resolution and are cheap to draw. Large runs can be split into page ranges
+rendered by a process pool; each range becomes its own PDF part.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_PREFIX = 'inventory:code_image'
+
+# Bump when rendering options change so old images are not served
+RENDER_VERSION = 1
+
+# Default size: QR box size in pixels, linear barcode DPI
+DEFAULT_SIZES = {'qr': 10}
+DEFAULT_LINEAR_DPI = 300
+
+# Pages per PDF part when a run is split across worker processes
+PAGES_PER_PART = 50
+
+POINTS_PER_INCH = 72.0
+POINTS_PER_MM = 72.0 / 25.4
+
+# Sheet geometry in points: page size, grid, label size, first label offset and gaps
+LABEL_LAYOUTS = {
+    'avery_5160': {
+        'name': 'Avery 5160 (Letter, 30 per sheet)',
+        'page_size': (8.5 * POINTS_PER_INCH, 11 * POINTS_PER_INCH),
+        'columns': 3, 'rows': 10,
+        'label_width': 2.625 * POINTS_PER_INCH, 'label_height': 1 * POINTS_PER_INCH,
+        'left': 0.1875 * POINTS_PER_INCH, 'top': 0.5 * POINTS_PER_INCH,
+        'column_gap': 0.125 * POINTS_PER_INCH, 'row_gap': 0,
+    },
+    'avery_5163': {
+        'name': 'Avery 5163 (Letter, 10 per sheet)',
+        'page_size': (8.5 * POINTS_PER_INCH, 11 * POINTS_PER_INCH),
+        'columns': 2, 'rows': 5,
+        'label_width': 4 * POINTS_PER_INCH, 'label_height': 2 * POINTS_PER_INCH,
+        'left': 0.15625 * POINTS_PER_INCH, 'top': 0.5 * POINTS_PER_INCH,
+        'column_gap': 0.1875 * POINTS_PER_INCH, 'row_gap': 0,
+    },
+    'avery_l7160': {
+        'name': 'Avery L7160 (A4, 21 per sheet)',
+        'page_size': (210 * POINTS_PER_MM, 297 * POINTS_PER_MM),
+        'columns': 3, 'rows': 7,
+        'label_width': 63.5 * POINTS_PER_MM, 'label_height': 38.1 * POINTS_PER_MM,
+        'left': 7.25 * POINTS_PER_MM, 'top': 15.15 * POINTS_PER_MM,
+        'column_gap': 2.5 * POINTS_PER_MM, 'row_gap': 0,
+    },
+}
+
+DEFAULT_LAYOUT = 'avery_5160'
+
+
+# =====================================
+# RASTER IMAGE CACHE
+# =====================================
+
+def _normalize(symbology, payload, size):
+    symbology = (symbology or 'code128').lower()
+    if isinstance(payload, dict):
+        payload = json.dumps(payload, sort_keys=True, default=str)
+    if size is None:
+        size = DEFAULT_SIZES.get(symbology, DEFAULT_LINEAR_DPI)
+    return symbology, str(payload), int(size)
+
+
+def image_cache_key(symbology, payload, size=None):
+    """Content address of one rendered image"""
+    symbology, payload, size = _normalize(symbology, payload, size)
+    digest = hashlib.sha256(
+        json.dumps([RENDER_VERSION, symbology, payload, size]).encode('utf-8')
+    ).hexdigest()
+    return f'{IMAGE_CACHE_PREFIX}:{digest}'
+
+
+def render_png(symbology, payload, size=None):
+    """
+    Render one barcode or QR code to PNG bytes (uncached).
+
+    Args:
+        symbology: 'qr' or a python-barcode name such as 'code128' or 'ean13'
+        payload: Encoded text (dicts are JSON encoded)
+        size: QR box size in pixels, or DPI for linear barcodes
+    """
+    symbology, payload, size = _normalize(symbology, payload, size)
+    buffer = BytesIO()
+
+    if symbology == 'qr':
+        import qrcode
+
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=size,
+            border=4,
+        )
+        qr.add_data(payload)
+        qr.make(fit=True)
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    else:
+        import barcode
+        from barcode.writer import ImageWriter
+
+        barcode_class = barcode.get_barcode_class(symbology)
+        barcode_class(payload, writer=ImageWriter()).write(buffer, options={'dpi': size})
+
+    return buffer.getvalue()
+
+
+def _timeout():
+    return getattr(settings, 'INVENTORY_SETTINGS', {}).get('CODE_IMAGE_CACHE_SECONDS', 30 * 24 * 3600)
+
+
+class CodeImageCache:
+    """
+    Content-addressed cache of rendered barcode and QR images
+    """
+
+    @staticmethod
+    def get_png(symbology, payload, size=None):
+        """PNG bytes, rendered on a cache miss"""
+        key = image_cache_key(symbology, payload, size)
+        image = cache.get(key)
+        if image is None:
+            image = render_png(symbology, payload, size)
+            cache.set(key, image, _timeout())
+        return image
+
+    @classmethod
+    def get_base64(cls, symbology, payload, size=None):
+        """Base64 encoded PNG, as embedded by the templates and JSON APIs"""
+        return base64.b64encode(cls.get_png(symbology, payload, size)).decode()
+
+    @staticmethod
+    def get_many_base64(requests):
+        """
+        Base64 PNGs for many images with one cache read and one cache write.
+
+        Args:
+            requests: List of (symbology, payload, size) tuples
+
+        Returns:
+            List of base64 strings (None where rendering failed), in request order
+        """
+        keys = [image_cache_key(*request) for request in requests]
+        cached = cache.get_many(list(set(keys)))
+
+        rendered = {}
+        for key, request in zip(keys, requests):
+            if key in cached or key in rendered:
+                continue
+            try:
+                rendered[key] = render_png(*request)
+            except Exception as e:
+                logger.error(f"Error rendering {request[0]} image for {request[1]!r}: {e}")
+        if rendered:
+            cache.set_many(rendered, _timeout())
+
+        images = {**cached, **rendered}
+        return [
+            base64.b64encode(images[key]).decode() if key in images else None
+            for key in keys
+        ]
+
+
+# =====================================
+# VECTOR LABEL SHEETS
+# =====================================
+
+def product_labels(products, symbology='code128', show_price=True):
+    """
+    Label dicts for products; plain data so they can be sent to worker processes.
+
+    Products without a barcode are labelled with their SKU.
+    """
+    labels = []
+    for product in products:
+        subtitle = product.sku
+        if show_price:
+            subtitle = f'{subtitle}  ${product.selling_price:.2f}'
+        labels.append({
+            'title': product.name,
+            'subtitle': subtitle,
+            'code': product.barcode or product.sku,
+            'symbology': symbology,
+        })
+    return labels
+
+
+def _fit_text(canvas, text, font, font_size, max_width):
+    if canvas.stringWidth(text, font, font_size) <= max_width:
+        return text
+    while text and canvas.stringWidth(text + '...', font, font_size) > max_width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _draw_qr(canvas, payload, x, y, side):
+    """QR code as one filled vector path, dark modules merged into horizontal runs"""
+    import qrcode
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    module = side / len(matrix)
+
+    path = canvas.beginPath()
+    for row_number, row in enumerate(matrix):
+        row_y = y + side - (row_number + 1) * module
+        run_start = None
+        for column, dark in enumerate(row + [False]):
+            if dark and run_start is None:
+                run_start = column
+            elif not dark and run_start is not None:
+                path.rect(x + run_start * module, row_y, (column - run_start) * module, module)
+                run_start = None
+    canvas.drawPath(path, stroke=0, fill=1)
+
+
+def _draw_label(canvas, label, x, y, width, height):
+    from reportlab.graphics.barcode.code128 import Code128
+
+    padding = min(6.0, height * 0.08)
+    title_size = max(5.0, min(8.0, height * 0.1))
+    inner_width = width - 2 * padding
+
+    top = y + height - padding - title_size
+    canvas.setFont('Helvetica-Bold', title_size)
+    canvas.drawString(x + padding, top, _fit_text(canvas, label['title'], 'Helvetica-Bold', title_size, inner_width))
+    canvas.setFont('Helvetica', title_size - 1)
+    top -= title_size
+    canvas.drawString(x + padding, top, _fit_text(canvas, label['subtitle'], 'Helvetica', title_size - 1, inner_width))
+
+    code_height = top - (y + padding) - 2
+    if code_height <= 0 or not label['code']:
+        return
+
+    if label['symbology'] == 'qr':
+        _draw_qr(canvas, label['code'], x + padding, y + padding, min(code_height, inner_width))
+    else:
+        human_readable_height = 8 if code_height > 24 else 0
+        bar_height = code_height - human_readable_height
+        # Without quiet zones the symbol width is linear in the bar width
+        unit_width = Code128(label['code'], barWidth=1, quiet=0).width
+        bar_width = min(inner_width / unit_width, 0.02 * POINTS_PER_INCH)
+        symbol = Code128(
+            label['code'], barWidth=bar_width, barHeight=bar_height, quiet=0,
+            humanReadable=bool(human_readable_height), fontSize=6
+        )
+        symbol.drawOn(canvas, x + padding + (inner_width - symbol.width) / 2, y + padding + human_readable_height)
+
+
+def _render_pages(labels, layout_name):
+    """One PDF for a run of labels (module level so worker processes can pickle it)"""
+    from reportlab.pdfgen.canvas import Canvas
+
+    layout = LABEL_LAYOUTS[layout_name]
+    buffer = BytesIO()
+    canvas = Canvas(buffer, pagesize=layout['page_size'])
+    canvas.setTitle('Product Labels')
+    per_page = layout['columns'] * layout['rows']
+    page_height = layout['page_size'][1]
+
+    for position, label in enumerate(labels):
+        if position and position % per_page == 0:
+            canvas.showPage()
+        slot = position % per_page
+        row, column = divmod(slot, layout['columns'])
+        x = layout['left'] + column * (layout['label_width'] + layout['column_gap'])
+        y = page_height - layout['top'] - (row + 1) * layout['label_height'] - row * layout['row_gap']
+        _draw_label(canvas, label, x, y, layout['label_width'], layout['label_height'])
+
+    canvas.save()
+    return buffer.getvalue()
+
+
+class LabelSheetRenderer:
+    """
+    Avery-style label sheets with vector barcodes
+
+    Args:
+        layout: Key of LABEL_LAYOUTS
+        workers: Worker processes for runs longer than PAGES_PER_PART pages
+    """
+
+    def __init__(self, layout=DEFAULT_LAYOUT, workers=1):
+        if layout not in LABEL_LAYOUTS:
+            raise ValueError(f"Unknown label layout '{layout}'")
+        self.layout = layout
+        self.workers = max(1, workers)
+
+    @property
+    def labels_per_page(self):
+        return LABEL_LAYOUTS[self.layout]['columns'] * LABEL_LAYOUTS[self.layout]['rows']
+
+    def render(self, labels):
+        """Every label in one PDF document (bytes)"""
+        return _render_pages(labels, self.layout)
+
+    def render_parts(self, labels):
+        """
+        PDF parts of at most PAGES_PER_PART pages each, in label order.
+
+        With more than one worker the parts are rendered in parallel.
+        """
+        part_size = self.labels_per_page * PAGES_PER_PART
+        parts = [labels[start:start + part_size] for start in range(0, len(labels), part_size)] or [[]]
+
+        if self.workers == 1 or len(parts) == 1:
+            return [_render_pages(part, self.layout) for part in parts]
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(parts))) as executor:
+            return list(executor.map(_render_pages, parts, [self.layout] * len(parts)))
@@ -0,0 +1,234 @@
+# inventory/listing.py - Faceted Product Listing
+
+"""
+Faceted product listing engine.
+
+The product list pages (all products, by category, brand and supplier) share
+one engine that builds the filtered page queryset and the filter sidebar
+counts:
+
+- stock status is a SQL CASE annotation over the denormalized stock fields,
+  so rows never call StockManager.get_stock_status per product
+- category, brand, supplier, stock status and price band counts come from a
+  single grouped query and are folded into per-facet counts in Python
+- the facet payload is cached per filter signature and invalidated by a
+  version bump whenever a product is saved or deleted
+"""
+
+import hashlib
+import json
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+logger = logging.getLogger(__name__)
+
+FACET_VERSION_CACHE_KEY = 'inventory:listing_facets_version'
+FACET_CACHE_PREFIX = 'inventory:listing_facets'
+
+STOCK_STATUS_LABELS = {
+    'in_stock': 'In Stock',
+    'low_stock': 'Low Stock',
+    'out_of_stock': 'Out of Stock',
+    'discontinued': 'Discontinued',
+}
+
+# Selling price bands (lower inclusive, upper exclusive; None = open ended)
+PRICE_BANDS = (
+    ('0-1', Decimal('0'), Decimal('1')),
+    ('1-5', Decimal('1'), Decimal('5')),
+    ('5-20', Decimal('5'), Decimal('20')),
+    ('20-100', Decimal('20'), Decimal('100')),
+    ('100+', Decimal('100'), None),
+)
+
+# Request parameters that take part in filtering (and the facet signature)
+FILTER_PARAMS = ('search', 'category', 'brand', 'supplier', 'stock_status', 'price')
+ID_PARAMS = ('category', 'brand', 'supplier')
+
+
+def stock_status_annotation():
+    """SQL equivalent of Product.stock_status"""
+    return Case(
+        When(is_active=False, then=Value('discontinued')),
+        When(available_stock__lte=0, then=Value('out_of_stock')),
+        When(available_stock__lte=F('reorder_level'), then=Value('low_stock')),
+        default=Value('in_stock'),
+        output_field=CharField(),
+    )
+
+
+def price_band_annotation():
+    """SQL CASE mapping selling_price to a PRICE_BANDS key"""
+    whens = []
+    for key, lower, upper in PRICE_BANDS:
+        condition = Q(selling_price__gte=lower)
+        if upper is not None:
+            condition &= Q(selling_price__lt=upper)
+        whens.append(When(condition, then=Value(key)))
+    return Case(*whens, default=Value(''), output_field=CharField())
+
+
+def invalidate_facets():
+    """Expire every cached facet payload"""
+    try:
+        cache.incr(FACET_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_CACHE_KEY, 1, None)
+
+
+class ProductListing:
+    """
+    Filtered product page plus facet counts for one request
+
+    Args:
+        params: Request GET QueryDict (or dict of lists)
+        scope: Fixed filters imposed by the view, e.g. {'brand': 3}
+        base_queryset: Optional starting queryset (defaults to active products)
+    """
+
+    def __init__(self, params, scope=None, base_queryset=None):
+        from .models import Product
+
+        self.scope = scope or {}
+        self.base_queryset = base_queryset if base_queryset is not None else Product.objects.filter(is_active=True)
+        self.filters = {}
+        for name in FILTER_PARAMS:
+            if name in self.scope:
+                continue
+            values = params.getlist(name) if hasattr(params, 'getlist') else params.get(name, [])
+            if isinstance(values, str):
+                values = [values]
+            values = [value for value in values if value not in (None, '')]
+            if name in ID_PARAMS:
+                values = [value for value in values if str(value).isdigit()]
+            if values:
+                self.filters[name] = values
+
+    # ---- filtering ----
+
+    def _category_filter(self, category_ids):
+        """Match products in the given categories or any of their descendants"""
+        from .models import Category
+
+        paths = Category.objects.filter(id__in=category_ids).values_list('tree_path', flat=True)
+        condition = Q()
+        for path in paths:
+            condition |= Q(category__tree_path__startswith=path)
+        return condition if paths else Q(pk__in=[])
+
+    def filtered_queryset(self):
+        """Base queryset with scope and request filters applied (unordered, unannotated)"""
+        queryset = self.base_queryset.filter(**{f'{name}_id': value for name, value in self.scope.items()})
+
+        for name, values in self.filters.items():
+            if name == 'category':
+                queryset = queryset.filter(self._category_filter(values))
+            elif name in ('brand', 'supplier'):
+                queryset = queryset.filter(**{f'{name}_id__in': values})
+            elif name == 'stock_status':
+                queryset = queryset.alias(listing_stock_status=stock_status_annotation()).filter(
+                    listing_stock_status__in=values
+                )
+            elif name == 'price':
+                queryset = queryset.alias(listing_price_band=price_band_annotation()).filter(
+                    listing_price_band__in=values
+                )
+        return queryset
+
+    def queryset(self, ordering='name'):
+        """Page queryset with related rows joined and stock status annotated"""
+        from .search import ProductSearchService
+
+        queryset = self.filtered_queryset().select_related(
+            'category', 'brand', 'supplier'
+        ).annotate(stock_status_code=stock_status_annotation())
+
+        search = self.filters.get('search')
+        if search:
+            return ProductSearchService.search(search[0], queryset=queryset)
+        return queryset.order_by(ordering)
+
+    # ---- facets ----
+
+    def signature(self):
+        """Stable digest of scope and filters"""
+        payload = json.dumps({'scope': self.scope, 'filters': self.filters}, sort_keys=True, default=str)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+    def facets(self):
+        """Facet counts for the current filter, cached per filter signature"""
+        version = cache.get(FACET_VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(FACET_VERSION_CACHE_KEY, 1, None)
+            version = cache.get(FACET_VERSION_CACHE_KEY, 1)
+
+        cache_key = f'{FACET_CACHE_PREFIX}:{version}:{self.signature()}'
+        facets = cache.get(cache_key)
+        if facets is None:
+            facets = self._compute_facets()
+            timeout = getattr(settings, 'INVENTORY_SETTINGS', {}).get('CACHE_TIMEOUT_SECONDS', 300)
+            cache.set(cache_key, facets, timeout)
+        return facets
+
+    def _compute_facets(self):
+        """One grouped query over every facet dimension"""
+        queryset = self.filtered_queryset()
+
+        search = self.filters.get('search')
+        if search:
+            from .search import ProductSearchService
+            queryset = queryset.filter(
+                pk__in=ProductSearchService.search(search[0], queryset=queryset).order_by().values('pk')
+            )
+
+        rows = queryset.annotate(
+            facet_stock_status=stock_status_annotation(),
+            facet_price_band=price_band_annotation(),
+        ).values(
+            'category_id', 'category__name',
+            'brand_id', 'brand__name',
+            'supplier_id', 'supplier__name',
+            'facet_stock_status', 'facet_price_band',
+        ).annotate(product_count=Count('id')).order_by()
+
+        dimensions = {
+            'category': {},
+            'brand': {},
+            'supplier': {},
+            'stock_status': {},
+            'price': {},
+        }
+        total = 0
+
+        def add(dimension, key, label, count):
+            if key is None:
+                return
+            entry = dimensions[dimension].setdefault(key, {'value': key, 'label': label, 'count': 0})
+            entry['count'] += count
+
+        for row in rows:
+            count = row['product_count']
+            total += count
+            add('category', row['category_id'], row['category__name'], count)
+            add('brand', row['brand_id'], row['brand__name'], count)
+            add('supplier', row['supplier_id'], row['supplier__name'], count)
+            add('stock_status', row['facet_stock_status'],
+                STOCK_STATUS_LABELS.get(row['facet_stock_status'], row['facet_stock_status']), count)
+            if row['facet_price_band']:
+                add('price', row['facet_price_band'], row['facet_price_band'], count)
+
+        band_order = [key for key, _, _ in PRICE_BANDS]
+        status_order = list(STOCK_STATUS_LABELS)
+        facets = {
+            'total': total,
+            'category': sorted(dimensions['category'].values(), key=lambda entry: entry['label'] or ''),
+            'brand': sorted(dimensions['brand'].values(), key=lambda entry: entry['label'] or ''),
+            'supplier': sorted(dimensions['supplier'].values(), key=lambda entry: entry['label'] or ''),
+            'stock_status': sorted(dimensions['stock_status'].values(), key=lambda entry: status_order.index(entry['value'])),
+            'price': sorted(dimensions['price'].values(), key=lambda entry: band_order.index(entry['value'])),
+        }
+        return facets
@@ -0,0 +1,69 @@
+# inventory/management/commands/backup_inventory.py
+
+"""
+Django Management Command for Inventory Snapshots
+
+Writes a compressed, chunked snapshot of the inventory tables
+(inventory.backup) to INVENTORY_SETTINGS['BACKUP_DIR']. With --incremental
+the append-only tables (stock movements, audit log) only include rows added
+since the latest snapshot, so frequent backups stay small.
+
+Usage Examples:
+    python manage.py backup_inventory
+    python manage.py backup_inventory --incremental
+    python manage.py backup_inventory --list
+    python manage.py backup_inventory --prune
+"""
+
+from django.core.management.base import BaseCommand
+
+from inventory.backup import SnapshotWriter, list_snapshots, prune_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Write a compressed snapshot of the inventory data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only copy stock movements and audit log entries added since the latest snapshot'
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            help='Backup directory (defaults to INVENTORY_SETTINGS BACKUP_DIR)'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List existing snapshots instead of writing one'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete snapshots older than BACKUP_RETENTION_DAYS after writing'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self.stdout.write(self.style.SUCCESS('=== Inventory Snapshots ==='))
+            for manifest in list_snapshots(options['dir']):
+                rows = sum(entry['rows'] for entry in manifest['models'])
+                base = f" (incremental from {manifest['base']})" if manifest['base'] else ''
+                self.stdout.write(f"{manifest['name']}: {rows} rows{base}")
+            return
+
+        manifest = SnapshotWriter(root=options['dir'], incremental=options['incremental']).write()
+
+        self.stdout.write(self.style.SUCCESS('=== Inventory Snapshot ==='))
+        self.stdout.write(f"Snapshot: {manifest['name']}")
+        self.stdout.write(f"Base: {manifest['base'] or 'none (full)'}")
+        self.stdout.write(f"Compression: {manifest['compression']}")
+        for entry in manifest['models']:
+            if entry['rows'] or options['verbosity'] > 1:
+                self.stdout.write(f"{entry['model']}: {entry['rows']} rows in {len(entry['chunks'])} chunks")
+
+        if options['prune']:
+            deleted = prune_snapshots(options['dir'])
+            self.stdout.write(f"Pruned snapshots: {len(deleted)}")
@@ -0,0 +1,60 @@
+# inventory/management/commands/benchmark_scans.py
+
+"""
+Django Management Command for Barcode Scan Latency Benchmarking
+
+Measures cold (database) and warm (cached product card) lookup latency for
+the scan path used by barcode_lookup_api, qr_code_scan_api and the mobile
+stock check, and reports p50/p95/p99.
+
+Usage Examples:
+    python manage.py benchmark_scans
+    python manage.py benchmark_scans --sample=200 --repeat=100
+    python manage.py benchmark_scans --code BT000123 --code LM358
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Product
+from inventory.scanning import ProductCardCache
+
+
+class Command(BaseCommand):
+    help = 'Benchmark barcode scan lookup latency (cold and cached)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--code',
+            action='append',
+            default=[],
+            help='Barcode/SKU/QR code to scan (may be given multiple times)'
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=50,
+            help='Number of active product barcodes to sample when no codes are given (default: 50)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Scans per code; the first is cold, the rest warm (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        codes = options['code']
+        if not codes:
+            codes = list(
+                Product.objects.filter(is_active=True).exclude(barcode='')
+                .order_by('?').values_list('barcode', flat=True)[:options['sample']]
+            )
+        if not codes:
+            raise CommandError('No codes to benchmark')
+
+        results = ProductCardCache.benchmark(codes, repeat=max(2, options['repeat']))
+
+        self.stdout.write(self.style.SUCCESS(f'=== Scan Benchmark ({len(codes)} codes) ==='))
+        self.stdout.write(json.dumps(results, indent=2))
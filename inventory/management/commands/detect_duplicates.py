@@ -0,0 +1,36 @@
+# inventory/management/commands/detect_duplicates.py
+
+"""
+Django Management Command for Duplicate Product Detection
+
+Runs the blocked duplicate detector (inventory.duplicates) and refreshes the
+stored candidate pairs and clusters reviewed on the Find Duplicates page.
+Incremental by default - only products changed since the last scan are
+re-paired - so it is cheap enough to schedule frequently.
+
+Usage Examples:
+    python manage.py detect_duplicates
+    python manage.py detect_duplicates --full
+"""
+
+from django.core.management.base import BaseCommand
+
+from inventory.duplicates import DuplicateDetector
+
+
+class Command(BaseCommand):
+    help = 'Detect potential duplicate products and refresh duplicate clusters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-score the whole catalog instead of products changed since the last scan'
+        )
+
+    def handle(self, *args, **options):
+        stats = DuplicateDetector.run(full=options['full'])
+
+        self.stdout.write(self.style.SUCCESS('=== Duplicate Detection ==='))
+        for key, value in stats.items():
+            self.stdout.write(f'{key.replace("_", " ").title()}: {value}')
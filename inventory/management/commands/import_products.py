@@ -16,24 +16,35 @@ Key Features:
 - Rollback on critical errors
 - Integration with existing inventory system
 
+Files are streamed (CSV reader, openpyxl read_only) and rows are cleaned in
+chunks, optionally across a --workers process pool; cleaned chunks reach the
+writer in file order.
+
+Rows are written in batches by inventory.importing.ProductImporter: lookups
+are preloaded once per file, each batch is one bulk insert plus one bulk
+update, and product side effects (stock levels, search index, reorder
+alerts, caches) are applied per batch with a single summary notification.
+
+Each run is an ImportSession. Rows whose content fingerprint matches the
+last applied version are skipped, a file identical to a clean earlier import
+is not processed at all, and --resume continues a failed run after the last
+committed batch.
+
 Usage Examples:
     python manage.py import_products products.csv --update-existing
     python manage.py import_products products.xlsx --dry-run
     python manage.py import_products data.csv --category-mapping=mapping.json
+    python manage.py import_products supplier_prices.csv --update-existing --workers=4
+    python manage.py import_products supplier_prices.csv --update-existing --resume
 """
 
-import csv
 import json
 import os
 import sys
-from decimal import Decimal, InvalidOperation
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
 from django.contrib.auth.models import User
-from django.utils.text import slugify
 
-from inventory.models import Product, Category, Supplier
-from inventory.utils import import_products_from_csv
+from inventory.importing import ImportTracker, ProductImporter, clean_chunks, read_csv_rows, read_excel_rows
 
 
 class Command(BaseCommand):
@@ -70,8 +81,27 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batch-size',
             type=int,
-            default=100,
-            help='Number of products to process in each batch (default: 100)'
+            default=1000,
+            help='Number of products to process in each batch (default: 1000)'
+        )
+        
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last unfinished import of this file from its checkpoint'
+        )
+        
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Apply every row, even rows unchanged since they were last imported'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes for parsing and validating rows (default: 1, no pool)'
         )
         
         parser.add_argument(
@@ -141,16 +171,59 @@ class Command(BaseCommand):
         # Display import configuration
         self._display_import_config(options, file_path, user)
         
+        # Sessions make reruns skip unchanged rows and let --resume continue a failed run
+        self.tracker = None
+        if not options['dry_run']:
+            self.tracker = ImportTracker(
+                'products',
+                file_path,
+                options={
+                    'update_existing': options['update_existing'],
+                    'create_categories': options['create_categories'],
+                    'create_suppliers': options['create_suppliers'],
+                    'category_mapping': category_mapping,
+                    'supplier_mapping': supplier_mapping,
+                },
+                user=user,
+                resume=options['resume'],
+                full=options['full'],
+            )
+            if not self.tracker.start():
+                previous = self.tracker.identical_to
+                self.stdout.write(self.style.SUCCESS(
+                    f'File is identical to import session #{previous.pk} '
+                    f'({previous.started_at:%Y-%m-%d %H:%M}); nothing to import. Use --full to apply it again.'
+                ))
+                return
+            if self.tracker.resume_after:
+                self.stdout.write(self.style.WARNING(f'Resuming after row {self.tracker.resume_after}'))
+        
+        self.importer = ProductImporter(
+            user=user,
+            update_existing=options['update_existing'],
+            create_categories=options['create_categories'],
+            create_suppliers=options['create_suppliers'],
+            category_mapping=category_mapping,
+            supplier_mapping=supplier_mapping,
+            tracker=self.tracker,
+        )
+        
         try:
             if file_extension == '.csv':
                 results = self._import_csv(file_path, options, user, category_mapping, supplier_mapping)
             else:
                 results = self._import_excel(file_path, options, user, category_mapping, supplier_mapping)
             
+            if not options['dry_run']:
+                self.importer.finish(results)
+                self.tracker.finish(error_count=len(results['errors']))
+            
             # Display results
             self._display_results(results, options['dry_run'])
             
         except Exception as e:
+            if self.tracker:
+                self.tracker.fail(e)
             self.stdout.write(
                 self.style.ERROR(f'Import failed: {str(e)}')
             )
@@ -199,317 +272,79 @@ class Command(BaseCommand):
         self.stdout.write(f'Update existing: {options["update_existing"]}')
         self.stdout.write(f'Dry run: {options["dry_run"]}')
         self.stdout.write(f'Batch size: {options["batch_size"]}')
+        self.stdout.write(f'Workers: {options["workers"]}')
         self.stdout.write(f'Create categories: {options["create_categories"]}')
         self.stdout.write(f'Create suppliers: {options["create_suppliers"]}')
         self.stdout.write('')
     
-    def _import_csv(self, file_path, options, user, category_mapping, supplier_mapping):
-        """Import products from CSV file"""
-        results = {
+    def _new_results(self):
+        return {
             'total_rows': 0,
             'processed': 0,
             'created': 0,
             'updated': 0,
             'skipped': 0,
+            'unchanged': 0,
             'errors': [],
             'warnings': []
         }
-        
+    
+    def _import_csv(self, file_path, options, user, category_mapping, supplier_mapping):
+        """Import products from CSV file"""
         try:
-            with open(file_path, 'r', encoding=options['encoding']) as csvfile:
-                # Detect delimiter if not specified
-                delimiter = options['delimiter']
-                if delimiter == ',':
-                    # Try to detect delimiter
-                    sample = csvfile.read(1024)
-                    csvfile.seek(0)
-                    sniffer = csv.Sniffer()
-                    try:
-                        delimiter = sniffer.sniff(sample).delimiter
-                    except:
-                        delimiter = ','
-                
-                reader = csv.DictReader(csvfile, delimiter=delimiter)
-                
-                # Validate headers
-                required_headers = ['name', 'sku', 'category', 'supplier']
-                missing_headers = [h for h in required_headers if h not in reader.fieldnames]
-                if missing_headers:
-                    raise CommandError(f'Missing required headers: {", ".join(missing_headers)}')
-                
-                self.stdout.write(f'Found headers: {", ".join(reader.fieldnames)}')
-                self.stdout.write('')
-                
-                # Process in batches
-                batch = []
-                batch_size = options['batch_size']
-                
-                for row_num, row in enumerate(reader, start=2):  # Start at 2 for header
-                    results['total_rows'] += 1
-                    
-                    # Clean and validate row data
-                    cleaned_row = self._clean_row_data(row, row_num, results)
-                    if cleaned_row:
-                        batch.append((row_num, cleaned_row))
-                    
-                    # Process batch when full
-                    if len(batch) >= batch_size:
-                        self._process_batch(batch, options, user, category_mapping, supplier_mapping, results)
-                        batch = []
-                    
-                    # Progress indicator
-                    if results['total_rows'] % 100 == 0:
-                        self.stdout.write(f'Processed {results["total_rows"]} rows...')
-                
-                # Process remaining batch
-                if batch:
-                    self._process_batch(batch, options, user, category_mapping, supplier_mapping, results)
+            with open(file_path, 'r', encoding=options['encoding'], newline='') as csvfile:
+                # Sniff the delimiter unless one was given
+                delimiter = None if options['delimiter'] == ',' else options['delimiter']
+                headers, rows = read_csv_rows(csvfile, delimiter)
+                return self._run_pipeline(headers, rows, options, user, category_mapping, supplier_mapping)
         
         except UnicodeDecodeError as e:
             raise CommandError(f'Encoding error: {str(e)}. Try specifying --encoding parameter.')
         except Exception as e:
             raise CommandError(f'Error reading CSV file: {str(e)}')
-        
-        return results
     
     def _import_excel(self, file_path, options, user, category_mapping, supplier_mapping):
         """Import products from Excel file"""
         try:
-            import pandas as pd
-        except ImportError:
-            raise CommandError('pandas is required for Excel import. Install with: pip install pandas openpyxl')
-        
-        results = {
-            'total_rows': 0,
-            'processed': 0,
-            'created': 0,
-            'updated': 0,
-            'skipped': 0,
-            'errors': [],
-            'warnings': []
-        }
-        
-        try:
-            # Read Excel file
-            df = pd.read_excel(file_path)
-            
-            # Validate headers
-            required_headers = ['name', 'sku', 'category', 'supplier']
-            missing_headers = [h for h in required_headers if h not in df.columns]
-            if missing_headers:
-                raise CommandError(f'Missing required headers: {", ".join(missing_headers)}')
-            
-            self.stdout.write(f'Found headers: {", ".join(df.columns)}')
-            self.stdout.write(f'Total rows: {len(df)}')
-            self.stdout.write('')
-            
-            # Process in batches
-            batch_size = options['batch_size']
-            
-            for start_idx in range(0, len(df), batch_size):
-                end_idx = min(start_idx + batch_size, len(df))
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                batch = []
-                for idx, row in batch_df.iterrows():
-                    row_num = idx + 2  # +2 for header and 0-based index
-                    results['total_rows'] += 1
-                    
-                    # Convert pandas Series to dict and clean
-                    row_dict = row.to_dict()
-                    cleaned_row = self._clean_row_data(row_dict, row_num, results)
-                    if cleaned_row:
-                        batch.append((row_num, cleaned_row))
-                
-                # Process batch
-                if batch:
-                    self._process_batch(batch, options, user, category_mapping, supplier_mapping, results)
-                
-                # Progress indicator
-                self.stdout.write(f'Processed {end_idx} of {len(df)} rows...')
-        
+            headers, rows = read_excel_rows(file_path)
+            return self._run_pipeline(headers, rows, options, user, category_mapping, supplier_mapping)
+        except ImportError as e:
+            raise CommandError(f'{str(e)}. Install openpyxl (and pandas with xlrd for .xls files).')
         except Exception as e:
             raise CommandError(f'Error reading Excel file: {str(e)}')
-        
-        return results
     
-    def _clean_row_data(self, row, row_num, results):
-        """Clean and validate row data"""
-        try:
-            # Clean string fields
-            cleaned = {}
-            
-            # Required fields
-            for field in ['name', 'sku', 'category', 'supplier']:
-                value = str(row.get(field, '')).strip()
-                if not value or value.lower() == 'nan':
-                    results['errors'].append(f'Row {row_num}: Missing required field "{field}"')
-                    return None
-                cleaned[field] = value
-            
-            # Optional string fields
-            for field in ['description', 'brand', 'model_number', 'barcode']:
-                value = str(row.get(field, '')).strip()
-                cleaned[field] = value if value and value.lower() != 'nan' else ''
-            
-            # Numeric fields
-            cleaned['cost_price'] = self._clean_decimal(row.get('cost_price', 0))
-            cleaned['selling_price'] = self._clean_decimal(row.get('selling_price', 0))
-            cleaned['reorder_level'] = self._clean_integer(row.get('reorder_level', 10))
-            cleaned['reorder_quantity'] = self._clean_integer(row.get('reorder_quantity', 50))
-            cleaned['current_stock'] = self._clean_integer(row.get('current_stock', 0))
-            
-            # Boolean fields
-            cleaned['is_active'] = self._clean_boolean(row.get('is_active', True))
-            
-            return cleaned
-            
-        except Exception as e:
-            results['errors'].append(f'Row {row_num}: Data cleaning error - {str(e)}')
-            return None
-    
-    def _clean_decimal(self, value):
-        """Clean decimal value"""
-        if value is None or str(value).strip() == '' or str(value).lower() == 'nan':
-            return Decimal('0.00')
+    def _run_pipeline(self, headers, rows, options, user, category_mapping, supplier_mapping):
+        """Clean rows chunk by chunk (optionally in worker processes) and write each batch in file order"""
+        results = self._new_results()
         
-        try:
-            # Remove currency symbols and whitespace
-            clean_value = str(value).replace('$', '').replace(',', '').strip()
-            return Decimal(clean_value)
-        except (InvalidOperation, ValueError):
-            return Decimal('0.00')
-    
-    def _clean_integer(self, value):
-        """Clean integer value"""
-        if value is None or str(value).strip() == '' or str(value).lower() == 'nan':
-            return 0
+        self.stdout.write(f'Found headers: {", ".join(headers)}')
+        self.stdout.write('')
         
-        try:
-            return int(float(value))
-        except (ValueError, TypeError):
-            return 0
-    
-    def _clean_boolean(self, value):
-        """Clean boolean value"""
-        if isinstance(value, bool):
-            return value
+        # Rows up to the checkpoint were committed by the run being resumed
+        resume_after = self.tracker.resume_after if self.tracker else 0
+        if resume_after:
+            rows = ((row_num, row) for row_num, row in rows if row_num > resume_after)
+        
+        for chunk_rows, batch, errors in clean_chunks(rows, options['batch_size'], options['workers']):
+            results['total_rows'] += chunk_rows
+            results['errors'].extend(errors)
+            
+            if batch:
+                self._process_batch(batch, options, user, category_mapping, supplier_mapping, results)
+            
+            # Progress indicator
+            self.stdout.write(f'Processed {results["total_rows"]} rows...')
         
-        str_value = str(value).lower().strip()
-        return str_value in ['true', 'yes', '1', 'y', 'active', 'on']
+        return results
     
     def _process_batch(self, batch, options, user, category_mapping, supplier_mapping, results):
         """Process a batch of products"""
         if options['dry_run']:
             # In dry run mode, just validate without saving
-            for row_num, row_data in batch:
-                self._validate_product_data(row_data, row_num, category_mapping, supplier_mapping, results)
-                results['processed'] += 1
+            self.importer.validate_batch(batch, results)
         else:
-            # Actually create/update products
-            with transaction.atomic():
-                for row_num, row_data in batch:
-                    success = self._create_or_update_product(
-                        row_data, row_num, options, user, category_mapping, supplier_mapping, results
-                    )
-                    if success:
-                        results['processed'] += 1
-    
-    def _validate_product_data(self, row_data, row_num, category_mapping, supplier_mapping, results):
-        """Validate product data without creating records"""
-        # Check if SKU already exists
-        if Product.objects.filter(sku=row_data['sku']).exists():
-            results['warnings'].append(f'Row {row_num}: SKU "{row_data["sku"]}" already exists')
-        
-        # Validate category
-        category_name = row_data['category']
-        mapped_category = category_mapping.get(category_name, category_name)
-        if not Category.objects.filter(name=mapped_category).exists():
-            results['warnings'].append(f'Row {row_num}: Category "{mapped_category}" does not exist')
-        
-        # Validate supplier
-        supplier_name = row_data['supplier']
-        mapped_supplier = supplier_mapping.get(supplier_name, supplier_name)
-        if not Supplier.objects.filter(name=mapped_supplier).exists():
-            results['warnings'].append(f'Row {row_num}: Supplier "{mapped_supplier}" does not exist')
-    
-    def _create_or_update_product(self, row_data, row_num, options, user, category_mapping, supplier_mapping, results):
-        """Create or update a product"""
-        try:
-            # Get or create category
-            category_name = row_data['category']
-            mapped_category = category_mapping.get(category_name, category_name)
-            
-            try:
-                category = Category.objects.get(name=mapped_category)
-            except Category.DoesNotExist:
-                if options['create_categories']:
-                    category = Category.objects.create(
-                        name=mapped_category,
-                        slug=slugify(mapped_category)
-                    )
-                    results['warnings'].append(f'Row {row_num}: Created category "{mapped_category}"')
-                else:
-                    results['errors'].append(f'Row {row_num}: Category "{mapped_category}" does not exist')
-                    return False
-            
-            # Get or create supplier
-            supplier_name = row_data['supplier']
-            mapped_supplier = supplier_mapping.get(supplier_name, supplier_name)
-            
-            try:
-                supplier = Supplier.objects.get(name=mapped_supplier)
-            except Supplier.DoesNotExist:
-                if options['create_suppliers']:
-                    supplier = Supplier.objects.create(
-                        name=mapped_supplier,
-                        supplier_code=f"SUP-{mapped_supplier[:3].upper()}",
-                        email=f"info@{mapped_supplier.lower().replace(' ', '')}.com"
-                    )
-                    results['warnings'].append(f'Row {row_num}: Created supplier "{mapped_supplier}"')
-                else:
-                    results['errors'].append(f'Row {row_num}: Supplier "{mapped_supplier}" does not exist')
-                    return False
-            
-            # Check if product exists
-            existing_product = Product.objects.filter(sku=row_data['sku']).first()
-            
-            if existing_product:
-                if options['update_existing']:
-                    # Update existing product
-                    for field, value in row_data.items():
-                        if field not in ['category', 'supplier']:
-                            setattr(existing_product, field, value)
-                    
-                    existing_product.category = category
-                    existing_product.supplier = supplier
-                    existing_product.save()
-                    
-                    results['updated'] += 1
-                    if options['verbosity'] >= 2:
-                        self.stdout.write(f'Updated: {existing_product.sku}')
-                else:
-                    results['skipped'] += 1
-                    if options['verbosity'] >= 2:
-                        self.stdout.write(f'Skipped: {row_data["sku"]} (already exists)')
-            else:
-                # Create new product
-                product_data = row_data.copy()
-                product_data['category'] = category
-                product_data['supplier'] = supplier
-                product_data['created_by'] = user
-                
-                product = Product.objects.create(**product_data)
-                results['created'] += 1
-                
-                if options['verbosity'] >= 2:
-                    self.stdout.write(f'Created: {product.sku}')
-            
-            return True
-            
-        except Exception as e:
-            results['errors'].append(f'Row {row_num}: {str(e)}')
-            return False
+            # Bulk create/update the batch in one transaction
+            self.importer.import_batch(batch, results, verbosity=options['verbosity'], stdout=self.stdout)
     
     def _display_results(self, results, dry_run):
         """Display import results"""
@@ -526,6 +361,9 @@ class Command(BaseCommand):
             self.stdout.write(f'Products created: {results["created"]}')
             self.stdout.write(f'Products updated: {results["updated"]}')
             self.stdout.write(f'Products skipped: {results["skipped"]}')
+            self.stdout.write(f'Products unchanged: {results["unchanged"]}')
+            if 'seconds' in results:
+                self.stdout.write(f'Elapsed: {results["seconds"]}s')
         
         # Display warnings
         if results['warnings']:
@@ -0,0 +1,87 @@
+# inventory/management/commands/print_labels.py
+
+"""
+Django Management Command for Printing Product Label Sheets
+
+Lays out Avery-style label sheets with vector barcodes (inventory.labels)
+and writes them as PDF. Long runs are split into parts of PAGES_PER_PART
+pages that can be rendered in parallel with --workers; each part is written
+as <output>-NNN.pdf.
+
+Usage Examples:
+    python manage.py print_labels --all --output=labels.pdf
+    python manage.py print_labels --category=resistors --layout=avery_l7160 --output=resistors.pdf
+    python manage.py print_labels --sku=LM358DR --sku=NE555P --symbology=qr --output=labels.pdf
+    python manage.py print_labels --all --workers=4 --output=catalog.pdf
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.labels import DEFAULT_LAYOUT, LABEL_LAYOUTS, LabelSheetRenderer, product_labels
+from inventory.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Render product label sheets as PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, required=True, help='PDF file to write')
+        parser.add_argument('--all', action='store_true', help='Label every active product')
+        parser.add_argument('--category', type=str, help='Category slug (includes subcategories)')
+        parser.add_argument('--sku', action='append', default=[], help='Product SKU (repeatable)')
+        parser.add_argument(
+            '--layout',
+            choices=sorted(LABEL_LAYOUTS),
+            default=DEFAULT_LAYOUT,
+            help='Label sheet layout'
+        )
+        parser.add_argument(
+            '--symbology',
+            choices=['code128', 'qr'],
+            default='code128',
+            help='Code printed on each label'
+        )
+        parser.add_argument('--no-price', action='store_true', help='Leave the selling price off the labels')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes for long runs')
+
+    def handle(self, *args, **options):
+        products = Product.objects.filter(is_active=True).order_by('sku')
+        if options['sku']:
+            products = products.filter(sku__in=options['sku'])
+        elif options['category']:
+            products = products.filter(category__tree_path__startswith=self._category_path(options['category']))
+        elif not options['all']:
+            raise CommandError('Pass --all, --category or --sku')
+
+        labels = product_labels(products, symbology=options['symbology'], show_price=not options['no_price'])
+        if not labels:
+            raise CommandError('No matching products')
+
+        renderer = LabelSheetRenderer(options['layout'], workers=options['workers'])
+        parts = renderer.render_parts(labels)
+
+        output = options['output']
+        if len(parts) == 1:
+            paths = [output]
+        else:
+            stem, extension = os.path.splitext(output)
+            paths = [f'{stem}-{number:03d}{extension or ".pdf"}' for number in range(1, len(parts) + 1)]
+        for path, pdf in zip(paths, parts):
+            with open(path, 'wb') as pdf_file:
+                pdf_file.write(pdf)
+
+        pages = -(-len(labels) // renderer.labels_per_page)
+        self.stdout.write(self.style.SUCCESS('=== Label Sheets ==='))
+        self.stdout.write(f"Layout: {LABEL_LAYOUTS[options['layout']]['name']}")
+        self.stdout.write(f'Labels: {len(labels)}')
+        self.stdout.write(f'Pages: {pages}')
+        for path in paths:
+            self.stdout.write(f'Written: {path}')
+
+    def _category_path(self, slug):
+        category = Category.objects.filter(slug=slug).first()
+        if not category:
+            raise CommandError(f"Category '{slug}' not found")
+        return category.tree_path
@@ -0,0 +1,45 @@
+# inventory/management/commands/refresh_offline_catalog.py
+
+"""
+Django Management Command for the Mobile Offline Catalog
+
+Rebuilds the prebuilt offline catalog snapshot (inventory.offline) that
+devices download to bootstrap, but only when the sync change sequence has
+moved past the published snapshot - so it is cheap to run every minute.
+
+Usage Examples:
+    python manage.py refresh_offline_catalog
+    python manage.py refresh_offline_catalog --force
+"""
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from inventory.offline import CATALOG_CACHE_KEY, OfflineCatalog
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the mobile offline catalog snapshot when the catalog has changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild even if nothing changed since the last snapshot'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = OfflineCatalog.refresh(force=options['force'])
+        snapshot = cache.get(CATALOG_CACHE_KEY)
+
+        self.stdout.write(self.style.SUCCESS('=== Offline Catalog ==='))
+        self.stdout.write(f"Rebuilt: {'yes' if rebuilt else 'no (up to date or build in progress)'}")
+        if snapshot:
+            self.stdout.write(f"Cursor: {snapshot['cursor']}")
+            self.stdout.write(f"ETag: {snapshot['etag']}")
+            for table, count in snapshot['counts'].items():
+                self.stdout.write(f"{table.replace('_', ' ').title()}: {count}")
+            self.stdout.write(
+                f"Size: {len(snapshot['identity'])} bytes, "
+                f"{len(snapshot['gzip'])} gzip, {len(snapshot['br']) if 'br' in snapshot else '-'} brotli"
+            )
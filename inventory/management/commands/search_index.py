@@ -0,0 +1,76 @@
+# inventory/management/commands/search_index.py
+
+"""
+Django Management Command for Product Search Index Maintenance
+
+Rebuilds the full-text search vectors used by ProductSearchService and the
+parametric attribute index, and benchmarks search latency against the live
+catalog.
+
+Usage Examples:
+    python manage.py search_index --rebuild
+    python manage.py search_index --benchmark "0805 10k" --benchmark LM358
+    python manage.py search_index --benchmark STM32 --repeat=20 --limit=50
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.parametric import rebuild_attribute_index
+from inventory.search import ProductSearchService, is_postgres, refresh_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild product search indexes and benchmark product search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute search vectors and parametric attributes for every product'
+        )
+        parser.add_argument(
+            '--benchmark',
+            action='append',
+            default=[],
+            metavar='QUERY',
+            help='Query to benchmark (may be given multiple times)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per benchmark query (default: 5)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Result limit per benchmark search (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['rebuild'] and not options['benchmark']:
+            raise CommandError('Specify --rebuild and/or at least one --benchmark query')
+
+        if options['rebuild']:
+            if not is_postgres():
+                self.stdout.write(
+                    self.style.WARNING('Search vectors are PostgreSQL-only; nothing to rebuild')
+                )
+            else:
+                updated = refresh_search_vectors()
+                self.stdout.write(self.style.SUCCESS(f'Rebuilt search vectors for {updated} products'))
+
+            values = rebuild_attribute_index()
+            self.stdout.write(self.style.SUCCESS(f'Indexed {values} parametric attribute values'))
+
+        if options['benchmark']:
+            results = ProductSearchService.benchmark(
+                options['benchmark'],
+                limit=options['limit'],
+                repeat=options['repeat']
+            )
+            self.stdout.write(self.style.SUCCESS('=== Product Search Benchmark ==='))
+            self.stdout.write(json.dumps(results, indent=2))
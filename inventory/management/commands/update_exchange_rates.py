@@ -0,0 +1,61 @@
+# inventory/management/commands/update_exchange_rates.py
+
+"""
+Django Management Command for Refreshing Exchange Rates
+
+Fetches rates from the configured provider (inventory.fx) and stores the
+changed ones on Currency and in the exchange rate history. Fetches are
+conditional, so running it often costs a 304 when nothing changed. By
+default only active currencies with auto-update enabled are refreshed.
+
+Usage Examples:
+    python manage.py update_exchange_rates
+    python manage.py update_exchange_rates --all
+    python manage.py update_exchange_rates --file=rates.json --force
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.fx import ExchangeRateService, FileRateProvider, RateProviderError
+from inventory.models import Currency
+
+
+class Command(BaseCommand):
+    help = 'Refresh currency exchange rates from the configured provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Refresh every active currency, including ones without auto-update'
+        )
+        parser.add_argument('--file', type=str, help='Read rates from this JSON file instead of the provider')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Fetch unconditionally and apply the rates even if unchanged'
+        )
+
+    def handle(self, *args, **options):
+        currencies = None
+        if options['all']:
+            currencies = Currency.objects.filter(is_active=True)
+
+        try:
+            provider = FileRateProvider(options['file']) if options['file'] else None
+            result = ExchangeRateService.refresh(provider=provider, currencies=currencies, force=options['force'])
+        except RateProviderError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS('=== Exchange Rates ==='))
+        if result['status'] == 'not_modified':
+            self.stdout.write('Rates not modified since the last refresh')
+            return
+
+        self.stdout.write(f"Provider rates date: {result['rates_date'] or 'not given'}")
+        for code, rate in sorted(result['updated'].items()):
+            self.stdout.write(f'  {code}: {rate:.6f} USD')
+        self.stdout.write(f"Changed: {len(result['updated'])}")
+        self.stdout.write(f"Unchanged: {result['unchanged']}")
+        if result['missing']:
+            self.stdout.write(self.style.WARNING(f"No rate for: {', '.join(result['missing'])}"))
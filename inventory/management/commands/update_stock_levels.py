@@ -15,9 +15,15 @@ Key Features:
 - Comprehensive audit trail creation
 - Integration with existing stock movement system
 
+File imports are tracked as ImportSessions: rows whose SKU/location/quantity
+fingerprint matches the last applied import are skipped (so a rerun never
+posts the same adjustment twice) and --resume continues a failed import
+after its last committed batch.
+
 Usage Examples:
     python manage.py update_stock_levels --reconcile-all
     python manage.py update_stock_levels --import-file stock_update.csv
+    python manage.py update_stock_levels --import-file stock_update.csv --resume
     python manage.py update_stock_levels --set-reorder-levels
     python manage.py update_stock_levels --generate-alerts
 """
@@ -32,8 +38,11 @@ from django.db import transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-from inventory.models import Product, StockLevel, Location, StockMovement, ReorderAlert
-from inventory.utils import create_stock_movement
+from inventory.importing import ImportTracker
+from inventory.models import Product, StockLevel, Location
+from inventory.posting import StockPoster
+from inventory.reorder import ReorderAlertEvaluator
+from inventory.utils import StockManager
 
 
 class Command(BaseCommand):
@@ -53,6 +62,18 @@ class Command(BaseCommand):
             help='Import stock levels from CSV file'
         )
         
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last unfinished import of --import-file from its checkpoint'
+        )
+        
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Apply every imported row, even rows unchanged since the last import'
+        )
+        
         parser.add_argument(
             '--set-reorder-levels',
             action='store_true',
@@ -272,7 +293,7 @@ class Command(BaseCommand):
                     product.save(update_fields=['current_stock', 'available_stock'])
                     
                     # Create stock movement record
-                    create_stock_movement(
+                    StockManager.create_stock_movement(
                         product=product,
                         movement_type='adjustment',
                         quantity=discrepancy,
@@ -306,9 +327,30 @@ class Command(BaseCommand):
             'total_rows': 0,
             'processed': 0,
             'updated': 0,
+            'unchanged': 0,
             'errors': []
         }
         
+        tracker = None
+        if not options['dry_run']:
+            tracker = ImportTracker(
+                'stock_levels',
+                file_path,
+                options={'reason': options['reason']},
+                user=user,
+                resume=options['resume'],
+                full=options['full'],
+            )
+            if not tracker.start():
+                previous = tracker.identical_to
+                self.stdout.write(self.style.SUCCESS(
+                    f'File is identical to import session #{previous.pk} '
+                    f'({previous.started_at:%Y-%m-%d %H:%M}); nothing to import. Use --full to apply it again.'
+                ))
+                return
+            if tracker.resume_after:
+                self.stdout.write(self.style.WARNING(f'Resuming after row {tracker.resume_after}'))
+        
         try:
             with open(file_path, 'r', encoding='utf-8') as csvfile:
                 reader = csv.DictReader(csvfile)
@@ -326,17 +368,22 @@ class Command(BaseCommand):
                 
                 batch = []
                 batch_size = options['batch_size']
+                resume_after = tracker.resume_after if tracker else 0
                 
                 for row_num, row in enumerate(reader, start=2):
+                    # Rows up to the checkpoint were committed by the run being resumed
+                    if row_num <= resume_after:
+                        continue
+                    
                     results['total_rows'] += 1
                     
                     try:
                         # Clean and validate row data
                         sku = row['sku'].strip()
                         quantity = int(float(row['quantity']))
-                        location_name = row.get('location', '').strip()
-                        reason = row.get('reason', options['reason']).strip()
-                        reference = row.get('reference', f'Import row {row_num}').strip()
+                        location_name = (row.get('location') or '').strip()
+                        reason = (row.get('reason') or options['reason']).strip()
+                        reference = (row.get('reference') or f'Import row {row_num}').strip()
                         
                         batch.append({
                             'row_num': row_num,
@@ -349,7 +396,7 @@ class Command(BaseCommand):
                         
                         # Process batch when full
                         if len(batch) >= batch_size:
-                            self._process_import_batch(batch, options, user, results)
+                            self._process_import_batch(batch, options, user, results, tracker)
                             batch = []
                     
                     except (ValueError, KeyError) as e:
@@ -361,11 +408,16 @@ class Command(BaseCommand):
                 
                 # Process remaining batch
                 if batch:
-                    self._process_import_batch(batch, options, user, results)
+                    self._process_import_batch(batch, options, user, results, tracker)
         
         except Exception as e:
+            if tracker:
+                tracker.fail(e)
             raise CommandError(f'Error reading import file: {str(e)}')
         
+        if tracker:
+            tracker.finish(error_count=len(results['errors']))
+        
         # Display results
         self.stdout.write('')
         self.stdout.write(f'Import results:')
@@ -373,6 +425,7 @@ class Command(BaseCommand):
         self.stdout.write(f'  Successfully processed: {results["processed"]}')
         if not options['dry_run']:
             self.stdout.write(f'  Stock levels updated: {results["updated"]}')
+            self.stdout.write(f'  Unchanged since last import: {results["unchanged"]}')
         
         if results['errors']:
             self.stdout.write(f'  Errors: {len(results["errors"])}')
@@ -383,20 +436,46 @@ class Command(BaseCommand):
         
         self.stdout.write('')
     
-    def _process_import_batch(self, batch, options, user, results):
+    def _process_import_batch(self, batch, options, user, results, tracker=None):
         """Process a batch of import records"""
         if options['dry_run']:
             # Just validate in dry run mode
             for item in batch:
                 if self._validate_import_item(item, results):
                     results['processed'] += 1
-        else:
-            # Actually update stock levels
-            with transaction.atomic():
-                for item in batch:
-                    if self._update_stock_from_import(item, options, user, results):
-                        results['processed'] += 1
-                        results['updated'] += 1
+            return
+        
+        # Skip rows this session already applied (a resumed run); counts from
+        # earlier imports are compared with current stock instead, since stock
+        # has moved since they were applied
+        fingerprints, same = {}, set()
+        if tracker:
+            for item in batch:
+                key = f"{item['sku']}|{item['location_name']}"
+                fingerprints[key] = tracker.fingerprint(
+                    {'sku': item['sku'], 'location': item['location_name'], 'quantity': item['quantity']}
+                )
+            same = tracker.unchanged(fingerprints, this_session=True)
+        
+        # Actually update stock levels
+        with transaction.atomic():
+            applied = {}
+            for item in batch:
+                key = f"{item['sku']}|{item['location_name']}"
+                if key in same:
+                    results['processed'] += 1
+                    results['unchanged'] += 1
+                    continue
+                if self._update_stock_from_import(item, options, user, results):
+                    results['processed'] += 1
+                    results['updated'] += 1
+                    if tracker:
+                        applied[key] = fingerprints[key]
+            
+            if tracker:
+                tracker.commit_batch(
+                    applied, last_row=batch[-1]['row_num'], written=len(applied), unchanged=len(same)
+                )
     
     def _validate_import_item(self, item, results):
         """Validate import item without making changes"""
@@ -424,34 +503,28 @@ class Command(BaseCommand):
             # Get product
             product = Product.objects.get(sku=item['sku'], is_active=True)
             
-            # Get location if specified
-            location = None
+            # Get location if specified, else the default location
             if item['location_name']:
                 location = Location.objects.get(name=item['location_name'], is_active=True)
+            else:
+                location = Location.objects.filter(is_default=True, is_active=True).first()
             
-            # Calculate adjustment needed
-            current_stock = product.current_stock
-            target_quantity = item['quantity']
-            adjustment = target_quantity - current_stock
+            # Post the count; StockPoster compares it with the stock there now
+            movements, _ = StockPoster.post([{
+                'product_id': product.pk,
+                'location_id': location.pk if location else None,
+                'movement_type': 'adjustment',
+                'counted': item['quantity'],
+                'reference': item['reference'],
+                'notes': f"Import adjustment: {item['reason']}",
+            }], user=user, check_reorders=False)
             
-            if adjustment != 0:
-                # Create stock movement
-                create_stock_movement(
-                    product=product,
-                    movement_type='adjustment',
-                    quantity=adjustment,
-                    reference=item['reference'],
-                    to_location=location if adjustment > 0 else None,
-                    from_location=location if adjustment < 0 else None,
-                    user=user,
-                    notes=f"Import adjustment: {item['reason']}"
+            movement = movements[0]
+            if movement is not None and options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'Updated {product.sku}: {movement.previous_stock} → {movement.new_stock} '
+                    f'({movement.quantity:+d})'
                 )
-                
-                if options['verbosity'] >= 2:
-                    self.stdout.write(
-                        f'Updated {product.sku}: {current_stock} → {target_quantity} '
-                        f'({adjustment:+d})'
-                    )
             
             return True
             
@@ -529,55 +602,25 @@ class Command(BaseCommand):
         """Generate reorder alerts for products below reorder level"""
         self.stdout.write(self.style.SUCCESS('=== Generating Reorder Alerts ==='))
         
-        products = self._get_filtered_products(options).filter(
-            current_stock__lte=models.F('reorder_level')
+        # One anti-join finds the products without an open alert; one insert creates them
+        result = ReorderAlertEvaluator.evaluate(
+            self._get_filtered_products(options), dry_run=options['dry_run']
         )
         
-        alert_count = 0
-        
-        for product in products:
-            # Check if there's already an active alert
-            existing_alert = ReorderAlert.objects.filter(
-                product=product,
-                status__in=['active', 'acknowledged']
-            ).exists()
-            
-            if not existing_alert:
-                # Determine priority
-                stock_ratio = product.current_stock / max(product.reorder_level, 1)
-                if stock_ratio <= 0:
-                    priority = 'critical'
-                elif stock_ratio <= 0.5:
-                    priority = 'high'
-                elif stock_ratio <= 0.8:
-                    priority = 'medium'
-                else:
-                    priority = 'low'
-                
-                if not options['dry_run']:
-                    ReorderAlert.objects.create(
-                        product=product,
-                        priority=priority,
-                        current_stock=product.current_stock,
-                        reorder_level=product.reorder_level,
-                        suggested_order_quantity=product.reorder_quantity,
-                        suggested_supplier=product.supplier,
-                        estimated_cost=product.reorder_quantity * product.cost_price
-                    )
-                
-                alert_count += 1
-                
-                if options['verbosity'] >= 2:
-                    self.stdout.write(
-                        f'Created {priority} alert for {product.sku} '
-                        f'(stock: {product.current_stock}, reorder: {product.reorder_level})'
-                    )
+        if options['verbosity'] >= 2:
+            for row in result['rows']:
+                self.stdout.write(
+                    f"{'Would create' if options['dry_run'] else 'Created'} {row['priority']} alert for {row['sku']} "
+                    f"(stock: {row['available_stock']}, reorder: {row['reorder_level']})"
+                )
         
         self.stdout.write('')
         self.stdout.write(f'Reorder alert generation complete:')
-        self.stdout.write(f'  Products below reorder level: {products.count()}')
+        self.stdout.write(f"  Products needing a new alert: {len(result['rows'])}")
+        for priority, count in result['by_priority'].items():
+            self.stdout.write(f'    {priority}: {count}')
         if not options['dry_run']:
-            self.stdout.write(f'  New alerts created: {alert_count}')
+            self.stdout.write(f"  New alerts created: {result['created']}")
         self.stdout.write('')
     
     def _sync_location_stock(self, options, user):
@@ -628,7 +671,7 @@ class Command(BaseCommand):
                 # Create adjustment to zero
                 adjustment = -negative_stock
                 
-                create_stock_movement(
+                StockManager.create_stock_movement(
                     product=product,
                     movement_type='adjustment',
                     quantity=adjustment,
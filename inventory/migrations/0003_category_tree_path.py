@@ -0,0 +1,46 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:27
+
+from django.db import migrations, models
+
+
+def populate_tree_paths(apps, schema_editor):
+    """Backfill materialized paths for existing categories"""
+    Category = apps.get_model('inventory', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_for(pk, seen=()):
+        if pk not in paths:
+            parent_id = parents.get(pk)
+            if parent_id is None or parent_id not in parents or parent_id in seen:
+                paths[pk] = f"{pk}/"
+            else:
+                paths[pk] = f"{path_for(parent_id, seen + (pk,))}{pk}/"
+        return paths[pk]
+
+    categories = list(Category.objects.all())
+    for category in categories:
+        category.tree_path = path_for(category.pk)
+        category.tree_depth = category.tree_path.count('/') - 1
+    Category.objects.bulk_update(categories, ['tree_path', 'tree_depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_location_description_location_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='tree_depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text="Materialized path of ancestor ids, e.g. '1/5/12/'", max_length=255),
+        ),
+        migrations.RunPython(populate_tree_paths, migrations.RunPython.noop),
+    ]
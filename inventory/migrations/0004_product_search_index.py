@@ -0,0 +1,61 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:30
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# GIN indexes are PostgreSQL-only, so they are created here rather than in
+# Product.Meta to keep SQLite test databases migratable.
+SEARCH_INDEXES = (
+    ('inventory_product_search_vector_gin', 'search_vector'),
+    ('inventory_product_sku_trgm', 'UPPER("sku") gin_trgm_ops'),
+    ('inventory_product_mpn_trgm', 'UPPER("manufacturer_part_number") gin_trgm_ops'),
+    ('inventory_product_supplier_sku_trgm', 'UPPER("supplier_sku") gin_trgm_ops'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for index_name, expression in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "inventory_product" USING gin ({expression})'
+        )
+
+    # Backfill the search vector for existing products
+    from django.contrib.postgres.search import SearchVector
+    from inventory.search import SEARCH_CONFIG, SEARCH_VECTOR_FIELDS
+
+    Product = apps.get_model('inventory', 'Product')
+    vector = None
+    for field_name, weight in SEARCH_VECTOR_FIELDS:
+        part = SearchVector(field_name, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    Product.objects.update(search_vector=vector)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for index_name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_category_tree_path'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, help_text='Weighted full-text index maintained by inventory.search (PostgreSQL)', null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.2 on 2026-10-18 21:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_attributes(apps, schema_editor):
+    from inventory.parametric import normalize_text, parse_quantity
+
+    Product = apps.get_model('inventory', 'Product')
+    ProductAttributeValue = apps.get_model('inventory', 'ProductAttributeValue')
+
+    rows = []
+    for product in Product.objects.only('id', 'dynamic_attributes').iterator(chunk_size=1000):
+        for name, raw_value in (product.dynamic_attributes or {}).items():
+            if raw_value is None or raw_value == '' or not str(name).strip():
+                continue
+            if isinstance(raw_value, (list, tuple)):
+                raw_value = ', '.join(str(item) for item in raw_value)
+            value_text = str(raw_value)[:200]
+            parsed = parse_quantity(value_text)
+            rows.append(ProductAttributeValue(
+                product_id=product.pk,
+                name=str(name).strip()[:100],
+                value_text=value_text,
+                value_normalized=normalize_text(value_text)[:200],
+                value_numeric=parsed[0] if parsed else None,
+                unit=parsed[1] if parsed else '',
+            ))
+    ProductAttributeValue.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAttributeValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('value_text', models.CharField(max_length=200)),
+                ('value_normalized', models.CharField(help_text='Lower-cased value for exact matching and facets', max_length=200)),
+                ('value_numeric', models.FloatField(blank=True, help_text='Value in SI base units, when numeric', null=True)),
+                ('unit', models.CharField(blank=True, help_text='SI unit symbol (Ω, V, F, %...)', max_length=10)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_values', to='inventory.product')),
+            ],
+            options={
+                'ordering': ['product', 'name'],
+                'indexes': [models.Index(fields=['name', 'value_normalized'], name='inventory_p_name_b92bc2_idx'), models.Index(fields=['name', 'value_numeric'], name='inventory_p_name_d11666_idx'), models.Index(fields=['value_normalized'], name='inventory_p_value_n_3c6bcf_idx'), models.Index(fields=['value_numeric', 'unit'], name='inventory_p_value_n_de2119_idx')],
+                'unique_together': {('product', 'name')},
+            },
+        ),
+        migrations.RunPython(index_existing_attributes, migrations.RunPython.noop),
+    ]
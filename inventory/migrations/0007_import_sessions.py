@@ -0,0 +1,58 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_duplicate_candidates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('products', 'Product Import'), ('stock_levels', 'Stock Level Import')], max_length=20)),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_hash', models.CharField(help_text='SHA-256 of the file contents', max_length=64)),
+                ('signature', models.CharField(help_text='Digest of the options that change how rows apply', max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('last_committed_row', models.PositiveIntegerField(default=0)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('rows_unchanged', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportRowFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('products', 'Product Import'), ('stock_levels', 'Stock Level Import')], max_length=20)),
+                ('key', models.CharField(max_length=200)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.importsession')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importsession',
+            index=models.Index(fields=['kind', 'file_hash', 'status'], name='inventory_i_kind_de3bf9_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='importrowfingerprint',
+            unique_together={('kind', 'key')},
+        ),
+    ]
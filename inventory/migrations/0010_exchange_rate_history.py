@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_rate_history(apps, schema_editor):
+    """Start the history with each currency's current rate"""
+    Currency = apps.get_model('inventory', 'Currency')
+    ExchangeRateHistory = apps.get_model('inventory', 'ExchangeRateHistory')
+    ExchangeRateHistory.objects.bulk_create([
+        ExchangeRateHistory(
+            currency_id=currency.pk,
+            rate_to_usd=currency.exchange_rate_to_usd,
+            effective_at=currency.last_updated,
+            source=currency.api_source or 'manual',
+        )
+        for currency in Currency.objects.all()
+    ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_mobile_operations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRateHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rate_to_usd', models.DecimalField(decimal_places=6, help_text='1 unit of the currency = X USD', max_digits=15)),
+                ('effective_at', models.DateTimeField(help_text='When the rate took effect')),
+                ('source', models.CharField(help_text="Rate provider, or 'manual'", max_length=50)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_history', to='inventory.currency')),
+            ],
+            options={
+                'verbose_name_plural': 'Exchange rate history',
+                'ordering': ['currency', '-effective_at'],
+                'indexes': [models.Index(fields=['currency', '-effective_at'], name='inventory_e_currenc_f72bcf_idx')],
+            },
+        ),
+        migrations.RunPython(seed_rate_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 22:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_exchange_rate_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('rule', models.CharField(choices=[('markup', 'Markup on Cost'), ('percent', 'Percentage Change'), ('fixed', 'Fixed Amount Change'), ('set', 'Set Price')], max_length=20)),
+                ('rule_value', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('changed_at', models.DateTimeField(db_index=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Price history',
+                'ordering': ['product', '-changed_at'],
+                'indexes': [models.Index(fields=['product', '-changed_at'], name='inventory_p_product_00e5a5_idx')],
+            },
+        ),
+    ]
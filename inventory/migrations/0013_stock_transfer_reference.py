@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_stock_transfers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransfer',
+            name='reference',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
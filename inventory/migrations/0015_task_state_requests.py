@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_task_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstate',
+            name='requested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskstate',
+            name='requested_kwargs',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,239 @@
+# inventory/mobile.py - Mobile Batch Uploads
+
+"""
+Idempotent application of operations queued on mobile devices.
+
+Reps count and adjust stock offline and upload the queue once they have a
+connection, often over links that drop mid-request. Every operation carries
+a client-generated idempotency key, so an upload can simply be retried:
+
+- the whole batch is validated up front (fields and quantities, then every
+  product and location in one query each); invalid operations are rejected
+  with a message without holding back the rest
+- the valid operations are posted together through StockPoster
+- each applied operation stores its key and result (MobileOperation); a key
+  seen again returns the stored result with status 'duplicate', so a retry
+  after a lost response changes nothing
+
+Keys are checked after the batch's products are locked, so a retry racing
+the original request waits for it to commit and then finds its keys.
+"""
+
+import logging
+
+from django.db import IntegrityError, transaction
+
+from .posting import StockPoster
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_OPERATIONS = 1000
+MAX_KEY_LENGTH = 64
+
+OPERATION_TYPES = ('count', 'adjust')
+
+
+class MobileBatchError(Exception):
+    """The upload as a whole cannot be processed"""
+
+
+def _whole_number(value, field):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a whole number')
+
+
+class MobileBatch:
+    """
+    Applies uploaded batches of stock counts and adjustments
+    """
+
+    @classmethod
+    def apply(cls, operations, user=None):
+        """
+        Validate and apply a batch of operations.
+
+        Args:
+            operations: List of dicts with key, type ('count' or 'adjust'),
+                product_id, quantity (the counted quantity, or the signed
+                change) and optional location_id and reason
+            user: User the movements are recorded against
+
+        Returns:
+            Dict with one result per operation in request order (status
+            'applied', 'duplicate' or 'rejected') and the count of each
+        """
+        if not isinstance(operations, list):
+            raise MobileBatchError('operations must be a list')
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            raise MobileBatchError(f'A batch may hold at most {MAX_BATCH_OPERATIONS} operations')
+
+        results = [None] * len(operations)
+        valid = cls._validate(operations, results)
+
+        if valid:
+            # A key inserted concurrently by a request touching other products
+            for attempt in range(2):
+                try:
+                    cls._apply_valid(valid, results, user)
+                    break
+                except IntegrityError:
+                    if attempt:
+                        raise
+
+        summary = {'applied': 0, 'duplicate': 0, 'rejected': 0}
+        for result in results:
+            summary[result['status']] += 1
+        logger.info(
+            f"Mobile batch from {user or 'anonymous'}: {summary['applied']} applied, "
+            f"{summary['duplicate']} duplicates, {summary['rejected']} rejected"
+        )
+
+        return {
+            'applied': summary['applied'],
+            'duplicates': summary['duplicate'],
+            'rejected': summary['rejected'],
+            'results': results,
+        }
+
+    # ---- validation ----
+
+    @staticmethod
+    def _clean(operation, seen_keys):
+        if not isinstance(operation, dict):
+            raise ValueError('Operation must be an object')
+
+        key = str(operation.get('key') or '').strip()
+        if not key:
+            raise ValueError('Missing idempotency key')
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f'Key longer than {MAX_KEY_LENGTH} characters')
+        if key in seen_keys:
+            raise ValueError('Key repeated within the batch')
+        seen_keys.add(key)
+
+        operation_type = operation.get('type')
+        if operation_type not in OPERATION_TYPES:
+            raise ValueError(f'Unknown operation type {operation_type!r}')
+
+        quantity = _whole_number(operation.get('quantity'), 'quantity')
+        if operation_type == 'count' and quantity < 0:
+            raise ValueError('Counted quantity cannot be negative')
+        if operation_type == 'adjust' and quantity == 0:
+            raise ValueError('Adjustment quantity cannot be zero')
+
+        location_id = operation.get('location_id')
+        return {
+            'key': key,
+            'type': operation_type,
+            'product_id': _whole_number(operation.get('product_id'), 'product_id'),
+            'location_id': _whole_number(location_id, 'location_id') if location_id not in (None, '') else None,
+            'quantity': quantity,
+            'reason': str(operation.get('reason') or '').strip()[:200],
+        }
+
+    @classmethod
+    def _validate(cls, operations, results):
+        """Clean every operation and check its references; returns [(index, operation)]"""
+        from .models import Location, Product
+
+        cleaned, seen_keys = [], set()
+        for index, operation in enumerate(operations):
+            try:
+                cleaned.append((index, cls._clean(operation, seen_keys)))
+            except ValueError as e:
+                key = operation.get('key') if isinstance(operation, dict) else None
+                results[index] = {'key': key, 'status': 'rejected', 'error': str(e)}
+
+        products = set(Product.objects.filter(
+            pk__in={operation['product_id'] for _, operation in cleaned}, is_active=True
+        ).values_list('pk', flat=True))
+        locations = set(Location.objects.filter(
+            pk__in={operation['location_id'] for _, operation in cleaned if operation['location_id']}, is_active=True
+        ).values_list('pk', flat=True))
+
+        valid = []
+        for index, operation in cleaned:
+            if operation['product_id'] not in products:
+                error = f"Product {operation['product_id']} not found or inactive"
+            elif operation['location_id'] and operation['location_id'] not in locations:
+                error = f"Location {operation['location_id']} not found or inactive"
+            else:
+                valid.append((index, operation))
+                continue
+            results[index] = {'key': operation['key'], 'status': 'rejected', 'error': error}
+        return valid
+
+    # ---- application ----
+
+    @staticmethod
+    def _line(operation):
+        """StockPoster line for an operation"""
+        label = 'count' if operation['type'] == 'count' else 'adjustment'
+        line = {
+            'product_id': operation['product_id'],
+            'location_id': operation['location_id'],
+            'movement_type': 'adjustment',
+            'reference': f"MOBILE-{operation['key']}",
+            'notes': f"Mobile {label}: {operation['reason'] or 'no reason given'}",
+        }
+        if operation['type'] == 'count':
+            line['counted'] = operation['quantity']
+        else:
+            line['quantity'] = operation['quantity']
+        return line
+
+    @classmethod
+    def _apply_valid(cls, valid, results, user):
+        from .models import MobileOperation, Product
+
+        with transaction.atomic():
+            # Serializes with any other upload touching these products
+            list(Product.objects.select_for_update().filter(
+                pk__in={operation['product_id'] for _, operation in valid}
+            ).order_by('pk').values_list('pk', flat=True))
+
+            applied = {
+                receipt.key: receipt
+                for receipt in MobileOperation.objects.filter(key__in=[operation['key'] for _, operation in valid])
+            }
+
+            pending = []
+            for index, operation in valid:
+                if operation['key'] in applied:
+                    results[index] = {**applied[operation['key']].result, 'status': 'duplicate'}
+                else:
+                    pending.append((index, operation))
+            if not pending:
+                return
+
+            movements, errors = StockPoster.post(
+                [cls._line(operation) for _, operation in pending], user=user, partial=True
+            )
+
+            receipts = []
+            for position, (index, operation) in enumerate(pending):
+                if position in errors:
+                    results[index] = {'key': operation['key'], 'status': 'rejected', 'error': errors[position]}
+                    continue
+
+                movement = movements[position]
+                result = {
+                    'key': operation['key'],
+                    'status': 'applied',
+                    'movement_id': movement.pk if movement else None,
+                    # A count that matched the stock posts no movement
+                    'previous_quantity': movement.previous_stock if movement else operation['quantity'],
+                    'new_quantity': movement.new_stock if movement else operation['quantity'],
+                }
+                results[index] = result
+                receipts.append(MobileOperation(
+                    key=operation['key'],
+                    operation_type=operation['type'],
+                    movement=movement,
+                    result=result,
+                    created_by=user,
+                ))
+
+            MobileOperation.objects.bulk_create(receipts)
@@ -23,11 +23,15 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
 from decimal import Decimal
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
-from django.db.models import Sum, F, Q
+from django.db.models import Sum, F, Q, Value
+from django.db.models.functions import Concat, Substr
+from django.core.cache import cache
+from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -82,6 +86,34 @@ class Currency(models.Model):
         """Get how old the exchange rate is in hours"""
         return (timezone.now() - self.last_updated).total_seconds() / 3600
 
+class ExchangeRateHistory(models.Model):
+    """
+    Append-only history of exchange rates to USD.
+    
+    A row is added whenever a currency's rate changes (provider refresh or
+    manual edit), so the rate valid at any moment is the newest row at or
+    before it (see inventory.fx.rate_at).
+    """
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='rate_history')
+    rate_to_usd = models.DecimalField(
+        max_digits=15,
+        decimal_places=6,
+        help_text="1 unit of the currency = X USD"
+    )
+    effective_at = models.DateTimeField(help_text="When the rate took effect")
+    source = models.CharField(max_length=50, help_text="Rate provider, or 'manual'")
+    recorded_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['currency', '-effective_at']
+        verbose_name_plural = "Exchange rate history"
+        indexes = [
+            models.Index(fields=['currency', '-effective_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.currency.code} {self.rate_to_usd} @ {self.effective_at:%Y-%m-%d %H:%M}"
+
 class OverheadFactor(models.Model):
     """
     Dynamic overhead factors for cost calculation
@@ -137,6 +169,26 @@ class OverheadFactor(models.Model):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def active_rules(cls):
+        """
+        Active factors with the category and supplier ids they are restricted to.
+        
+        Returns:
+            List of (factor, category_ids, supplier_ids); empty sets mean no restriction
+        """
+        factors = cls.objects.filter(is_active=True).prefetch_related(
+            'applies_to_categories', 'applies_to_suppliers'
+        )
+        return [
+            (
+                factor,
+                {category.id for category in factor.applies_to_categories.all()},
+                {supplier.id for supplier in factor.applies_to_suppliers.all()},
+            )
+            for factor in factors
+        ]
+    
     def calculate_cost(self, product_cost, order_value, weight_kg=None):
         """Calculate the overhead cost based on the factor type"""
         if not self.is_active:
@@ -788,11 +840,23 @@ class Category(models.Model):
     meta_description = models.CharField(max_length=160, blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
     
+    # Materialized hierarchy (maintained on save/move)
+    tree_path = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Materialized path of ancestor ids, e.g. '1/5/12/'"
+    )
+    tree_depth = models.PositiveIntegerField(default=0, editable=False)
+    
     # Audit trail
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     
+    ROLLUP_CACHE_KEY = 'inventory:category_rollups'
+    
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['display_order', 'name']
@@ -802,14 +866,62 @@ class Category(models.Model):
             return f"{self.parent.name} > {self.name}"
         return self.name
     
+    def save(self, *args, **kwargs):
+        """Save and keep the materialized path of this subtree in sync"""
+        old_path = self.tree_path
+        ancestor_ids = self.ancestor_ids
+        moved = not old_path or (ancestor_ids[-1] if ancestor_ids else None) != self.parent_id
+        
+        parent_path = ''
+        if moved and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list(
+                'tree_path', flat=True
+            ).first() or ''
+            if self.pk and str(self.pk) in parent_path.split('/'):
+                raise ValueError("A category cannot be moved below itself or one of its descendants")
+        
+        super().save(*args, **kwargs)
+        
+        if not moved:
+            return
+        
+        new_path = f"{parent_path}{self.pk}/"
+        new_depth = new_path.count('/') - 1
+        Category.objects.filter(pk=self.pk).update(tree_path=new_path, tree_depth=new_depth)
+        
+        # Re-root the whole subtree in one statement when the category moves
+        if old_path and old_path != new_path:
+            Category.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                tree_path=Concat(Value(new_path), Substr('tree_path', len(old_path) + 1)),
+                tree_depth=F('tree_depth') + (new_depth - self.tree_depth),
+            )
+        
+        self.tree_path = new_path
+        self.tree_depth = new_depth
+        Category.invalidate_rollups()
+    
+    @property
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first"""
+        return [int(pk) for pk in self.tree_path.split('/')[:-2] if pk]
+    
+    def get_ancestors(self):
+        """Ancestors ordered from the root down (one query)"""
+        ancestors = Category.objects.in_bulk(self.ancestor_ids)
+        return [ancestors[pk] for pk in self.ancestor_ids if pk in ancestors]
+    
+    def get_descendants(self, include_self=False):
+        """All categories below this one (one query)"""
+        descendants = Category.objects.filter(tree_path__startswith=self.tree_path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
     @property
     def full_path(self):
         """Get the complete category path"""
-        path = [self.name]
-        parent = self.parent
-        while parent:
-            path.insert(0, parent.name)
-            parent = parent.parent
+        path = [ancestor.name for ancestor in self.get_ancestors()]
+        path.append(self.name)
         return " > ".join(path)
     
     def get_absolute_url(self):
@@ -817,19 +929,93 @@ class Category(models.Model):
     
     def get_product_count(self):
         """Get total number of products in this category and subcategories"""
-        return Product.objects.filter(
-            Q(category=self) | Q(category__parent=self)
-        ).count()
+        return Category.get_subtree_rollups().get(self.pk, {}).get('product_count', 0)
     
     def get_total_stock_value(self):
-        """Calculate total value of stock in this category"""
-        products = Product.objects.filter(
-            Q(category=self) | Q(category__parent=self),
-            is_active=True
-        ).aggregate(
-            total_value=Sum(F('current_stock') * F('total_cost_price'))
+        """Calculate total value of stock in this category and subcategories"""
+        return Category.get_subtree_rollups().get(self.pk, {}).get('total_stock_value', Decimal('0.00'))
+    
+    @classmethod
+    def get_subtree_rollups(cls):
+        """
+        Product counts and stock values for every category, rolled up over
+        its whole subtree.
+        
+        Built from a single grouped query over products keyed by the
+        category's materialized path, then cached until stock, products or
+        the hierarchy change.
+        
+        Returns:
+            Dict of category id -> {'product_count', 'active_product_count',
+            'total_stock_value'}
+        """
+        rollups = cache.get(cls.ROLLUP_CACHE_KEY)
+        if rollups is not None:
+            return rollups
+        
+        direct_totals = Product.objects.order_by().values('category__tree_path').annotate(
+            product_count=models.Count('id'),
+            active_product_count=models.Count('id', filter=Q(is_active=True)),
+            total_stock_value=Sum(
+                F('current_stock') * F('total_cost_price_usd'),
+                filter=Q(is_active=True),
+                output_field=models.DecimalField(max_digits=20, decimal_places=6)
+            ),
+        )
+        
+        rollups = {}
+        for row in direct_totals:
+            for pk in (row['category__tree_path'] or '').split('/'):
+                if not pk:
+                    continue
+                totals = rollups.setdefault(int(pk), {
+                    'product_count': 0,
+                    'active_product_count': 0,
+                    'total_stock_value': Decimal('0.00'),
+                })
+                totals['product_count'] += row['product_count']
+                totals['active_product_count'] += row['active_product_count']
+                totals['total_stock_value'] += row['total_stock_value'] or Decimal('0.00')
+        
+        cache.set(
+            cls.ROLLUP_CACHE_KEY,
+            rollups,
+            getattr(settings, 'INVENTORY_SETTINGS', {}).get('CACHE_TIMEOUT_SECONDS', 300)
         )
-        return products['total_value'] or Decimal('0.00')
+        return rollups
+    
+    @classmethod
+    def invalidate_rollups(cls):
+        """Drop cached subtree totals (stock, product or hierarchy changed)"""
+        cache.delete(cls.ROLLUP_CACHE_KEY)
+    
+    @classmethod
+    def rebuild_tree_paths(cls):
+        """Recompute every materialized path from the parent links"""
+        categories = {c.pk: c for c in cls.objects.only('id', 'parent_id', 'tree_path', 'tree_depth')}
+        paths = {}
+        
+        def path_for(pk, seen=()):
+            if pk in paths:
+                return paths[pk]
+            parent_id = categories[pk].parent_id
+            if parent_id is None or parent_id not in categories or parent_id in seen:
+                paths[pk] = f"{pk}/"
+            else:
+                paths[pk] = f"{path_for(parent_id, seen + (pk,))}{pk}/"
+            return paths[pk]
+        
+        changed = []
+        for pk, category in categories.items():
+            path = path_for(pk)
+            if category.tree_path != path:
+                category.tree_path = path
+                category.tree_depth = path.count('/') - 1
+                changed.append(category)
+        
+        cls.objects.bulk_update(changed, ['tree_path', 'tree_depth'], batch_size=500)
+        cls.invalidate_rollups()
+        return len(changed)
 
 class Product(models.Model):
     """
@@ -1194,6 +1380,12 @@ class Product(models.Model):
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.CharField(max_length=500, blank=True)
     search_keywords = models.TextField(blank=True, help_text="Comma-separated keywords")
+    search_vector = SearchVectorField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Weighted full-text index maintained by inventory.search (PostgreSQL)"
+    )
     
     # Audit trail
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1244,11 +1436,21 @@ class Product(models.Model):
     
     def save(self, *args, **kwargs):
         """Enhanced save method with cost calculations"""
-        self.calculate_all_costs()
+        self.prepare_for_save()
+        super().save(*args, **kwargs)
+    
+    def prepare_for_save(self, overhead_rules=None):
+        """
+        Set derived fields (costs, component family, QR code, stock totals).
+        
+        Called by save(); bulk writers call it directly with rules from
+        OverheadFactor.active_rules() so costs need no per-product queries.
+        """
+        self.calculate_all_costs(overhead_rules)
         
         # Auto-set component family from category
-        if self.category and self.category.component_family:
-            self.component_family = self.category.component_family
+        if self.category and self.category.component_family_id:
+            self.component_family_id = self.category.component_family_id
         
         # Generate QR code if not exists
         if not self.qr_code:
@@ -1256,14 +1458,12 @@ class Product(models.Model):
         
         self.current_stock = self.total_stock or 0
         self.available_stock = max(0, (self.total_stock or 0) - (self.reserved_stock or 0))
-        
-        super().save(*args, **kwargs)
     
-    def calculate_all_costs(self):
+    def calculate_all_costs(self, overhead_rules=None):
         """Calculate all cost components"""
         # Convert cost price to USD
-        if self.supplier_currency:
-            self.cost_price_usd = self.cost_price * self.supplier_currency.exchange_rate_to_usd
+        if self.supplier_currency_id:
+            self.cost_price_usd = self.price_in_usd(self.cost_price, self.supplier_currency_id)
         else:
             self.cost_price_usd = self.cost_price
         
@@ -1281,45 +1481,47 @@ class Product(models.Model):
         )
         
         # Calculate overhead costs
-        self.calculate_overhead_costs()
+        self.calculate_overhead_costs(overhead_rules)
         
         # Calculate total cost
         self.total_cost_price_usd = self.total_import_cost_usd + self.overhead_cost_per_unit
         
         # Calculate markup percentage
-        if self.total_cost_price_usd and self.selling_price and self.selling_currency:
-            selling_price_usd = self.selling_price
-            if self.selling_currency.code != 'USD':
-                selling_price_usd = self.selling_price * self.selling_currency.exchange_rate_to_usd
+        if self.total_cost_price_usd and self.selling_price and self.selling_currency_id:
+            selling_price_usd = self.price_in_usd(self.selling_price, self.selling_currency_id)
             
             if self.total_cost_price_usd > 0:
                 markup = ((selling_price_usd - self.total_cost_price_usd) / self.total_cost_price_usd) * 100
                 self.markup_percentage = markup
     
-    def calculate_overhead_costs(self):
+    @staticmethod
+    def price_in_usd(amount, currency_id):
+        """USD value of an amount, from the in-process rate table"""
+        from .conversion import to_usd
+        
+        return to_usd(amount, currency_id)
+    
+    def calculate_overhead_costs(self, overhead_rules=None):
         """Calculate allocated overhead costs per unit"""
         overhead_total = Decimal('0.00')
         
-        # Get all active overhead factors
-        overhead_factors = OverheadFactor.objects.filter(is_active=True)
+        # Get all active overhead factors with their category/supplier restrictions
+        if overhead_rules is None:
+            overhead_rules = OverheadFactor.active_rules()
         
-        for factor in overhead_factors:
-            # Check if factor applies to this product
-            applies = True
-            
-            if factor.applies_to_categories.exists():
-                applies = applies and factor.applies_to_categories.filter(id=self.category.id).exists()
+        for factor, category_ids, supplier_ids in overhead_rules:
+            # Empty restriction sets apply to everything
+            if category_ids and self.category_id not in category_ids:
+                continue
+            if supplier_ids and self.supplier_id not in supplier_ids:
+                continue
             
-            if factor.applies_to_suppliers.exists():
-                applies = applies and factor.applies_to_suppliers.filter(id=self.supplier.id).exists()
-            
-            if applies:
-                cost = factor.calculate_cost(
-                    product_cost=self.total_import_cost_usd,
-                    order_value=self.total_import_cost_usd,  # For single item
-                    weight_kg=self.weight_grams / 1000 if self.weight_grams else None
-                )
-                overhead_total += cost
+            cost = factor.calculate_cost(
+                product_cost=self.total_import_cost_usd,
+                order_value=self.total_import_cost_usd,  # For single item
+                weight_kg=self.weight / 1000 if self.weight else None  # weight is in grams
+            )
+            overhead_total += cost
         
         self.overhead_cost_per_unit = overhead_total
     
@@ -1337,10 +1539,8 @@ class Product(models.Model):
     @property
     def profit_per_unit_usd(self):
         """Calculate profit per unit in USD"""
-        if self.selling_currency and self.selling_price:
-            selling_price_usd = self.selling_price
-            if self.selling_currency.code != 'USD':
-                selling_price_usd = self.selling_price * self.selling_currency.exchange_rate_to_usd
+        if self.selling_currency_id and self.selling_price:
+            selling_price_usd = self.price_in_usd(self.selling_price, self.selling_currency_id)
             return selling_price_usd - self.total_cost_price_usd
         return Decimal('0.00')
     
@@ -1503,6 +1703,65 @@ class ProductStockLevel(models.Model):
         self.product.reserved_stock = total['total_reserved'] or 0
         self.product.save(update_fields=['total_stock', 'reserved_stock'])
 
+class ProductAttributeValue(models.Model):
+    """
+    Typed copy of Product.dynamic_attributes for parametric search.
+    Maintained by inventory.parametric - rows are rebuilt whenever the product's attributes change.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='attribute_values')
+    name = models.CharField(max_length=100)
+    value_text = models.CharField(max_length=200)
+    value_normalized = models.CharField(max_length=200, help_text="Lower-cased value for exact matching and facets")
+    value_numeric = models.FloatField(null=True, blank=True, help_text="Value in SI base units, when numeric")
+    unit = models.CharField(max_length=10, blank=True, help_text="SI unit symbol (Ω, V, F, %...)")
+    
+    class Meta:
+        unique_together = ['product', 'name']
+        ordering = ['product', 'name']
+        indexes = [
+            models.Index(fields=['name', 'value_normalized']),
+            models.Index(fields=['name', 'value_numeric']),
+            models.Index(fields=['value_normalized']),
+            models.Index(fields=['value_numeric', 'unit']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} {self.name}={self.value_text}"
+
+class PriceHistory(models.Model):
+    """
+    Selling price changes made by repricing rules.
+    
+    Rows are written by inventory.pricing.Repricer in the same statement
+    batch as the price update itself, so the history always matches the
+    prices that were applied.
+    """
+    
+    RULES = (
+        ('markup', 'Markup on Cost'),
+        ('percent', 'Percentage Change'),
+        ('fixed', 'Fixed Amount Change'),
+        ('set', 'Set Price'),
+    )
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    old_price = models.DecimalField(max_digits=15, decimal_places=2)
+    new_price = models.DecimalField(max_digits=15, decimal_places=2)
+    rule = models.CharField(max_length=20, choices=RULES)
+    rule_value = models.DecimalField(max_digits=15, decimal_places=4)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['product', '-changed_at']
+        verbose_name_plural = "Price history"
+        indexes = [
+            models.Index(fields=['product', '-changed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} -> {self.new_price} ({self.rule})"
+
 class Location(models.Model):
     """
     Storage locations for inventory management.
@@ -1713,6 +1972,64 @@ class StockMovement(models.Model):
             self.total_cost = abs(self.quantity) * self.unit_cost
         super().save(*args, **kwargs)
 
+class StockTransfer(models.Model):
+    """
+    Transfer documents moving stock between locations.
+    
+    A transfer is drafted with all its lines, dispatched (stock leaves the
+    source location and is in transit) and received at the destination,
+    each step posted for the whole document by inventory.transfers.
+    """
+    
+    STATUS_CHOICES = (
+        ('draft', 'Draft'),
+        ('in_transit', 'In Transit'),
+        ('partially_received', 'Partially Received'),
+        ('received', 'Received'),
+        ('cancelled', 'Cancelled'),
+    )
+    
+    transfer_number = models.CharField(max_length=50, unique=True)
+    reference = models.CharField(max_length=100, blank=True)
+    from_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_out')
+    to_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='transfers_in')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', db_index=True)
+    notes = models.TextField(blank=True)
+    
+    # Audit trail
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    dispatched_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    received_at = models.DateTimeField(null=True, blank=True)
+    received_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Transfer {self.transfer_number}: {self.from_location} -> {self.to_location}"
+
+class StockTransferItem(models.Model):
+    """
+    Lines of a transfer document
+    """
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    quantity_received = models.PositiveIntegerField(default=0)
+    notes = models.CharField(max_length=200, blank=True)
+    
+    class Meta:
+        unique_together = ('transfer', 'product')
+    
+    @property
+    def quantity_in_transit(self):
+        """Dispatched quantity not yet received"""
+        if self.transfer.status in ('draft', 'cancelled'):
+            return 0
+        return self.quantity - self.quantity_received
+
 class StockTake(models.Model):
     """
     Physical stock counting and reconciliation.
@@ -1946,35 +2263,15 @@ class PurchaseOrderItem(models.Model):
         return self.quantity_received >= self.quantity_ordered
     
     def receive_stock(self, quantity, user=None, notes=""):
-        """Process receipt of stock for this PO item"""
-        if quantity > self.quantity_outstanding:
-            raise ValueError("Cannot receive more than outstanding quantity")
-        
-        # Update received quantity
-        self.quantity_received += quantity
-        self.save()
+        """Process receipt of stock for this PO item (a one-line goods-received note)"""
+        from .receiving import GoodsReceiver
         
-        # Update product stock
-        old_stock = self.product.current_stock
-        self.product.current_stock += quantity
-        self.product.last_restocked_date = timezone.now()
-        self.product.save()
-        
-        # Create stock movement
-        StockMovement.objects.create(
-            product=self.product,
-            movement_type='purchase',
-            quantity=quantity,
-            reference=f"PO {self.purchase_order.po_number}",
-            previous_stock=old_stock,
-            new_stock=self.product.current_stock,
-            unit_cost=self.unit_price,
-            total_cost=quantity * self.unit_price,
-            notes=f"Received from {self.purchase_order.supplier.name}. {notes}",
-            created_by=user
+        GoodsReceiver.receive(
+            self.purchase_order_id,
+            [{'item_id': self.pk, 'quantity': quantity, 'notes': notes}],
+            user=user
         )
-        
-        logger.info(f"Received {quantity} units of {self.product.sku} from PO {self.purchase_order.po_number}")
+        self.refresh_from_db(fields=['quantity_received', 'actual_delivery_date'])
 
 class ReorderAlert(models.Model):
     """
@@ -2047,6 +2344,220 @@ class ReorderAlert(models.Model):
             self.status = 'ordered'
         self.save()
 
+class DuplicateCluster(models.Model):
+    """
+    Group of products the duplicate detector believes describe the same item.
+    
+    Clusters are rebuilt from open DuplicateCandidate pairs after every scan
+    (see inventory.duplicates).
+    """
+    product_count = models.PositiveIntegerField(default=0)
+    best_score = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-best_score', '-product_count']
+    
+    def __str__(self):
+        return f"Duplicate cluster #{self.pk} ({self.product_count} products, {self.best_score:.0%})"
+
+class DuplicateCandidate(models.Model):
+    """Scored pair of possibly duplicate products"""
+    
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('dismissed', 'Not a Duplicate'),
+    )
+    
+    product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='duplicate_candidates')
+    product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    cluster = models.ForeignKey(
+        DuplicateCluster, on_delete=models.SET_NULL, null=True, blank=True, related_name='candidates'
+    )
+    score = models.FloatField()
+    reasons = models.JSONField(default=list, blank=True, help_text="Signals that matched: same_mpn, similar_name, ...")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['product_a', 'product_b']
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['status', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_a_id} ~ {self.product_b_id} ({self.score:.0%})"
+    
+    def dismiss(self, user):
+        """Mark the pair as reviewed and not a duplicate"""
+        self.status = 'dismissed'
+        self.cluster = None
+        self.reviewed_by = user
+        self.reviewed_at = timezone.now()
+        self.save()
+
+class ImportSession(models.Model):
+    """
+    One run of a file import, with a checkpoint for resuming.
+    
+    last_committed_row is the last file row of the unbroken run of committed
+    batches; --resume continues after it (see inventory.importing.ImportTracker).
+    Sessions that completed with errors can be resumed too.
+    """
+    
+    KIND_CHOICES = (
+        ('products', 'Product Import'),
+        ('stock_levels', 'Stock Level Import'),
+    )
+    
+    STATUS_CHOICES = (
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_name = models.CharField(max_length=255)
+    file_hash = models.CharField(max_length=64, help_text="SHA-256 of the file contents")
+    signature = models.CharField(max_length=64, help_text="Digest of the options that change how rows apply")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    
+    last_committed_row = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    rows_unchanged = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['kind', 'file_hash', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.file_name} ({self.status})"
+
+class ImportRowFingerprint(models.Model):
+    """Content hash of the last row applied for each import key (SKU, SKU + location)"""
+    kind = models.CharField(max_length=20, choices=ImportSession.KIND_CHOICES)
+    key = models.CharField(max_length=200)
+    fingerprint = models.CharField(max_length=40)
+    session = models.ForeignKey(ImportSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['kind', 'key']
+    
+    def __str__(self):
+        return f"{self.kind}:{self.key}"
+
+class SyncChange(models.Model):
+    """
+    Change log for mobile delta sync.
+    
+    The primary key is the change sequence number: devices keep the highest
+    one they have applied as their cursor and ask for everything after it
+    (see inventory.sync.ChangeFeed). Deletes are recorded as tombstones.
+    """
+    
+    ENTITY_CHOICES = (
+        ('product', 'Product'),
+        ('stock_level', 'Stock Level'),
+        ('category', 'Category'),
+        ('brand', 'Brand'),
+        ('supplier', 'Supplier'),
+        ('location', 'Location'),
+        ('reset', 'Reset'),
+    )
+    
+    ACTION_CHOICES = (
+        ('upsert', 'Created/Updated'),
+        ('delete', 'Deleted'),
+    )
+    
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='upsert')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.entity}:{self.object_id}"
+
+class MobileOperation(models.Model):
+    """
+    Idempotency key of an operation applied from a mobile batch upload.
+    
+    Devices generate a key per queued operation and resend it on every
+    retry; a key found here is answered with the stored result instead of
+    being applied again (see inventory.mobile.MobileBatch).
+    """
+    
+    OPERATION_TYPES = (
+        ('count', 'Stock Count'),
+        ('adjust', 'Stock Adjustment'),
+    )
+    
+    key = models.CharField(max_length=64, unique=True)
+    operation_type = models.CharField(max_length=20, choices=OPERATION_TYPES)
+    movement = models.ForeignKey(
+        StockMovement,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Movement posted by the operation (none when a count matched the stock)"
+    )
+    result = models.JSONField(default=dict)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_operation_type_display()} {self.key}"
+
+
+class TaskState(models.Model):
+    """
+    Run state of a scheduled inventory task, shared by every process.
+
+    Holds the task's lock (token and expiry), when it last ran (what the
+    local scheduler checks to see whether it is due), the day it last
+    completed, for once-a-day tasks, and a run requested outside the
+    schedule (e.g. a manual rate refresh) with its arguments. Kept in the
+    database rather than the cache so cron runs, web processes and workers
+    see the same state (see inventory.tasks).
+    """
+
+    name = models.CharField(max_length=200, unique=True)
+    lock_token = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_run = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, blank=True)
+    completed_on = models.DateField(null=True, blank=True)
+    requested_at = models.DateTimeField(null=True, blank=True)
+    requested_kwargs = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
 @receiver(post_save, sender=Product)
 def update_stock_levels_on_product_save(sender, instance, **kwargs):
     """Ensure stock levels exist for all active locations"""
@@ -2081,36 +2592,5 @@ def update_product_stock_on_movement(sender, instance, created, **kwargs):
             stock_level.quantity += abs(instance.quantity)
             stock_level.save()
 
-@receiver(post_save, sender=Product)
-def check_reorder_level(sender, instance, **kwargs):
-    """Check if product needs reordering and create alert if necessary"""
-    if instance.needs_reorder and instance.is_active:
-        # Check if there's already an active alert
-        existing_alert = ReorderAlert.objects.filter(
-            product=instance,
-            status__in=['active', 'acknowledged']
-        ).first()
-        
-        if not existing_alert:
-            # Determine priority based on stock situation
-            stock_ratio = instance.available_stock / max(instance.reorder_level, 1)
-            if stock_ratio <= 0:
-                priority = 'critical'
-            elif stock_ratio <= 0.5:
-                priority = 'high'
-            elif stock_ratio <= 0.8:
-                priority = 'medium'
-            else:
-                priority = 'low'
-            
-            ReorderAlert.objects.create(
-                product=instance,
-                priority=priority,
-                current_stock=instance.current_stock,
-                reorder_level=instance.reorder_level,
-                suggested_order_quantity=instance.reorder_quantity,
-                suggested_supplier=instance.supplier,
-                estimated_cost=instance.reorder_quantity * instance.cost_price
-            )
-            
-            logger.info(f"Reorder alert created for {instance.sku} - {priority} priority")
+# Reorder alerts are raised in sets by inventory.reorder.ReorderAlertEvaluator,
+# after batches of movements and on a schedule, not on every product save
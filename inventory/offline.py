@@ -0,0 +1,195 @@
+# inventory/offline.py - Offline Catalog Snapshot for Mobile Devices
+
+"""
+Prebuilt offline catalog that devices download to bootstrap.
+
+A freshly installed device (or one whose sync cursor has expired) needs the
+whole active catalog before it can delta sync. Building that per request
+would put a full catalog scan on the database for every device, so the
+snapshot is built once and shared through the cache backend:
+
+- tables (products, stock levels per location, categories, brands,
+  suppliers, locations) are serialized column names once plus one JSON
+  array per row
+- the body is stored pre-compressed as Brotli and gzip next to the plain
+  JSON, and the response picks one from Accept-Encoding
+- the ETag is a digest of the body, kept under its own cache key, so
+  devices revalidate with If-None-Match and get a 304 without any database
+  work or fetching the body from the cache
+- the body carries the sync cursor it was built at; the device continues
+  with inventory.sync.ChangeFeed from there
+
+refresh() rebuilds the snapshot when the change sequence has advanced and
+is meant to run in the background (see the refresh_offline_catalog
+command). A request that finds no snapshot builds it once, guarded by a
+cache lock so a cold start does not stampede the database.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+CATALOG_CACHE_KEY = 'inventory:offline_catalog'
+ETAG_CACHE_KEY = 'inventory:offline_catalog_etag'
+BUILD_LOCK_KEY = 'inventory:offline_catalog_lock'
+BUILD_LOCK_SECONDS = 300
+
+# Table name -> (model label, filter, fields)
+CATALOG_TABLES = {
+    'products': ('inventory.Product', {'is_active': True}, (
+        'id', 'sku', 'name', 'barcode', 'qr_code', 'category_id', 'brand_id', 'supplier_id',
+        'selling_price', 'current_stock', 'available_stock', 'reorder_level', 'is_active', 'updated_at',
+    )),
+    'stock_levels': ('inventory.StockLevel', {'product__is_active': True}, (
+        'id', 'product_id', 'location_id', 'quantity', 'reserved_quantity',
+    )),
+    'categories': ('inventory.Category', {'is_active': True}, ('id', 'name', 'parent_id', 'is_active')),
+    'brands': ('inventory.Brand', {'is_active': True}, ('id', 'name', 'is_active')),
+    'suppliers': ('inventory.Supplier', {'is_active': True}, ('id', 'name', 'supplier_code', 'is_active')),
+    'locations': ('inventory.Location', {'is_active': True}, ('id', 'name', 'location_code', 'is_active')),
+}
+
+
+class OfflineCatalog:
+    """
+    Shared, pre-compressed offline catalog snapshot
+    """
+
+    @staticmethod
+    def build():
+        """
+        Serialize the active catalog.
+
+        The cursor is read before the tables, so every change up to it is
+        included; changes after it may be too, which the device's next delta
+        sync re-applies harmlessly.
+
+        Returns:
+            Snapshot dict with etag, cursor, generated_at, row counts and the
+            'identity', 'gzip' and 'br' encoded bodies
+        """
+        from django.apps import apps
+        from .sync import ChangeFeed
+
+        cursor = ChangeFeed.head()
+        tables = {}
+        counts = {}
+        for name, (label, filters, fields) in CATALOG_TABLES.items():
+            rows = apps.get_model(label).objects.filter(**filters).order_by('id').values_list(*fields)
+            tables[name] = {'columns': list(fields), 'rows': list(rows.iterator(chunk_size=5000))}
+            counts[name] = len(tables[name]['rows'])
+
+        body = json.dumps(
+            {'format': FORMAT_VERSION, 'cursor': cursor, 'tables': tables},
+            cls=DjangoJSONEncoder, separators=(',', ':')
+        ).encode('utf-8')
+
+        snapshot = {
+            'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            'cursor': cursor,
+            'generated_at': timezone.now().isoformat(),
+            'counts': counts,
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=6),
+        }
+        if brotli:
+            snapshot['br'] = brotli.compress(body, quality=9)
+        return snapshot
+
+    @classmethod
+    def store(cls):
+        """Build and publish a new snapshot; returns it"""
+        snapshot = cls.build()
+        cache.set(CATALOG_CACHE_KEY, snapshot, None)
+        cache.set(ETAG_CACHE_KEY, snapshot['etag'], None)
+        logger.info(
+            f"Offline catalog built at cursor {snapshot['cursor']}: {snapshot['counts']}, "
+            f"{len(snapshot['identity'])} bytes ({len(snapshot.get('br') or snapshot['gzip'])} compressed)"
+        )
+        return snapshot
+
+    @classmethod
+    def get(cls):
+        """
+        The current snapshot, building it if none exists yet.
+
+        Returns None while another process holds the build lock.
+        """
+        snapshot = cache.get(CATALOG_CACHE_KEY)
+        if snapshot is not None:
+            return snapshot
+
+        if not cache.add(BUILD_LOCK_KEY, True, BUILD_LOCK_SECONDS):
+            return None
+        try:
+            return cls.store()
+        finally:
+            cache.delete(BUILD_LOCK_KEY)
+
+    @staticmethod
+    def etag():
+        """ETag of the current snapshot without loading its body (None if unknown)"""
+        return cache.get(ETAG_CACHE_KEY)
+
+    @classmethod
+    def refresh(cls, force=False):
+        """
+        Rebuild when the change sequence has moved past the snapshot.
+
+        Returns:
+            True if a new snapshot was published
+        """
+        from .sync import ChangeFeed
+
+        snapshot = cache.get(CATALOG_CACHE_KEY)
+        if not force and snapshot is not None and snapshot['cursor'] >= ChangeFeed.head():
+            return False
+
+        if not cache.add(BUILD_LOCK_KEY, True, BUILD_LOCK_SECONDS):
+            return False
+        try:
+            cls.store()
+        finally:
+            cache.delete(BUILD_LOCK_KEY)
+        return True
+
+    @staticmethod
+    def choose_encoding(snapshot, accept_encoding):
+        """Best stored encoding the client accepts: 'br', 'gzip' or 'identity'"""
+        accepted = set()
+        for part in (accept_encoding or '').split(','):
+            coding, _, params = part.partition(';')
+            params = params.replace(' ', '')
+            if params.startswith('q='):
+                try:
+                    if float(params[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(coding.strip().lower())
+
+        if 'br' in accepted and 'br' in snapshot:
+            return 'br'
+        if 'gzip' in accepted or '*' in accepted:
+            return 'gzip'
+        return 'identity'
+
+    @classmethod
+    def payload(cls):
+        """Decoded snapshot body (for in-process callers)"""
+        snapshot = cls.get() or cls.build()
+        return json.loads(snapshot['identity'])
@@ -0,0 +1,349 @@
+# inventory/parametric.py - Parametric Component Search
+
+"""
+Parametric search over Product.dynamic_attributes.
+
+Component specifications (resistance, voltage, tolerance, package...) live in
+the free-form dynamic_attributes JSON. To search them efficiently each value is
+copied into the typed ProductAttributeValue side table:
+
+- value_normalized: lower-cased text, used for exact matches and facets
+- value_numeric/unit: the value parsed to an SI base number ("10kΩ" ->
+  10000.0 'Ω', "100nF" -> 1e-07 'F', "4k7" -> 4700.0 ''), used for range
+  queries and unit-aware matching
+
+A query such as "0805 10kΩ ±1%" becomes one EXISTS clause per term, so every
+term must match some attribute of the product. Facet counts for the current
+result set come from a single grouped query over the side table.
+"""
+
+import logging
+import re
+
+from django.db.models import Count, Exists, Min, OuterRef, Q
+
+logger = logging.getLogger(__name__)
+
+SI_PREFIXES = {
+    'p': 1e-12,
+    'n': 1e-9,
+    'u': 1e-6,
+    'µ': 1e-6,
+    'μ': 1e-6,
+    'm': 1e-3,
+    'k': 1e3,
+    'K': 1e3,
+    'M': 1e6,
+    'G': 1e9,
+}
+
+# Unit spellings mapped to the stored symbol
+UNIT_ALIASES = {
+    'Ω': 'Ω',
+    'ω': 'Ω',
+    'ohm': 'Ω',
+    'ohms': 'Ω',
+    'r': 'Ω',
+    'v': 'V',
+    'a': 'A',
+    'f': 'F',
+    'h': 'H',
+    'hz': 'Hz',
+    'w': 'W',
+    '%': '%',
+    '°c': '°C',
+}
+
+_PREFIX_CHARS = ''.join(SI_PREFIXES)
+_UNIT_PATTERN = r'Ω|ω|ohms?|[Hh]z|°[Cc]|[VvAaFfHhWwRr%]'
+
+QUANTITY_PATTERN = re.compile(
+    rf'^(?:±|\+/-|\+-)?\s*(?P<number>\d+(?:\.\d+)?)\s*'
+    rf'(?P<prefix>[{_PREFIX_CHARS}])?\s*(?P<unit>{_UNIT_PATTERN})?$'
+)
+
+# RKM notation used on resistors and capacitors: 4k7, 4R7, 2n2
+RKM_PATTERN = re.compile(
+    rf'^(?P<whole>\d+)(?P<prefix>[{_PREFIX_CHARS}Rr])(?P<fraction>\d+)\s*(?P<unit>{_UNIT_PATTERN})?$'
+)
+
+UNIT_ONLY_PATTERN = re.compile(rf'^[{_PREFIX_CHARS}]?(?:{_UNIT_PATTERN})$')
+
+# Relative tolerance for matching parsed floats
+NUMERIC_TOLERANCE = 1e-9
+
+
+def normalize_text(value):
+    """Lower-cased, whitespace-collapsed attribute value"""
+    return ' '.join(str(value).split()).lower()
+
+
+def parse_quantity(value):
+    """
+    Parse an attribute value with an optional SI prefix and unit.
+
+    Args:
+        value: Text such as '10kΩ', '100 nF', '±5%', '4k7', '3.3V'
+
+    Returns:
+        (number, unit, has_magnitude) or None if the value is not a quantity.
+        has_magnitude is True when a prefix or unit was present.
+    """
+    text = str(value).strip()
+    if not text:
+        return None
+
+    match = QUANTITY_PATTERN.match(text)
+    if match:
+        number = float(match.group('number'))
+        prefix = match.group('prefix')
+        unit = match.group('unit')
+        if prefix:
+            number *= SI_PREFIXES[prefix]
+        return number, _canonical_unit(unit), bool(prefix or unit)
+
+    match = RKM_PATTERN.match(text)
+    if match:
+        number = float(f"{match.group('whole')}.{match.group('fraction')}")
+        prefix = match.group('prefix')
+        unit = _canonical_unit(match.group('unit'))
+        if prefix in ('R', 'r'):
+            unit = unit or 'Ω'
+        else:
+            number *= SI_PREFIXES[prefix]
+        return number, unit, True
+
+    return None
+
+
+def _canonical_unit(unit):
+    if not unit:
+        return ''
+    return UNIT_ALIASES.get(unit.lower(), UNIT_ALIASES.get(unit, unit))
+
+
+def _numeric_q(number, unit=None, prefix='value_numeric'):
+    margin = abs(number) * NUMERIC_TOLERANCE
+    condition = Q(**{
+        f'{prefix}__gte': number - margin,
+        f'{prefix}__lte': number + margin,
+    })
+    if unit:
+        # Values stored without a unit ('10k' on a resistor) still match '10kΩ'
+        condition &= Q(unit=unit) | Q(unit='')
+    return condition
+
+
+# =====================================
+# INDEXING
+# =====================================
+
+def attribute_rows(product):
+    """Build unsaved ProductAttributeValue rows for one product"""
+    from .models import ProductAttributeValue
+
+    rows = []
+    for name, raw_value in (product.dynamic_attributes or {}).items():
+        if raw_value is None or raw_value == '' or not str(name).strip():
+            continue
+        if isinstance(raw_value, (list, tuple)):
+            raw_value = ', '.join(str(item) for item in raw_value)
+
+        value_text = str(raw_value)[:200]
+        parsed = parse_quantity(value_text)
+        rows.append(ProductAttributeValue(
+            product_id=product.pk,
+            name=str(name).strip()[:100],
+            value_text=value_text,
+            value_normalized=normalize_text(value_text)[:200],
+            value_numeric=parsed[0] if parsed else None,
+            unit=parsed[1] if parsed else '',
+        ))
+    return rows
+
+
+def index_products(products):
+    """
+    Replace the side-table rows for the given products.
+
+    One DELETE and one bulk INSERT regardless of how many products are passed.
+
+    Args:
+        products: Iterable of Product instances
+
+    Returns:
+        Number of attribute rows written
+    """
+    from .models import ProductAttributeValue
+
+    products = [product for product in products if product.pk]
+    if not products:
+        return 0
+
+    rows = []
+    for product in products:
+        rows.extend(attribute_rows(product))
+
+    ProductAttributeValue.objects.filter(product_id__in=[product.pk for product in products]).delete()
+    ProductAttributeValue.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild_attribute_index(batch_size=1000):
+    """Re-index every product's attributes in batches"""
+    from .models import Product
+
+    written = 0
+    batch = []
+    for product in Product.objects.only('id', 'dynamic_attributes').iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            written += index_products(batch)
+            batch = []
+    written += index_products(batch)
+
+    logger.info(f"Parametric attribute index rebuilt: {written} values")
+    return written
+
+
+# =====================================
+# SEARCH AND FACETS
+# =====================================
+
+class ParametricSearch:
+    """
+    Parametric filtering and facet counts over ProductAttributeValue
+    """
+
+    @staticmethod
+    def parse_query(query):
+        """
+        Split a free-text parametric query into criteria.
+
+        Returns:
+            List of ('numeric', number, unit) or ('text', normalized) tuples
+        """
+        tokens = (query or '').split()
+        criteria = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            # Re-join "10 kΩ" style input split on the space
+            if index + 1 < len(tokens) and re.fullmatch(r'\d+(?:\.\d+)?', token) \
+                    and UNIT_ONLY_PATTERN.match(tokens[index + 1]):
+                token = token + tokens[index + 1]
+                index += 1
+            index += 1
+
+            parsed = parse_quantity(token)
+            if parsed and parsed[2]:
+                criteria.append(('numeric', parsed[0], parsed[1]))
+            else:
+                criteria.append(('text', normalize_text(token)))
+        return criteria
+
+    @staticmethod
+    def _exists(condition):
+        from .models import ProductAttributeValue
+
+        return Exists(ProductAttributeValue.objects.filter(condition, product_id=OuterRef('pk')))
+
+    @classmethod
+    def search(cls, query, queryset=None):
+        """
+        Products matching every term of a parametric query.
+
+        Args:
+            query: e.g. '0805 10kΩ ±1%'
+            queryset: Optional base product queryset
+        """
+        from .models import Product
+
+        if queryset is None:
+            queryset = Product.objects.filter(is_active=True)
+
+        for kind, *values in cls.parse_query(query):
+            if kind == 'numeric':
+                number, unit = values
+                condition = _numeric_q(number, unit)
+            else:
+                condition = Q(value_normalized=values[0])
+            queryset = queryset.filter(cls._exists(condition))
+        return queryset
+
+    @classmethod
+    def apply_filters(cls, queryset, filters):
+        """
+        Apply per-attribute filters.
+
+        Args:
+            queryset: Product queryset
+            filters: {attribute name: value | [values] | {'min': x, 'max': y}}
+                     Values may carry units ('10k', '50V'); lists are OR-ed.
+        """
+        for name, spec in (filters or {}).items():
+            condition = Q(name=name)
+
+            if isinstance(spec, dict):
+                for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+                    if spec.get(bound) in (None, ''):
+                        continue
+                    parsed = parse_quantity(spec[bound])
+                    if not parsed:
+                        raise ValueError(f"Invalid {bound} value for {name}: {spec[bound]}")
+                    condition &= Q(**{f'value_numeric__{lookup}': parsed[0]})
+            else:
+                values = spec if isinstance(spec, (list, tuple)) else [spec]
+                value_condition = Q()
+                for value in values:
+                    value_condition |= Q(value_normalized=normalize_text(value))
+                    parsed = parse_quantity(value)
+                    if parsed and parsed[2]:
+                        value_condition |= _numeric_q(parsed[0], parsed[1])
+                condition &= value_condition
+
+            queryset = queryset.filter(cls._exists(condition))
+        return queryset
+
+    @staticmethod
+    def facet_counts(queryset, attribute_names=None, max_values=50):
+        """
+        Count products per attribute value for the current result set.
+
+        One grouped query over the side table.
+
+        Args:
+            queryset: Filtered product queryset
+            attribute_names: Optional list restricting which attributes to facet
+            max_values: Maximum values returned per attribute
+
+        Returns:
+            {attribute name: [{'value', 'count', 'numeric', 'unit'}, ...]}
+            ordered numerically where possible
+        """
+        from .models import ProductAttributeValue
+
+        rows = ProductAttributeValue.objects.filter(
+            product_id__in=queryset.order_by().values('pk')
+        )
+        if attribute_names:
+            rows = rows.filter(name__in=attribute_names)
+
+        rows = rows.values('name', 'value_normalized').annotate(
+            display=Min('value_text'),
+            numeric=Min('value_numeric'),
+            unit=Min('unit'),
+            count=Count('product_id', distinct=True),
+        ).order_by('name', 'numeric', 'value_normalized')
+
+        facets = {}
+        for row in rows:
+            values = facets.setdefault(row['name'], [])
+            if len(values) < max_values:
+                values.append({
+                    'value': row['display'],
+                    'count': row['count'],
+                    'numeric': row['numeric'],
+                    'unit': row['unit'],
+                })
+        return facets
@@ -0,0 +1,272 @@
+# inventory/posting.py - Bulk Stock Movement Posting
+
+"""
+Set-based stock movement posting.
+
+Creating movements one at a time runs the StockMovement post_save receivers
+for every row: a get_or_create and save per stock level, a re-aggregation of
+the product total, a reorder check and one or more product saves. StockPoster
+posts a whole batch of movements in a fixed number of queries instead:
+
+- the products and stock levels involved are locked up front with
+  select_for_update (missing stock levels are created in one insert)
+- lines are applied in order against in-memory quantities, so previous and
+  new stock chain correctly when a batch touches the same row twice
+- movements are inserted with one bulk_create, and stock levels and product
+  totals are written with one bulk_update each
+- the receivers' side effects (sales/restock metrics, reorder alerts, the
+  sync change log, cache invalidation and manager notifications) are applied
+  once for the batch
+
+bulk_create does not send post_save, so the per-row receivers never see
+these movements.
+
+A line changes one stock level (location_id) or, without a location, the
+product total; its previous_stock/new_stock record the quantities of what it
+changed. Lines that would take stock below zero are refused.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Movements at least this large (units or value) are reported to managers
+SIGNIFICANT_QUANTITY = 100
+SIGNIFICANT_VALUE = Decimal('1000')
+
+PRODUCT_UPDATE_FIELDS = (
+    'total_stock', 'current_stock', 'available_stock', 'total_sold', 'total_revenue',
+    'last_sold_date', 'last_restocked_date', 'updated_at',
+)
+LEVEL_UPDATE_FIELDS = ('quantity', 'last_counted', 'last_movement')
+
+
+class StockPostingError(Exception):
+    """Lines that could not be posted; errors maps line index to message"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'Line {index + 1}: {message}' for index, message in sorted(errors.items())))
+
+
+class StockPoster:
+    """
+    Posts batches of stock movements with aggregate side effects
+    """
+
+    @classmethod
+    def post(cls, lines, user=None, partial=False, check_reorders=True):
+        """
+        Apply stock movement lines in one transaction.
+
+        Args:
+            lines: Dicts with product_id, movement_type and either quantity
+                (signed change) or counted (quantity found by a count), plus
+                optional location_id, reference, notes and unit_cost
+            user: Recorded as created_by
+            partial: Post the valid lines and report the others instead of
+                raising StockPostingError
+            check_reorders: Evaluate reorder alerts for the products posted
+                (off when the stock is only in transit)
+
+        Returns:
+            (movements, errors): movements is aligned with lines and holds
+            the created StockMovement, or None where a line changed nothing
+            or was refused; errors maps line index to message
+        """
+        from .models import Product, StockMovement
+
+        now = timezone.now()
+        movements = [None] * len(lines)
+        errors = {}
+
+        with transaction.atomic():
+            products = Product.objects.select_for_update().order_by('pk').in_bulk(
+                sorted({line['product_id'] for line in lines})
+            )
+            levels = cls._lock_levels({
+                (line['product_id'], line['location_id']) for line in lines if line.get('location_id')
+            })
+
+            touched_products, touched_levels = {}, {}
+            for index, line in enumerate(lines):
+                try:
+                    movements[index] = cls._apply(line, products, levels, touched_products, touched_levels, user, now)
+                except ValueError as e:
+                    errors[index] = str(e)
+
+            if errors and not partial:
+                raise StockPostingError(errors)
+
+            created = [movement for movement in movements if movement is not None]
+            StockMovement.objects.bulk_create(created, batch_size=1000)
+            cls._write(touched_products, touched_levels)
+
+        cls._apply_side_effects(list(touched_products.values()), list(touched_levels), created, user, check_reorders)
+        return movements, errors
+
+    @staticmethod
+    def _lock_levels(pairs):
+        """Lock the (product_id, location_id) stock levels, creating missing ones"""
+        from .models import StockLevel
+
+        if not pairs:
+            return {}
+
+        def locked():
+            rows = StockLevel.objects.select_for_update().filter(
+                product_id__in={product_id for product_id, _ in pairs},
+                location_id__in={location_id for _, location_id in pairs},
+            ).order_by('pk')
+            return {(row.product_id, row.location_id): row for row in rows if (row.product_id, row.location_id) in pairs}
+
+        levels = locked()
+        missing = pairs - set(levels)
+        if missing:
+            StockLevel.objects.bulk_create(
+                [StockLevel(product_id=product_id, location_id=location_id, quantity=0) for product_id, location_id in missing],
+                ignore_conflicts=True
+            )
+            levels = locked()
+        return levels
+
+    @staticmethod
+    def _apply(line, products, levels, touched_products, touched_levels, user, now):
+        """Apply one line to the in-memory rows; returns the unsaved movement or None"""
+        from .models import StockMovement
+
+        product = products.get(line['product_id'])
+        if product is None:
+            raise ValueError(f"Product {line['product_id']} not found")
+
+        location_id = line.get('location_id')
+        level = levels[(product.pk, location_id)] if location_id else None
+        current = level.quantity if level else product.total_stock
+
+        if line.get('counted') is not None:
+            change = int(line['counted']) - current
+        else:
+            change = int(line['quantity'])
+
+        new = current + change
+        if new < 0:
+            where = ' at this location' if level else ''
+            raise ValueError(f'Insufficient stock for {product.sku}: {current} on hand{where}, change {change}')
+
+        if level:
+            if line.get('counted') is not None:
+                level.last_counted = now
+                touched_levels[level.pk] = level
+            if change:
+                level.quantity = new
+                level.last_movement = now
+                touched_levels[level.pk] = level
+
+        if not change:
+            return None
+
+        movement_type = line['movement_type']
+        unit_cost = line.get('unit_cost')
+
+        product.total_stock = (product.total_stock or 0) + change
+        product.current_stock = product.total_stock
+        product.available_stock = max(0, product.total_stock - (product.reserved_stock or 0))
+        if movement_type == 'sale' and change < 0:
+            product.total_sold += -change
+            product.last_sold_date = now
+            if unit_cost:
+                product.total_revenue += -change * unit_cost
+        elif movement_type in ('purchase', 'in') and change > 0:
+            product.last_restocked_date = now
+        product.updated_at = now
+        touched_products[product.pk] = product
+
+        return StockMovement(
+            product_id=product.pk,
+            movement_type=movement_type,
+            quantity=change,
+            from_location_id=location_id if change < 0 else None,
+            to_location_id=location_id if change > 0 else None,
+            previous_stock=current,
+            new_stock=new,
+            reference=(line.get('reference') or '')[:100],
+            notes=line.get('notes') or '',
+            unit_cost=unit_cost,
+            total_cost=abs(change) * unit_cost if unit_cost else None,
+            created_by=user,
+        )
+
+    @staticmethod
+    def _write(touched_products, touched_levels):
+        from .models import Product, StockLevel
+
+        if touched_levels:
+            StockLevel.objects.bulk_update(list(touched_levels.values()), LEVEL_UPDATE_FIELDS, batch_size=1000)
+        if touched_products:
+            Product.objects.bulk_update(list(touched_products.values()), PRODUCT_UPDATE_FIELDS, batch_size=1000)
+
+    @classmethod
+    def _apply_side_effects(cls, products, level_ids, movements, user, check_reorders=True):
+        """What the StockMovement and Product post_save receivers do, once per batch"""
+        from .listing import invalidate_facets
+        from .models import Category
+        from .reorder import ReorderAlertEvaluator
+        from .scanning import ProductCardCache
+        from .sync import record_changes
+
+        if products and check_reorders:
+            ReorderAlertEvaluator.evaluate([product.pk for product in products])
+        if products:
+            record_changes('product', [product.pk for product in products])
+        record_changes('stock_level', level_ids)
+
+        product_ids = [product.pk for product in products]
+
+        def invalidate_caches():
+            invalidate_facets()
+            Category.invalidate_rollups()
+            for product_id in product_ids:
+                ProductCardCache.invalidate(product_id)
+
+        if product_ids or level_ids:
+            transaction.on_commit(invalidate_caches)
+
+        significant = [
+            movement for movement in movements
+            if abs(movement.quantity) >= SIGNIFICANT_QUANTITY or (movement.total_cost or 0) >= SIGNIFICANT_VALUE
+        ]
+        if significant:
+            transaction.on_commit(lambda: cls._notify_significant(significant, user))
+
+    @staticmethod
+    def _notify_significant(movements, user):
+        """One summary notification to managers instead of one per movement"""
+        try:
+            from django.contrib.auth.models import User
+            from core.utils import create_bulk_notifications
+
+            managers = User.objects.filter(
+                profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
+                profile__is_active=True
+            )
+            if user:
+                managers = managers.exclude(id=user.id)
+
+            units = sum(abs(movement.quantity) for movement in movements)
+            create_bulk_notifications(
+                users=managers,
+                title="Significant Stock Movements",
+                message=(
+                    f"{len(movements)} significant stock movements ({units} units) posted by "
+                    f"{user.get_full_name() or user.username if user else 'System'}"
+                ),
+                notification_type="info",
+                action_url="/inventory/stock-movements/",
+                action_text="View History"
+            )
+        except Exception as e:
+            logger.error(f"Error sending significant movement notification: {str(e)}")
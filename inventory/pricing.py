@@ -0,0 +1,228 @@
+# inventory/pricing.py - Set-Based Repricing
+
+"""
+Bulk selling price changes as single SQL statements.
+
+Repricing product by product meant a save (and its post_save receivers) and
+a log line per row. Repricer expresses each rule as a database expression
+and applies it to the whole selection at once:
+
+- markup:  cost_price * (1 + value / 100)
+- percent: selling_price * (1 + value / 100)
+- fixed:   selling_price + value
+- set:     value
+
+Prices are rounded to cents and never go below MIN_PRICE. A rule runs as
+three statements however many products it touches: an aggregate for the
+summary, an INSERT ... SELECT of the price history (when
+ENABLE_PRICE_HISTORY is on) and the UPDATE, which also recomputes
+markup_percentage against total_cost_price_usd. Selling currencies are
+converted to USD with the in-process rate table (inventory.conversion), so
+no join is needed.
+
+queryset.update() sends no post_save, so the change log and caches are
+refreshed here once per batch.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, DateTimeField, DecimalField, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MIN_PRICE = Decimal('0.01')
+
+RULES = ('markup', 'percent', 'fixed', 'set')
+
+# Rule names used by older forms and utilities
+RULE_ALIASES = {
+    'percentage': 'percent',
+    'percentage_increase': 'percent',
+    'fixed_amount': 'fixed',
+    'fixed_increase': 'fixed',
+    'set_price': 'set',
+}
+
+PRICE = DecimalField(max_digits=15, decimal_places=2)
+RATIO = DecimalField(max_digits=20, decimal_places=6)
+
+
+class RepricingError(ValueError):
+    """The rule or its value cannot be applied"""
+
+
+def _history_enabled():
+    return getattr(settings, 'INVENTORY_SETTINGS', {}).get('ENABLE_PRICE_HISTORY', False)
+
+
+class Repricer:
+    """
+    Applies repricing rules to product selections
+    """
+
+    @staticmethod
+    def normalize_rule(rule):
+        rule = RULE_ALIASES.get(rule, rule)
+        if rule not in RULES:
+            raise RepricingError(f'Unknown repricing rule {rule!r}')
+        return rule
+
+    @staticmethod
+    def price_expression(rule, value):
+        """New selling price of a rule as a database expression"""
+        # The multiplier is computed here: SQLite would divide whole numbers as integers
+        multiplier = Value(1 + value / 100, output_field=RATIO)
+        if rule == 'markup':
+            price = F('cost_price') * multiplier
+        elif rule == 'percent':
+            price = F('selling_price') * multiplier
+        elif rule == 'fixed':
+            price = F('selling_price') + Value(value, output_field=RATIO)
+        else:
+            price = Value(value, output_field=RATIO)
+        return Greatest(Round(price, 2, output_field=PRICE), Value(MIN_PRICE, output_field=PRICE), output_field=PRICE)
+
+    @staticmethod
+    def markup_expression(price):
+        """markup_percentage for a new price, as Product.calculate_all_costs computes it"""
+        from .conversion import rate_table
+
+        table = rate_table()
+        usd_rate = Case(
+            *[
+                When(selling_currency_id=currency_id, then=Value(table.rates[code], output_field=RATIO))
+                for currency_id, code in table.codes_by_id.items()
+            ],
+            default=Value(Decimal('1'), output_field=RATIO),
+            output_field=RATIO,
+        )
+        return Case(
+            When(
+                total_cost_price_usd__gt=0,
+                # A float factor first keeps the division fractional on every backend
+                then=(price * usd_rate - F('total_cost_price_usd')) * Value(100.0, output_field=FloatField()) / F('total_cost_price_usd'),
+            ),
+            default=F('markup_percentage'),
+            output_field=DecimalField(max_digits=8, decimal_places=3),
+        )
+
+    @classmethod
+    def apply(cls, products, rule, value, user=None):
+        """
+        Reprice every product in a queryset.
+
+        Args:
+            products: Product queryset (or ids)
+            rule: 'markup', 'percent', 'fixed' or 'set' (older names accepted)
+            value: Percentage, amount or price for the rule
+            user: Recorded in the price history
+
+        Returns:
+            Summary dict: rule, value, matched and changed counts, the sum of
+            selling prices before and after, and history rows written
+        """
+        from .models import Product
+
+        rule = cls.normalize_rule(rule)
+        try:
+            value = Decimal(str(value))
+        except Exception:
+            raise RepricingError(f'Invalid value {value!r}')
+        if rule == 'set' and value < MIN_PRICE:
+            raise RepricingError(f'Price must be at least {MIN_PRICE}')
+
+        if not hasattr(products, 'model'):
+            products = Product.objects.filter(pk__in=list(products))
+        # Plain selection; ordering and select_related would only get in the way of the UPDATE
+        products = Product.objects.filter(pk__in=products.values('pk'))
+
+        now = timezone.now()
+        price = cls.price_expression(rule, value)
+
+        with transaction.atomic():
+            summary = products.annotate(new_price=price).aggregate(
+                matched=Count('pk'),
+                changed=Count('pk', filter=~Q(selling_price=F('new_price'))),
+                total_before=Sum('selling_price'),
+                total_after=Sum('new_price'),
+            )
+
+            history_rows = 0
+            if summary['changed'] and _history_enabled():
+                history_rows = cls._insert_history(products, price, rule, value, user, now)
+
+            if summary['changed']:
+                products.update(
+                    selling_price=price,
+                    markup_percentage=cls.markup_expression(price),
+                    updated_at=now,
+                )
+                cls._after_update(products)
+
+        result = {
+            'rule': rule,
+            'value': value,
+            'matched': summary['matched'],
+            'changed': summary['changed'],
+            'unchanged': summary['matched'] - summary['changed'],
+            'total_before': (summary['total_before'] or Decimal('0')).quantize(MIN_PRICE),
+            'total_after': (summary['total_after'] or Decimal('0')).quantize(MIN_PRICE),
+            'history_rows': history_rows,
+        }
+        logger.info(
+            f"Repriced {result['changed']} of {result['matched']} products ({rule} {value}) "
+            f"by {user.username if user else 'System'}: "
+            f"{result['total_before']} -> {result['total_after']}"
+        )
+        return result
+
+    @staticmethod
+    def _insert_history(products, price, rule, value, user, now):
+        """INSERT ... SELECT one history row per changed product"""
+        from .models import PriceHistory
+
+        # Every selected column is an annotation, so the SELECT list keeps this order
+        source = products.annotate(
+            h_product=F('pk'),
+            h_old=F('selling_price'),
+            h_new=price,
+            h_rule=Value(rule),
+            h_value=Value(value, output_field=RATIO),
+            h_user=Value(user.pk if user else None, output_field=IntegerField()),
+            h_at=Value(now, output_field=DateTimeField()),
+        ).exclude(selling_price=F('h_new')).values_list(
+            'h_product', 'h_old', 'h_new', 'h_rule', 'h_value', 'h_user', 'h_at'
+        )
+        select_sql, params = source.query.sql_with_params()
+
+        table = PriceHistory._meta.db_table
+        columns = ['product_id', 'old_price', 'new_price', 'rule', 'rule_value', 'changed_by_id', 'changed_at']
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(table)} ({', '.join(quote(column) for column in columns)}) {select_sql}",
+                params
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _after_update(products):
+        """What the Product post_save receivers would do, once for the batch"""
+        from .listing import invalidate_facets
+        from .scanning import ProductCardCache
+        from .sync import record_changes
+
+        product_ids = list(products.values_list('pk', flat=True))
+        record_changes('product', product_ids)
+
+        def invalidate_caches():
+            invalidate_facets()
+            for product_id in product_ids:
+                ProductCardCache.invalidate(product_id)
+
+        transaction.on_commit(invalidate_caches)
@@ -0,0 +1,217 @@
+# inventory/purchasing.py - Purchase Orders from Reorder Alerts
+
+"""
+Draft purchase orders built from reorder alerts in bulk.
+
+Alerts are grouped by supplier (the alert's suggested supplier, else the
+product's), and each supplier gets one draft order:
+
+- orders and their lines are inserted with one bulk_create each
+- the alerts are marked 'ordered' and linked to their order with one UPDATE
+- order subtotals and totals are computed by the database from the lines
+- managers get one summary notification instead of one per order
+
+The builder works on any alert selection, so the same call serves the
+reorder screens, the admin action and scheduled auto-ordering through
+purchase_orders_from_alerts_api.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OPEN_ALERT_STATUSES = ('active', 'acknowledged')
+PRICE_PLACES = Decimal('0.01')
+
+
+class PurchaseOrderBuildError(Exception):
+    """The selection cannot be turned into purchase orders"""
+
+
+class PurchaseOrderBuilder:
+    """
+    Turns reorder alerts into per-supplier draft purchase orders
+    """
+
+    @classmethod
+    def build(cls, alerts, user=None, delivery_location=None):
+        """
+        Create draft purchase orders for a selection of alerts.
+
+        Only open alerts (active or acknowledged) without an order are used;
+        alerts with no supplier are skipped.
+
+        Args:
+            alerts: ReorderAlert queryset
+            user: Recorded as the orders' creator
+            delivery_location: Location (default: the default receiving location)
+
+        Returns:
+            Summary dict with the created purchase_orders, the alerts and
+            lines ordered and the ids of skipped alerts
+        """
+        from .models import Location, PurchaseOrder, PurchaseOrderItem, ReorderAlert, Supplier
+
+        location = delivery_location or (
+            Location.objects.filter(is_active=True).order_by('-is_default', 'name').first()
+        )
+        if location is None:
+            raise PurchaseOrderBuildError('No delivery location is configured')
+
+        with transaction.atomic():
+            rows = list(
+                alerts.select_for_update(of=('self',)).filter(
+                    status__in=OPEN_ALERT_STATUSES, purchase_order__isnull=True
+                ).order_by('pk').values(
+                    'pk', 'product_id', 'suggested_order_quantity', 'suggested_supplier_id',
+                    'product__supplier_id', 'product__cost_price', 'product__minimum_order_quantity',
+                )
+            )
+
+            groups, skipped = {}, []
+            for row in rows:
+                supplier_id = row['suggested_supplier_id'] or row['product__supplier_id']
+                if supplier_id is None:
+                    skipped.append(row['pk'])
+                    continue
+                lines = groups.setdefault(supplier_id, {})
+                quantity = max(row['suggested_order_quantity'] or 0, row['product__minimum_order_quantity'] or 1)
+                line = lines.setdefault(row['product_id'], {
+                    'quantity': 0,
+                    'unit_price': (row['product__cost_price'] or Decimal('0')).quantize(PRICE_PLACES),
+                    'alert_ids': [],
+                })
+                # Two alerts for one product order the larger suggestion once
+                line['quantity'] = max(line['quantity'], quantity)
+                line['alert_ids'].append(row['pk'])
+
+            if not groups:
+                return {'purchase_orders': [], 'alerts': 0, 'lines': 0, 'skipped': skipped}
+
+            suppliers = Supplier.objects.select_related('currency').in_bulk(list(groups))
+            today = timezone.now().date()
+            numbers = cls._po_numbers(today, len(groups))
+
+            orders = PurchaseOrder.objects.bulk_create([
+                PurchaseOrder(
+                    po_number=number,
+                    supplier_id=supplier_id,
+                    status='draft',
+                    expected_delivery_date=today + timedelta(days=suppliers[supplier_id].average_lead_time_days),
+                    currency=suppliers[supplier_id].currency.code,
+                    delivery_location=location,
+                    payment_terms=suppliers[supplier_id].payment_terms,
+                    notes='Generated from reorder alerts',
+                    created_by=user,
+                )
+                for number, supplier_id in zip(numbers, groups)
+            ])
+            order_by_supplier = {order.supplier_id: order for order in orders}
+
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(
+                    purchase_order=order_by_supplier[supplier_id],
+                    product_id=product_id,
+                    quantity_ordered=line['quantity'],
+                    unit_price=line['unit_price'],
+                    total_price=line['quantity'] * line['unit_price'],
+                )
+                for supplier_id, lines in groups.items()
+                for product_id, line in lines.items()
+            ], batch_size=1000)
+
+            alert_ids_by_order = {
+                order_by_supplier[supplier_id].pk: [
+                    alert_id for line in lines.values() for alert_id in line['alert_ids']
+                ]
+                for supplier_id, lines in groups.items()
+            }
+            ordered = ReorderAlert.objects.filter(
+                pk__in=[alert_id for alert_ids in alert_ids_by_order.values() for alert_id in alert_ids]
+            ).update(
+                status='ordered',
+                purchase_order_id=Case(
+                    *[When(pk__in=alert_ids, then=Value(order_id)) for order_id, alert_ids in alert_ids_by_order.items()],
+                    output_field=IntegerField(),
+                ),
+            )
+
+            cls._compute_totals([order.pk for order in orders])
+
+        line_count = sum(len(lines) for lines in groups.values())
+        logger.info(
+            f"Created {len(orders)} draft purchase orders ({line_count} lines) from {ordered} reorder alerts"
+            f"{f'; {len(skipped)} alerts without a supplier skipped' if skipped else ''}"
+        )
+        transaction.on_commit(lambda: cls._notify(orders, user))
+
+        return {
+            'purchase_orders': list(PurchaseOrder.objects.filter(pk__in=[order.pk for order in orders]).order_by('po_number')),
+            'alerts': ordered,
+            'lines': line_count,
+            'skipped': skipped,
+        }
+
+    @staticmethod
+    def _po_numbers(day, count):
+        """count free PO-YYYYMMDD-NNN numbers for a day"""
+        from .models import PurchaseOrder
+
+        prefix = f"PO-{day.strftime('%Y%m%d')}-"
+        taken = set(PurchaseOrder.objects.filter(po_number__startswith=prefix).values_list('po_number', flat=True))
+        numbers, sequence = [], 1
+        while len(numbers) < count:
+            number = f'{prefix}{sequence:03d}'
+            if number not in taken:
+                numbers.append(number)
+            sequence += 1
+        return numbers
+
+    @staticmethod
+    def _compute_totals(order_ids):
+        """Subtotal and total of each order from its lines, in one UPDATE"""
+        from .models import PurchaseOrder, PurchaseOrderItem
+
+        money = DecimalField(max_digits=12, decimal_places=2)
+        line_total = Subquery(
+            PurchaseOrderItem.objects.filter(purchase_order=OuterRef('pk')).values('purchase_order').annotate(
+                total=Sum('total_price')
+            ).values('total')[:1],
+            output_field=money,
+        )
+        PurchaseOrder.objects.filter(pk__in=order_ids).update(
+            subtotal=Coalesce(line_total, Value(Decimal('0.00')), output_field=money),
+            total_amount=Coalesce(line_total, Value(Decimal('0.00')), output_field=money) + F('tax_amount') + F('shipping_cost'),
+        )
+
+    @staticmethod
+    def _notify(orders, user):
+        """One summary notification to purchasing managers"""
+        try:
+            from django.contrib.auth.models import User
+            from core.utils import create_bulk_notifications
+
+            managers = User.objects.filter(
+                profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
+                profile__is_active=True
+            )
+            create_bulk_notifications(
+                users=managers,
+                title="Draft Purchase Orders Created",
+                message=(
+                    f"{len(orders)} draft purchase orders were generated from reorder alerts by "
+                    f"{user.get_full_name() or user.username if user else 'System'}"
+                ),
+                notification_type="info",
+                action_url="/inventory/purchase-orders/",
+                action_text="Review Orders"
+            )
+        except Exception as e:
+            logger.error(f"Error sending purchase order notification: {str(e)}")
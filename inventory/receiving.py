@@ -0,0 +1,178 @@
+# inventory/receiving.py - Purchase Order Receiving
+
+"""
+Goods-received notes posted against purchase orders in one pass.
+
+Receiving line by line saved each PurchaseOrderItem, did a full
+Product.save() and created one StockMovement per line, each firing its
+receivers and notifications, so a container receipt of a few hundred lines
+held locks for a long time. GoodsReceiver takes the whole note:
+
+- the purchase order is locked, then every line is checked against the
+  outstanding quantities read in one query; any invalid line rejects the
+  note (ReceiptError lists them all)
+- quantity_received is raised for all lines with one UPDATE
+- the receipt movements go through StockPoster, which inserts them (with
+  their unit and total cost, the cost record of each receipt) in one
+  bulk_create and writes stock levels and product totals in bulk
+- reorder alerts the receipt covers are resolved in one UPDATE, and the
+  order status is recomputed once at the end
+
+There is no separate cost-layer table; receipt movements carry the cost of
+each received lot.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .posting import StockPoster
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptError(ValueError):
+    """Lines of a goods-received note that cannot be received; errors maps item id to message"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'Item {item_id}: {message}' for item_id, message in errors.items()))
+
+
+class GoodsReceiver:
+    """
+    Posts goods-received notes against purchase orders
+    """
+
+    @classmethod
+    def receive(cls, purchase_order, lines, user=None, location=None, received_date=None, notes=''):
+        """
+        Receive a goods-received note.
+
+        Args:
+            purchase_order: PurchaseOrder (or its id)
+            lines: Dicts with item_id, quantity and optional notes; lines
+                with a zero quantity are ignored
+            user: Recorded on the movements
+            location: Receiving Location (default: the order's delivery location)
+            received_date: Delivery date (default: today)
+            notes: Delivery notes added to every movement
+
+        Returns:
+            Summary dict with the order status, lines and units received and
+            the created movements
+
+        Raises:
+            ReceiptError: A line is unknown, not positive or above the
+                outstanding quantity; nothing is received
+        """
+        from .models import PurchaseOrder, PurchaseOrderItem
+
+        received_date = received_date or timezone.now().date()
+        quantities, line_notes, errors = {}, {}, {}
+        for line in lines:
+            item_id = line.get('item_id')
+            try:
+                quantity = int(line.get('quantity') or 0)
+            except (TypeError, ValueError):
+                errors[item_id] = 'Quantity must be a whole number'
+                continue
+            if quantity < 0:
+                errors[item_id] = 'Quantity cannot be negative'
+            elif quantity:
+                quantities[item_id] = quantities.get(item_id, 0) + quantity
+                if line.get('notes'):
+                    line_notes[item_id] = line['notes']
+
+        with transaction.atomic():
+            po = PurchaseOrder.objects.select_for_update().select_related('supplier').get(
+                pk=getattr(purchase_order, 'pk', purchase_order)
+            )
+            if po.status == 'cancelled':
+                raise ReceiptError({None: 'Purchase order is cancelled'})
+
+            items = {
+                item['pk']: item for item in PurchaseOrderItem.objects.filter(
+                    purchase_order=po, pk__in=list(quantities)
+                ).values('pk', 'product_id', 'quantity_ordered', 'quantity_received', 'unit_price')
+            }
+            for item_id, quantity in quantities.items():
+                item = items.get(item_id)
+                if item is None:
+                    errors[item_id] = 'Not a line of this purchase order'
+                elif quantity > item['quantity_ordered'] - item['quantity_received']:
+                    errors[item_id] = (
+                        f"Cannot receive {quantity}: "
+                        f"{item['quantity_ordered'] - item['quantity_received']} outstanding"
+                    )
+            if errors:
+                raise ReceiptError(errors)
+            if not quantities:
+                raise ReceiptError({None: 'No quantities to receive'})
+
+            PurchaseOrderItem.objects.filter(pk__in=list(quantities)).update(
+                quantity_received=F('quantity_received') + Case(
+                    *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in quantities.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                actual_delivery_date=received_date,
+            )
+
+            # Form values arrive as strings; stock levels are keyed by integer ids
+            location_id = int(getattr(location, 'pk', location) or po.delivery_location_id)
+            reference = f"PO {po.po_number}"
+            movements, _ = StockPoster.post([
+                {
+                    'product_id': items[item_id]['product_id'],
+                    'location_id': location_id,
+                    'movement_type': 'purchase',
+                    'quantity': quantity,
+                    'unit_cost': items[item_id]['unit_price'],
+                    'reference': reference,
+                    'notes': ' '.join(filter(None, [
+                        f"Received from {po.supplier.name}.", notes, line_notes.get(item_id)
+                    ])),
+                }
+                for item_id, quantity in quantities.items()
+            ], user=user)
+
+            cls._resolve_alerts({items[item_id]['product_id'] for item_id in quantities})
+            status = cls._update_status(po, received_date)
+
+        units = sum(quantities.values())
+        logger.info(f"Received {len(quantities)} lines ({units} units) on PO {po.po_number}; status {status}")
+        return {
+            'status': status,
+            'lines': len(quantities),
+            'units': units,
+            'movements': [movement for movement in movements if movement is not None],
+        }
+
+    @staticmethod
+    def _resolve_alerts(product_ids):
+        """Resolve open alerts of received products now above their reorder level"""
+        from .models import ReorderAlert
+
+        ReorderAlert.objects.filter(
+            product_id__in=product_ids,
+            status__in=['active', 'acknowledged'],
+            product__total_stock__gt=F('product__reorder_level'),
+        ).update(status='resolved', resolved_at=timezone.now())
+
+    @staticmethod
+    def _update_status(po, received_date):
+        """Order status from the remaining quantities, saved once"""
+        outstanding = po.items.aggregate(
+            outstanding=Sum(F('quantity_ordered') - F('quantity_received'))
+        )['outstanding'] or 0
+
+        status = 'received' if outstanding <= 0 else 'partially_received'
+        if status != po.status or po.actual_delivery_date is None:
+            po.status = status
+            po.actual_delivery_date = received_date
+            # One save, so the status-change notification is sent once
+            po.save(update_fields=['status', 'actual_delivery_date'])
+        return status
@@ -0,0 +1,172 @@
+# inventory/reorder.py - Reorder Alert Evaluation
+
+"""
+Set-based reorder alert evaluation.
+
+Alerts used to be checked row by row from several places (every product
+save, every stock movement, the update_stock_levels command and the
+low-stock notification job), each running an exists() or get_or_create per
+product. ReorderAlertEvaluator replaces all of them with one pass over a set
+of products:
+
+- products at or below their reorder level that have no open alert are
+  found with a single NOT EXISTS anti-join
+- the priority bands are a SQL CASE (integer arithmetic, so every backend
+  agrees) and the 30-day outgoing quantity, used for the stockout estimate,
+  is a correlated subquery in the same statement
+- the new alerts are inserted with one bulk_create, and managers get one
+  summary notification for the urgent ones
+
+It runs after batches of movements (StockPoster, imports, receipts) and on
+a schedule, never per row.
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, CharField, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OPEN_ALERT_STATUSES = ('active', 'acknowledged')
+URGENT_PRIORITIES = ('critical', 'high')
+USAGE_WINDOW_DAYS = 30
+
+
+def priority_case():
+    """
+    Alert priority of a product's stock position as a SQL CASE.
+
+    Bands on available_stock / max(reorder_level, 1): <= 0 critical,
+    <= 0.5 high, <= 0.8 medium, otherwise low.
+    """
+    level = Greatest(F('reorder_level'), Value(1))
+    tenfold_stock = F('available_stock') * 10
+    return Case(
+        When(available_stock__lte=0, then=Value('critical')),
+        When(LessThanOrEqual(tenfold_stock, level * 5), then=Value('high')),
+        When(LessThanOrEqual(tenfold_stock, level * 8), then=Value('medium')),
+        default=Value('low'),
+        output_field=CharField(),
+    )
+
+
+class ReorderAlertEvaluator:
+    """
+    Raises reorder alerts for sets of products
+    """
+
+    @classmethod
+    def candidates(cls, products=None):
+        """
+        Products needing a new alert, with their priority and recent usage.
+
+        Args:
+            products: Product queryset or ids to limit the check to (default:
+                every active product)
+        """
+        from .models import Product, ReorderAlert, StockMovement
+
+        queryset = Product.objects.filter(is_active=True, available_stock__lte=F('reorder_level'))
+        if products is not None:
+            queryset = queryset.filter(pk__in=products.values('pk') if hasattr(products, 'values') else list(products))
+
+        open_alerts = ReorderAlert.objects.filter(product=OuterRef('pk'), status__in=OPEN_ALERT_STATUSES)
+        usage = StockMovement.objects.filter(
+            product=OuterRef('pk'),
+            movement_type__in=['out', 'sale'],
+            quantity__lt=0,
+            created_at__gte=timezone.now() - timedelta(days=USAGE_WINDOW_DAYS),
+        ).values('product').annotate(total=Sum('quantity')).values('total')[:1]
+
+        return queryset.filter(~Exists(open_alerts)).annotate(
+            priority=priority_case(),
+            outgoing=Coalesce(Subquery(usage, output_field=IntegerField()), Value(0)),
+        ).values(
+            'pk', 'sku', 'priority', 'current_stock', 'available_stock', 'reorder_level',
+            'reorder_quantity', 'supplier_id', 'cost_price', 'outgoing',
+        ).order_by('pk')
+
+    @classmethod
+    def evaluate(cls, products=None, dry_run=False, notify=True):
+        """
+        Create the missing alerts for a set of products.
+
+        Args:
+            products: Product queryset or ids (default: every active product)
+            dry_run: Report what would be created without writing
+            notify: Send managers one summary of new urgent alerts
+
+        Returns:
+            Dict with the number of alerts created, a count per priority and
+            the candidate rows (sku, priority, stock and reorder level)
+        """
+        from .models import ReorderAlert
+
+        rows = list(cls.candidates(products))
+        by_priority = Counter(row['priority'] for row in rows)
+        if rows and not dry_run:
+            today = timezone.now().date()
+            ReorderAlert.objects.bulk_create([
+                ReorderAlert(
+                    product_id=row['pk'],
+                    priority=row['priority'],
+                    current_stock=row['current_stock'],
+                    reorder_level=row['reorder_level'],
+                    suggested_order_quantity=row['reorder_quantity'],
+                    suggested_supplier_id=row['supplier_id'],
+                    estimated_cost=row['reorder_quantity'] * row['cost_price'],
+                    estimated_stockout_date=cls._stockout_date(row, today),
+                )
+                for row in rows
+            ], batch_size=1000)
+            logger.info(f"Created {len(rows)} reorder alerts: {dict(by_priority)}")
+
+            urgent = sum(by_priority[priority] for priority in URGENT_PRIORITIES)
+            if notify and urgent:
+                transaction.on_commit(lambda: cls._notify(len(rows), by_priority))
+
+        return {
+            'created': 0 if dry_run else len(rows),
+            'by_priority': dict(by_priority),
+            'rows': rows,
+        }
+
+    @staticmethod
+    def _stockout_date(row, today):
+        """Day stock runs out at the last 30 days' outgoing rate (None when out already)"""
+        if row['available_stock'] <= 0:
+            return None
+        daily_usage = -row['outgoing'] / USAGE_WINDOW_DAYS if row['outgoing'] else 1
+        return today + timedelta(days=int(row['available_stock'] / daily_usage))
+
+    @staticmethod
+    def _notify(created, by_priority):
+        """One summary notification for a run's new alerts"""
+        try:
+            from django.contrib.auth.models import User
+            from core.utils import create_bulk_notifications
+
+            users_to_notify = User.objects.filter(
+                profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
+                profile__is_active=True
+            )
+            breakdown = ', '.join(
+                f"{by_priority[priority]} {priority}" for priority in ('critical', 'high', 'medium', 'low')
+                if by_priority.get(priority)
+            )
+            create_bulk_notifications(
+                users=users_to_notify,
+                title="New Reorder Alerts",
+                message=f"{created} products reached their reorder level ({breakdown})",
+                notification_type="warning",
+                action_url="/inventory/reorders/",
+                action_text="View Alerts"
+            )
+        except Exception as e:
+            logger.error(f"Error sending reorder alert notification: {str(e)}")
@@ -0,0 +1,255 @@
+# inventory/scanning.py - Barcode Scan Product Cards
+
+"""
+Read-through product card cache for the barcode/QR scan path.
+
+Scanner bursts hit the lookup endpoints dozens of times a minute per device.
+Instead of fetching the product with joins, its per-location stock levels
+and a separate stock status aggregate on every scan, each product is
+serialized once into a compact "card" (identity, prices, per-location
+availability) and cached:
+
+- inventory:scan_card:<product_id>        -> card dict
+- inventory:scan_code:<kind>:<digest>     -> product_id (barcode, sku, qr_code)
+
+Cards are invalidated precisely - by product id, together with the code
+aliases stored on the cached card - from product saves/deletes and from the
+stock movement pipeline (StockLevel and StockMovement writes).
+"""
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+
+logger = logging.getLogger(__name__)
+
+CARD_CACHE_PREFIX = 'inventory:scan_card'
+CODE_CACHE_PREFIX = 'inventory:scan_code'
+
+# Code kinds in lookup priority order
+CODE_KINDS = ('barcode', 'sku', 'qr_code')
+
+# Maximum codes resolved by one batch lookup
+BATCH_LOOKUP_LIMIT = 100
+
+
+def _card_key(product_id):
+    return f'{CARD_CACHE_PREFIX}:{product_id}'
+
+
+def _code_key(kind, code):
+    if kind == 'sku':
+        code = code.upper()
+    digest = hashlib.md5(code.encode('utf-8')).hexdigest()
+    return f'{CODE_CACHE_PREFIX}:{kind}:{digest}'
+
+
+def _timeout():
+    return getattr(settings, 'INVENTORY_SETTINGS', {}).get('CACHE_TIMEOUT_SECONDS', 300)
+
+
+class ProductCardCache:
+    """
+    Cached product cards keyed by barcode, SKU or QR code
+    """
+
+    @staticmethod
+    def _products_queryset():
+        from .models import Product, StockLevel
+
+        return Product.objects.filter(is_active=True).select_related(
+            'category', 'supplier', 'brand'
+        ).prefetch_related(
+            Prefetch('stock_levels', queryset=StockLevel.objects.select_related('location'))
+        )
+
+    @staticmethod
+    def build_card(product):
+        """Serialize a product (with prefetched stock levels) into a card"""
+        stock_levels = []
+        available_total = 0
+        for stock_level in product.stock_levels.all():
+            available_total += stock_level.quantity - stock_level.reserved_quantity
+            stock_levels.append({
+                'location_id': stock_level.location_id,
+                'location_name': stock_level.location.name,
+                'quantity': stock_level.quantity,
+                'available_quantity': stock_level.available_quantity,
+            })
+
+        # Same rules as StockManager.get_stock_status, from the rows already loaded
+        if not product.is_active:
+            stock_status = 'discontinued'
+        elif available_total <= 0:
+            stock_status = 'out_of_stock'
+        elif available_total <= product.reorder_level:
+            stock_status = 'low_stock'
+        else:
+            stock_status = 'in_stock'
+
+        return {
+            'product_id': product.id,
+            'sku': product.sku,
+            'barcode': product.barcode,
+            'qr_code': product.qr_code,
+            'name': product.name,
+            'description': product.description,
+            'category': product.category.name if product.category else '',
+            'supplier': product.supplier.name if product.supplier else '',
+            'brand': product.brand.name if product.brand else '',
+            'cost_price': float(product.cost_price),
+            'selling_price': float(product.selling_price),
+            'current_stock': product.current_stock,
+            'reorder_level': product.reorder_level,
+            'stock_status': stock_status,
+            'stock_levels': stock_levels,
+            'last_restocked': product.last_restocked_date.isoformat() if product.last_restocked_date else None,
+        }
+
+    @classmethod
+    def _store(cls, cards):
+        values = {}
+        for card in cards:
+            values[_card_key(card['product_id'])] = card
+            for kind in CODE_KINDS:
+                if card.get(kind):
+                    values[_code_key(kind, card[kind])] = card['product_id']
+        if values:
+            cache.set_many(values, _timeout())
+
+    @classmethod
+    def get_cards(cls, codes, kinds=CODE_KINDS):
+        """
+        Resolve scanned codes to product cards.
+
+        At most two cache round trips, plus one database query for all misses.
+
+        Args:
+            codes: Iterable of scanned strings
+            kinds: Code kinds to try, in priority order
+
+        Returns:
+            Dict mapping each input code to its card (or None if unknown)
+        """
+        codes = [code.strip() for code in codes if code and code.strip()]
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return {}
+
+        # 1. code -> product id aliases
+        alias_keys = {(kind, code): _code_key(kind, code) for code in codes for kind in kinds}
+        aliases = cache.get_many(list(alias_keys.values()))
+
+        product_ids = {}
+        for code in codes:
+            for kind in kinds:
+                product_id = aliases.get(alias_keys[(kind, code)])
+                if product_id:
+                    product_ids[code] = product_id
+                    break
+
+        # 2. product id -> card
+        cards_by_id = {}
+        if product_ids:
+            cached = cache.get_many([_card_key(product_id) for product_id in set(product_ids.values())])
+            cards_by_id = {card['product_id']: card for card in cached.values()}
+
+        results = {}
+        misses = []
+        for code in codes:
+            card = cards_by_id.get(product_ids.get(code))
+            if card:
+                results[code] = card
+            else:
+                misses.append(code)
+
+        # 3. one query for everything the cache couldn't answer
+        if misses:
+            results.update(cls._load(misses, kinds))
+        return results
+
+    @classmethod
+    def _load(cls, codes, kinds):
+        condition = Q()
+        if 'barcode' in kinds:
+            condition |= Q(barcode__in=codes)
+        if 'sku' in kinds:
+            condition |= Q(sku__in=codes) | Q(sku__in=[code.upper() for code in codes])
+        if 'qr_code' in kinds:
+            condition |= Q(qr_code__in=codes)
+
+        cards = [cls.build_card(product) for product in cls._products_queryset().filter(condition)]
+        cls._store(cards)
+
+        index = {}
+        for card in cards:
+            for kind in kinds:
+                value = card.get(kind)
+                if value:
+                    index[(kind, value.upper() if kind == 'sku' else value)] = card
+
+        results = {}
+        for code in codes:
+            results[code] = None
+            for kind in kinds:
+                card = index.get((kind, code.upper() if kind == 'sku' else code))
+                if card:
+                    results[code] = card
+                    break
+        return results
+
+    @classmethod
+    def get_card(cls, code, kinds=CODE_KINDS):
+        """Resolve a single scanned code; None if no active product matches"""
+        return cls.get_cards([code], kinds=kinds).get((code or '').strip())
+
+    @staticmethod
+    def invalidate(product_id):
+        """Drop a product's card and the code aliases recorded on it"""
+        card = cache.get(_card_key(product_id))
+        keys = [_card_key(product_id)]
+        if card:
+            keys.extend(_code_key(kind, card[kind]) for kind in CODE_KINDS if card.get(kind))
+        cache.delete_many(keys)
+
+    @classmethod
+    def benchmark(cls, codes, repeat=50):
+        """
+        Measure scan latency for a set of codes.
+
+        The first pass runs against a cold cache; the remaining passes are warm.
+
+        Returns:
+            Dict with cold/warm p50, p95, p99 and max in milliseconds
+        """
+        for product_id in {card['product_id'] for card in cls.get_cards(codes).values() if card}:
+            cls.invalidate(product_id)
+
+        cold, warm = [], []
+        for run in range(repeat):
+            for code in codes:
+                started = time.perf_counter()
+                cls.get_card(code)
+                (cold if run == 0 else warm).append((time.perf_counter() - started) * 1000)
+
+        def summary(timings):
+            timings = sorted(timings)
+            if not timings:
+                return {}
+
+            def percentile(p):
+                return round(timings[min(len(timings) - 1, int(len(timings) * p))], 3)
+
+            return {
+                'samples': len(timings),
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'max_ms': round(timings[-1], 3),
+            }
+
+        return {'cold': summary(cold), 'warm': summary(warm)}
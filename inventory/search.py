@@ -0,0 +1,279 @@
+# inventory/search.py - Ranked Product Search
+
+"""
+Product search service for BlitzTech Electronics inventory.
+
+Every product search endpoint (inventory APIs, quick/global search, the
+product search page and the quote builder) goes through ProductSearchService
+so results are ranked the same way everywhere.
+
+On PostgreSQL the service uses:
+- a maintained `search_vector` tsvector column (GIN indexed) with weighted
+  fields: part numbers and name (A), keywords and short description (B),
+  long description (C)
+- pg_trgm GIN indexes on UPPER(sku/manufacturer_part_number/supplier_sku),
+  which serve Django's icontains lookups, plus trigram similarity for ranking
+
+On other databases (SQLite in tests) it falls back to icontains filters with
+a CASE-based relevance score, so callers never need to care which backend
+is running.
+"""
+
+import logging
+import re
+import time
+
+from django.db import connection
+from django.db.models import (
+    Case, F, FloatField, Q, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration - 'simple' avoids stemming part numbers and units
+SEARCH_CONFIG = 'simple'
+
+# Fields folded into Product.search_vector with their weights
+SEARCH_VECTOR_FIELDS = (
+    ('sku', 'A'),
+    ('manufacturer_part_number', 'A'),
+    ('supplier_sku', 'A'),
+    ('barcode', 'A'),
+    ('name', 'A'),
+    ('model_number', 'B'),
+    ('search_keywords', 'B'),
+    ('short_description', 'B'),
+    ('description', 'C'),
+)
+
+# Part number fields carrying trigram indexes
+TRIGRAM_FIELDS = ('sku', 'manufacturer_part_number', 'supplier_sku')
+
+TOKEN_PATTERN = re.compile(r'[\w.+\-/]+', re.UNICODE)
+
+
+def is_postgres():
+    """Check whether the default database supports full-text search"""
+    return connection.vendor == 'postgresql'
+
+
+def build_search_vector():
+    """Weighted SearchVector expression over the product's own text fields"""
+    from django.contrib.postgres.search import SearchVector
+
+    vector = None
+    for field_name, weight in SEARCH_VECTOR_FIELDS:
+        part = SearchVector(field_name, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def refresh_search_vectors(product_ids=None):
+    """
+    Recompute search_vector for the given products (or all products).
+
+    A single UPDATE per call; a no-op on databases without full-text search.
+
+    Args:
+        product_ids: Iterable of product ids, or None for every product
+
+    Returns:
+        Number of rows updated
+    """
+    if not is_postgres():
+        return 0
+
+    from .models import Product
+
+    queryset = Product.objects.all()
+    if product_ids is not None:
+        queryset = queryset.filter(pk__in=list(product_ids))
+    return queryset.update(search_vector=build_search_vector())
+
+
+class ProductSearchService:
+    """
+    Ranked product search shared by all search endpoints
+    """
+
+    MIN_QUERY_LENGTH = 2
+
+    @staticmethod
+    def tokenize(query: str):
+        """Split a query into search tokens, dropping tsquery syntax characters"""
+        return [token for token in TOKEN_PATTERN.findall(query or '') if token.strip('.+-/')]
+
+    @classmethod
+    def search(cls, query: str, queryset=None, limit: int = None):
+        """
+        Search products and return a queryset ordered by relevance.
+
+        Args:
+            query: Raw user query (partial SKUs, part numbers, words)
+            queryset: Optional base queryset (e.g. active or quotable products)
+            limit: Optional maximum number of results
+
+        Returns:
+            QuerySet annotated with `search_rank`, best matches first
+        """
+        from .models import Product
+
+        if queryset is None:
+            queryset = Product.objects.filter(is_active=True)
+
+        query = (query or '').strip()
+        tokens = cls.tokenize(query)
+        if len(query) < cls.MIN_QUERY_LENGTH or not tokens:
+            return queryset.none()
+
+        if is_postgres():
+            results = cls._postgres_search(queryset, query, tokens)
+        else:
+            results = cls._fallback_search(queryset, query, tokens)
+
+        results = results.order_by('-search_rank', 'name')
+        if limit:
+            results = results[:limit]
+        return results
+
+    @staticmethod
+    def _category_ids(tokens):
+        """Resolve categories whose name matches any token (small table, one query)"""
+        from .models import Category
+
+        category_filter = Q()
+        for token in tokens:
+            category_filter |= Q(name__icontains=token)
+        return list(Category.objects.filter(category_filter).values_list('id', flat=True))
+
+    @staticmethod
+    def _exact_match_boost(query):
+        """Relevance boost for exact and prefix hits on identifiers"""
+        return Case(
+            When(Q(sku__iexact=query) | Q(barcode=query), then=Value(1.0)),
+            When(Q(manufacturer_part_number__iexact=query) | Q(supplier_sku__iexact=query), then=Value(0.95)),
+            When(sku__istartswith=query, then=Value(0.9)),
+            When(manufacturer_part_number__istartswith=query, then=Value(0.85)),
+            When(name__istartswith=query, then=Value(0.7)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    @classmethod
+    def _postgres_search(cls, queryset, query, tokens):
+        """Full-text + trigram search on PostgreSQL"""
+        from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+
+        # Prefix matching on every token so partial input ranks as the user types.
+        # Lexemes are split on non-word characters (as the tsvector parser does with
+        # hyphenated part numbers) so user input can't break tsquery syntax.
+        lexemes = re.findall(r'\w+', query.lower())
+        ts_query = SearchQuery(
+            ' & '.join(f"{lexeme}:*" for lexeme in lexemes) or query,
+            search_type='raw' if lexemes else 'plain',
+            config=SEARCH_CONFIG,
+        )
+
+        match = Q(search_vector=ts_query) | Q(barcode=query)
+        for field_name in TRIGRAM_FIELDS:
+            match |= Q(**{f'{field_name}__icontains': query})
+
+        category_ids = cls._category_ids(tokens)
+        if category_ids:
+            match |= Q(category_id__in=category_ids)
+
+        # Products whose search_vector is not filled yet rank by trigram and
+        # boost alone; a NULL rank would sort them first in descending order
+        return queryset.filter(match).annotate(
+            search_rank=(
+                Coalesce(SearchRank(F('search_vector'), ts_query), Value(0.0), output_field=FloatField())
+                + Greatest(*[TrigramSimilarity(field_name, query) for field_name in TRIGRAM_FIELDS])
+                + cls._exact_match_boost(query)
+            )
+        )
+
+    @classmethod
+    def _fallback_search(cls, queryset, query, tokens):
+        """icontains search with CASE-based ranking for non-PostgreSQL databases"""
+        category_ids = cls._category_ids(tokens)
+
+        # Every token must match at least one field ("0805 10k" narrows, not widens)
+        match = Q()
+        for token in tokens:
+            token_match = (
+                Q(name__icontains=token) |
+                Q(sku__icontains=token) |
+                Q(barcode__icontains=token) |
+                Q(manufacturer_part_number__icontains=token) |
+                Q(supplier_sku__icontains=token) |
+                Q(model_number__icontains=token) |
+                Q(search_keywords__icontains=token) |
+                Q(description__icontains=token)
+            )
+            if category_ids:
+                token_match |= Q(category_id__in=category_ids)
+            match &= token_match
+
+        field_rank = Case(
+            When(name__icontains=query, then=Value(0.6)),
+            When(
+                Q(sku__icontains=query) |
+                Q(manufacturer_part_number__icontains=query) |
+                Q(supplier_sku__icontains=query),
+                then=Value(0.5)
+            ),
+            When(search_keywords__icontains=query, then=Value(0.4)),
+            When(category_id__in=category_ids or [0], then=Value(0.3)),
+            default=Value(0.1),
+            output_field=FloatField(),
+        )
+
+        return queryset.filter(match).annotate(
+            search_rank=cls._exact_match_boost(query) + field_rank
+        )
+
+    @classmethod
+    def benchmark(cls, queries, queryset=None, limit=20, repeat=5):
+        """
+        Time searches for a set of queries.
+
+        Args:
+            queries: Iterable of query strings
+            queryset: Optional base queryset
+            limit: Result limit per search
+            repeat: Runs per query
+
+        Returns:
+            Dict with per-query timings and overall p50/p95/max in milliseconds
+        """
+        timings = []
+        per_query = {}
+
+        for query in queries:
+            query_timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result_count = len(list(cls.search(query, queryset=queryset, limit=limit)))
+                query_timings.append((time.perf_counter() - started) * 1000)
+            timings.extend(query_timings)
+            per_query[query] = {
+                'results': result_count,
+                'avg_ms': round(sum(query_timings) / len(query_timings), 3),
+                'max_ms': round(max(query_timings), 3),
+            }
+
+        timings.sort()
+
+        def percentile(p):
+            if not timings:
+                return 0.0
+            return round(timings[min(len(timings) - 1, int(len(timings) * p))], 3)
+
+        return {
+            'backend': connection.vendor,
+            'queries': per_query,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(timings[-1], 3) if timings else 0.0,
+        }
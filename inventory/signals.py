@@ -9,7 +9,7 @@ notification generation, and business rule enforcement.
 
 Key Automation Features:
 - Automatic stock level synchronization
-- Real-time reorder alert generation
+- Reorder alert resolution
 - Stock movement audit trail creation
 - Purchase order workflow automation
 - Integration with core notification system
@@ -21,6 +21,7 @@ sophisticated inventory management automation that reduces manual work
 and prevents common inventory management errors.
 """
 
+from django.core.signals import request_started, request_finished
 from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
@@ -28,9 +29,11 @@ from django.db import transaction
 from decimal import Decimal
 import logging
 
+from core.events import defer, handles
+
 from .models import (
     Product, StockLevel, StockMovement, PurchaseOrder, PurchaseOrderItem,
-    ReorderAlert, StockTake, StockTakeItem, Category, Supplier, Location
+    ReorderAlert, StockTake, StockTakeItem, Category, Supplier, Location, Brand, Currency
 )
 from inventory import models
 
@@ -69,25 +72,8 @@ def handle_product_creation_and_updates(sender, instance, created, **kwargs):
                         }
                     )
                 
-                # Create notification for product creation
-                from core.utils import create_notification
-                
-                # Notify inventory managers about new product
-                from django.contrib.auth.models import User
-                inventory_managers = User.objects.filter(
-                    profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
-                    profile__is_active=True
-                ).exclude(id=instance.created_by.id if instance.created_by else None)
-                
-                for manager in inventory_managers:
-                    create_notification(
-                        user=manager,
-                        title="New Product Added",
-                        message=f"Product '{instance.name}' ({instance.sku}) has been added to inventory by {instance.created_by.get_full_name() if instance.created_by else 'System'}",
-                        notification_type="info",
-                        action_url=f"/inventory/products/{instance.id}/",
-                        action_text="View Product"
-                    )
+                # Notify inventory managers after the commit
+                defer('inventory.product_created', key=instance.pk)
                 
                 logger.info(f"Product {instance.sku} set up successfully with stock levels")
             
@@ -98,6 +84,82 @@ def handle_product_creation_and_updates(sender, instance, created, **kwargs):
     except Exception as e:
         logger.error(f"Error in product signal handler: {str(e)}")
 
+@handles('inventory.product_created')
+def _notify_new_product(product_id):
+    """Notify inventory managers about a new product"""
+    from core.notifications import NotificationDispatcher
+    from django.contrib.auth.models import User
+
+    product = Product.objects.select_related('created_by').filter(pk=product_id).first()
+    if product is None:
+        return
+
+    inventory_managers = User.objects.filter(
+        profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
+        profile__is_active=True
+    ).exclude(id=product.created_by_id)
+
+    # Imports add products by the hundred; managers get one summary per window
+    NotificationDispatcher.digest(
+        'inventory.product_created',
+        users=inventory_managers,
+        title="New Product Added",
+        message=f"Product '{product.name}' ({product.sku}) has been added to inventory by {product.created_by.get_full_name() if product.created_by else 'System'}",
+        summary="{count} products added in the last {minutes} minutes",
+        notification_type="info",
+        action_url=f"/inventory/products/{product.id}/",
+        action_text="View Product",
+        summary_action_url="/inventory/products/",
+        summary_action_text="View Products"
+    )
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text search vector in step with the product's text fields"""
+    from .search import SEARCH_VECTOR_FIELDS, refresh_search_vectors
+    
+    # Stock-only saves don't touch any indexed text
+    if update_fields and not set(update_fields) & {name for name, _ in SEARCH_VECTOR_FIELDS}:
+        return
+    
+    try:
+        refresh_search_vectors([instance.pk])
+    except Exception as e:
+        logger.error(f"Error refreshing search vector for {instance.sku}: {str(e)}")
+
+@receiver(post_save, sender=Product)
+def index_product_attributes(sender, instance, update_fields=None, **kwargs):
+    """Re-index dynamic attributes for parametric search when they may have changed"""
+    from .parametric import index_products
+    
+    if update_fields and 'dynamic_attributes' not in update_fields:
+        return
+    
+    try:
+        index_products([instance])
+    except Exception as e:
+        logger.error(f"Error indexing attributes for {instance.sku}: {str(e)}")
+
+@receiver(post_save, sender=Product)
+def update_part_number_index(sender, instance, update_fields=None, **kwargs):
+    """Apply the product's identifiers to the autocomplete index once committed"""
+    from .autocomplete import INDEXED_FIELDS, part_number_index
+    
+    # Stock-only saves don't touch any indexed identifier
+    if update_fields and not set(update_fields) & {'name', 'is_active', *INDEXED_FIELDS}:
+        return
+    
+    values = {field_name: getattr(instance, field_name) for field_name in ('id', 'name', 'is_active') + INDEXED_FIELDS}
+    transaction.on_commit(lambda: part_number_index.update_product(values))
+
+@receiver(post_delete, sender=Product)
+def remove_from_part_number_index(sender, instance, **kwargs):
+    """Drop a deleted product from the autocomplete index once committed"""
+    from .autocomplete import part_number_index
+    
+    product_id = instance.pk
+    transaction.on_commit(lambda: part_number_index.remove_product(product_id))
+
 def _handle_product_updates(product):
     """Handle updates to existing products"""
     try:
@@ -114,7 +176,10 @@ def _handle_product_updates(product):
             ) if old_product.selling_price > 0 else 0
             
             if price_change_percent > 10:
-                _notify_price_change(product, old_product.selling_price, product.selling_price)
+                defer(
+                    'inventory.price_changed', key=product.pk,
+                    old_price=str(old_product.selling_price), new_price=str(product.selling_price)
+                )
         
         # Check for reorder level changes
         if old_product.reorder_level != product.reorder_level:
@@ -129,12 +194,18 @@ def _handle_product_updates(product):
     except Exception as e:
         logger.error(f"Error handling product updates for {product.sku}: {str(e)}")
 
-def _notify_price_change(product, old_price, new_price):
+@handles('inventory.price_changed')
+def _notify_price_change(product_id, old_price, new_price):
     """Notify relevant users about significant price changes"""
     try:
         from core.utils import create_bulk_notifications
         from django.contrib.auth.models import User
         
+        product = Product.objects.filter(pk=product_id).first()
+        if product is None:
+            return
+        old_price, new_price = Decimal(old_price), Decimal(new_price)
+        
         # Notify sales team and managers
         users_to_notify = User.objects.filter(
             profile__user_type__in=['sales_rep', 'sales_manager', 'blitzhub_admin'],
@@ -178,7 +249,8 @@ def _update_reorder_alerts(product):
             ).first()
             
             if not existing_alert:
-                _create_reorder_alert(product)
+                from .reorder import ReorderAlertEvaluator
+                ReorderAlertEvaluator.evaluate([product.pk])
         
     except Exception as e:
         logger.error(f"Error updating reorder alerts for {product.sku}: {str(e)}")
@@ -210,7 +282,6 @@ def handle_stock_movement_effects(sender, instance, created, **kwargs):
     When stock moves, this signal:
     - Updates product stock levels
     - Updates location-specific stock levels
-    - Checks reorder requirements
     - Updates product performance metrics
     - Generates relevant notifications
     """
@@ -227,14 +298,12 @@ def handle_stock_movement_effects(sender, instance, created, **kwargs):
             # Update product total stock from all locations
             _sync_product_total_stock(product)
             
-            # Check reorder requirements
-            _check_reorder_requirements(product)
-            
             # Update product performance metrics
             _update_product_metrics(instance)
             
-            # Generate notifications for significant movements
-            _notify_significant_movements(instance)
+            # Notify about significant movements after the commit
+            if abs(instance.quantity) >= 100 or (instance.unit_cost and instance.total_cost >= 1000):
+                defer('inventory.significant_movement', key=instance.pk)
             
             logger.debug(f"Stock movement processed: {instance}")
             
@@ -289,117 +358,9 @@ def _sync_product_total_stock(product):
     except Exception as e:
         logger.error(f"Error syncing total stock for {product.sku}: {str(e)}")
 
-def _check_reorder_requirements(product):
-    """Check if product needs reordering after stock movement"""
-    try:
-        if product.needs_reorder and product.is_active:
-            # Check if there's already an active alert
-            existing_alert = ReorderAlert.objects.filter(
-                product=product,
-                status__in=['active', 'acknowledged']
-            ).first()
-            
-            if not existing_alert:
-                _create_reorder_alert(product)
-        
-    except Exception as e:
-        logger.error(f"Error checking reorder requirements for {product.sku}: {str(e)}")
-
-def _create_reorder_alert(product):
-    """Create a new reorder alert for a product"""
-    try:
-        # Determine priority based on stock situation
-        if product.available_stock <= 0:
-            priority = 'critical'
-        elif product.available_stock <= (product.reorder_level * 0.5):
-            priority = 'high'
-        elif product.available_stock <= (product.reorder_level * 0.8):
-            priority = 'medium'
-        else:
-            priority = 'low'
-        
-        # Calculate estimated stockout date based on average usage
-        estimated_stockout_date = _calculate_stockout_date(product)
-        
-        alert = ReorderAlert.objects.create(
-            product=product,
-            priority=priority,
-            current_stock=product.current_stock,
-            reorder_level=product.reorder_level,
-            suggested_order_quantity=product.reorder_quantity,
-            suggested_supplier=product.supplier,
-            estimated_cost=product.reorder_quantity * product.cost_price,
-            estimated_stockout_date=estimated_stockout_date
-        )
-        
-        # Notify relevant users
-        _notify_reorder_alert(alert)
-        
-        logger.info(f"Created {priority} reorder alert for {product.sku}")
-        
-    except Exception as e:
-        logger.error(f"Error creating reorder alert for {product.sku}: {str(e)}")
-
-def _calculate_stockout_date(product):
-    """Calculate estimated stockout date based on usage patterns"""
-    try:
-        from django.utils import timezone
-        from django.db.models import Sum
-        
-        # Calculate average daily usage over last 30 days
-        thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-        
-        recent_outgoing_movements = StockMovement.objects.filter(
-            product=product,
-            movement_type__in=['out', 'sale'],
-            created_at__gte=thirty_days_ago,
-            quantity__lt=0
-        ).aggregate(total=Sum('quantity'))['total'] or 0
-        
-        daily_usage = abs(recent_outgoing_movements) / 30 if recent_outgoing_movements else 1
-        
-        if daily_usage > 0 and product.available_stock > 0:
-            days_remaining = product.available_stock / daily_usage
-            return timezone.now().date() + timezone.timedelta(days=int(days_remaining))
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"Error calculating stockout date for {product.sku}: {str(e)}")
-        return None
-
-def _notify_reorder_alert(alert):
-    """Notify relevant users about reorder alerts"""
-    try:
-        from core.utils import create_bulk_notifications
-        from django.contrib.auth.models import User
-        
-        # Notify inventory managers and purchasing team
-        users_to_notify = User.objects.filter(
-            profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
-            profile__is_active=True
-        )
-        
-        urgency_text = {
-            'critical': '🚨 CRITICAL',
-            'high': '⚠️ HIGH PRIORITY',
-            'medium': '📋 MEDIUM',
-            'low': '📝 LOW'
-        }.get(alert.priority, alert.priority.upper())
-        
-        create_bulk_notifications(
-            users=users_to_notify,
-            title=f"Reorder Alert: {alert.product.name}",
-            message=f"{urgency_text} - {alert.product.sku} is at {alert.current_stock} units (reorder level: {alert.reorder_level})",
-            notification_type="warning" if alert.priority in ['high', 'critical'] else "info",
-            action_url=f"/inventory/reorder-alerts/{alert.id}/",
-            action_text="View Alert"
-        )
-        
-        logger.info(f"Reorder alert notification sent for {alert.product.sku}")
-        
-    except Exception as e:
-        logger.error(f"Error sending reorder alert notification: {str(e)}")
+# Reorder alerts are not checked per movement: StockPoster evaluates them
+# once per batch and the scheduled low-stock check covers single movements
+# (see inventory.reorder)
 
 def _update_product_metrics(movement):
     """Update product performance metrics based on movement"""
@@ -427,12 +388,13 @@ def _update_product_metrics(movement):
     except Exception as e:
         logger.error(f"Error updating product metrics: {str(e)}")
 
-def _notify_significant_movements(movement):
-    """Notify about significant stock movements"""
+@handles('inventory.significant_movement')
+def _notify_significant_movements(movement_id):
+    """Notify about a significant stock movement"""
     try:
-        # Define what constitutes a "significant" movement
-        if abs(movement.quantity) >= 100 or (movement.unit_cost and movement.total_cost >= 1000):
-            from core.utils import create_notification
+        movement = StockMovement.objects.select_related('product').filter(pk=movement_id).first()
+        if movement is not None:
+            from core.notifications import NotificationDispatcher
             from django.contrib.auth.models import User
             
             # Notify inventory managers
@@ -444,15 +406,17 @@ def _notify_significant_movements(movement):
             movement_type_display = movement.get_movement_type_display()
             direction = "+" if movement.quantity > 0 else ""
             
-            for manager in managers:
-                create_notification(
-                    user=manager,
-                    title=f"Significant Stock Movement",
-                    message=f"{movement_type_display}: {direction}{movement.quantity} units of {movement.product.name} ({movement.reference})",
-                    notification_type="info",
-                    action_url=f"/inventory/stock-movements/?product={movement.product.id}",
-                    action_text="View History"
-                )
+            NotificationDispatcher.digest(
+                'inventory.significant_movement',
+                users=managers,
+                title="Significant Stock Movement",
+                message=f"{movement_type_display}: {direction}{movement.quantity} units of {movement.product.name} ({movement.reference})",
+                summary="{count} significant stock movements in the last {minutes} minutes",
+                notification_type="info",
+                action_url=f"/inventory/stock-movements/?product={movement.product.id}",
+                action_text="View History",
+                summary_action_url="/inventory/stock-movements/"
+            )
         
     except Exception as e:
         logger.error(f"Error sending significant movement notification: {str(e)}")
@@ -470,16 +434,21 @@ def handle_purchase_order_workflow(sender, instance, created, **kwargs):
     """
     try:
         if created:
-            _handle_new_purchase_order(instance)
+            defer('inventory.purchase_order_created', key=instance.pk)
         else:
             _handle_purchase_order_updates(instance)
             
     except Exception as e:
         logger.error(f"Error in purchase order workflow: {str(e)}")
 
-def _handle_new_purchase_order(po):
+@handles('inventory.purchase_order_created')
+def _handle_new_purchase_order(po_id):
     """Handle new purchase order creation"""
     try:
+        po = PurchaseOrder.objects.select_related('supplier').filter(pk=po_id).first()
+        if po is None:
+            return
+        
         # Notify purchasing team
         from core.utils import create_bulk_notifications
         from django.contrib.auth.models import User
@@ -514,16 +483,24 @@ def _handle_purchase_order_updates(po):
         
         # Handle status changes
         if old_po.status != po.status:
-            _handle_po_status_change(po, old_po.status, po.status)
+            defer(
+                'inventory.purchase_order_status_changed', key=(po.pk, po.status),
+                old_status=old_po.status, new_status=po.status
+            )
         
     except Exception as e:
         logger.error(f"Error handling purchase order updates: {str(e)}")
 
-def _handle_po_status_change(po, old_status, new_status):
+@handles('inventory.purchase_order_status_changed')
+def _handle_po_status_change(key, old_status, new_status):
     """Handle purchase order status changes"""
     try:
         from core.utils import create_notification
         
+        po = PurchaseOrder.objects.select_related('supplier', 'created_by').filter(pk=key[0]).first()
+        if po is None:
+            return
+        
         # Notify PO creator about status changes
         if po.created_by:
             status_messages = {
@@ -549,73 +526,8 @@ def _handle_po_status_change(po, old_status, new_status):
     except Exception as e:
         logger.error(f"Error handling PO status change: {str(e)}")
 
-@receiver(post_save, sender=PurchaseOrderItem)
-def handle_purchase_order_item_updates(sender, instance, created, **kwargs):
-    """
-    Handle purchase order item changes and stock receipts.
-    
-    When PO items are updated (especially quantity received),
-    this triggers stock updates and related notifications.
-    """
-    if not created:
-        try:
-            _handle_po_item_receipt(instance)
-        except Exception as e:
-            logger.error(f"Error handling PO item updates: {str(e)}")
-
-def _handle_po_item_receipt(po_item):
-    """Handle receipt of purchase order items"""
-    try:
-        # Check if this is a stock receipt (quantity_received increased)
-        try:
-            old_item = PurchaseOrderItem.objects.get(pk=po_item.pk)
-            if old_item.quantity_received < po_item.quantity_received:
-                received_qty = po_item.quantity_received - old_item.quantity_received
-                _process_stock_receipt(po_item, received_qty)
-        except PurchaseOrderItem.DoesNotExist:
-            pass
-        
-    except Exception as e:
-        logger.error(f"Error handling PO item receipt: {str(e)}")
-
-def _process_stock_receipt(po_item, received_qty):
-    """Process stock receipt from purchase order"""
-    try:
-        with transaction.atomic():
-            product = po_item.product
-            po = po_item.purchase_order
-            
-            # Create stock movement
-            StockMovement.objects.create(
-                product=product,
-                movement_type='purchase',
-                quantity=received_qty,
-                reference=f"PO {po.po_number}",
-                to_location=po.delivery_location,
-                previous_stock=product.current_stock,
-                new_stock=product.current_stock + received_qty,
-                unit_cost=po_item.unit_price,
-                total_cost=received_qty * po_item.unit_price,
-                notes=f"Received from {po.supplier.name}",
-                created_by=None  # System generated
-            )
-            
-            # Update product stock
-            product.current_stock += received_qty
-            product.last_restocked_date = timezone.now()
-            product.save()
-            
-            # Resolve reorder alerts if stock is now above reorder level
-            if product.current_stock > product.reorder_level:
-                ReorderAlert.objects.filter(
-                    product=product,
-                    status__in=['active', 'acknowledged']
-                ).update(status='resolved', resolved_at=timezone.now())
-            
-            logger.info(f"Processed stock receipt: {received_qty} units of {product.sku} from PO {po.po_number}")
-        
-    except Exception as e:
-        logger.error(f"Error processing stock receipt: {str(e)}")
+# Stock receipts are posted by inventory.receiving.GoodsReceiver for the
+# whole goods-received note; saving a PurchaseOrderItem moves no stock.
 
 # =====================================
 # STOCK TAKE SIGNALS
@@ -657,7 +569,7 @@ def _process_stock_take_variance(stock_take_item):
         
         # Notify about significant variances
         if abs(stock_take_item.variance_value) > 100:  # Significant variance threshold
-            _notify_significant_variance(stock_take_item)
+            defer('inventory.stock_take_variance', key=stock_take_item.pk)
         
     except Exception as e:
         logger.error(f"Error processing stock take variance: {str(e)}")
@@ -694,12 +606,19 @@ def _create_variance_adjustment(stock_take_item):
     except Exception as e:
         logger.error(f"Error creating variance adjustment: {str(e)}")
 
-def _notify_significant_variance(stock_take_item):
+@handles('inventory.stock_take_variance')
+def _notify_significant_variance(stock_take_item_id):
     """Notify about significant variances found during stock take"""
     try:
         from core.utils import create_bulk_notifications
         from django.contrib.auth.models import User
         
+        stock_take_item = StockTakeItem.objects.select_related('stock_take', 'product').filter(
+            pk=stock_take_item_id
+        ).first()
+        if stock_take_item is None:
+            return
+        
         # Notify inventory managers about significant variances
         managers = User.objects.filter(
             profile__user_type__in=['sales_manager', 'blitzhub_admin', 'it_admin'],
@@ -754,6 +673,38 @@ def _apply_category_defaults_to_products(category):
     except Exception as e:
         logger.error(f"Error applying category defaults: {str(e)}")
 
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def invalidate_category_rollups(sender, instance, **kwargs):
+    """
+    Drop cached category subtree totals.
+    
+    Product saves cover stock changes too, since every movement ends in a
+    product stock sync.
+    """
+    Category.invalidate_rollups()
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=StockLevel)
+@receiver(post_delete, sender=StockLevel)
+@receiver(post_save, sender=StockMovement)
+def invalidate_product_card(sender, instance, **kwargs):
+    """Drop the cached scan card for the affected product once the change commits"""
+    from .scanning import ProductCardCache
+    
+    product_id = instance.pk if sender is Product else instance.product_id
+    transaction.on_commit(lambda: ProductCardCache.invalidate(product_id))
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_listing_facets(sender, instance, **kwargs):
+    """Expire cached product list facet counts"""
+    from .listing import invalidate_facets
+    
+    invalidate_facets()
+
 @receiver(post_save, sender=Supplier)
 def handle_supplier_changes(sender, instance, created, **kwargs):
     """
@@ -791,6 +742,90 @@ def _handle_supplier_updates(supplier):
     except Exception as e:
         logger.error(f"Error handling supplier updates: {str(e)}")
 
+# =====================================
+# EXCHANGE RATE HISTORY
+# =====================================
+
+@receiver(post_save, sender=Currency)
+def record_exchange_rate_history(sender, instance, raw=False, **kwargs):
+    """
+    Append manually entered rates (forms, admin) to the rate history.
+    
+    Provider refreshes bulk update currencies and write their own history.
+    """
+    if raw:
+        return
+    
+    try:
+        from .fx import record_rate
+        
+        record_rate(instance, source='manual')
+    except Exception as e:
+        logger.error(f"Error recording exchange rate history for {instance.code}: {str(e)}")
+
+# =====================================
+# CURRENCY CONVERSION TABLE
+# =====================================
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def refresh_conversion_table(sender, instance, **kwargs):
+    """Rebuild the in-process rate tables after a currency change"""
+    from .conversion import rates_changed
+    
+    rates_changed()
+
+@receiver(request_started)
+def start_conversion_request(sender, **kwargs):
+    """Let the rate table check its version once in this request"""
+    from .conversion import start_request
+    
+    start_request()
+
+@receiver(request_finished)
+def finish_conversion_request(sender, **kwargs):
+    from .conversion import finish_request
+    
+    finish_request()
+
+# =====================================
+# MOBILE SYNC CHANGE LOG
+# =====================================
+
+SYNC_ENTITY_BY_MODEL = {
+    Product: 'product',
+    StockLevel: 'stock_level',
+    Category: 'category',
+    Brand: 'brand',
+    Supplier: 'supplier',
+    Location: 'location',
+}
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=StockLevel)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Location)
+def record_sync_upsert(sender, instance, raw=False, **kwargs):
+    """Append the change to the mobile sync log once committed"""
+    from .sync import record_changes
+    
+    if not raw:
+        record_changes(SYNC_ENTITY_BY_MODEL[sender], [instance.pk])
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=StockLevel)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Location)
+def record_sync_delete(sender, instance, **kwargs):
+    """Tombstone the deleted row in the mobile sync log once committed"""
+    from .sync import record_changes
+    
+    record_changes(SYNC_ENTITY_BY_MODEL[sender], [instance.pk], action='delete')
+
 # =====================================
 # CLEANUP AND MAINTENANCE SIGNALS
 # =====================================
@@ -0,0 +1,203 @@
+# inventory/sync.py - Mobile Delta Sync
+
+"""
+Cursor-based delta sync for the mobile app.
+
+Every product, stock level, category, brand, supplier and location write
+appends a row to the SyncChange log; its id is a monotonically increasing
+change sequence number. A device keeps the highest sequence it has applied
+as its cursor and pages through the changes after it, so a sync costs time
+proportional to what changed rather than to the size of the catalog:
+
+- saves and deletes are recorded by signals (see inventory.signals)
+- bulk writes that bypass signals call record_changes() themselves
+- deletes are tombstones, so devices drop rows they should no longer have
+- several changes to one row inside a page collapse to its current state
+
+Changes are recorded after the writing transaction commits, so a sequence
+number never becomes visible before the data it describes, and pages only
+include changes older than VISIBILITY_LAG_SECONDS so that two commits racing
+for neighbouring sequence numbers cannot be skipped.
+
+The log is pruned after SYNC_CHANGE_RETENTION_DAYS. A device whose cursor
+is older than the oldest retained change (or ahead of the log after a
+restore) gets reset=True and must bootstrap from the offline catalog.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Entity -> (model label, response key, fields sent to devices)
+SYNC_ENTITIES = {
+    'product': ('inventory.Product', 'products', (
+        'id', 'sku', 'name', 'barcode', 'qr_code', 'category_id', 'brand_id', 'supplier_id',
+        'selling_price', 'current_stock', 'available_stock', 'reorder_level', 'is_active', 'updated_at',
+    )),
+    'stock_level': ('inventory.StockLevel', 'stock_levels', (
+        'id', 'product_id', 'location_id', 'quantity', 'reserved_quantity',
+    )),
+    'category': ('inventory.Category', 'categories', ('id', 'name', 'parent_id', 'is_active')),
+    'brand': ('inventory.Brand', 'brands', ('id', 'name', 'is_active')),
+    'supplier': ('inventory.Supplier', 'suppliers', ('id', 'name', 'supplier_code', 'is_active')),
+    'location': ('inventory.Location', 'locations', ('id', 'name', 'location_code', 'is_active')),
+}
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+
+# Changes younger than this are held back (see module docstring)
+VISIBILITY_LAG_SECONDS = 2
+
+
+def record_changes(entity, object_ids, action='upsert'):
+    """
+    Append changes to the sync log once the current transaction commits.
+
+    Args:
+        entity: Key of SYNC_ENTITIES
+        object_ids: Primary keys of the changed rows
+        action: 'upsert' or 'delete'
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+
+    def write():
+        from .models import SyncChange
+
+        try:
+            SyncChange.objects.bulk_create(
+                [SyncChange(entity=entity, object_id=object_id, action=action) for object_id in object_ids],
+                batch_size=1000
+            )
+        except Exception as e:
+            logger.error(f"Error recording {len(object_ids)} {entity} sync changes: {e}")
+
+    transaction.on_commit(write)
+
+
+class ChangeFeed:
+    """
+    Pages of the sync log for device cursors
+    """
+
+    @staticmethod
+    def _visible():
+        from .models import SyncChange
+
+        return SyncChange.objects.filter(
+            created_at__lte=timezone.now() - timedelta(seconds=VISIBILITY_LAG_SECONDS)
+        )
+
+    @classmethod
+    def head(cls):
+        """Sequence number a freshly bootstrapped device starts from"""
+        return cls._visible().aggregate(head=Max('id'))['head'] or 0
+
+    @classmethod
+    def cursor_is_valid(cls, cursor):
+        """Whether every change after the cursor is still in the log"""
+        from .models import SyncChange
+
+        bounds = SyncChange.objects.aggregate(oldest=Min('id'), latest=Max('id'))
+        if bounds['oldest'] is None:
+            return cursor == 0
+        if cursor > bounds['latest']:
+            return False
+        # Everything up to the oldest retained change has been pruned (or reset)
+        return cursor >= bounds['oldest'] - 1
+
+    @classmethod
+    def page(cls, cursor, limit=DEFAULT_PAGE_SIZE):
+        """
+        Changes after a cursor.
+
+        Args:
+            cursor: Highest sequence number the device has applied
+            limit: Maximum log entries read for this page
+
+        Returns:
+            Dict with the new cursor, has_more, reset, current rows per
+            entity and deleted ids per entity
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        cursor = max(0, int(cursor))
+
+        if not cls.cursor_is_valid(cursor):
+            return {'cursor': cls.head(), 'reset': True, 'has_more': False}
+
+        changes = list(
+            cls._visible().filter(id__gt=cursor).order_by('id').values_list('id', 'entity', 'object_id', 'action')[:limit + 1]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        # A reset marker inside the page means the data was replaced wholesale
+        if any(entity == 'reset' for _, entity, _, _ in changes):
+            return {'cursor': cls.head(), 'reset': True, 'has_more': False}
+
+        # Last action per row wins
+        latest = {}
+        for _, entity, object_id, action in changes:
+            latest[(entity, object_id)] = action
+
+        response = {
+            'cursor': changes[-1][0] if changes else cursor,
+            'reset': False,
+            'has_more': has_more,
+            'deleted': {},
+            'timestamp': timezone.now().isoformat(),
+        }
+
+        for entity, (label, key, fields) in SYNC_ENTITIES.items():
+            upserted = [object_id for (kind, object_id), action in latest.items() if kind == entity and action == 'upsert']
+            deleted = [object_id for (kind, object_id), action in latest.items() if kind == entity and action == 'delete']
+
+            rows = []
+            if upserted:
+                rows = list(apps.get_model(label).objects.filter(pk__in=upserted).values(*fields))
+                # Rows deleted after this page's change are tombstoned here already
+                deleted.extend(set(upserted) - {row['id'] for row in rows})
+
+            response[key] = rows
+            response['deleted'][key] = sorted(deleted)
+
+        return response
+
+    @staticmethod
+    def reset():
+        """
+        Invalidate every device cursor (after a restore or bulk rewrite).
+
+        The log is cleared and a single reset marker is written, so any older
+        cursor fails validation and the device bootstraps again.
+        """
+        from .models import SyncChange
+
+        with transaction.atomic():
+            SyncChange.objects.all().delete()
+            SyncChange.objects.create(entity='reset', object_id=0)
+
+    @staticmethod
+    def prune(retention_days=None):
+        """Delete changes older than the retention period; returns the count"""
+        from .models import SyncChange
+
+        if retention_days is None:
+            retention_days = getattr(settings, 'INVENTORY_SETTINGS', {}).get('SYNC_CHANGE_RETENTION_DAYS', 30)
+
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        latest_id = SyncChange.objects.aggregate(latest=Max('id'))['latest']
+        # Always keep the newest entry so the retained range stays anchored
+        deleted, _ = SyncChange.objects.filter(created_at__lt=cutoff).exclude(id=latest_id).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} sync changes older than {retention_days} days")
+        return deleted
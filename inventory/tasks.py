@@ -0,0 +1,399 @@
+# inventory/tasks.py - Background Tasks
+
+"""
+Periodic inventory tasks.
+
+These are the tasks named in settings.CELERY_BEAT_SCHEDULE. Each one is:
+
+- locked: a lock on the task's TaskState row keeps overlapping runs from
+  colliding, across processes and hosts; a run that finds the lock held is
+  skipped, not queued behind it
+- idempotent: running a task twice in a row does no extra work (rates are
+  fetched conditionally, alerts are only raised where none is open, the
+  daily reports are sent once per day, pruning deletes by age)
+- chunked: product-wide work runs in CHUNK_SIZE batches of ids, so no run
+  holds one long transaction
+- measured: the duration and outcome of each run are logged and kept in the
+  cache per task (task_metrics()); when each task last ran is kept on its
+  TaskState row, which is what the local scheduler reads to decide whether
+  it is due
+
+With Celery installed the tasks are registered as shared tasks under their
+inventory.tasks.* names, for the worker and beat. enqueue() sends them to the
+broker when INVENTORY_SETTINGS['TASK_BACKEND'] is 'celery' and runs them in
+process otherwise; request_run() is for callers that must not wait, such as
+views, and without a broker records the run for the scheduler instead. The
+run_scheduled_tasks command runs the same schedule (and those requests)
+without a broker, so everything works (and is testable) without Redis.
+"""
+
+import logging
+import time
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+try:
+    from celery import shared_task
+except ImportError:  # Celery is optional; tasks then run in process
+    shared_task = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+METRICS_KEY = 'inventory:task_metrics:{}'
+
+# Registered tasks by name
+TASKS = {}
+
+
+def _inventory_settings():
+    return getattr(settings, 'INVENTORY_SETTINGS', {})
+
+
+# =====================================
+# TASK REGISTRATION, LOCKING AND METRICS
+# =====================================
+
+def inventory_task(lock_seconds=600):
+    """
+    Register a function as an inventory task.
+
+    The run holds the task's lock for at most lock_seconds (a crashed worker
+    cannot block the task for longer) and records its duration and outcome.
+    """
+    def decorator(func):
+        name = f'{__name__}.{func.__name__}'
+
+        @wraps(func)
+        def run(*args, **kwargs):
+            return _run(name, func, lock_seconds, args, kwargs)
+
+        task = shared_task(name=name, ignore_result=True)(run) if shared_task else run
+        TASKS[name] = task
+        return task
+    return decorator
+
+
+def _run(name, func, lock_seconds, args, kwargs):
+    token = uuid.uuid4().hex
+    if not _acquire(name, token, lock_seconds):
+        logger.info(f"Task {name} skipped: a previous run still holds the lock")
+        _record(name, 'skipped', 0)
+        return {'status': 'skipped', 'reason': 'locked'}
+
+    started = time.perf_counter()
+    status = 'failed'
+    try:
+        result = func(*args, **kwargs)
+        status = result.get('status', 'ok') if isinstance(result, dict) else 'ok'
+    except Exception as e:
+        duration = time.perf_counter() - started
+        logger.error(f"Task {name} failed after {duration:.2f}s: {str(e)}")
+        _record(name, 'failed', duration, error=str(e))
+        raise
+    finally:
+        _release(name, token, status)
+
+    duration = time.perf_counter() - started
+    logger.info(f"Task {name} {status} in {duration:.2f}s: {result}")
+    _record(name, status, duration)
+    return result
+
+
+def _acquire(name, token, lock_seconds):
+    """Take the task's lock unless another run holds an unexpired one"""
+    from django.db.models import Q
+    from .models import TaskState
+
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+    claim = {'lock_token': token, 'locked_until': now + timedelta(seconds=lock_seconds)}
+    if TaskState.objects.filter(free, name=name).update(**claim):
+        return True
+    # First run of the task anywhere: create its row, then race for it
+    TaskState.objects.bulk_create([TaskState(name=name)], ignore_conflicts=True)
+    return bool(TaskState.objects.filter(free, name=name).update(**claim))
+
+
+def _release(name, token, status):
+    """Record the run and free the lock if this run still holds it"""
+    from .models import TaskState
+
+    now = timezone.now()
+    TaskState.objects.filter(name=name).update(last_run=now, last_status=status[:20])
+    TaskState.objects.filter(name=name, lock_token=token).update(lock_token='', locked_until=None)
+
+
+def last_run(name):
+    """When a task last ran (finished, whatever the outcome), or None"""
+    from .models import TaskState
+
+    return TaskState.objects.filter(name=name).values_list('last_run', flat=True).first()
+
+
+def _record(name, status, duration, error=''):
+    """Update the task's run counters (best effort; last writer wins)"""
+    key = METRICS_KEY.format(name)
+    metrics = cache.get(key) or {
+        'runs': 0, 'failures': 0, 'skipped': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+    }
+    if status == 'skipped':
+        metrics['skipped'] += 1
+    else:
+        metrics['runs'] += 1
+        metrics['total_seconds'] += duration
+        metrics['max_seconds'] = max(metrics['max_seconds'], duration)
+        metrics['last_seconds'] = round(duration, 3)
+        metrics['last_run'] = timezone.now().isoformat()
+        if status == 'failed':
+            metrics['failures'] += 1
+            metrics['last_error'] = error[:500]
+    metrics['last_status'] = status
+    cache.set(key, metrics, None)
+
+
+def task_metrics(name=None):
+    """Run counters of one task, or of every registered task by name"""
+    if name is not None:
+        return cache.get(METRICS_KEY.format(name)) or {}
+    return {task_name: cache.get(METRICS_KEY.format(task_name)) or {} for task_name in TASKS}
+
+
+def _task_name(name):
+    return name if name in TASKS else f'{__name__}.{name}'
+
+
+def _uses_broker():
+    return bool(shared_task) and _inventory_settings().get('TASK_BACKEND', 'local') == 'celery'
+
+
+def enqueue(name, **kwargs):
+    """
+    Start a task: on the broker with the celery backend, otherwise in process.
+
+    Returns:
+        The Celery AsyncResult, or the task's result when run in process
+    """
+    task = TASKS[_task_name(name)]
+    if _uses_broker():
+        return task.delay(**kwargs)
+    return task(**kwargs)
+
+
+def request_run(name, **kwargs):
+    """
+    Start a task outside the current request: on the broker with the celery
+    backend, otherwise recorded on its TaskState row for the next pass of
+    run_scheduled_tasks (a later request replaces the arguments of one not
+    yet run). kwargs must be JSON-serializable.
+
+    Returns:
+        The Celery AsyncResult, or None when recorded for the scheduler
+    """
+    from .models import TaskState
+
+    name = _task_name(name)
+    task = TASKS[name]
+    if _uses_broker():
+        return task.delay(**kwargs)
+
+    values = {'requested_at': timezone.now(), 'requested_kwargs': kwargs}
+    if not TaskState.objects.filter(name=name).update(**values):
+        TaskState.objects.bulk_create([TaskState(name=name)], ignore_conflicts=True)
+        TaskState.objects.filter(name=name).update(**values)
+    logger.info(f"Task {name} requested for the scheduler: {kwargs}")
+    return None
+
+
+def run_requested():
+    """
+    Run the tasks requested with request_run(), once each.
+
+    Returns:
+        (name, result) pairs
+    """
+    from .models import TaskState
+
+    ran = []
+    requested = TaskState.objects.filter(requested_at__isnull=False, name__in=list(TASKS))
+    for name, requested_at, kwargs in requested.values_list('name', 'requested_at', 'requested_kwargs'):
+        # Claim the request; another scheduler that got there first runs it
+        if not TaskState.objects.filter(name=name, requested_at=requested_at).update(
+            requested_at=None, requested_kwargs={}
+        ):
+            continue
+        try:
+            result = TASKS[name](**kwargs)
+        except Exception as e:
+            # Logged and counted by the task itself
+            ran.append((name, f'failed: {e}'))
+            continue
+        if isinstance(result, dict) and result.get('status') == 'skipped':
+            # A run without these arguments holds the lock; keep the request for the next pass
+            TaskState.objects.filter(name=name, requested_at__isnull=True).update(
+                requested_at=requested_at, requested_kwargs=kwargs
+            )
+        ran.append((name, result))
+    return ran
+
+
+def _chunks(queryset):
+    """Ids of a queryset in CHUNK_SIZE lists"""
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+# =====================================
+# SCHEDULED TASKS
+# =====================================
+
+@inventory_task(lock_seconds=300)
+def update_exchange_rates(force=False, all_active=False):
+    """
+    Refresh currency rates from the configured provider.
+
+    force (a manual refresh) runs even with AUTO_UPDATE_EXCHANGE_RATES off;
+    all_active also updates active currencies without auto_update_enabled.
+    """
+    from .fx import ExchangeRateService
+    from .models import Currency
+
+    if not force and not _inventory_settings().get('AUTO_UPDATE_EXCHANGE_RATES', False):
+        return {'status': 'disabled'}
+
+    currencies = Currency.objects.filter(is_active=True) if all_active else None
+    result = ExchangeRateService.refresh(currencies=currencies, force=force)
+    return {
+        'status': result['status'],
+        'updated': sorted(result['updated']),
+        'missing': result['missing'],
+    }
+
+
+@inventory_task(lock_seconds=900)
+def check_low_stock_levels():
+    """Raise missing reorder alerts and resolve the ones stock has recovered from"""
+    from django.db.models import F
+    from .models import Product, ReorderAlert
+    from .reorder import OPEN_ALERT_STATUSES, ReorderAlertEvaluator
+
+    if not _inventory_settings().get('ENABLE_LOW_STOCK_ALERTS', True):
+        return {'status': 'disabled'}
+
+    resolved = ReorderAlert.objects.filter(status__in=OPEN_ALERT_STATUSES).exclude(
+        product__is_active=True, product__available_stock__lte=F('product__reorder_level')
+    ).update(status='resolved', resolved_at=timezone.now())
+
+    created, by_priority = 0, {}
+    candidates = Product.objects.filter(is_active=True, available_stock__lte=F('reorder_level'))
+    for chunk in _chunks(candidates):
+        result = ReorderAlertEvaluator.evaluate(chunk)
+        created += result['created']
+        for priority, count in result['by_priority'].items():
+            by_priority[priority] = by_priority.get(priority, 0) + count
+
+    return {'status': 'ok', 'created': created, 'resolved': resolved, 'by_priority': by_priority}
+
+
+@inventory_task(lock_seconds=3600)
+def generate_daily_reports(report_types=('valuation', 'low-stock')):
+    """Email the daily stock reports, once per day"""
+    import os
+    from django.core.management import call_command
+
+    config = _inventory_settings()
+    recipients = [email.strip() for email in config.get('REPORT_EMAIL_RECIPIENTS', []) if email.strip()]
+    if not config.get('GENERATE_DAILY_REPORTS', False) or not recipients:
+        return {'status': 'disabled'}
+
+    from .models import TaskState
+
+    name = f'{__name__}.generate_daily_reports'
+    today = timezone.localdate()
+    if TaskState.objects.filter(name=name, completed_on=today).exists():
+        return {'status': 'already_sent', 'date': today.isoformat()}
+
+    report_dir = str(config.get('REPORT_DIR', os.path.join(settings.BASE_DIR, 'reports', 'inventory')))
+    os.makedirs(report_dir, exist_ok=True)
+
+    generated, failed = [], []
+    for report_type in report_types:
+        output_file = os.path.join(report_dir, f'{report_type}_{today:%Y%m%d}.csv')
+        try:
+            call_command(
+                'generate_stock_report', report_type=report_type, format='csv',
+                output_file=output_file, email=','.join(recipients), verbosity=0
+            )
+            generated.append(report_type)
+        except (Exception, SystemExit) as e:
+            # The command exits on failure; keep going with the other reports
+            logger.error(f"Daily {report_type} report failed: {str(e)}")
+            failed.append(report_type)
+
+    if not failed:
+        TaskState.objects.filter(name=name).update(completed_on=today)
+    return {'status': 'ok' if not failed else 'partial', 'generated': generated, 'failed': failed}
+
+
+@inventory_task(lock_seconds=3600)
+def cleanup_old_data():
+    """Prune the sync change log, mobile idempotency keys, old import sessions and snapshots"""
+    from .backup import prune_snapshots
+    from .models import ImportSession, MobileOperation
+    from .sync import ChangeFeed
+
+    config = _inventory_settings()
+    now = timezone.now()
+
+    sync_changes = ChangeFeed.prune()
+
+    mobile_cutoff = now - timedelta(days=config.get('SYNC_CHANGE_RETENTION_DAYS', 30))
+    mobile_operations = 0
+    for chunk in _chunks(MobileOperation.objects.filter(created_at__lt=mobile_cutoff)):
+        mobile_operations += MobileOperation.objects.filter(pk__in=chunk).delete()[0]
+
+    # Running and failed sessions are resume checkpoints; only finished ones go
+    import_cutoff = now - timedelta(days=config.get('IMPORT_SESSION_RETENTION_DAYS', 90))
+    import_sessions = 0
+    for chunk in _chunks(ImportSession.objects.filter(status='completed', updated_at__lt=import_cutoff)):
+        import_sessions += ImportSession.objects.filter(pk__in=chunk).delete()[0]
+
+    snapshots = prune_snapshots()
+
+    return {
+        'status': 'ok',
+        'sync_changes': sync_changes,
+        'mobile_operations': mobile_operations,
+        'import_sessions': import_sessions,
+        'snapshots': len(snapshots),
+    }
+
+
+@inventory_task(lock_seconds=600)
+def refresh_offline_catalog():
+    """Rebuild the mobile offline catalog when the catalog has changed"""
+    from .offline import OfflineCatalog
+
+    return {'status': 'ok', 'rebuilt': OfflineCatalog.refresh()}
+
+
+@inventory_task(lock_seconds=120)
+def flush_notification_digests():
+    """Send the summaries of notification digest windows that have passed"""
+    from core.notifications import NotificationDispatcher
+
+    return {'status': 'ok', 'sent': NotificationDispatcher.flush_digests()}
+
+
+@inventory_task(lock_seconds=1800)
+def detect_duplicates(full=False):
+    """Rescan for duplicate products (incrementally unless full)"""
+    from .duplicates import DuplicateDetector
+
+    return {'status': 'ok', **DuplicateDetector.run(full=full)}
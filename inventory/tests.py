@@ -0,0 +1,1527 @@
+# inventory/tests.py - Inventory test suite
+
+import base64
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import (
+    Brand, Category, Currency, DuplicateCandidate, DuplicateCluster, ExchangeRateHistory, ImportSession, Location,
+    PriceHistory, Product, ProductAttributeValue, PurchaseOrder, PurchaseOrderItem, ReorderAlert, StockLevel, StockMovement, Supplier,
+    StockTransfer, SupplierCountry
+)
+from . import conversion
+from .autocomplete import part_number_index
+from .backup import SnapshotError, SnapshotRestorer, SnapshotWriter
+from .duplicates import DuplicateDetector
+from .fx import ExchangeRateService, FileRateProvider, convert_at, rate_at
+from .labels import CodeImageCache, LabelSheetRenderer, product_labels
+from .importing import ProductImporter
+from .listing import ProductListing
+from .mobile import MobileBatch
+from .offline import OfflineCatalog
+from .pricing import Repricer, RepricingError
+from .purchasing import PurchaseOrderBuilder
+from .receiving import GoodsReceiver, ReceiptError
+from .reorder import ReorderAlertEvaluator
+from .parametric import ParametricSearch
+from .posting import StockPoster
+from .scanning import ProductCardCache
+from .search import ProductSearchService
+from .sync import ChangeFeed
+from . import tasks
+from .transfers import TransferError, TransferPoster
+
+
+class InventoryFixtureMixin:
+    """Shared catalog fixtures for inventory tests"""
+
+    def setUp(self):
+        cache.clear()
+        self.usd = Currency.objects.create(
+            code='USD', name='US Dollar', symbol='$', exchange_rate_to_usd=Decimal('1.000000')
+        )
+        self.country = SupplierCountry.objects.create(name='China', code='CN', region='Asia')
+        self.supplier = Supplier.objects.create(
+            name='Shenzhen Parts', supplier_code='SZP', supplier_type='distributor',
+            address_line_1='1 Market St', city='Shenzhen', country=self.country,
+            currency=self.usd
+        )
+        self.brand = Brand.objects.create(name='Generic', slug='generic')
+        self.category = Category.objects.create(name='Passives', slug='passives')
+        self._product_counter = 0
+
+    def make_product(self, category=None, **kwargs):
+        self._product_counter += 1
+        defaults = {
+            'name': f'Product {self._product_counter}',
+            'sku': f'SKU-{self._product_counter:04d}',
+            'barcode': f'BC{self._product_counter:06d}',
+            'description': 'Test product',
+            'category': category or self.category,
+            'supplier': self.supplier,
+            'brand': self.brand,
+            'cost_price': Decimal('1.00'),
+            'supplier_currency': self.usd,
+            'selling_currency': self.usd,
+            'selling_price': Decimal('2.00'),
+        }
+        defaults.update(kwargs)
+        return Product.objects.create(**defaults)
+
+
+class CategoryHierarchyTest(InventoryFixtureMixin, TestCase):
+    """Materialized category paths and subtree rollups"""
+
+    def setUp(self):
+        super().setUp()
+        self.resistors = Category.objects.create(name='Resistors', slug='resistors', parent=self.category)
+        self.smd = Category.objects.create(name='SMD Resistors', slug='smd-resistors', parent=self.resistors)
+
+    def test_paths_follow_parents(self):
+        self.assertEqual(self.category.tree_path, f'{self.category.pk}/')
+        self.assertEqual(self.smd.tree_path, f'{self.category.pk}/{self.resistors.pk}/{self.smd.pk}/')
+        self.assertEqual(self.smd.tree_depth, 2)
+        self.assertEqual(self.smd.full_path, 'Passives > Resistors > SMD Resistors')
+
+    def test_move_reroots_subtree(self):
+        actives = Category.objects.create(name='Actives', slug='actives')
+        self.resistors.parent = actives
+        self.resistors.save()
+
+        self.smd.refresh_from_db()
+        self.assertEqual(self.smd.tree_path, f'{actives.pk}/{self.resistors.pk}/{self.smd.pk}/')
+        self.assertEqual(self.smd.tree_depth, 2)
+        self.assertEqual(list(self.category.get_descendants()), [])
+
+    def test_cannot_move_below_descendant(self):
+        self.category.parent = self.smd
+        with self.assertRaises(ValueError):
+            self.category.save()
+
+    def test_subtree_rollups(self):
+        self.make_product(category=self.smd, current_stock=10, total_stock=10)
+        self.make_product(category=self.resistors, total_stock=5)
+        self.make_product(category=self.category, is_active=False, total_stock=100)
+
+        self.assertEqual(self.category.get_product_count(), 3)
+        self.assertEqual(self.resistors.get_product_count(), 2)
+        self.assertEqual(self.smd.get_product_count(), 1)
+        # Inactive products are excluded from the stock value
+        self.assertEqual(self.category.get_total_stock_value(), self.resistors.get_total_stock_value())
+
+    def test_rollups_are_cached_and_invalidated(self):
+        self.make_product(category=self.smd)
+        self.category.get_product_count()
+
+        with self.assertNumQueries(0):
+            for category in (self.category, self.resistors, self.smd):
+                category.get_product_count()
+                category.get_total_stock_value()
+
+        self.make_product(category=self.smd)
+        self.assertEqual(self.category.get_product_count(), 2)
+
+
+class ProductSearchTest(InventoryFixtureMixin, TestCase):
+    """Ranked product search (icontains fallback on SQLite)"""
+
+    def setUp(self):
+        super().setUp()
+        self.exact = self.make_product(name='Op Amp', sku='LM358', manufacturer_part_number='LM358DR')
+        self.prefix = self.make_product(name='Dual Op Amp', sku='LM358-SMD')
+        self.resistor = self.make_product(name='Resistor 10k 0805', sku='RES-0805-10K')
+        self.cap = self.make_product(name='Capacitor 10uF 0805', sku='CAP-0805-10U')
+
+    def test_exact_sku_ranks_first(self):
+        results = list(ProductSearchService.search('LM358'))
+        self.assertEqual(results[:2], [self.exact, self.prefix])
+
+    def test_all_tokens_must_match(self):
+        results = list(ProductSearchService.search('0805 10k'))
+        self.assertEqual(results, [self.resistor])
+
+    def test_short_query_and_base_queryset(self):
+        self.assertEqual(list(ProductSearchService.search('L')), [])
+        results = ProductSearchService.search('0805', queryset=Product.objects.exclude(pk=self.cap.pk))
+        self.assertEqual(list(results), [self.resistor])
+
+    def test_postgres_rank_treats_missing_vectors_as_zero(self):
+        # Compiled only; the full-text functions need PostgreSQL to run
+        queryset = ProductSearchService._postgres_search(Product.objects.all(), 'LM358', ['lm358'])
+        self.assertRegex(str(queryset.query), r'COALESCE\(ts_rank\(')
+
+
+class PartNumberIndexTest(InventoryFixtureMixin, TestCase):
+    """In-process autocomplete index"""
+
+    def setUp(self):
+        super().setUp()
+        part_number_index.invalidate()
+        self.opamp = self.make_product(name='Op Amp', sku='LM358', manufacturer_part_number='LM358-DR')
+        self.timer = self.make_product(name='Timer', sku='NE555', supplier_sku='LM-TIMER')
+
+    def test_prefix_and_compact_lookup(self):
+        self.assertEqual([p['id'] for p in part_number_index.suggest('lm358')], [self.opamp.id])
+        self.assertEqual([p['id'] for p in part_number_index.suggest('LM358DR')], [self.opamp.id])
+        self.assertEqual({p['id'] for p in part_number_index.suggest('LM')}, {self.opamp.id, self.timer.id})
+
+    def test_signals_update_index_after_commit(self):
+        part_number_index.suggest('LM')  # build
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.make_product(name='Regulator', sku='LM7805')
+        self.assertIn(added.id, [p['id'] for p in part_number_index.suggest('LM78')])
+        self.assertEqual(part_number_index.sku_owner('LM7805'), added.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        self.assertEqual(part_number_index.suggest('LM78'), [])
+        self.assertIsNone(part_number_index.sku_owner('LM7805'))
+
+    def test_stock_only_saves_skip_the_index(self):
+        part_number_index.suggest('LM')  # build
+
+        with mock.patch.object(part_number_index, 'update_product') as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.opamp.current_stock = 12
+                self.opamp.save(update_fields=['current_stock'])
+            update.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.opamp.save(update_fields=['sku', 'current_stock'])
+            update.assert_called_once()
+
+    def test_lookups_do_not_query_database(self):
+        part_number_index.suggest('NE')
+        with self.assertNumQueries(0):
+            self.assertEqual(part_number_index.sku_owner('NE555'), self.timer.id)
+            part_number_index.suggest('NE5')
+
+
+class ParametricSearchTest(InventoryFixtureMixin, TestCase):
+    """Parametric attribute index, search and facets"""
+
+    def setUp(self):
+        super().setUp()
+        self.r10k = self.make_product(dynamic_attributes={'Resistance': '10kΩ', 'Package': '0805', 'Tolerance': '±1%'})
+        self.r4k7 = self.make_product(dynamic_attributes={'Resistance': '4k7', 'Package': '0805', 'Tolerance': '±5%'})
+        self.r10k_tht = self.make_product(dynamic_attributes={'Resistance': '10 k', 'Package': 'Axial', 'Tolerance': '1 %'})
+
+    def test_values_are_parsed_to_si_units(self):
+        values = {
+            value.product_id: value
+            for value in ProductAttributeValue.objects.filter(name='Resistance')
+        }
+        self.assertEqual(values[self.r10k.id].value_numeric, 10000.0)
+        self.assertEqual(values[self.r10k.id].unit, 'Ω')
+        self.assertEqual(values[self.r4k7.id].value_numeric, 4700.0)
+
+    def test_free_text_query_requires_every_term(self):
+        results = ParametricSearch.search('0805 10kΩ ±1%')
+        self.assertEqual(list(results), [self.r10k])
+        self.assertEqual(set(ParametricSearch.search('10k 1%')), {self.r10k, self.r10k_tht})
+
+    def test_range_filter_and_facets(self):
+        results = ParametricSearch.apply_filters(
+            Product.objects.all(), {'Resistance': {'min': '5k', 'max': '20kΩ'}}
+        )
+        self.assertEqual(set(results), {self.r10k, self.r10k_tht})
+
+        facets = ParametricSearch.facet_counts(results)
+        packages = {facet['value']: facet['count'] for facet in facets['Package']}
+        self.assertEqual(packages, {'0805': 1, 'Axial': 1})
+
+    def test_reindexed_on_attribute_change(self):
+        self.r4k7.dynamic_attributes = {'Resistance': '22k'}
+        self.r4k7.save(update_fields=['dynamic_attributes'])
+        self.assertEqual(list(ParametricSearch.search('22k')), [self.r4k7])
+        self.assertFalse(ProductAttributeValue.objects.filter(product=self.r4k7, name='Package').exists())
+
+
+class ProductListingTest(InventoryFixtureMixin, TestCase):
+    """Faceted product listing"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_brand = Brand.objects.create(name='Vishay', slug='vishay')
+        self.resistors = Category.objects.create(name='Resistors', slug='resistors', parent=self.category)
+        self.in_stock = self.make_product(
+            category=self.resistors, total_stock=50, selling_price=Decimal('0.50')
+        )
+        self.low = self.make_product(total_stock=5, brand=self.other_brand, selling_price=Decimal('12.00'))
+        self.out = self.make_product(total_stock=0, selling_price=Decimal('250.00'))
+
+    def test_stock_status_annotation_matches_property(self):
+        for product in ProductListing({}).queryset():
+            self.assertEqual(product.stock_status_code, product.stock_status)
+
+    def test_facet_counts(self):
+        facets = ProductListing({}).facets()
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(
+            {entry['value']: entry['count'] for entry in facets['stock_status']},
+            {'in_stock': 1, 'low_stock': 1, 'out_of_stock': 1}
+        )
+        self.assertEqual(
+            {entry['label']: entry['count'] for entry in facets['brand']},
+            {'Generic': 2, 'Vishay': 1}
+        )
+        self.assertEqual([entry['value'] for entry in facets['price']], ['0-1', '5-20', '100+'])
+
+    def test_filters_and_subtree_category(self):
+        listing = ProductListing({'category': [str(self.category.pk)], 'stock_status': ['in_stock', 'low_stock']})
+        self.assertEqual(set(listing.queryset()), {self.in_stock, self.low})
+
+        listing = ProductListing({'price': ['100+']}, scope={'brand': self.brand.pk})
+        self.assertEqual(list(listing.queryset()), [self.out])
+
+    def test_facets_cached_until_product_changes(self):
+        ProductListing({}).facets()
+        with self.assertNumQueries(0):
+            ProductListing({}).facets()
+
+        self.make_product(total_stock=1)
+        self.assertEqual(ProductListing({}).facets()['total'], 4)
+
+    def test_list_views_provide_facets_to_the_sidebars(self):
+        from django.template.loader import get_template
+        from django.test import RequestFactory
+        from .views import BrandProductsView
+
+        request = RequestFactory().get('/', {'stock_status': 'out_of_stock'})
+        request.user = User.objects.create_superuser('lister', 'lister@example.com', 'x')
+        response = BrandProductsView.as_view()(request, pk=self.brand.pk)
+
+        context = response.context_data
+        self.assertEqual(list(context['products']), [self.out])
+        self.assertEqual(context['current_filters'], {'stock_status': 'out_of_stock'})
+        self.assertEqual([(entry['value'], entry['count']) for entry in context['facets']['stock_status']], [('out_of_stock', 1)])
+
+        # The sidebars loop over the facets and submit their values
+        for name in ('products/product_list.html', 'configuration/category_products.html', 'brand/brand_products.html'):
+            source = get_template(f'inventory/{name}').template.source
+            self.assertIn('facets.stock_status', source)
+            self.assertNotIn('out_stock', source)
+
+
+class ProductCardCacheTest(InventoryFixtureMixin, TestCase):
+    """Cached scan cards and batch lookups"""
+
+    def setUp(self):
+        super().setUp()
+        self.location = Location.objects.create(name='Main Store', location_code='MAIN', location_type='store')
+        self.product = self.make_product(sku='LM358', reorder_level=5)
+        # New products get a stock level at every active location
+        StockLevel.objects.filter(product=self.product, location=self.location).update(
+            quantity=20, reserved_quantity=2
+        )
+        self.other = self.make_product()
+
+    def test_card_contents_and_cache_hit(self):
+        card = ProductCardCache.get_card(self.product.barcode)
+        self.assertEqual(card['sku'], 'LM358')
+        self.assertEqual(card['stock_status'], 'in_stock')
+        self.assertEqual(card['stock_levels'][0]['available_quantity'], 18)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ProductCardCache.get_card('lm358')['product_id'], self.product.id)
+
+    def test_batch_lookup_single_query(self):
+        with self.assertNumQueries(2):  # products + prefetched stock levels
+            cards = ProductCardCache.get_cards([self.product.barcode, self.other.sku, 'UNKNOWN'])
+        self.assertEqual(cards[self.product.barcode]['product_id'], self.product.id)
+        self.assertEqual(cards[self.other.sku]['product_id'], self.other.id)
+        self.assertIsNone(cards['UNKNOWN'])
+
+    def test_stock_change_invalidates_card(self):
+        ProductCardCache.get_card(self.product.barcode)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_level = StockLevel.objects.get(product=self.product, location=self.location)
+            stock_level.quantity = 3
+            stock_level.save()
+        card = ProductCardCache.get_card(self.product.barcode)
+        self.assertEqual(card['stock_status'], 'low_stock')
+
+
+class DuplicateDetectorTest(InventoryFixtureMixin, TestCase):
+    """Blocked duplicate detection"""
+
+    def setUp(self):
+        super().setUp()
+        self.a = self.make_product(name='LM358 Dual Op Amp SOIC-8', manufacturer_part_number='LM358DR')
+        self.b = self.make_product(name='LM358 Dual OpAmp SOIC8', manufacturer_part_number='LM-358-DR')
+        self.c = self.make_product(name='NE555 Timer DIP-8', manufacturer_part_number='NE555P')
+        self.d = self.make_product(name='Totally Different Relay 12V')
+
+    def test_full_scan_clusters_duplicates(self):
+        stats = DuplicateDetector.run(full=True)
+        self.assertEqual(stats['duplicates_found'], 1)
+
+        candidate = DuplicateCandidate.objects.get()
+        self.assertEqual((candidate.product_a, candidate.product_b), (self.a, self.b))
+        self.assertIn('same_mpn', candidate.reasons)
+        self.assertEqual(candidate.cluster.product_count, 2)
+
+    def test_blocking_limits_pairs(self):
+        stats = DuplicateDetector.run(full=True)
+        # 4 products would be 6 pairs without blocking
+        self.assertLess(stats['candidate_pairs'], 6)
+
+    def test_incremental_scan_and_dismissal(self):
+        DuplicateDetector.run(full=True)
+        DuplicateCandidate.objects.get().dismiss(user=None)
+
+        self.c.name = 'LM358 Dual Op Amp SOIC-8 Rev B'
+        self.c.save()
+        stats = DuplicateDetector.run()
+        self.assertEqual(stats['mode'], 'incremental')
+        self.assertEqual(stats['changed_products'], 1)
+
+        open_pairs = set(
+            DuplicateCandidate.objects.filter(status='open').values_list('product_a_id', 'product_b_id')
+        )
+        self.assertIn((self.a.id, self.c.id), open_pairs)
+        self.assertNotIn((self.a.id, self.b.id), open_pairs)
+        self.assertEqual(DuplicateCluster.objects.count(), 1)
+
+    def test_scan_view_enqueues_task(self):
+        admin = User.objects.create_superuser('deduper', 'deduper@example.com', 'x')
+        self.client.force_login(admin)
+
+        with mock.patch('inventory.tasks.enqueue', return_value={
+            'status': 'ok', 'candidate_pairs': 3, 'duplicates_found': 1,
+        }) as enqueue:
+            response = self.client.post('/inventory/data/duplicates/', {'action': 'scan', 'full': '1'})
+
+        self.assertEqual(response.status_code, 302)
+        enqueue.assert_called_once_with('detect_duplicates', full=True)
+
+
+class ProductImportTest(InventoryFixtureMixin, TestCase):
+    """Batched product import"""
+
+    HEADERS = ['name', 'sku', 'category', 'supplier', 'brand', 'cost_price', 'selling_price', 'reorder_level']
+
+    def setUp(self):
+        super().setUp()
+        self.location = Location.objects.create(name='Main Store', location_code='MAIN', location_type='store')
+        self.existing = self.make_product(sku='EXIST-1', selling_price=Decimal('2.00'))
+
+    def write_csv(self, rows):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(self.HEADERS)
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def rows(self, count, start=0):
+        return [
+            {
+                'name': f'Resistor {i}', 'sku': f'RES-{i:05d}', 'category': 'Passives',
+                'supplier': 'Shenzhen Parts', 'brand': 'Yageo', 'description': '', 'model_number': '',
+                'barcode': '', 'cost_price': Decimal('0.10'), 'selling_price': Decimal('0.25'),
+                'reorder_level': 10, 'reorder_quantity': 50, 'current_stock': 0, 'is_active': True,
+            }
+            for i in range(start, start + count)
+        ]
+
+    def test_command_creates_updates_and_reports(self):
+        path = self.write_csv([
+            ['10k Resistor', 'RES-10K', 'Passives', 'Shenzhen Parts', 'Yageo', '0.01', '0.05', '100'],
+            ['Existing Updated', 'EXIST-1', 'Passives', 'Shenzhen Parts', '', '1.50', '3.00', '5'],
+            ['Duplicate', 'RES-10K', 'Passives', 'Shenzhen Parts', '', '0.01', '0.05', '1'],
+            ['Unknown Category', 'RES-1K', 'Missing', 'Shenzhen Parts', '', '0.01', '0.05', '1'],
+        ])
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_products', path, '--update-existing', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Products created: 1', output)
+        self.assertIn('Products updated: 1', output)
+        self.assertIn('Duplicate SKU "RES-10K"', output)
+        self.assertIn('Category "Missing" does not exist', output)
+
+        product = Product.objects.get(sku='RES-10K')
+        self.assertEqual(product.brand.name, 'Yageo')
+        self.assertEqual(product.supplier_currency, self.usd)
+        self.assertTrue(product.barcode.startswith('BT'))
+        self.assertEqual(product.total_cost_price_usd, Decimal('0.011500'))
+        self.assertTrue(StockLevel.objects.filter(product=product, location=self.location).exists())
+        self.assertEqual(ReorderAlert.objects.get(product=product).priority, 'critical')
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, 'Existing Updated')
+        self.assertEqual(self.existing.selling_price, Decimal('3.00'))
+        self.assertEqual(self.existing.barcode, 'BC000001')
+
+    def test_excel_import_with_worker_pool_keeps_row_numbers(self):
+        import openpyxl
+
+        workbook = openpyxl.Workbook()
+        worksheet = workbook.active
+        worksheet.append(self.HEADERS)
+        for i in range(7):
+            worksheet.append([f'Cap {i}', f'CAP-{i}', 'Passives', 'Shenzhen Parts', 'Yageo', 0.02, 0.1, 5])
+        worksheet.append(['', 'CAP-X', 'Passives', 'Shenzhen Parts', '', 0.02, 0.1, 5])
+        worksheet.append(['Bad Price', 'CAP-Y', 'Passives', 'Shenzhen Parts', '', -1, 0.1, 5])
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        workbook.save(path)
+        self.addCleanup(os.remove, path)
+
+        out = StringIO()
+        call_command('import_products', path, '--workers=2', '--batch-size=3', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Products created: 7', output)
+        self.assertIn('Row 9: Missing required field "name"', output)
+        self.assertIn('Row 10: Prices cannot be negative', output)
+        self.assertEqual(
+            list(Product.objects.filter(sku__startswith='CAP-').order_by('sku').values_list('sku', flat=True)),
+            [f'CAP-{i}' for i in range(7)]
+        )
+
+    def test_existing_skipped_without_update_flag(self):
+        importer = ProductImporter()
+        results = {'processed': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'errors': [], 'warnings': []}
+        rows = self.rows(1)
+        rows[0]['sku'] = 'EXIST-1'
+        importer.import_batch([(2, rows[0])], results)
+
+        self.assertEqual(results['skipped'], 1)
+        self.existing.refresh_from_db()
+        self.assertNotEqual(self.existing.name, 'Resistor 0')
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def batch_queries(count, start):
+            importer = ProductImporter()
+            importer.load()
+            results = {'processed': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'errors': [], 'warnings': []}
+            batch = list(enumerate(self.rows(count, start), start=2))
+            with CaptureQueriesContext(connection) as queries:
+                importer.import_batch(batch, results)
+            self.assertEqual(results['created'], count)
+            # Bulk inserts are split by the backend's parameter limit; everything else is per batch
+            return len([
+                query for query in queries.captured_queries
+                if not query['sql'].startswith('INSERT INTO "inventory_product"')
+            ])
+
+        Brand.objects.create(name='Yageo', slug='yageo')
+        self.assertEqual(batch_queries(5, 0), batch_queries(50, 100))
+
+
+class ImportSessionTest(InventoryFixtureMixin, TestCase):
+    """Resumable, fingerprinted imports"""
+
+    def setUp(self):
+        super().setUp()
+        self.location = Location.objects.create(
+            name='Main Store', location_code='MAIN', location_type='store', is_default=True
+        )
+
+    def write_csv(self, headers, rows):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def product_file(self, count):
+        return self.write_csv(
+            ['name', 'sku', 'category', 'supplier', 'cost_price', 'selling_price'],
+            [[f'Diode {i}', f'DIO-{i}', 'Passives', 'Shenzhen Parts', '0.01', '0.05'] for i in range(count)]
+        )
+
+    def test_identical_reimport_issues_no_writes(self):
+        path = self.product_file(4)
+        call_command('import_products', path, '--update-existing', stdout=StringIO())
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_products', path, '--update-existing', stdout=out)
+
+        self.assertIn('nothing to import', out.getvalue())
+        writes = [query['sql'] for query in queries.captured_queries
+                  if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+
+    def test_resume_continues_after_failed_batch(self):
+        path = self.product_file(6)
+        original_write = ProductImporter._write
+        calls = []
+
+        def failing_write(importer, to_create, to_update):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return original_write(importer, to_create, to_update)
+
+        with mock.patch.object(ProductImporter, '_write', failing_write):
+            call_command('import_products', path, '--batch-size=2', stdout=StringIO())
+        self.assertEqual(Product.objects.filter(sku__startswith='DIO-').count(), 4)
+        session = ImportSession.objects.get()
+        self.assertEqual(session.last_committed_row, 3)
+
+        out = StringIO()
+        call_command('import_products', path, '--batch-size=2', '--resume', stdout=out)
+        output = out.getvalue()
+        self.assertIn('Resuming after row 3', output)
+        self.assertIn('Products created: 2', output)
+        self.assertIn('Products unchanged: 2', output)
+        self.assertEqual(Product.objects.filter(sku__startswith='DIO-').count(), 6)
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'completed')
+
+    def test_stock_import_rerun_does_not_double_post(self):
+        product = self.make_product(sku='LED-RED')
+        call_command(
+            'update_stock_levels', import_file=self.write_csv(['sku', 'quantity'], [['LED-RED', '25']]),
+            stdout=StringIO()
+        )
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 1)
+
+        # A changed file (new row) reapplies only what changed
+        other = self.make_product(sku='LED-GREEN')
+        call_command(
+            'update_stock_levels',
+            import_file=self.write_csv(['sku', 'quantity'], [['LED-RED', '25'], ['LED-GREEN', '5']]),
+            stdout=StringIO()
+        )
+        self.assertEqual(StockMovement.objects.filter(product=product).count(), 1)
+        self.assertEqual(StockMovement.objects.filter(product=other).count(), 1)
+
+    def test_stock_import_repeating_old_count_corrects_moved_stock(self):
+        product = self.make_product(sku='LED-RED')
+        call_command(
+            'update_stock_levels', import_file=self.write_csv(['sku', 'quantity'], [['LED-RED', '25']]),
+            stdout=StringIO()
+        )
+        StockPoster.post([{
+            'product_id': product.pk, 'location_id': self.location.pk, 'movement_type': 'sale', 'quantity': -5,
+        }])
+        product.refresh_from_db()
+        self.assertEqual(product.current_stock, 20)
+
+        # A later count file with the same count as before is still applied
+        call_command(
+            'update_stock_levels',
+            import_file=self.write_csv(['sku', 'quantity', 'reference'], [['LED-RED', '25', 'Recount']]),
+            stdout=StringIO()
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.current_stock, 25)
+
+
+class SnapshotBackupTest(InventoryFixtureMixin, TestCase):
+    """Chunked snapshot backup and restore"""
+
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.product = self.make_product(sku='CAP-100N', selling_price=Decimal('0.15'))
+        self.other = self.make_product(sku='CAP-10U')
+
+    def move(self, quantity):
+        return StockMovement.objects.create(
+            product=self.product, movement_type='in', quantity=quantity,
+            previous_stock=0, new_stock=quantity, reference='TEST'
+        )
+
+    def test_restore_brings_back_snapshot_rows(self):
+        created_at = self.product.created_at
+        manifest = SnapshotWriter(root=self.root).write()
+        self.assertEqual(
+            next(entry for entry in manifest['models'] if entry['model'] == 'inventory.Product')['rows'], 2
+        )
+
+        other_pk = self.other.pk
+        Product.objects.filter(pk=self.product.pk).update(selling_price=Decimal('9.99'))
+        self.other.delete()
+
+        SnapshotRestorer(manifest['name'], root=self.root).restore()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.selling_price, Decimal('0.15'))
+        self.assertEqual(self.product.created_at, created_at)
+        self.assertTrue(Product.objects.filter(pk=other_pk, sku='CAP-10U').exists())
+
+    def test_incremental_snapshot_holds_only_new_movements(self):
+        first = self.move(10)
+        full = SnapshotWriter(root=self.root).write()
+        second = self.move(5)
+        incremental = SnapshotWriter(root=self.root, incremental=True).write()
+
+        self.assertEqual(incremental['base'], full['name'])
+        movements = next(entry for entry in incremental['models'] if entry['model'] == 'inventory.StockMovement')
+        self.assertTrue(movements['incremental'])
+        self.assertEqual(movements['rows'], 1)
+
+        StockMovement.objects.all().delete()
+        SnapshotRestorer(incremental['name'], root=self.root).restore()
+        self.assertEqual(
+            set(StockMovement.objects.values_list('pk', flat=True)), {first.pk, second.pk}
+        )
+
+    def test_corrupt_chunk_is_rejected_before_writing(self):
+        manifest = SnapshotWriter(root=self.root).write()
+        entry = next(entry for entry in manifest['models'] if entry['model'] == 'inventory.Product')
+        with open(os.path.join(self.root, manifest['name'], entry['chunks'][0]['file']), 'ab') as chunk_file:
+            chunk_file.write(b'garbage')
+
+        Product.objects.filter(pk=self.product.pk).update(selling_price=Decimal('9.99'))
+        with self.assertRaises(SnapshotError):
+            SnapshotRestorer(manifest['name'], root=self.root).restore()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.selling_price, Decimal('9.99'))
+
+    def test_names_outside_the_backup_root_are_rejected(self):
+        manifest = SnapshotWriter(root=self.root).write()
+        outside = os.path.basename(tempfile.mkdtemp(dir=os.path.dirname(self.root)))
+        self.addCleanup(shutil.rmtree, os.path.join(os.path.dirname(self.root), outside), ignore_errors=True)
+
+        with self.assertRaises(SnapshotError):
+            SnapshotRestorer(f'../{outside}', root=self.root).restore()
+        with self.assertRaises(SnapshotError):
+            SnapshotRestorer(f"{manifest['name']}/../{manifest['name']}", root=self.root).restore()
+
+    def test_chunk_paths_outside_the_snapshot_are_rejected(self):
+        manifest = SnapshotWriter(root=self.root).write()
+        manifest_path = os.path.join(self.root, manifest['name'], 'manifest.json')
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            data = json.load(manifest_file)
+        data['models'][0]['chunks'][0]['file'] = '../../outside.jsonl.gz'
+        with open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(data, manifest_file)
+
+        with self.assertRaisesRegex(SnapshotError, 'outside snapshot'):
+            SnapshotRestorer(manifest['name'], root=self.root).verify()
+
+    def test_restore_view_rejects_unknown_snapshot(self):
+        admin = User.objects.create_superuser('restorer', 'restorer@example.com', 'pw')
+        self.client.force_login(admin)
+        with mock.patch('inventory.backup.backup_root', return_value=self.root):
+            response = self.client.post('/inventory/data/restore/', {'snapshot': '../../etc'}, follow=True)
+        self.assertContains(response, 'Unknown snapshot')
+
+
+class LabelRenderingTest(InventoryFixtureMixin, TestCase):
+    """Content-addressed code images and vector label sheets"""
+
+    def test_images_render_once_per_content(self):
+        with mock.patch('inventory.labels.render_png', return_value=b'png') as render:
+            self.assertEqual(CodeImageCache.get_png('code128', 'BT000001'), b'png')
+            self.assertEqual(CodeImageCache.get_png('code128', 'BT000001'), b'png')
+            CodeImageCache.get_png('qr', {'sku': 'BT000001'})
+            images = CodeImageCache.get_many_base64([
+                ('code128', 'BT000001', None), ('code128', 'BT000002', None), ('code128', 'BT000002', None),
+            ])
+        self.assertEqual(render.call_count, 3)
+        self.assertEqual(len(images), 3)
+
+    def test_barcode_manager_returns_cached_png(self):
+        from .utils import BarcodeManager
+
+        first = BarcodeManager.generate_barcode('BT000001')
+        self.assertEqual(first, BarcodeManager.generate_barcode('BT000001'))
+        self.assertTrue(base64.b64decode(first).startswith(b'\x89PNG'))
+
+    def test_label_sheet_pages_and_parts(self):
+        products = [self.make_product() for _ in range(31)]
+        labels = product_labels(products)
+        renderer = LabelSheetRenderer('avery_5160')
+
+        pdf = renderer.render(labels)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 2)
+
+        with mock.patch('inventory.labels.PAGES_PER_PART', 1):
+            parts = renderer.render_parts(labels)
+        self.assertEqual(len(parts), 2)
+
+
+class DeltaSyncTest(InventoryFixtureMixin, TestCase):
+    """Change-log cursor sync for mobile devices"""
+
+    def setUp(self):
+        super().setUp()
+        lag = mock.patch('inventory.sync.VISIBILITY_LAG_SECONDS', 0)
+        lag.start()
+        self.addCleanup(lag.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resistor = self.make_product(sku='RES-10K')
+            self.capacitor = self.make_product(sku='CAP-100N')
+        self.cursor = ChangeFeed.head()
+
+    def test_page_returns_current_rows_and_tombstones(self):
+        capacitor_id = self.capacitor.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resistor.selling_price = Decimal('0.25')
+            self.resistor.save()
+            self.resistor.save()
+            self.capacitor.delete()
+
+        page = ChangeFeed.page(self.cursor)
+        self.assertFalse(page['reset'])
+        self.assertEqual([row['sku'] for row in page['products']], ['RES-10K'])
+        self.assertEqual(page['products'][0]['selling_price'], Decimal('0.25'))
+        self.assertEqual(page['deleted']['products'], [capacitor_id])
+
+        follow_up = ChangeFeed.page(page['cursor'])
+        self.assertEqual(follow_up['products'], [])
+        self.assertEqual(follow_up['cursor'], page['cursor'])
+
+    def test_pages_through_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                self.make_product()
+
+        first = ChangeFeed.page(self.cursor, limit=3)
+        self.assertTrue(first['has_more'])
+        rest = ChangeFeed.page(first['cursor'], limit=100)
+        self.assertFalse(rest['has_more'])
+        skus = {row['sku'] for row in first['products'] + rest['products']}
+        self.assertEqual(len(skus), 5)
+
+    def test_cursor_before_reset_must_bootstrap(self):
+        ChangeFeed.reset()
+        self.assertTrue(ChangeFeed.page(self.cursor)['reset'])
+        self.assertFalse(ChangeFeed.page(ChangeFeed.head())['reset'])
+
+    def test_sync_api_without_cursor_asks_for_bootstrap(self):
+        self.client.force_login(User.objects.create_superuser('device', 'device@example.com', 'x'))
+        response = self.client.post('/inventory/api/mobile/sync/', data='{}', content_type='application/json')
+        payload = response.json()
+        self.assertTrue(payload['reset'])
+        self.assertEqual(payload['cursor'], self.cursor)
+
+    def test_sync_api_requires_login(self):
+        response = self.client.post('/inventory/api/mobile/sync/', data='{"cursor": 0}', content_type='application/json')
+        self.assertNotEqual(response.status_code, 200)
+
+
+class OfflineCatalogTest(InventoryFixtureMixin, TestCase):
+    """Prebuilt, compressed offline catalog snapshot"""
+
+    url = '/inventory/api/mobile/offline-data/'
+
+    def setUp(self):
+        super().setUp()
+        lag = mock.patch('inventory.sync.VISIBILITY_LAG_SECONDS', 0)
+        lag.start()
+        self.addCleanup(lag.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(120):
+                self.make_product()
+            self.make_product(is_active=False)
+        self.client.force_login(User.objects.create_superuser('device', 'device@example.com', 'x'))
+
+    def test_snapshot_holds_whole_active_catalog_at_cursor(self):
+        payload = OfflineCatalog.payload()
+        self.assertEqual(payload['cursor'], ChangeFeed.head())
+        products = payload['tables']['products']
+        self.assertEqual(len(products['rows']), 120)
+        sku = products['columns'].index('sku')
+        self.assertIn('SKU-0001', {row[sku] for row in products['rows']})
+
+    def test_etag_revalidation_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # Revalidation reads only the ETag key, never the snapshot body
+        with mock.patch.object(OfflineCatalog, 'get', side_effect=AssertionError('body loaded')):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertNotEqual(self.client.get(self.url).status_code, 200)
+
+    def test_serves_stored_encoding_from_accept_encoding(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['format'], 1)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br' if 'br' in OfflineCatalog.get() else 'gzip')
+
+        self.assertNotIn('Content-Encoding', self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0'))
+
+    def test_refresh_rebuilds_only_after_changes(self):
+        etag = OfflineCatalog.get()['etag']
+        self.assertFalse(OfflineCatalog.refresh())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_product()
+        self.assertTrue(OfflineCatalog.refresh())
+        self.assertNotEqual(OfflineCatalog.get()['etag'], etag)
+
+
+class MobileBatchTest(InventoryFixtureMixin, TestCase):
+    """Idempotent batch application of mobile stock operations"""
+
+    def setUp(self):
+        super().setUp()
+        self.location = Location.objects.create(name='Main Store', location_code='MAIN', location_type='store')
+        self.resistor = self.make_product(sku='RES-10K')
+        self.capacitor = self.make_product(sku='CAP-100N')
+
+    def level(self, product):
+        return StockLevel.objects.get(product=product, location=self.location).quantity
+
+    def operations(self):
+        return [
+            {'key': 'op-1', 'type': 'count', 'product_id': self.resistor.pk, 'location_id': self.location.pk, 'quantity': 40},
+            {'key': 'op-2', 'type': 'adjust', 'product_id': self.resistor.pk, 'location_id': self.location.pk,
+             'quantity': -3, 'reason': 'Damaged'},
+            {'key': 'op-3', 'type': 'count', 'product_id': self.capacitor.pk, 'location_id': self.location.pk, 'quantity': 12},
+        ]
+
+    def test_applies_operations_in_order(self):
+        summary = MobileBatch.apply(self.operations())
+
+        self.assertEqual(summary['applied'], 3)
+        self.assertEqual([result['status'] for result in summary['results']], ['applied'] * 3)
+        self.assertEqual(summary['results'][1]['previous_quantity'], 40)
+        self.assertEqual(summary['results'][1]['new_quantity'], 37)
+        self.assertEqual(self.level(self.resistor), 37)
+        self.resistor.refresh_from_db()
+        self.assertEqual(self.resistor.total_stock, 37)
+        self.assertEqual(self.resistor.current_stock, 37)
+        self.assertEqual(StockMovement.objects.filter(reference__startswith='MOBILE-').count(), 3)
+
+    def test_retry_is_a_no_op(self):
+        first = MobileBatch.apply(self.operations())
+        retry = MobileBatch.apply(self.operations())
+
+        self.assertEqual(retry['duplicates'], 3)
+        self.assertEqual(retry['applied'], 0)
+        self.assertEqual(
+            [result['movement_id'] for result in retry['results']],
+            [result['movement_id'] for result in first['results']]
+        )
+        self.assertEqual(self.level(self.resistor), 37)
+        self.assertEqual(StockMovement.objects.count(), 3)
+
+    def test_invalid_operations_are_rejected_individually(self):
+        operations = self.operations() + [
+            {'key': 'op-4', 'type': 'adjust', 'product_id': 999999, 'quantity': 1},
+            {'key': 'op-5', 'type': 'adjust', 'product_id': self.capacitor.pk, 'location_id': self.location.pk,
+             'quantity': -50},
+            {'key': 'op-1', 'type': 'count', 'product_id': self.resistor.pk, 'quantity': 1},
+            {'type': 'count', 'product_id': self.resistor.pk, 'quantity': 1},
+        ]
+        summary = MobileBatch.apply(operations)
+
+        self.assertEqual(summary['applied'], 3)
+        self.assertEqual(summary['rejected'], 4)
+        self.assertIn('Insufficient stock', summary['results'][4]['error'])
+        self.assertEqual(self.level(self.capacitor), 12)
+
+        # A rejected key was not consumed, so a corrected retry applies
+        retry = MobileBatch.apply([dict(operations[4], quantity=-5)])
+        self.assertEqual(retry['applied'], 1)
+        self.assertEqual(self.level(self.capacitor), 7)
+
+    def test_batch_posts_in_constant_queries(self):
+        products = [self.make_product() for _ in range(30)]
+        operations = [
+            {'key': f'count-{product.pk}', 'type': 'count', 'product_id': product.pk,
+             'location_id': self.location.pk, 'quantity': 5}
+            for product in products
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            summary = MobileBatch.apply(operations)
+        self.assertEqual(summary['applied'], 30)
+        self.assertLess(len(queries), 25)
+
+    def test_upload_api(self):
+        user = User.objects.create_superuser('rep', 'rep@example.com', 'secret')
+        self.client.force_login(user)
+        response = self.client.post(
+            '/inventory/api/mobile/upload-batch/',
+            data=json.dumps({'operations': self.operations()}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['applied'], 3)
+        self.assertEqual(StockMovement.objects.filter(created_by=user).count(), 3)
+
+
+class ExchangeRateServiceTest(InventoryFixtureMixin, TestCase):
+    """Provider refresh, rate history and as-of conversions"""
+
+    def setUp(self):
+        super().setUp()
+        self.eur = Currency.objects.create(
+            code='EUR', name='Euro', symbol='€', exchange_rate_to_usd=Decimal('1.100000'), auto_update_enabled=True
+        )
+        self.cny = Currency.objects.create(
+            code='CNY', name='Yuan', symbol='¥', exchange_rate_to_usd=Decimal('0.140000'), auto_update_enabled=True
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'rates.json')
+        self.writes = 0
+        self.write_rates('2026-10-01', {'EUR': 0.8, 'CNY': 7.25})
+
+    def write_rates(self, date, rates):
+        with open(self.path, 'w') as rates_file:
+            json.dump({'base': 'USD', 'date': date, 'rates': rates}, rates_file)
+        # Distinct mtimes even within one clock tick
+        self.writes += 1
+        os.utime(self.path, (self.writes, self.writes))
+
+    def refresh(self):
+        # The provider remembers its validators once the refresh commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return ExchangeRateService.refresh(FileRateProvider(self.path))
+
+    def test_refresh_updates_changed_rates_and_history(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = ExchangeRateService.refresh(FileRateProvider(self.path))
+
+        self.assertEqual(result['status'], 'updated')
+        self.assertEqual(sorted(result['updated']), ['CNY', 'EUR'])
+        self.assertLessEqual(len(queries), 6)
+        self.eur.refresh_from_db()
+        self.assertEqual(self.eur.exchange_rate_to_usd, Decimal('1.250000'))
+        self.assertTrue(self.eur.rate_history.filter(source='file', rate_to_usd=Decimal('1.250000')).exists())
+
+    def test_unchanged_source_is_not_modified(self):
+        self.refresh()
+        history = ExchangeRateHistory.objects.count()
+
+        self.assertEqual(self.refresh()['status'], 'not_modified')
+        # Rewritten with the same content
+        self.write_rates('2026-10-01', {'EUR': 0.8, 'CNY': 7.25})
+        self.assertEqual(self.refresh()['status'], 'not_modified')
+        self.assertEqual(ExchangeRateHistory.objects.count(), history)
+
+    def test_rate_at_reads_the_rate_valid_then(self):
+        from django.utils import timezone
+
+        self.refresh()
+        between = timezone.now()
+        self.write_rates('2026-10-10', {'EUR': 0.5, 'CNY': 7.25})
+        result = self.refresh()
+        self.assertEqual(list(result['updated']), ['EUR'])
+
+        self.assertEqual(rate_at('EUR', between), Decimal('1.250000'))
+        self.assertEqual(rate_at(self.eur), Decimal('2.000000'))
+        self.assertEqual(convert_at(100, 'EUR', 'USD', between), Decimal('125'))
+
+    def test_manual_rate_change_is_recorded(self):
+        self.cny.exchange_rate_to_usd = Decimal('0.150000')
+        self.cny.save()
+        self.assertEqual(
+            self.cny.rate_history.order_by('-effective_at').values_list('rate_to_usd', 'source').first(),
+            (Decimal('0.150000'), 'manual')
+        )
+
+    def test_update_api_queues_the_refresh_for_the_scheduler(self):
+        admin = User.objects.create_superuser('treasurer', 'treasurer@example.com', 'x')
+        self.client.force_login(admin)
+
+        with mock.patch('inventory.fx.get_provider', side_effect=AssertionError('fetched in the request')):
+            response = self.client.post('/inventory/api/currencies/update-rates/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'status': 'success', 'refresh': 'queued', 'updated': {}})
+
+        with override_settings(CELERY_BEAT_SCHEDULE={}), \
+                mock.patch('inventory.fx.get_provider', return_value=FileRateProvider(self.path)):
+            call_command('run_scheduled_tasks', '--once', stdout=StringIO())
+            call_command('run_scheduled_tasks', '--once', stdout=StringIO())
+
+        self.eur.refresh_from_db()
+        self.assertEqual(self.eur.exchange_rate_to_usd, Decimal('1.250000'))
+        metrics = tasks.task_metrics('inventory.tasks.update_exchange_rates')
+        self.assertEqual((metrics['runs'], metrics['last_status']), (1, 'updated'))
+
+
+class ConversionTableTest(InventoryFixtureMixin, TestCase):
+    """In-process rate table and vectorized conversions"""
+
+    def setUp(self):
+        super().setUp()
+        self.eur = Currency.objects.create(
+            code='EUR', name='Euro', symbol='€', exchange_rate_to_usd=Decimal('1.100000')
+        )
+
+    def test_convert_many_uses_one_table(self):
+        conversion.rate_table()
+        with CaptureQueriesContext(connection) as queries:
+            converted = conversion.convert_many(
+                [Decimal('10'), None, Decimal('5'), Decimal('1')], ['EUR', 'USD', 'USD', 'XXX']
+            )
+            product = self.make_product(supplier_currency=self.eur, cost_price=Decimal('10.00'))
+
+        self.assertEqual(converted, [Decimal('11.000000'), None, Decimal('5'), None])
+        self.assertFalse([query for query in queries if 'FROM "inventory_currency"' in query['sql']])
+        self.assertEqual(product.cost_price_usd, Decimal('11.00'))
+        self.assertEqual(conversion.convert(Decimal('11'), 'USD', 'EUR'), Decimal('10'))
+
+    def test_rate_change_rebuilds_table_and_bumps_version(self):
+        version = conversion.rate_table().version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eur.exchange_rate_to_usd = Decimal('1.200000')
+            self.eur.save()
+
+        self.assertEqual(conversion.convert(Decimal('10'), 'EUR'), Decimal('12.000000'))
+        self.assertGreater(conversion.rate_table().version, version)
+
+    def test_stale_version_in_another_process_is_picked_up(self):
+        table = conversion.rate_table()
+        Currency.objects.filter(pk=self.eur.pk).update(exchange_rate_to_usd=Decimal('1.300000'))
+        # Another process bumped the shared version; this one re-checks on its next request
+        cache.incr(conversion.VERSION_CACHE_KEY)
+        self.assertIs(conversion.rate_table(), table)
+
+        conversion.start_request()
+        self.addCleanup(conversion.finish_request)
+        self.assertEqual(conversion.convert(Decimal('10'), 'EUR'), Decimal('13.000000'))
+
+
+class RepricerTest(InventoryFixtureMixin, TestCase):
+    """Set-based repricing rules and price history"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('pricer', password='x')
+        self.cheap = self.make_product(cost_price=Decimal('1.00'), selling_price=Decimal('2.00'))
+        self.dear = self.make_product(cost_price=Decimal('10.00'), selling_price=Decimal('15.00'))
+
+    def test_percent_rule_updates_prices_history_and_markup(self):
+        products = Product.objects.filter(pk__in=[self.cheap.pk, self.dear.pk])
+        with CaptureQueriesContext(connection) as queries:
+            summary = Repricer.apply(products, 'percent', Decimal('10'), user=self.user)
+
+        self.assertEqual((summary['matched'], summary['changed']), (2, 2))
+        self.assertEqual(summary['total_before'], Decimal('17.00'))
+        self.assertEqual(summary['total_after'], Decimal('18.70'))
+        # Aggregate, history insert, update and the id list for the change log
+        self.assertLessEqual(len([q for q in queries if 'SAVEPOINT' not in q['sql']]), 4)
+
+        self.dear.refresh_from_db()
+        self.assertEqual(self.dear.selling_price, Decimal('16.50'))
+        cost = self.dear.total_cost_price_usd
+        self.assertAlmostEqual(float(self.dear.markup_percentage), float((Decimal('16.50') - cost) / cost * 100), places=2)
+        history = PriceHistory.objects.get(product=self.dear)
+        self.assertEqual((history.old_price, history.new_price, history.rule), (Decimal('15.00'), Decimal('16.50'), 'percent'))
+        self.assertEqual(history.changed_by, self.user)
+
+    def test_unchanged_prices_write_no_history(self):
+        summary = Repricer.apply(Product.objects.filter(pk=self.cheap.pk), 'set_price', Decimal('2.00'))
+
+        self.assertEqual((summary['changed'], summary['unchanged']), (0, 1))
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_markup_rule_prices_from_cost_with_floor(self):
+        free = self.make_product(cost_price=Decimal('0.00'), selling_price=Decimal('5.00'))
+        Repricer.apply(Product.objects.filter(pk__in=[self.dear.pk, free.pk]), 'markup', Decimal('25'))
+
+        self.dear.refresh_from_db()
+        free.refresh_from_db()
+        self.assertEqual(self.dear.selling_price, Decimal('12.50'))
+        self.assertEqual(free.selling_price, Decimal('0.01'))
+        with self.assertRaises(RepricingError):
+            Repricer.apply(Product.objects.all(), 'discount', 5)
+
+
+class GoodsReceiverTest(InventoryFixtureMixin, TestCase):
+    """Whole goods-received notes against purchase orders"""
+
+    def setUp(self):
+        super().setUp()
+        from datetime import date
+
+        self.location = Location.objects.create(name='Main Store', location_code='MAIN', location_type='store')
+        self.po = PurchaseOrder.objects.create(
+            po_number='PO-1001', supplier=self.supplier, status='sent', expected_delivery_date=date(2026, 11, 1),
+            delivery_location=self.location, payment_terms='Net 30'
+        )
+        self.items = [
+            PurchaseOrderItem.objects.create(
+                purchase_order=self.po, product=self.make_product(reorder_level=5), quantity_ordered=10,
+                unit_price=Decimal('1.50')
+            )
+            for _ in range(3)
+        ]
+
+    def test_receives_whole_note_in_bulk(self):
+        lines = [{'item_id': item.pk, 'quantity': 10} for item in self.items]
+        lines[2]['quantity'] = 4
+        summary = GoodsReceiver.receive(self.po, lines)
+
+        self.assertEqual((summary['status'], summary['lines'], summary['units']), ('partially_received', 3, 24))
+        self.assertEqual(
+            list(PurchaseOrderItem.objects.filter(purchase_order=self.po).order_by('pk').values_list('quantity_received', flat=True)),
+            [10, 10, 4]
+        )
+        movement = StockMovement.objects.get(product=self.items[0].product)
+        self.assertEqual((movement.movement_type, movement.quantity, movement.total_cost), ('purchase', 10, Decimal('15.00')))
+        self.assertEqual(movement.to_location, self.location)
+        self.assertEqual(StockLevel.objects.get(product=self.items[2].product, location=self.location).quantity, 4)
+        product = Product.objects.get(pk=self.items[0].product_id)
+        self.assertEqual(product.total_stock, 10)
+
+        GoodsReceiver.receive(self.po, [{'item_id': self.items[2].pk, 'quantity': 6}])
+        self.po.refresh_from_db()
+        self.assertEqual(self.po.status, 'received')
+
+    def test_over_receipt_rejects_the_whole_note(self):
+        with self.assertRaises(ReceiptError) as raised:
+            GoodsReceiver.receive(self.po, [
+                {'item_id': self.items[0].pk, 'quantity': 5},
+                {'item_id': self.items[1].pk, 'quantity': 11},
+            ])
+
+        self.assertEqual(list(raised.exception.errors), [self.items[1].pk])
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertFalse(PurchaseOrderItem.objects.filter(quantity_received__gt=0).exists())
+
+    def test_receive_stock_posts_one_line(self):
+        self.items[0].receive_stock(3)
+
+        self.assertEqual(self.items[0].quantity_received, 3)
+        with self.assertRaises(ValueError):
+            self.items[0].receive_stock(8)
+
+    def test_receive_form_posts_note(self):
+        admin = User.objects.create_superuser('receiver', 'receiver@example.com', 'x')
+        self.client.force_login(admin)
+        form = {
+            'delivery_location': str(self.location.pk),
+            'received_date': '2026-10-30',
+            'delivery_notes': 'Pallet 1 of 1',
+        }
+        for item in self.items:
+            form[f'item_{item.pk}_quantity'] = '10'
+            form[f'item_{item.pk}_notes'] = ''
+        form[f'item_{self.items[0].pk}_damaged'] = 'true'
+
+        response = self.client.post(f'/inventory/purchase-orders/{self.po.pk}/receive/', form)
+
+        self.assertRedirects(response, f'/inventory/purchase-orders/{self.po.pk}/', fetch_redirect_response=False)
+        self.assertEqual(
+            list(StockLevel.objects.filter(location=self.location).order_by('product_id').values_list('quantity', flat=True)),
+            [10, 10, 10]
+        )
+        self.po.refresh_from_db()
+        self.assertEqual(self.po.status, 'received')
+
+
+class PurchaseOrderBuilderTest(InventoryFixtureMixin, TestCase):
+    """Per-supplier draft purchase orders from reorder alerts"""
+
+    def setUp(self):
+        super().setUp()
+        self.location = Location.objects.create(
+            name='Main Store', location_code='MAIN', location_type='store', is_default=True
+        )
+        self.other_supplier = Supplier.objects.create(
+            name='Taipei Semis', supplier_code='TPS', supplier_type='distributor',
+            address_line_1='2 Harbour Rd', city='Taipei', country=self.country, currency=self.usd
+        )
+        products = [
+            self.make_product(supplier=supplier, cost_price=Decimal(cost))
+            for supplier, cost in ((self.supplier, '2.00'), (self.supplier, '3.00'), (self.other_supplier, '4.00'))
+        ]
+        self.alerts = [
+            ReorderAlert.objects.create(
+                product=product, priority='high', current_stock=0, reorder_level=5,
+                suggested_order_quantity=10, suggested_supplier=product.supplier
+            )
+            for product in products
+        ]
+
+    def test_builds_one_draft_order_per_supplier(self):
+        with CaptureQueriesContext(connection) as queries:
+            summary = PurchaseOrderBuilder.build(ReorderAlert.objects.all())
+
+        self.assertEqual((len(summary['purchase_orders']), summary['lines'], summary['alerts']), (2, 3, 3))
+        self.assertLessEqual(len(queries), 12)
+        po = PurchaseOrder.objects.get(supplier=self.supplier)
+        self.assertEqual((po.status, po.delivery_location), ('draft', self.location))
+        self.assertEqual(po.items.count(), 2)
+        self.assertEqual((po.subtotal, po.total_amount), (Decimal('50.00'), Decimal('50.00')))
+        self.assertEqual(
+            set(ReorderAlert.objects.values_list('status', 'purchase_order__supplier')),
+            {('ordered', self.supplier.pk), ('ordered', self.other_supplier.pk)}
+        )
+
+    def test_ordered_alerts_are_not_ordered_again(self):
+        PurchaseOrderBuilder.build(ReorderAlert.objects.filter(pk=self.alerts[0].pk))
+        summary = PurchaseOrderBuilder.build(ReorderAlert.objects.all())
+
+        self.assertEqual(summary['alerts'], 2)
+        self.assertEqual(PurchaseOrderItem.objects.count(), 3)
+        self.assertEqual(len(set(PurchaseOrder.objects.values_list('po_number', flat=True))), 3)
+
+    def test_api_orders_selected_priorities(self):
+        admin = User.objects.create_superuser('buyer', 'buyer@example.com', 'x')
+        self.client.force_login(admin)
+        ReorderAlert.objects.filter(pk=self.alerts[2].pk).update(priority='low')
+
+        response = self.client.post(
+            '/inventory/api/reorders/create-purchase-orders/',
+            data=json.dumps({'priorities': ['high']}), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['purchase_orders']), 1)
+        self.assertEqual(ReorderAlert.objects.get(pk=self.alerts[2].pk).status, 'active')
+
+    def test_api_requires_an_explicit_selection(self):
+        admin = User.objects.create_superuser('buyer', 'buyer@example.com', 'x')
+        self.client.force_login(admin)
+        url = '/inventory/api/reorders/create-purchase-orders/'
+
+        response = self.client.post(url, data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+        response = self.client.post(
+            url, data=json.dumps({'all': True, 'delivery_location_id': 999999}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+        response = self.client.post(url, data=json.dumps({'all': True}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['alerts'], 3)
+
+
+class ReorderAlertEvaluatorTest(InventoryFixtureMixin, TestCase):
+    """Set-based reorder alert evaluation"""
+
+    def setUp(self):
+        super().setUp()
+        self.products = [
+            self.make_product(total_stock=stock, reorder_level=10, reorder_quantity=20)
+            for stock in (0, 4, 7, 9, 50)
+        ]
+
+    def test_product_saves_raise_no_alerts(self):
+        self.assertFalse(ReorderAlert.objects.exists())
+
+    def test_creates_alerts_with_priority_bands(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = ReorderAlertEvaluator.evaluate(notify=False)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(
+            dict(ReorderAlert.objects.values_list('product__sku', 'priority')),
+            {
+                self.products[0].sku: 'critical',
+                self.products[1].sku: 'high',
+                self.products[2].sku: 'medium',
+                self.products[3].sku: 'low',
+            }
+        )
+        alert = ReorderAlert.objects.get(product=self.products[1])
+        self.assertEqual((alert.suggested_order_quantity, alert.estimated_cost), (20, Decimal('20.00')))
+        self.assertIsNone(ReorderAlert.objects.get(product=self.products[0]).estimated_stockout_date)
+
+    def test_open_alerts_are_not_duplicated(self):
+        ReorderAlertEvaluator.evaluate(notify=False)
+        ReorderAlert.objects.filter(product=self.products[3]).update(status='resolved')
+
+        result = ReorderAlertEvaluator.evaluate([product.pk for product in self.products], notify=False)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(ReorderAlert.objects.filter(status='active').count(), 4)
+
+    def test_dry_run_writes_nothing(self):
+        result = ReorderAlertEvaluator.evaluate(dry_run=True)
+
+        self.assertEqual((result['created'], result['by_priority']['critical']), (0, 1))
+        self.assertFalse(ReorderAlert.objects.exists())
+
+
+class TransferPosterTest(InventoryFixtureMixin, TestCase):
+    """Multi-line transfer documents with an in-transit step"""
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Location.objects.create(name='Warehouse', location_code='WH', location_type='warehouse')
+        self.branch = Location.objects.create(name='Branch', location_code='BR', location_type='store')
+        self.products = [self.make_product(reorder_level=5) for _ in range(3)]
+        StockPoster.post([
+            {'product_id': product.pk, 'location_id': self.warehouse.pk, 'movement_type': 'in', 'quantity': 20}
+            for product in self.products
+        ])
+
+    def levels(self, location):
+        return list(
+            StockLevel.objects.filter(location=location, product__in=self.products).order_by('product_id')
+            .values_list('quantity', flat=True)
+        )
+
+    def test_dispatch_then_receive_all_lines(self):
+        transfer = TransferPoster.create(
+            self.warehouse, self.branch, [{'product_id': product.pk, 'quantity': 18} for product in self.products]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            summary = TransferPoster.dispatch(transfer)
+
+        self.assertLessEqual(len(queries), 15)
+        self.assertEqual((summary['status'], summary['lines'], summary['units']), ('in_transit', 3, 54))
+        self.assertEqual(self.levels(self.warehouse), [2, 2, 2])
+        self.assertFalse(ReorderAlert.objects.exists())
+
+        summary = TransferPoster.receive(transfer)
+
+        self.assertEqual((summary['status'], summary['units']), ('received', 54))
+        self.assertEqual(self.levels(self.branch), [18, 18, 18])
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[product.pk for product in self.products]).values_list('total_stock', flat=True)),
+            [20, 20, 20]
+        )
+
+    def test_shortage_rejects_whole_dispatch(self):
+        StockLevel.objects.filter(product=self.products[1], location=self.warehouse).update(reserved_quantity=15)
+        transfer = TransferPoster.create(
+            self.warehouse, self.branch, [{'product_id': product.pk, 'quantity': 10} for product in self.products]
+        )
+
+        with self.assertRaises(TransferError) as raised:
+            TransferPoster.dispatch(transfer)
+
+        self.assertEqual(list(raised.exception.errors), [self.products[1].sku])
+        self.assertEqual(self.levels(self.warehouse), [20, 20, 20])
+        self.assertEqual(StockTransfer.objects.get(pk=transfer.pk).status, 'draft')
+
+    def test_partial_receipt_leaves_rest_in_transit(self):
+        transfer = TransferPoster.create(self.warehouse, self.branch, [{'product_id': self.products[0].pk, 'quantity': 10}])
+        TransferPoster.dispatch(transfer)
+        item = transfer.items.get()
+
+        self.assertEqual(TransferPoster.receive(transfer, {item.pk: 4})['status'], 'partially_received')
+        with self.assertRaises(TransferError):
+            TransferPoster.receive(transfer, {item.pk: 7})
+        self.assertEqual(TransferPoster.receive(transfer)['units'], 6)
+        self.assertEqual(self.levels(self.branch)[:1], [10])
+
+    def test_immediate_transfer_keeps_callers_reference(self):
+        from .utils import transfer_stock_between_locations
+
+        outgoing, incoming = transfer_stock_between_locations(
+            self.products[0], self.warehouse, self.branch, 4, 'REQ-17', notes='Shelf B.'
+        )
+
+        self.assertEqual((outgoing.reference, incoming.reference), ('REQ-17', 'REQ-17'))
+        transfer = StockTransfer.objects.get()
+        self.assertEqual((transfer.reference, transfer.notes), ('REQ-17', 'Shelf B.'))
+
+    def test_api_drafts_and_dispatches(self):
+        admin = User.objects.create_superuser('keeper', 'keeper@example.com', 'x')
+        self.client.force_login(admin)
+
+        response = self.client.post('/inventory/api/stock/transfers/', data=json.dumps({
+            'from_location_id': self.warehouse.pk,
+            'to_location_id': self.branch.pk,
+            'lines': [{'product_id': product.pk, 'quantity': 5} for product in self.products],
+        }), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'in_transit')
+        self.assertEqual(self.levels(self.warehouse), [15, 15, 15])
+
+
+class InventoryTasksTest(InventoryFixtureMixin, TestCase):
+    """Locked, measured scheduled tasks run without a broker"""
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.make_product(total_stock=2, reorder_level=10)
+
+    def test_low_stock_check_raises_then_resolves_alerts(self):
+        result = tasks.check_low_stock_levels()
+        self.assertEqual((result['created'], result['resolved']), (1, 0))
+        self.assertEqual(tasks.check_low_stock_levels()['created'], 0)
+
+        Product.objects.filter(pk=self.product.pk).update(available_stock=50)
+        result = tasks.check_low_stock_levels()
+
+        self.assertEqual(result['resolved'], 1)
+        self.assertEqual(ReorderAlert.objects.get().status, 'resolved')
+        metrics = tasks.task_metrics('inventory.tasks.check_low_stock_levels')
+        self.assertEqual((metrics['runs'], metrics['last_status']), (3, 'ok'))
+
+    def test_overlapping_run_is_skipped(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import TaskState
+
+        state = TaskState.objects.create(
+            name='inventory.tasks.check_low_stock_levels', lock_token='other-worker',
+            locked_until=timezone.now() + timedelta(minutes=1)
+        )
+
+        self.assertEqual(tasks.check_low_stock_levels()['status'], 'skipped')
+        self.assertFalse(ReorderAlert.objects.exists())
+        self.assertEqual(tasks.task_metrics('inventory.tasks.check_low_stock_levels')['skipped'], 1)
+
+        # An expired lock (crashed worker) is taken over
+        TaskState.objects.filter(pk=state.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(tasks.check_low_stock_levels()['status'], 'ok')
+        state.refresh_from_db()
+        self.assertEqual((state.lock_token, state.last_status), ('', 'ok'))
+
+    def test_daily_reports_are_sent_once_per_day(self):
+        config = dict(settings.INVENTORY_SETTINGS, GENERATE_DAILY_REPORTS=True,
+                      REPORT_EMAIL_RECIPIENTS=['buyer@example.com'], REPORT_DIR=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, config['REPORT_DIR'], ignore_errors=True)
+
+        with override_settings(INVENTORY_SETTINGS=config), \
+                mock.patch('django.core.management.call_command') as report:
+            self.assertEqual(tasks.generate_daily_reports()['status'], 'ok')
+            cache.clear()
+            self.assertEqual(tasks.generate_daily_reports()['status'], 'already_sent')
+        self.assertEqual(report.call_count, 2)
+
+    @override_settings(CELERY_BEAT_SCHEDULE={
+        'check-low-stock': {'task': 'inventory.tasks.check_low_stock_levels', 'schedule': 1800.0},
+        'update-exchange-rates': {'task': 'inventory.tasks.update_exchange_rates', 'schedule': 3600.0},
+    })
+    def test_local_scheduler_runs_due_tasks_once(self):
+        out = StringIO()
+        call_command('run_scheduled_tasks', '--once', stdout=out)
+        call_command('run_scheduled_tasks', '--once', stdout=out)
+
+        # Each cron invocation is a new process with an empty local cache
+        cache.clear()
+        call_command('run_scheduled_tasks', '--once', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('=== Scheduled tasks: 2 run ===', output)
+        self.assertEqual(output.count('=== Scheduled tasks: 0 run ==='), 2)
+        self.assertIn("'status': 'disabled'", output)
+        self.assertEqual(ReorderAlert.objects.count(), 1)
@@ -0,0 +1,306 @@
+# inventory/transfers.py - Stock Transfer Documents
+
+"""
+Multi-line stock transfers between locations.
+
+Transfers used to move one product at a time, two movements per product,
+each going through the per-row StockMovement receivers. A branch
+replenishment of a few hundred lines is now one StockTransfer document,
+posted in two separate atomic steps:
+
+- dispatch: the document is locked, the availability of every line at the
+  source (quantity less reserved) is checked with one query, and the
+  outgoing movements go through StockPoster as one batch; the stock is then
+  in transit
+- receive: received quantities are raised with one UPDATE and the incoming
+  movements are posted at the destination as one batch; a partial receipt
+  leaves the rest in transit
+
+Stock in transit counts at neither location, so product totals drop on
+dispatch and come back on receipt. Dispatch does not raise reorder alerts
+for that dip. transfer_stock_between_locations posts an immediate transfer
+as a one-line document dispatched and received in one transaction.
+"""
+
+import logging
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .posting import StockPoster
+
+logger = logging.getLogger(__name__)
+
+
+class TransferError(ValueError):
+    """Lines of a transfer that cannot be posted; errors maps each line (product id, SKU or item id) to its message"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(
+            f'{key}: {message}' if key is not None else message for key, message in errors.items()
+        ))
+
+
+class TransferPoster:
+    """
+    Creates, dispatches and receives transfer documents
+    """
+
+    @classmethod
+    def create(cls, from_location, to_location, lines, user=None, notes='', reference=''):
+        """
+        Draft a transfer document.
+
+        Args:
+            from_location: Source Location (or id)
+            to_location: Destination Location (or id)
+            lines: Dicts with product_id, quantity and optional notes; lines
+                for the same product are added together
+            user: Recorded as the creator
+            notes: Document notes
+            reference: Caller's reference (e.g. a requisition number), also
+                put on the movements; defaults to the transfer number there
+
+        Returns:
+            The draft StockTransfer
+
+        Raises:
+            TransferError: The locations or a line are invalid; nothing is created
+        """
+        from .models import Location, Product, StockTransfer, StockTransferItem
+
+        from_id = getattr(from_location, 'pk', from_location)
+        to_id = getattr(to_location, 'pk', to_location)
+        if from_id == to_id:
+            raise TransferError({None: 'Source and destination locations must differ'})
+        if Location.objects.filter(pk__in=[from_id, to_id], is_active=True).count() != 2:
+            raise TransferError({None: 'Both locations must exist and be active'})
+
+        quantities, line_notes, errors = OrderedDict(), {}, {}
+        for line in lines:
+            product_id = line.get('product_id')
+            try:
+                quantity = int(line.get('quantity') or 0)
+            except (TypeError, ValueError):
+                errors[product_id] = 'Quantity must be a whole number'
+                continue
+            if quantity <= 0:
+                errors[product_id] = 'Quantity must be positive'
+                continue
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+            if line.get('notes'):
+                line_notes[product_id] = str(line['notes'])[:200]
+
+        active = set(Product.objects.filter(pk__in=list(quantities), is_active=True).values_list('pk', flat=True))
+        for product_id in quantities:
+            if product_id not in active:
+                errors[product_id] = 'Product not found or inactive'
+        if errors:
+            raise TransferError(errors)
+        if not quantities:
+            raise TransferError({None: 'A transfer needs at least one line'})
+
+        with transaction.atomic():
+            transfer = StockTransfer.objects.create(
+                transfer_number=cls._transfer_number(timezone.now().date()),
+                from_location_id=from_id,
+                to_location_id=to_id,
+                reference=(reference or '')[:100],
+                notes=notes,
+                created_by=user,
+            )
+            StockTransferItem.objects.bulk_create([
+                StockTransferItem(
+                    transfer=transfer, product_id=product_id, quantity=quantity, notes=line_notes.get(product_id, '')
+                )
+                for product_id, quantity in quantities.items()
+            ], batch_size=1000)
+
+        logger.info(f"Drafted transfer {transfer.transfer_number}: {len(quantities)} lines")
+        return transfer
+
+    @classmethod
+    def dispatch(cls, transfer, user=None):
+        """
+        Take a draft transfer's stock out of the source location.
+
+        Returns:
+            Summary dict with the status, lines and units dispatched and the
+            created movements
+
+        Raises:
+            TransferError: The transfer is not a draft, or lines exceed the
+                available stock at the source (all shortages are listed);
+                nothing is posted
+        """
+        from .models import StockLevel, StockTransfer
+
+        with transaction.atomic():
+            transfer = StockTransfer.objects.select_for_update().select_related(
+                'from_location', 'to_location'
+            ).get(pk=getattr(transfer, 'pk', transfer))
+            if transfer.status != 'draft':
+                raise TransferError({None: f'Transfer {transfer.transfer_number} is {transfer.get_status_display().lower()}'})
+
+            items = list(transfer.items.values('product_id', 'quantity', 'product__sku'))
+            available = {
+                row['product_id']: row['quantity'] - row['reserved_quantity']
+                for row in StockLevel.objects.select_for_update().filter(
+                    location_id=transfer.from_location_id, product_id__in=[item['product_id'] for item in items]
+                ).values('product_id', 'quantity', 'reserved_quantity')
+            }
+            errors = {
+                item['product__sku']: f"{available.get(item['product_id'], 0)} available, {item['quantity']} required"
+                for item in items if item['quantity'] > available.get(item['product_id'], 0)
+            }
+            if errors:
+                raise TransferError(errors)
+
+            movements, _ = StockPoster.post([
+                {
+                    'product_id': item['product_id'],
+                    'location_id': transfer.from_location_id,
+                    'movement_type': 'transfer',
+                    'quantity': -item['quantity'],
+                    'reference': transfer.reference or f'Transfer {transfer.transfer_number}',
+                    'notes': f"Dispatched to {transfer.to_location.name}",
+                }
+                for item in items
+            ], user=user, check_reorders=False)
+
+            transfer.status = 'in_transit'
+            transfer.dispatched_at = timezone.now()
+            transfer.dispatched_by = user
+            transfer.save(update_fields=['status', 'dispatched_at', 'dispatched_by'])
+
+        units = sum(item['quantity'] for item in items)
+        logger.info(f"Dispatched transfer {transfer.transfer_number}: {len(items)} lines, {units} units")
+        return {
+            'status': transfer.status,
+            'lines': len(items),
+            'units': units,
+            'movements': [movement for movement in movements if movement is not None],
+        }
+
+    @classmethod
+    def receive(cls, transfer, quantities=None, user=None):
+        """
+        Put a dispatched transfer's stock into the destination location.
+
+        Args:
+            transfer: StockTransfer (or its id)
+            quantities: Item id to quantity received (default: everything
+                still in transit)
+            user: Recorded on the movements
+
+        Returns:
+            Summary dict with the status, lines and units received and the
+            created movements
+
+        Raises:
+            TransferError: The transfer is not in transit, or a quantity is
+                unknown or above what is in transit; nothing is received
+        """
+        from .models import StockTransfer, StockTransferItem
+
+        with transaction.atomic():
+            transfer = StockTransfer.objects.select_for_update().select_related(
+                'from_location', 'to_location'
+            ).get(pk=getattr(transfer, 'pk', transfer))
+            if transfer.status not in ('in_transit', 'partially_received'):
+                raise TransferError({None: f'Transfer {transfer.transfer_number} is {transfer.get_status_display().lower()}'})
+
+            items = {
+                item['pk']: item for item in transfer.items.values('pk', 'product_id', 'quantity', 'quantity_received')
+            }
+            if quantities is None:
+                quantities = {
+                    item_id: item['quantity'] - item['quantity_received'] for item_id, item in items.items()
+                }
+
+            received, errors = {}, {}
+            for item_id, quantity in quantities.items():
+                item = items.get(int(item_id)) if str(item_id).isdigit() else None
+                try:
+                    quantity = int(quantity or 0)
+                except (TypeError, ValueError):
+                    errors[item_id] = 'Quantity must be a whole number'
+                    continue
+                if item is None:
+                    errors[item_id] = 'Not a line of this transfer'
+                elif quantity < 0 or quantity > item['quantity'] - item['quantity_received']:
+                    errors[item_id] = f"{item['quantity'] - item['quantity_received']} in transit, {quantity} received"
+                elif quantity:
+                    received[item['pk']] = quantity
+            if errors:
+                raise TransferError(errors)
+            if not received:
+                raise TransferError({None: 'No quantities to receive'})
+
+            StockTransferItem.objects.filter(pk__in=list(received)).update(
+                quantity_received=F('quantity_received') + Case(
+                    *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in received.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+            movements, _ = StockPoster.post([
+                {
+                    'product_id': items[item_id]['product_id'],
+                    'location_id': transfer.to_location_id,
+                    'movement_type': 'transfer',
+                    'quantity': quantity,
+                    'reference': transfer.reference or f'Transfer {transfer.transfer_number}',
+                    'notes': f"Received from {transfer.from_location.name}",
+                }
+                for item_id, quantity in received.items()
+            ], user=user)
+
+            in_transit = transfer.items.aggregate(
+                in_transit=Sum(F('quantity') - F('quantity_received'))
+            )['in_transit'] or 0
+            transfer.status = 'received' if in_transit <= 0 else 'partially_received'
+            transfer.received_at = timezone.now()
+            transfer.received_by = user
+            transfer.save(update_fields=['status', 'received_at', 'received_by'])
+
+        units = sum(received.values())
+        logger.info(
+            f"Received {len(received)} lines ({units} units) of transfer {transfer.transfer_number}; "
+            f"status {transfer.status}"
+        )
+        return {
+            'status': transfer.status,
+            'lines': len(received),
+            'units': units,
+            'movements': [movement for movement in movements if movement is not None],
+        }
+
+    @staticmethod
+    def cancel(transfer):
+        """Cancel a transfer that has not been dispatched"""
+        from .models import StockTransfer
+
+        updated = StockTransfer.objects.filter(pk=getattr(transfer, 'pk', transfer), status='draft').update(
+            status='cancelled'
+        )
+        if not updated:
+            raise TransferError({None: 'Only draft transfers can be cancelled'})
+
+    @staticmethod
+    def _transfer_number(day):
+        """Next free TR-YYYYMMDD-NNN number for a day"""
+        from .models import StockTransfer
+
+        prefix = f"TR-{day.strftime('%Y%m%d')}-"
+        taken = set(StockTransfer.objects.filter(transfer_number__startswith=prefix).values_list(
+            'transfer_number', flat=True
+        ))
+        sequence = 1
+        while f'{prefix}{sequence:03d}' in taken:
+            sequence += 1
+        return f'{prefix}{sequence:03d}'
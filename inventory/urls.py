@@ -191,6 +191,14 @@ reorder_patterns = [
     
     # Purchase order integration
     path('reorders/create-po/', views.create_purchase_order_from_alerts_view, name='create_po_from_alerts'),
+    
+    # Purchase orders
+    path('purchase-orders/', views.PurchaseOrderListView.as_view(), name='po_list'),
+    path('purchase-orders/create/', views.PurchaseOrderCreateView.as_view(), name='po_create'),
+    path('purchase-orders/<int:pk>/', views.PurchaseOrderDetailView.as_view(), name='po_detail'),
+    path('purchase-orders/<int:pk>/edit/', views.PurchaseOrderUpdateView.as_view(), name='po_update'),
+    path('purchase-orders/<int:pk>/receive/', views.purchase_order_receive_view, name='po_receive'),
+    path('purchase-orders/<int:pk>/cancel/', views.purchase_order_cancel_view, name='po_cancel'),
 ]
 
 # =====================================
@@ -269,6 +277,7 @@ reports_patterns = [
 api_patterns = [
     # Product data APIs
     path('api/products/search/', views.product_search_api, name='product_search_api'),
+    path('api/products/parametric-search/', views.parametric_search_api, name='parametric_search_api'),
     path('api/products/<int:product_id>/details/', views.product_details_api, name='product_details_api'),
     path('api/products/<int:product_id>/cost-calculation/', views.calculate_product_cost_api, name='product_cost_calculation_api'),
     path('api/products/<int:product_id>/stock-levels/', views.product_stock_levels_api, name='product_stock_levels_api'),
@@ -281,11 +290,15 @@ api_patterns = [
     path('api/stock/adjust/', views.stock_adjustment_api, name='stock_adjustment_api'),
     path('api/stock/levels/', views.stock_levels_api, name='stock_levels_api'),
     path('api/stock/movements/', views.stock_movements_api, name='stock_movements_api'),
+    path('api/stock/transfers/', views.stock_transfer_api, name='stock_transfer_api'),
+    path('api/stock/transfers/<int:pk>/dispatch/', views.stock_transfer_dispatch_api, name='stock_transfer_dispatch_api'),
+    path('api/stock/transfers/<int:pk>/receive/', views.stock_transfer_receive_api, name='stock_transfer_receive_api'),
     
     # Reorder management APIs
     path('api/reorders/generate-list/', views.generate_reorder_list_api, name='generate_reorder_list_api'),
     path('api/reorders/check-stock/', views.check_stock_availability_api, name='check_stock_availability_api'),
     path('api/reorders/recommendations/', views.reorder_recommendations_api, name='reorder_recommendations_api'),
+    path('api/reorders/create-purchase-orders/', views.purchase_orders_from_alerts_api, name='purchase_orders_from_alerts_api'),
     
     # Cost calculation APIs
     path('api/pricing/calculate/', views.calculate_product_cost_api, name='calculate_cost_api'),
@@ -296,6 +309,7 @@ api_patterns = [
     path('api/barcodes/generate/<int:product_id>/', views.generate_barcode_api, name='generate_barcode_api'),
     path('api/qr-codes/generate/<int:product_id>/', views.product_qr_code_api, name='product_qr_code_api'),
     path('api/barcodes/lookup/<str:barcode>/', views.barcode_lookup_api, name='barcode_lookup_api'),
+    path('api/barcodes/batch-lookup/', views.barcode_batch_lookup_api, name='barcode_batch_lookup_api'),
     path('api/qr-codes/scan/', views.qr_code_scan_api, name='qr_code_scan_api'),
     
     # Currency and exchange rate APIs
@@ -84,16 +84,10 @@ class CostCalculator:
         self.overhead_factors = self._get_overhead_factors()
     
     def _get_exchange_rates(self) -> Dict[str, Decimal]:
-        """Get current exchange rates"""
-        from .models import Currency
+        """Get current exchange rates (shared in-process table, no query)"""
+        from .conversion import rate_table
         
-        rates = {}
-        currencies = Currency.objects.filter(is_active=True)
-        
-        for currency in currencies:
-            rates[currency.code] = currency.exchange_rate_to_usd
-        
-        return rates
+        return rate_table().rates
     
     def _get_overhead_factors(self) -> List:
         """Get active overhead factors"""
@@ -321,55 +315,28 @@ class BarcodeManager:
     
     @staticmethod
     def generate_qr_code(data, size=10):
-        """Generate QR code and return as base64 string"""
+        """Generate QR code and return as base64 string (cached by content)"""
         try:
-            import qrcode
-            from io import BytesIO
-            import base64
-            
+            from .labels import CodeImageCache
+
             if isinstance(data, dict):
                 import json
                 data = json.dumps(data)
-            
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=size,
-                border=4,
-            )
-            qr.add_data(data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            img_data = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_data
-            
+
+            return CodeImageCache.get_base64('qr', data, size)
+
         except Exception as e:
             logger.error(f"Error generating QR code: {str(e)}")
             return None
     
     @staticmethod
     def generate_barcode(code, code_type='code128'):
-        """Generate barcode and return as base64 string"""
+        """Generate barcode and return as base64 string (cached by content)"""
         try:
-            import barcode
-            from barcode.writer import ImageWriter
-            from io import BytesIO
-            import base64
-            
-            barcode_class = barcode.get_barcode_class(code_type)
-            barcode_instance = barcode_class(code, writer=ImageWriter())
-            
-            buffer = BytesIO()
-            barcode_instance.write(buffer)
-            img_data = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_data
-            
+            from .labels import CodeImageCache
+
+            return CodeImageCache.get_base64(code_type, code)
+
         except Exception as e:
             logger.error(f"Error generating barcode: {str(e)}")
             return None
@@ -727,43 +694,10 @@ def apply_bulk_price_update(products, update_type, value, user=None):
     Returns:
         int: Number of products updated
     """
+    from .pricing import Repricer
+    
     try:
-        updated_count = 0
-        
-        with transaction.atomic():
-            for product in products:
-                old_price = product.selling_price
-                
-                if update_type == 'markup':
-                    # Apply markup percentage to cost price
-                    product.selling_price = calculate_selling_price(
-                        product.cost_price, value
-                    )
-                elif update_type == 'percentage_increase':
-                    # Increase current price by percentage
-                    multiplier = 1 + (value / 100)
-                    product.selling_price = old_price * multiplier
-                elif update_type == 'fixed_increase':
-                    # Add fixed amount to current price
-                    product.selling_price = old_price + value
-                elif update_type == 'set_price':
-                    # Set specific price
-                    product.selling_price = value
-                
-                # Ensure price is not negative
-                product.selling_price = max(product.selling_price, Decimal('0.01'))
-                
-                product.save(update_fields=['selling_price'])
-                
-                # Log the price change
-                logger.info(
-                    f"Price updated for {product.sku}: {old_price} -> {product.selling_price} "
-                    f"by {user.username if user else 'System'}"
-                )
-                
-                updated_count += 1
-        
-        return updated_count
+        return Repricer.apply(products, update_type, value, user=user)['changed']
         
     except Exception as e:
         logger.error(f"Error in bulk price update: {str(e)}")
@@ -824,44 +758,17 @@ def transfer_stock_between_locations(product, from_location, to_location,
         Tuple[StockMovement, StockMovement]: (outgoing, incoming) movements
     """
     try:
-        from .models import StockLevel
+        from .transfers import TransferPoster
         
+        # A one-line transfer document, dispatched and received at once
         with transaction.atomic():
-            # Check available stock at from_location
-            from_stock = StockLevel.objects.filter(
-                product=product, location=from_location
-            ).first()
-            
-            if not from_stock or from_stock.available_quantity < quantity:
-                raise ValidationError(
-                    f"Insufficient stock at {from_location.name}. "
-                    f"Available: {from_stock.available_quantity if from_stock else 0}, "
-                    f"Required: {quantity}"
-                )
-            
-            # Create outgoing movement
-            outgoing = StockManager.create_stock_movement(
-                product=product,
-                movement_type='transfer',
-                quantity=-quantity,
-                reference=reference,
-                from_location=from_location,
-                to_location=None,
-                user=user,
-                notes=f"Transfer to {to_location.name}. {notes}"
-            )
-            
-            # Create incoming movement
-            incoming = StockManager.create_stock_movement(
-                product=product,
-                movement_type='transfer',
-                quantity=quantity,
-                reference=reference,
-                from_location=None,
-                to_location=to_location,
-                user=user,
-                notes=f"Transfer from {from_location.name}. {notes}"
+            transfer = TransferPoster.create(
+                from_location, to_location,
+                [{'product_id': product.pk, 'quantity': quantity}],
+                user=user, notes=notes, reference=reference
             )
+            outgoing = TransferPoster.dispatch(transfer, user=user)['movements'][0]
+            incoming = TransferPoster.receive(transfer, user=user)['movements'][0]
             
             return outgoing, incoming
             
@@ -1530,28 +1437,21 @@ class NotificationManager:
     def send_low_stock_alerts():
         """Send low stock alerts to relevant users"""
         try:
-            from .models import Product, ReorderAlert
+            from .models import Product
+            from .reorder import ReorderAlertEvaluator
             from django.contrib.auth.models import User
             
             # Find products with low stock
             low_stock_products = Product.objects.filter(
                 is_active=True,
-                total_stock__lte=F('reorder_level')
+                available_stock__lte=F('reorder_level')
             )
             
             if not low_stock_products.exists():
                 return
             
-            # Create/update reorder alerts
-            for product in low_stock_products:
-                alert, created = ReorderAlert.objects.get_or_create(
-                    product=product,
-                    status='active',
-                    defaults={
-                        'quantity_needed': product.reorder_quantity,
-                        'priority': 'high' if product.total_stock == 0 else 'medium'
-                    }
-                )
+            # Raise the missing reorder alerts in one pass
+            ReorderAlertEvaluator.evaluate(low_stock_products)
             
             # Send email notification to inventory managers
             inventory_managers = User.objects.filter(
@@ -1616,28 +1516,14 @@ class MobileDataManager:
             user: User requesting offline data
             
         Returns:
-            Dictionary with offline data
+            Dictionary with the sync cursor and per-table columns and rows
         """
         try:
-            from .models import Product, Category, Brand, Supplier
+            from .offline import OfflineCatalog
             
-            # Get essential data for offline use
-            data = {
-                'categories': list(Category.objects.filter(is_active=True).values(
-                    'id', 'name', 'parent_id'
-                )),
-                'brands': list(Brand.objects.filter(is_active=True).values(
-                    'id', 'name'
-                )),
-                'suppliers': list(Supplier.objects.filter(is_active=True).values(
-                    'id', 'name', 'code'
-                )),
-                'products': list(Product.objects.filter(is_active=True).values(
-                    'id', 'sku', 'name', 'category_id', 'brand_id', 'supplier_id',
-                    'total_stock', 'reorder_level', 'selling_price', 'barcode'
-                )[:1000]),  # Limit for mobile storage
-                'last_sync': timezone.now().isoformat()
-            }
+            # The whole active catalog, from the shared prebuilt snapshot
+            data = OfflineCatalog.payload()
+            data['last_sync'] = timezone.now().isoformat()
             
             return data
             
@@ -1658,25 +1544,17 @@ class MobileDataManager:
             Sync results
         """
         try:
-            results = {
-                'synced_count': 0,
-                'error_count': 0,
-                'errors': []
-            }
+            from .mobile import MobileBatch
             
-            # Process stock adjustments from mobile
-            if 'stock_adjustments' in sync_data:
-                for adjustment in sync_data['stock_adjustments']:
-                    try:
-                        # Process mobile stock adjustment
-                        # Implementation would depend on mobile data format
-                        results['synced_count'] += 1
-                        
-                    except Exception as e:
-                        results['error_count'] += 1
-                        results['errors'].append(str(e))
+            # Stock counts and adjustments, applied idempotently by key
+            summary = MobileBatch.apply(sync_data.get('stock_adjustments', []), user=user)
             
-            return results
+            return {
+                'synced_count': summary['applied'] + summary['duplicates'],
+                'error_count': summary['rejected'],
+                'errors': [result['error'] for result in summary['results'] if result['status'] == 'rejected'],
+                'results': summary['results'],
+            }
             
         except Exception as e:
             logger.error(f"Error syncing mobile data: {str(e)}")
@@ -24,7 +24,6 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from django.template.loader import render_to_string
 import qrcode
-import requests
 from weasyprint import HTML
 from django.db import transaction
 
@@ -42,6 +41,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q, Sum, Count, Avg, F, Max
 from django.db.models.functions import TruncDate
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from openpyxl import Workbook
@@ -50,8 +50,8 @@ from .models import (
     Brand, Category, ComponentFamily, Currency, OverheadFactor, 
     ProductAttributeDefinition, StorageBin, StorageLocation,
     Supplier, Location, Product, StockLevel, StockMovement,
-    StockTake, StockTakeItem, PurchaseOrder, PurchaseOrderItem,
-    ReorderAlert
+    StockTake, StockTakeItem, StockTransfer, PurchaseOrder, PurchaseOrderItem,
+    ReorderAlert, DuplicateCandidate, DuplicateCluster
 )
 from .forms import (
     CategoryForm, CurrencyForm, ProductAttributeDefinitionForm, ProductBulkUpdateForm, SupplierForm,
@@ -62,6 +62,26 @@ from .decorators import (
     inventory_permission_required, stock_adjustment_permission, location_access_required,
     purchase_order_permission, stock_take_permission, cost_data_access, bulk_operation_permission
 )
+from .autocomplete import part_number_index
+from .backup import SnapshotError, SnapshotRestorer, SnapshotWriter, list_snapshots
+from .duplicates import DuplicateDetector
+from .conversion import UnknownCurrency, convert, convert_many
+from .labels import (
+    DEFAULT_LAYOUT, LABEL_LAYOUTS, CodeImageCache, LabelSheetRenderer, product_labels
+)
+from .listing import ProductListing
+from .mobile import MobileBatch, MobileBatchError
+from .offline import OfflineCatalog
+from .parametric import ParametricSearch
+from .posting import StockPoster, StockPostingError
+from .pricing import Repricer
+from .purchasing import PurchaseOrderBuildError, PurchaseOrderBuilder
+from .receiving import GoodsReceiver, ReceiptError
+from .reorder import ReorderAlertEvaluator
+from .scanning import BATCH_LOOKUP_LIMIT, ProductCardCache
+from .search import ProductSearchService
+from .sync import ChangeFeed, record_changes
+from .transfers import TransferError, TransferPoster
 from .utils import (
     ExportManager, InventoryAnalytics, PricingCalculator, StockManager,
     calculate_days_of_stock, get_low_stock_products, BarcodeManager,
@@ -98,18 +118,19 @@ class BaseInventoryListView(LoginRequiredMixin, ListView, BaseInventoryMixin):
         context = super().get_context_data(**kwargs)
         model_name = self.model._meta.verbose_name_plural.title()
         
-        # Add summary statistics
-        queryset = self.get_queryset()
-        summary = {
-            'total_count': queryset.count(),
-            'active_count': queryset.filter(is_active=True).count() if hasattr(self.model, 'is_active') else None,
-        }
-        
         context.update(self.get_base_context(
             page_title=f'{model_name}',
-            summary=summary,
+            summary=self.get_summary(),
         ))
         return context
+    
+    def get_summary(self):
+        """Summary statistics for the list header"""
+        queryset = self.object_list
+        return {
+            'total_count': queryset.count(),
+            'active_count': queryset.filter(is_active=True).count() if hasattr(self.model, 'is_active') else None,
+        }
 
 class BaseInventoryCreateView(LoginRequiredMixin, CreateView, BaseInventoryMixin):
     """Base class for inventory create views with consistent permissions and messages"""
@@ -229,6 +250,45 @@ class ProductRelatedMixin:
             'category', 'brand', 'supplier'
         ).filter(is_active=True)
 
+class FacetedProductListMixin:
+    """
+    Mixin for product list pages backed by ProductListing.
+    
+    Builds the page queryset (with a `stock_status_code` annotation) and the
+    sidebar facet counts from one listing, so templates never query per row
+    or per filter.
+    """
+    listing_scope_kwarg = None  # e.g. 'brand' -> fixed filter brand_id=self.kwargs['pk']
+    
+    def get_listing(self):
+        if not hasattr(self, '_listing'):
+            scope = {}
+            if self.listing_scope_kwarg:
+                scope[self.listing_scope_kwarg] = self.kwargs['pk']
+            self._listing = ProductListing(self.request.GET, scope=scope)
+        return self._listing
+    
+    def get_queryset(self):
+        return self.get_listing().queryset()
+    
+    def get_summary(self):
+        facets = self.get_listing().facets()
+        return {
+            'total_count': facets['total'],
+            'active_count': facets['total'],
+        }
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        listing = self.get_listing()
+        context.update({
+            'facets': listing.facets(),
+            'active_filters': listing.filters,
+            # First value per filter, for the sidebar selects
+            'current_filters': {name: values[0] for name, values in listing.filters.items()},
+        })
+        return context
+
 class StockOperationMixin:
     """Mixin for views that perform stock operations"""
     
@@ -518,38 +578,12 @@ def inventory_alerts_view(request):
 # PRODUCT MANAGEMENT VIEWS
 # =====================================
 
-class ProductListView(BaseInventoryListView):
-    """List all products with search and filtering"""
+class ProductListView(FacetedProductListMixin, BaseInventoryListView):
+    """List all products with search, filtering and facet counts"""
     model = Product
     template_name = 'inventory/products/product_list.html'
     context_object_name = 'products'
     paginate_by = 20
-    
-    def get_queryset(self):
-        queryset = Product.objects.select_related(
-            'category', 'brand', 'supplier'
-        ).filter(is_active=True)
-        
-        # Apply search filter
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(sku__icontains=search) |
-                Q(description__icontains=search)
-            )
-        
-        # Apply category filter
-        category = self.request.GET.get('category')
-        if category:
-            queryset = queryset.filter(category_id=category)
-        
-        # Apply supplier filter
-        supplier = self.request.GET.get('supplier')
-        if supplier:
-            queryset = queryset.filter(supplier_id=supplier)
-        
-        return queryset.order_by('name')
 
 class ProductDetailView(BaseInventoryDetailView):
     """Product detail view with stock levels and movements"""
@@ -613,14 +647,9 @@ class ProductSearchView(BaseInventoryListView):
             'category', 'brand', 'supplier'
         ).filter(is_active=True)
         
+        search = None
         if form.is_valid():
-            if form.cleaned_data.get('search'):
-                search = form.cleaned_data['search']
-                queryset = queryset.filter(
-                    Q(name__icontains=search) |
-                    Q(sku__icontains=search) |
-                    Q(barcode__icontains=search)
-                )
+            search = form.cleaned_data.get('search')
             
             if form.cleaned_data.get('category'):
                 queryset = queryset.filter(category=form.cleaned_data['category'])
@@ -647,6 +676,10 @@ class ProductSearchView(BaseInventoryListView):
             if max_price:
                 queryset = queryset.filter(selling_price__lte=max_price)
         
+        if search:
+            # Ranked search applies after the filters so it narrows their result
+            return ProductSearchService.search(search, queryset=queryset)
+        
         return queryset.order_by('name')
     
     def get_context_data(self, **kwargs):
@@ -1625,6 +1658,16 @@ class PurchaseOrderListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         return PurchaseOrder.objects.select_related('supplier').order_by('-created_at')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # USD equivalents for the page from the in-process rate table
+        orders = list(context['purchase_orders'])
+        totals_usd = convert_many([po.total_amount for po in orders], [po.currency for po in orders])
+        for po, total_usd in zip(orders, totals_usd):
+            po.total_amount_usd = total_usd
+        context['purchase_orders'] = orders
+        return context
 
 class PurchaseOrderDetailView(LoginRequiredMixin, DetailView):
     """Detailed view of purchase order"""
@@ -1678,18 +1721,47 @@ def purchase_order_receive_view(request, pk):
     po = get_object_or_404(PurchaseOrder, pk=pk)
     
     if request.method == 'POST':
-        # Process receiving logic here
-        po.status = 'received'
-        po.received_date = timezone.now().date()
-        po.save()
+        # The whole goods-received note is posted in one pass
+        lines = []
+        for item_id in po.items.values_list('id', flat=True):
+            notes = [request.POST.get(f'item_{item_id}_notes', '').strip()]
+            if request.POST.get(f'item_{item_id}_damaged'):
+                notes.append(f"Damaged: {request.POST.get(f'item_{item_id}_damage_notes', '').strip() or 'see delivery'}")
+            lines.append({
+                'item_id': item_id,
+                'quantity': request.POST.get(f'item_{item_id}_quantity') or 0,
+                'notes': ' '.join(filter(None, notes)),
+            })
+        
+        location = None
+        if request.POST.get('delivery_location'):
+            location = get_object_or_404(Location, pk=request.POST['delivery_location'], is_active=True)
         
-        messages.success(request, f'Purchase order {po.po_number} marked as received')
+        try:
+            summary = GoodsReceiver.receive(
+                po, lines,
+                user=request.user,
+                location=location,
+                received_date=parse_date(request.POST.get('received_date') or '') or None,
+                notes=request.POST.get('delivery_notes', '').strip(),
+            )
+        except ReceiptError as e:
+            messages.error(request, f'Nothing was received: {e}')
+            return redirect('inventory:po_detail', pk=po.pk)
+        
+        messages.success(
+            request,
+            f"Received {summary['units']} units on {summary['lines']} lines of {po.po_number} "
+            f"({summary['status'].replace('_', ' ')})"
+        )
         return redirect('inventory:po_detail', pk=po.pk)
     
     context = {
         'page_title': f'Receive PO: {po.po_number}',
         'purchase_order': po,
         'po_items': po.items.select_related('product').all(),
+        'locations': Location.objects.filter(is_active=True).order_by('name'),
+        'today': timezone.now().date(),
     }
     return render(request, 'inventory/purchase_orders/po_receive.html', context)
 
@@ -1914,16 +1986,12 @@ class BrandDetailView(BaseInventoryDetailView):
     template_name = 'inventory/configuration/brand_detail.html'
     context_object_name = 'brand'
 
-class BrandProductsView(BaseInventoryListView, ProductRelatedMixin):
+class BrandProductsView(FacetedProductListMixin, BaseInventoryListView, ProductRelatedMixin):
     """List products by brand"""
     model = Product
     template_name = 'inventory/brand/brand_products.html'
     context_object_name = 'products'
-
-    def get_queryset(self):
-        return self.get_products_queryset().filter(
-            brand_id=self.kwargs['pk']
-        ).order_by('name')
+    listing_scope_kwarg = 'brand'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -2059,17 +2127,13 @@ class CategoryDetailView(BaseInventoryDetailView):
     template_name = 'inventory/configuration/category_detail.html'
     context_object_name = 'category'
 
-class CategoryProductsView(BaseInventoryListView, ProductRelatedMixin):
+class CategoryProductsView(FacetedProductListMixin, BaseInventoryListView, ProductRelatedMixin):
     """List products belonging to a category"""
     model = Product
     template_name = 'inventory/configuration/category_products.html'
     context_object_name = 'products'
     paginate_by = 30
-
-    def get_queryset(self):
-        return self.get_products_queryset().filter(
-            category_id=self.kwargs['pk']
-        ).order_by('name')
+    listing_scope_kwarg = 'category'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -2108,16 +2172,12 @@ class SupplierDetailView(BaseInventoryDetailView):
     template_name = 'inventory/suppliers/supplier_detail.html'
     context_object_name = 'supplier'
 
-class SupplierProductsView(BaseInventoryListView, ProductRelatedMixin):
+class SupplierProductsView(FacetedProductListMixin, BaseInventoryListView, ProductRelatedMixin):
     """All products sourced from a given supplier"""
     model = Product
     template_name = 'inventory/suppliers/supplier_products.html'
     context_object_name = 'products'
-
-    def get_queryset(self):
-        return self.get_products_queryset().filter(
-            supplier_id=self.kwargs['pk']
-        ).order_by('name')
+    listing_scope_kwarg = 'supplier'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -2197,12 +2257,11 @@ def product_search_api(request):
         if len(search_term) < 2:
             return JsonResponse({'success': False, 'error': 'Search term too short'})
         
-        products = Product.objects.filter(
-            Q(name__icontains=search_term) |
-            Q(sku__icontains=search_term) |
-            Q(barcode__icontains=search_term),
-            is_active=True
-        ).select_related('category', 'supplier')[:limit]
+        products = ProductSearchService.search(
+            search_term,
+            queryset=Product.objects.filter(is_active=True).select_related('category', 'supplier'),
+            limit=limit
+        )
         
         results = []
         for product in products:
@@ -2230,6 +2289,79 @@ def product_search_api(request):
         logger.error(f"Error in product search API: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)})
 
+@login_required
+@inventory_permission_required('view')
+def parametric_search_api(request):
+    """
+    Parametric component search with facet counts.
+    
+    Query parameters:
+        q: Free-text parametric terms, e.g. "0805 10kΩ ±1%"
+        category / component_family: Optional ids narrowing the result set
+        attr.<name>: Attribute value (repeatable, OR-ed), e.g. attr.Package=0805
+        attr.<name>.min / attr.<name>.max: Numeric range with units, e.g. attr.Voltage.min=50V
+        limit: Maximum products returned (default 50, max 200)
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 200)
+        queryset = Product.objects.filter(is_active=True)
+        
+        category_id = request.GET.get('category')
+        if category_id:
+            category = get_object_or_404(Category, id=category_id)
+            queryset = queryset.filter(category__in=category.get_descendants(include_self=True))
+        
+        family_id = request.GET.get('component_family')
+        if family_id:
+            queryset = queryset.filter(component_family_id=family_id)
+        
+        filters = {}
+        for key in request.GET:
+            if not key.startswith('attr.'):
+                continue
+            name = key[len('attr.'):]
+            if name.endswith('.min') or name.endswith('.max'):
+                name, bound = name.rsplit('.', 1)
+                spec = filters.setdefault(name, {})
+                if isinstance(spec, dict):
+                    spec[bound] = request.GET[key]
+            else:
+                filters[name] = request.GET.getlist(key)
+        
+        queryset = ParametricSearch.apply_filters(queryset, filters)
+        
+        query = request.GET.get('q', '').strip()
+        if query:
+            queryset = ParametricSearch.search(query, queryset=queryset)
+        
+        products = queryset.order_by('name').values(
+            'id', 'sku', 'name', 'manufacturer_part_number', 'selling_price', 'current_stock', 'dynamic_attributes'
+        )[:limit]
+        
+        return JsonResponse({
+            'success': True,
+            'count': queryset.count(),
+            'results': [
+                {
+                    'id': product['id'],
+                    'sku': product['sku'],
+                    'name': product['name'],
+                    'manufacturer_part_number': product['manufacturer_part_number'],
+                    'selling_price': float(product['selling_price']),
+                    'current_stock': product['current_stock'],
+                    'attributes': product['dynamic_attributes'],
+                }
+                for product in products
+            ],
+            'facets': ParametricSearch.facet_counts(queryset),
+        })
+        
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error in parametric search API: {str(e)}")
+        return JsonResponse({'success': False, 'error': str(e)})
+
 @require_POST
 @login_required
 @inventory_permission_required('edit')
@@ -2312,11 +2444,9 @@ def check_sku_availability(request):
     if not sku:
         return JsonResponse({'available': False, 'error': 'SKU required'})
     
-    existing = Product.objects.filter(sku=sku)
-    if product_id:
-        existing = existing.exclude(id=product_id)
-    
-    available = not existing.exists()
+    # Answered from the in-process index; the unique constraint still guards saves
+    owner_id = part_number_index.sku_owner(sku)
+    available = owner_id is None or str(owner_id) == str(product_id)
     
     return JsonResponse({
         'available': available,
@@ -2917,59 +3047,85 @@ def stock_adjustment_api(request):
         })
 
 @csrf_exempt
+@inventory_permission_required('edit')
 @require_http_methods(["POST"])
 def stock_transfer_api(request):
-    """API for stock transfers"""
+    """
+    API for transfer documents.
+    
+    {"from_location_id": 1, "to_location_id": 2, "lines": [{"product_id": 5,
+    "quantity": 10}, ...]} drafts a transfer and dispatches it unless
+    "dispatch" is false. A single product_id and quantity instead of lines
+    transfers at once, as the stock transfer form does.
+    """
     try:
-        data = json.loads(request.body)
-        product_id = data.get('product_id')
-        from_location_id = data.get('from_location_id')
-        to_location_id = data.get('to_location_id')
-        quantity = data.get('quantity')
-        
-        product = Product.objects.get(id=product_id, is_active=True)
-        from_location = Location.objects.get(id=from_location_id)
-        to_location = Location.objects.get(id=to_location_id)
-        
-        # Process transfer
-        from_stock = StockLevel.objects.get(product=product, location=from_location)
-        to_stock, created = StockLevel.objects.get_or_create(
-            product=product, 
-            location=to_location,
-            defaults={'quantity': 0}
-        )
-        
-        from_stock.quantity -= quantity
-        to_stock.quantity += quantity
-        
-        from_stock.save()
-        to_stock.save()
-        
-        # Create movement records
-        StockManager.create_stock_movement(
-            product=product,
-            movement_type='transfer_out',
-            quantity=-quantity,
-            user=request.user,
-            from_location=from_location,
-            to_location=to_location
-        )
+        data = json.loads(request.body or '{}')
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        
+        lines = data.get('lines')
+        if lines is None:
+            lines = [{'product_id': data.get('product_id'), 'quantity': data.get('quantity')}]
+            dispatch = receive = True
+        else:
+            dispatch = data.get('dispatch', True)
+            receive = False
         
-        StockManager.create_stock_movement(
-            product=product,
-            movement_type='transfer_in',
-            quantity=quantity,
-            user=request.user,
-            from_location=from_location,
-            to_location=to_location
-        )
+        with transaction.atomic():
+            transfer = TransferPoster.create(
+                data.get('from_location_id'), data.get('to_location_id'), lines,
+                user=request.user, notes=data.get('notes', '')
+            )
+            if dispatch:
+                TransferPoster.dispatch(transfer, user=request.user)
+            if receive:
+                TransferPoster.receive(transfer, user=request.user)
         
-        return JsonResponse({'success': True})
-    except Exception as e:
+        transfer.refresh_from_db(fields=['status'])
         return JsonResponse({
-            'success': False,
-            'error': str(e)
+            'success': True,
+            'transfer_id': transfer.id,
+            'transfer_number': transfer.transfer_number,
+            'status': transfer.status,
+            'lines': len(lines),
         })
+    except TransferError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'errors': {str(k): v for k, v in e.errors.items()}}, status=400)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Stock transfer failed: {str(e)}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@inventory_permission_required('edit')
+@require_http_methods(["POST"])
+def stock_transfer_dispatch_api(request, pk):
+    """API for dispatching a draft transfer"""
+    transfer = get_object_or_404(StockTransfer, pk=pk)
+    try:
+        summary = TransferPoster.dispatch(transfer, user=request.user)
+        return JsonResponse({'success': True, 'status': summary['status'], 'lines': summary['lines'], 'units': summary['units']})
+    except TransferError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'errors': {str(k): v for k, v in e.errors.items()}}, status=400)
+
+@inventory_permission_required('edit')
+@require_http_methods(["POST"])
+def stock_transfer_receive_api(request, pk):
+    """
+    API for receiving a transfer.
+    
+    {"quantities": {"<item_id>": 5, ...}} receives part of it; an empty body
+    receives everything still in transit.
+    """
+    transfer = get_object_or_404(StockTransfer, pk=pk)
+    try:
+        data = json.loads(request.body or '{}')
+        summary = TransferPoster.receive(transfer, quantities=data.get('quantities'), user=request.user)
+        return JsonResponse({'success': True, 'status': summary['status'], 'lines': summary['lines'], 'units': summary['units']})
+    except TransferError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'errors': {str(k): v for k, v in e.errors.items()}}, status=400)
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -3280,11 +3436,7 @@ def quick_search_view(request):
         return JsonResponse({'results': []})
     
     # Search products
-    products = Product.objects.filter(
-        Q(name__icontains=search_term) |
-        Q(sku__icontains=search_term),
-        is_active=True
-    )[:10]
+    products = ProductSearchService.search(search_term, limit=10)
     
     results = [
         {
@@ -3842,45 +3994,66 @@ def category_analysis_report(request):
     try:
         categories = Category.objects.filter(is_active=True)
         category_data = []
+        six_months_ago = timezone.now() - timedelta(days=180)
+        
+        # Direct product metrics for every category in one grouped query
+        product_metrics = {
+            row['category_id']: row
+            for row in Product.objects.filter(is_active=True).order_by().values('category_id').annotate(
+                total_products=Count('id'),
+                total_stock_value=Sum(F('current_stock') * F('cost_price')),
+                total_stock_units=Sum('current_stock'),
+                avg_selling_price=Avg('selling_price'),
+                avg_cost_price=Avg('cost_price'),
+                low_stock_count=Count('id', filter=Q(current_stock__lte=F('reorder_level'))),
+            )
+        }
+        
+        # Sales metrics (last 6 months) for every category in one grouped query
+        sales_by_category = dict(
+            StockMovement.objects.filter(
+                movement_type='sale',
+                created_at__gte=six_months_ago
+            ).order_by().values_list('product__category_id').annotate(total=Sum('quantity'))
+        )
+        
+        # Subtree totals come from the cached category rollups
+        rollups = Category.get_subtree_rollups()
         
         for category in categories:
-            products = category.products.filter(is_active=True)
+            metrics = product_metrics.get(category.id, {})
             
             # Stock metrics
-            total_products = products.count()
-            total_stock_value = sum(p.current_stock * p.cost_price for p in products)
-            total_stock_units = sum(p.current_stock for p in products)
+            total_products = metrics.get('total_products', 0)
+            total_stock_value = metrics.get('total_stock_value') or Decimal('0')
+            total_stock_units = metrics.get('total_stock_units') or 0
             
-            # Sales metrics (last 6 months)
-            six_months_ago = timezone.now() - timedelta(days=180)
-            category_sales = StockMovement.objects.filter(
-                product__category=category,
-                movement_type='sale',
-                created_at__gte=six_months_ago
-            ).aggregate(
-                total_units_sold=Sum('quantity'),
-            )['total_units_sold'] or 0
+            category_sales = sales_by_category.get(category.id) or 0
             
             # Calculate average selling price for the category
-            avg_selling_price = products.aggregate(Avg('selling_price'))['selling_price__avg'] or Decimal('0')
+            avg_selling_price = metrics.get('avg_selling_price') or Decimal('0')
             sales_value = category_sales * avg_selling_price
             
             # Low stock products
-            low_stock_count = products.filter(current_stock__lte=F('reorder_level')).count()
+            low_stock_count = metrics.get('low_stock_count', 0)
             
             # Profit margins
-            avg_cost_price = products.aggregate(Avg('cost_price'))['cost_price__avg'] or Decimal('0')
+            avg_cost_price = metrics.get('avg_cost_price') or Decimal('0')
             avg_margin = avg_selling_price - avg_cost_price
             avg_margin_percent = (avg_margin / avg_selling_price * 100) if avg_selling_price > 0 else 0
             
             # Turnover rate (simplified)
             turnover_rate = (category_sales / total_stock_units) if total_stock_units > 0 else 0
             
+            subtree = rollups.get(category.id, {})
+            
             category_data.append({
                 'category': category,
                 'total_products': total_products,
                 'total_stock_value': total_stock_value,
                 'total_stock_units': total_stock_units,
+                'subtree_product_count': subtree.get('product_count', 0),
+                'subtree_stock_value': subtree.get('total_stock_value', Decimal('0.00')),
                 'sales_units': category_sales,
                 'sales_value': sales_value,
                 'low_stock_count': low_stock_count,
@@ -4514,37 +4687,64 @@ def data_cleanup_view(request):
 @inventory_permission_required('view')
 def find_duplicates_view(request):
     """
-    Find potential duplicate products.
+    Review potential duplicate products.
+    
+    Candidates come from the blocked duplicate detector (inventory.duplicates),
+    which runs in the background; editors can trigger an incremental rescan
+    or dismiss pairs that are not duplicates.
     """
     try:
-        # Find products with similar names
-        from difflib import SequenceMatcher
-        
-        products = Product.objects.filter(is_active=True).order_by('name')
-        potential_duplicates = []
-        
-        # Compare each product with others
-        for i, product1 in enumerate(products):
-            for product2 in products[i+1:]:
-                # Calculate similarity
-                similarity = SequenceMatcher(None, product1.name.lower(), product2.name.lower()).ratio()
+        if request.method == 'POST':
+            from core.utils import has_app_permission
+            
+            if not has_app_permission(request.user, 'inventory', 'edit'):
+                messages.error(request, 'You do not have permission to manage duplicates')
+                return redirect('inventory:find_duplicates')
+            
+            action = request.POST.get('action')
+            if action == 'scan':
+                from .tasks import enqueue
                 
-                if similarity > 0.8:  # 80% similarity threshold
-                    potential_duplicates.append({
-                        'product1': product1,
-                        'product2': product2,
-                        'similarity': round(similarity * 100, 1),
-                        'same_supplier': product1.supplier == product2.supplier,
-                        'same_category': product1.category == product2.category,
-                    })
-        
-        # Sort by similarity (highest first)
-        potential_duplicates.sort(key=lambda x: x['similarity'], reverse=True)
+                stats = enqueue('detect_duplicates', full=request.POST.get('full') == '1')
+                if isinstance(stats, dict) and 'candidate_pairs' in stats:
+                    messages.success(
+                        request,
+                        f"Duplicate scan checked {stats['candidate_pairs']} candidate pairs "
+                        f"and found {stats['duplicates_found']} potential duplicates"
+                    )
+                else:
+                    # Queued on the broker, or a scan is already running
+                    messages.info(request, 'Duplicate scan started; refresh this page in a few minutes')
+            elif action == 'dismiss':
+                candidate = get_object_or_404(DuplicateCandidate, pk=request.POST.get('candidate_id'))
+                candidate.dismiss(request.user)
+                DuplicateDetector.rebuild_clusters()
+                messages.success(request, 'Pair marked as not a duplicate')
+            return redirect('inventory:find_duplicates')
+        
+        candidates = DuplicateCandidate.objects.filter(status='open').select_related(
+            'product_a', 'product_b'
+        ).order_by('-score')
+        
+        potential_duplicates = [
+            {
+                'candidate_id': candidate.id,
+                'cluster_id': candidate.cluster_id,
+                'product1': candidate.product_a,
+                'product2': candidate.product_b,
+                'similarity': round(candidate.score * 100, 1),
+                'reasons': candidate.reasons,
+                'same_supplier': candidate.product_a.supplier_id == candidate.product_b.supplier_id,
+                'same_category': candidate.product_a.category_id == candidate.product_b.category_id,
+            }
+            for candidate in candidates[:50]  # Limit to top 50
+        ]
         
         return render(request, 'inventory/data/find_duplicates.html', {
             'page_title': 'Find Duplicate Products',
-            'potential_duplicates': potential_duplicates[:50],  # Limit to top 50
-            'total_found': len(potential_duplicates),
+            'potential_duplicates': potential_duplicates,
+            'total_found': candidates.count(),
+            'clusters': DuplicateCluster.objects.all()[:50],
         })
         
     except Exception as e:
@@ -4566,20 +4766,45 @@ def import_templates_view(request):
 @login_required
 @inventory_permission_required('admin')
 def data_backup_view(request):
-    """Backup inventory data"""
-    # Implementation for data backup
+    """Write and list inventory snapshots"""
+    if request.method == 'POST':
+        try:
+            manifest = SnapshotWriter(
+                incremental=request.POST.get('incremental') == 'on',
+                user=request.user.username,
+            ).write()
+            rows = sum(entry['rows'] for entry in manifest['models'])
+            messages.success(request, f"Snapshot {manifest['name']} written ({rows} rows).")
+        except Exception as e:
+            logger.error(f"Inventory backup failed: {e}")
+            messages.error(request, f'Backup failed: {str(e)}')
+        return redirect('inventory:data_backup')
+
     context = {
         'page_title': 'Data Backup',
+        'snapshots': list_snapshots(),
     }
     return render(request, 'inventory/data/backup.html', context)
 
 @login_required
 @inventory_permission_required('admin')
 def data_restore_view(request):
-    """Restore inventory data"""
-    # Implementation for data restore
+    """Restore inventory data from a snapshot"""
+    if request.method == 'POST':
+        name = request.POST.get('snapshot', '')
+        try:
+            counts = SnapshotRestorer(name).restore()
+            messages.success(request, f'Snapshot {name} restored ({sum(counts.values())} rows).')
+        except SnapshotError as e:
+            messages.error(request, f'Restore failed: {str(e)}')
+        except Exception as e:
+            logger.error(f"Inventory restore of {name} failed: {e}")
+            messages.error(request, f'Restore failed: {str(e)}')
+        return redirect('inventory:data_restore')
+
     context = {
         'page_title': 'Data Restore',
+        'snapshots': list_snapshots(),
     }
     return render(request, 'inventory/data/restore.html', context)
 
@@ -4640,34 +4865,28 @@ class MobileStockCheckView(LoginRequiredMixin, TemplateView):
         product = None
         
         if search_term:
-            # Try to find product by SKU or barcode first
-            try:
-                product = Product.objects.select_related(
-                    'category', 'supplier'
-                ).get(
-                    Q(sku__iexact=search_term) | Q(barcode=search_term),
-                    is_active=True
-                )
-            except Product.DoesNotExist:
+            # Scanned SKU or barcode - answered from the cached product card
+            product = ProductCardCache.get_card(search_term, kinds=('barcode', 'sku'))
+            
+            if not product:
                 # Try partial name match
-                products = Product.objects.filter(
+                products = list(Product.objects.filter(
                     name__icontains=search_term,
                     is_active=True
-                ).select_related('category', 'supplier')[:5]
+                ).values_list('sku', flat=True)[:5])
                 
-                if products.count() == 1:
-                    product = products.first()
-                elif products.count() > 1:
-                    context['multiple_products'] = products
+                if len(products) == 1:
+                    product = ProductCardCache.get_card(products[0], kinds=('sku',))
+                elif len(products) > 1:
+                    context['multiple_products'] = Product.objects.filter(
+                        sku__in=products
+                    ).select_related('category', 'supplier')
         
         if product:
-            # Get stock levels by location
-            stock_levels = product.stock_levels.select_related('location').all()
-            
             context.update({
                 'product': product,
-                'stock_levels': stock_levels,
-                'stock_status': StockManager.get_stock_status(product),
+                'stock_levels': product['stock_levels'],
+                'stock_status': product['stock_status'],
             })
         
         context.update({
@@ -4731,65 +4950,115 @@ class MobileBarcodeScannerView(LoginRequiredMixin, TemplateView):
         return super().dispatch(*args, **kwargs)
 
 @csrf_exempt
+@inventory_permission_required('view')
 @require_http_methods(["POST"])
 def mobile_sync_api(request):
-    """API for mobile app synchronization"""
+    """
+    API for mobile app delta synchronization.
+    
+    The device posts the cursor from its previous page ({"cursor": 1234,
+    "limit": 500}) and gets the rows changed since then plus tombstones.
+    It repeats while has_more is true. reset=true (no cursor, or one older
+    than the retained change log) means it must bootstrap from the offline
+    catalog and continue from the returned cursor.
+    """
     try:
-        data = json.loads(request.body)
-        last_sync = data.get('last_sync')
+        data = json.loads(request.body or '{}')
+        cursor = data.get('cursor')
         
-        # Return changes since last sync
-        sync_data = {
-            'products': [],
-            'stock_levels': [],
-            'movements': [],
-            'timestamp': timezone.now().isoformat(),
-        }
+        if cursor is None:
+            sync_data = {'cursor': ChangeFeed.head(), 'reset': True, 'has_more': False}
+        else:
+            sync_data = ChangeFeed.page(cursor, limit=data.get('limit', 500))
+        
+        if sync_data['reset']:
+            sync_data['bootstrap_url'] = reverse('inventory:mobile_offline_data_api')
         
         return JsonResponse(sync_data)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Invalid sync request: {str(e)}'
+        }, status=400)
     except Exception as e:
+        logger.error(f"Mobile sync failed: {str(e)}")
         return JsonResponse({
             'success': False,
             'error': str(e)
         })
 
 @csrf_exempt
+@inventory_permission_required('view')
 @require_http_methods(["GET"])
 def mobile_offline_data_api(request):
-    """API for mobile offline data"""
-    # Return essential data for offline operation
-    products = Product.objects.filter(is_active=True).values(
-        'id', 'name', 'sku', 'current_stock', 'reorder_level'
-    )[:100]  # Limit for mobile
+    """
+    Full active catalog for offline use, served from the prebuilt snapshot.
     
-    return JsonResponse({
-        'products': list(products),
-        'timestamp': timezone.now().isoformat(),
-    })
+    Devices send If-None-Match with the ETag of the copy they hold; an
+    unchanged catalog answers 304 without loading the snapshot body. The
+    body carries the sync cursor to continue delta syncing from.
+    """
+    if_none_match = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    etag = OfflineCatalog.etag()
+    if etag and etag in if_none_match:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    snapshot = OfflineCatalog.get()
+    if snapshot is None:
+        # Another worker is building the first snapshot
+        response = JsonResponse({'success': False, 'error': 'Offline catalog is being prepared'}, status=503)
+        response['Retry-After'] = '10'
+        return response
+    
+    if snapshot['etag'] in if_none_match:
+        response = HttpResponse(status=304)
+    else:
+        encoding = OfflineCatalog.choose_encoding(snapshot, request.headers.get('Accept-Encoding'))
+        response = HttpResponse(snapshot[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    
+    response['ETag'] = snapshot['etag']
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @csrf_exempt
+@inventory_permission_required('edit')
 @require_http_methods(["POST"])
 def mobile_upload_batch_api(request):
-    """API for mobile batch uploads"""
+    """
+    API for mobile batch uploads.
+    
+    The device posts the operations it queued offline, each with its own
+    idempotency key: {"operations": [{"key": "<uuid>", "type": "count",
+    "product_id": 12, "location_id": 3, "quantity": 40, "reason": "Cycle
+    count"}, ...]}. Every operation gets a result (applied, duplicate or
+    rejected) in request order; resending a batch after a lost response is
+    safe because applied keys come back as duplicates.
+    """
     try:
-        data = json.loads(request.body)
-        batch_data = data.get('batch_data', [])
-        
-        processed_count = 0
-        for item in batch_data:
-            # Process each batch item
-            # This could be stock adjustments, transfers, etc.
-            processed_count += 1
+        data = json.loads(request.body or '{}')
+        if not isinstance(data, dict):
+            raise MobileBatchError('Expected a JSON object')
         
+        summary = MobileBatch.apply(data.get('operations', data.get('batch_data', [])), user=request.user)
+        return JsonResponse({'success': True, **summary})
+    except (ValueError, MobileBatchError) as e:
         return JsonResponse({
-            'success': True,
-            'processed_count': processed_count
-        })
+            'success': False,
+            'error': f'Invalid batch: {str(e)}'
+        }, status=400)
     except Exception as e:
+        logger.error(f"Mobile batch upload failed: {str(e)}")
         return JsonResponse({
             'success': False,
             'error': str(e)
-        })
+        }, status=500)
 
 @login_required
 @inventory_permission_required('edit')
@@ -4805,56 +5074,29 @@ def mobile_quick_adjust_view(request):
         reason = request.POST.get('reason', 'Mobile adjustment')
         
         product = get_object_or_404(Product, id=product_id)
+        location = get_object_or_404(Location, id=location_id) if location_id else None
+        
+        movements, _ = StockPoster.post([{
+            'product_id': product.id,
+            'location_id': location.id if location else None,
+            'movement_type': 'adjustment',
+            'counted': new_quantity,
+            'reference': f"MOBILE-ADJ-{timezone.now().strftime('%Y%m%d%H%M%S')}",
+            'notes': f"Mobile adjustment: {reason}",
+        }], user=request.user)
+        adjustment = movements[0].quantity if movements[0] else 0
         
-        with transaction.atomic():
-            if location_id:
-                location = get_object_or_404(Location, id=location_id)
-                stock_level, created = StockLevel.objects.get_or_create(
-                    product=product,
-                    location=location,
-                    defaults={'quantity': 0}
-                )
-                
-                old_quantity = stock_level.quantity
-                adjustment = new_quantity - old_quantity
-                
-                stock_level.quantity = new_quantity
-                stock_level.last_counted = timezone.now()
-                stock_level.save()
-                
-                # Update product total
-                product.current_stock = product.stock_levels.aggregate(
-                    total=Sum('quantity')
-                )['total'] or 0
-                
-            else:
-                old_quantity = product.current_stock
-                adjustment = new_quantity - old_quantity
-                product.current_stock = new_quantity
-            
-            product.last_stock_check = timezone.now()
-            product.save()
-            
-            # Create movement record
-            StockMovement.objects.create(
-                product=product,
-                movement_type='adjustment',
-                quantity=adjustment,
-                from_location=location if location_id and adjustment < 0 else None,
-                to_location=location if location_id and adjustment > 0 else None,
-                previous_stock=old_quantity,
-                new_stock=new_quantity,
-                reference=f"MOBILE-ADJ-{timezone.now().strftime('%Y%m%d%H%M%S')}",
-                notes=f"Mobile adjustment: {reason}",
-                created_by=request.user
-            )
-            
         return JsonResponse({
             'success': True,
             'message': f'Stock updated: {product.name} adjusted by {adjustment}',
             'new_quantity': new_quantity,
         })
         
+    except (ValueError, StockPostingError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -4930,31 +5172,33 @@ def print_barcode_labels_view(request):
             messages.error(request, 'No products with barcodes found')
             return redirect('inventory:product_list')
         
-        # Generate barcode images
+        # Vector label sheets straight to PDF
+        if request.GET.get('format') == 'pdf':
+            layout = request.GET.get('layout', DEFAULT_LAYOUT)
+            if layout not in LABEL_LAYOUTS:
+                layout = DEFAULT_LAYOUT
+            symbology = 'qr' if request.GET.get('symbology') == 'qr' else 'code128'
+            pdf = LabelSheetRenderer(layout).render(product_labels(products, symbology=symbology))
+            response = HttpResponse(pdf, content_type='application/pdf')
+            response['Content-Disposition'] = 'inline; filename="product_labels.pdf"'
+            return response
+
+        # Barcode images from the content-addressed cache
+        products = list(products)
+        images = CodeImageCache.get_many_base64([('code128', product.barcode, None) for product in products])
         label_data = []
-        for product in products:
-            try:
-                # Generate barcode using python-barcode or similar
-                from barcode import Code128
-                from barcode.writer import ImageWriter
-                
-                code = Code128(product.barcode, writer=ImageWriter())
-                barcode_buffer = BytesIO()
-                code.write(barcode_buffer)
-                barcode_b64 = base64.b64encode(barcode_buffer.getvalue()).decode()
-                
-                label_data.append({
-                    'product': product,
-                    'barcode_image': f'data:image/png;base64,{barcode_b64}',
-                })
-                
-            except Exception as e:
-                logger.error(f"Failed to generate barcode for {product.sku}: {str(e)}")
+        for product, barcode_b64 in zip(products, images):
+            if barcode_b64 is None:
                 continue
+            label_data.append({
+                'product': product,
+                'barcode_image': f'data:image/png;base64,{barcode_b64}',
+            })
         
         return render(request, 'inventory/barcode/barcode_labels.html', {
             'page_title': 'Barcode Labels',
             'label_data': label_data,
+            'label_layouts': LABEL_LAYOUTS,
         })
         
     except Exception as e:
@@ -4981,23 +5225,9 @@ def product_qr_code_api(request, product_id):
             )
         }
         
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(json.dumps(qr_data))
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        img_data = base64.b64encode(buffer.getvalue()).decode()
+        img_data = BarcodeManager.generate_qr_code(qr_data)
+        if img_data is None:
+            return JsonResponse({'success': False, 'error': 'Failed to generate QR code'})
         
         return JsonResponse({
             'success': True,
@@ -5011,57 +5241,63 @@ def product_qr_code_api(request, product_id):
 
 @login_required
 @inventory_permission_required('view')
-def barcode_lookup_api(request):
+def barcode_lookup_api(request, barcode=None):
     """
     API endpoint: Look up product by barcode.
+    
+    Served from the cached product card; see inventory.scanning.
     """
     try:
-        barcode = request.GET.get('barcode', '').strip()
+        barcode = (barcode or request.GET.get('barcode', '')).strip()
         
         if not barcode:
             return JsonResponse({'success': False, 'error': 'No barcode provided'})
         
-        try:
-            product = Product.objects.select_related(
-                'category', 'supplier', 'brand'
-            ).get(barcode=barcode, is_active=True)
-            
-            # Get stock levels
-            stock_levels = []
-            for stock_level in product.stock_levels.select_related('location'):
-                stock_levels.append({
-                    'location_id': stock_level.location.id,
-                    'location_name': stock_level.location.name,
-                    'quantity': stock_level.quantity,
-                    'available_quantity': stock_level.available_quantity,
-                })
-            
-            data = {
-                'product_id': product.id,
-                'sku': product.sku,
-                'name': product.name,
-                'description': product.description,
-                'category': product.category.name if product.category else '',
-                'supplier': product.supplier.name if product.supplier else '',
-                'brand': product.brand.name if product.brand else '',
-                'cost_price': float(product.cost_price),
-                'selling_price': float(product.selling_price),
-                'current_stock': product.current_stock,
-                'reorder_level': product.reorder_level,
-                'stock_status': StockManager.get_stock_status(product),
-                'stock_levels': stock_levels,
-                'last_restocked': product.last_restocked_date.isoformat() if product.last_restocked_date else None,
-            }
-            
-            return JsonResponse({'success': True, 'product': data})
-            
-        except Product.DoesNotExist:
+        card = ProductCardCache.get_card(barcode, kinds=('barcode',))
+        if not card:
             return JsonResponse({
                 'success': False,
                 'error': f'Product with barcode "{barcode}" not found'
             })
         
+        return JsonResponse({'success': True, 'product': card})
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@login_required
+@inventory_permission_required('view')
+@require_POST
+def barcode_batch_lookup_api(request):
+    """
+    API endpoint: Resolve a burst of scanned codes in one round trip.
+    
+    Body: {"codes": ["BT000123", "LM358", ...]} - barcodes, SKUs or QR codes
+    """
+    try:
+        payload = json.loads(request.body or '{}')
+        codes = payload.get('codes') or []
+        
+        if not isinstance(codes, list) or not codes:
+            return JsonResponse({'success': False, 'error': 'No codes provided'}, status=400)
+        if len(codes) > BATCH_LOOKUP_LIMIT:
+            return JsonResponse({
+                'success': False,
+                'error': f'At most {BATCH_LOOKUP_LIMIT} codes per request'
+            }, status=400)
+        
+        cards = ProductCardCache.get_cards([str(code) for code in codes])
+        
+        return JsonResponse({
+            'success': True,
+            'products': cards,
+            'not_found': [code for code, card in cards.items() if card is None],
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
     except Exception as e:
+        logger.error(f"Error in batch barcode lookup: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 # =====================================
@@ -5308,13 +5544,11 @@ def global_inventory_search(request):
             return JsonResponse({'results': []})
         
         # Search products
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(sku__icontains=query) |
-            Q(barcode__icontains=query) |
-            Q(description__icontains=query),
-            is_active=True
-        ).select_related('category', 'supplier')[:limit]
+        products = ProductSearchService.search(
+            query,
+            queryset=Product.objects.filter(is_active=True).select_related('category', 'supplier'),
+            limit=limit
+        )
         
         results = []
         for product in products:
@@ -5518,22 +5752,18 @@ def product_bulk_update_view(request):
             try:
                 with transaction.atomic():
                     if action == 'update_prices':
-                        # Handle price updates
-                        adjustment_type = form.cleaned_data['price_adjustment_type']
-                        adjustment_value = form.cleaned_data['price_adjustment_value']
-                        
-                        for product in products:
-                            if adjustment_type == 'percentage':
-                                if adjustment_value > 0:
-                                    product.selling_price = product.selling_price * (1 + adjustment_value / 100)
-                                else:
-                                    product.selling_price = product.selling_price * (1 + adjustment_value / 100)
-                            elif adjustment_type == 'fixed_amount':
-                                product.selling_price = product.selling_price + adjustment_value
-                            elif adjustment_type == 'set_price':
-                                product.selling_price = adjustment_value
-                            
-                            product.save()
+                        # One UPDATE for the whole selection, with price history
+                        summary = Repricer.apply(
+                            products,
+                            form.cleaned_data['price_adjustment_type'],
+                            form.cleaned_data['price_adjustment_value'],
+                            user=request.user
+                        )
+                        messages.info(
+                            request,
+                            f"Prices changed for {summary['changed']} of {summary['matched']} products "
+                            f"(total {summary['total_before']} -> {summary['total_after']})"
+                        )
                     
                     elif action == 'update_category':
                         new_category = form.cleaned_data['new_category']
@@ -5548,6 +5778,10 @@ def product_bulk_update_view(request):
                     
                     elif action == 'deactivate':
                         products.update(is_active=False)
+                    
+                    if action != 'update_prices':
+                        # queryset.update() sends no save signals
+                        record_changes('product', products.values_list('id', flat=True))
                 
                 messages.success(request, f'Bulk operation completed for {products.count()} products')
                 
@@ -5656,17 +5890,12 @@ def update_exchange_rates_view(request):
     
     if request.method == 'POST':
         try:
-            # Update exchange rates (placeholder - integrate with real API)
-            updated_count = 0
-            currencies = Currency.objects.filter(is_active=True).exclude(code='USD')
-            
-            for currency in currencies:
-                # Placeholder - would fetch real rates from API
-                # currency.exchange_rate_to_usd = fetch_exchange_rate(currency.code)
-                # currency.save()
-                updated_count += 1
+            from .tasks import request_run
             
-            messages.success(request, f'Updated exchange rates for {updated_count} currencies')
+            # Normally refreshed on schedule; this queues a refresh of every
+            # active currency so the provider is not called in the request
+            request_run('update_exchange_rates', force=True, all_active=True)
+            messages.info(request, 'Exchange rate update queued; rates refresh shortly')
             
         except Exception as e:
             messages.error(request, f'Failed to update exchange rates: {str(e)}')
@@ -5726,30 +5955,8 @@ def bulk_create_reorder_alerts_view(request):
     if request.method == 'POST':
         try:
             with transaction.atomic():
-                low_stock_products = get_low_stock_products()
-                created_count = 0
-                
-                for product in low_stock_products:
-                    # Check if alert already exists
-                    existing_alert = ReorderAlert.objects.filter(
-                        product=product,
-                        is_active=True
-                    ).first()
-                    
-                    if not existing_alert:
-                        ReorderAlert.objects.create(
-                            product=product,
-                            supplier=product.supplier,
-                            current_stock=product.current_stock,
-                            reorder_level=product.reorder_level,
-                            recommended_quantity=max(
-                                product.reorder_level * 2 - product.current_stock,
-                                product.minimum_order_quantity or 1
-                            ),
-                            priority='high' if product.current_stock == 0 else 'medium',
-                            created_by=request.user
-                        )
-                        created_count += 1
+                # One pass over every low stock product without an open alert
+                created_count = ReorderAlertEvaluator.evaluate()['created']
                 
                 messages.success(request, f'Created {created_count} reorder alerts')
                 
@@ -5798,53 +6005,73 @@ def create_purchase_order_from_alerts_view(request):
             return redirect('inventory:reorder_alert_list')
         
         try:
-            with transaction.atomic():
-                alerts = ReorderAlert.objects.filter(
-                    id__in=alert_ids,
-                    is_active=True
-                ).select_related('product', 'supplier')
-                
-                # Group by supplier
-                alerts_by_supplier = {}
-                for alert in alerts:
-                    supplier = alert.supplier
-                    if supplier not in alerts_by_supplier:
-                        alerts_by_supplier[supplier] = []
-                    alerts_by_supplier[supplier].append(alert)
-                
-                created_pos = 0
-                for supplier, supplier_alerts in alerts_by_supplier.items():
-                    # Create purchase order
-                    po = PurchaseOrder.objects.create(
-                        supplier=supplier,
-                        status='draft',
-                        created_by=request.user
-                    )
-                    
-                    # Add items
-                    for alert in supplier_alerts:
-                        PurchaseOrderItem.objects.create(
-                            purchase_order=po,
-                            product=alert.product,
-                            quantity=alert.recommended_quantity,
-                            unit_price=alert.product.cost_price or 0
-                        )
-                        
-                        # Mark alert as completed
-                        alert.is_active = False
-                        alert.completed_by = request.user
-                        alert.completed_at = timezone.now()
-                        alert.save()
-                    
-                    created_pos += 1
-                
-                messages.success(request, f'Created {created_pos} purchase orders from selected alerts')
+            summary = PurchaseOrderBuilder.build(ReorderAlert.objects.filter(id__in=alert_ids), user=request.user)
+            messages.success(
+                request,
+                f"Created {len(summary['purchase_orders'])} purchase orders ({summary['lines']} lines) "
+                f"from {summary['alerts']} alerts"
+            )
+            if summary['skipped']:
+                messages.warning(request, f"{len(summary['skipped'])} alerts have no supplier and were skipped")
                 
         except Exception as e:
             messages.error(request, f'Failed to create purchase orders: {str(e)}')
     
     return redirect('inventory:reorder_alert_list')
 
+@purchase_order_permission
+@require_http_methods(["POST"])
+def purchase_orders_from_alerts_api(request):
+    """
+    API for building draft purchase orders from reorder alerts.
+    
+    Meant for scheduled auto-ordering as well as the reorder screens. The
+    body selects the alerts: {"alert_ids": [1, 2]}, a filter such as
+    {"priorities": ["critical", "high"]}, or {"all": true} for every open
+    alert. One draft order is created per supplier.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        if not (data.get('alert_ids') or data.get('priorities') or data.get('all') is True):
+            raise ValueError('Select alerts with alert_ids or priorities, or pass {"all": true}')
+        
+        alerts = ReorderAlert.objects.all()
+        if data.get('alert_ids'):
+            alerts = alerts.filter(id__in=[int(alert_id) for alert_id in data['alert_ids']])
+        if data.get('priorities'):
+            alerts = alerts.filter(priority__in=data['priorities'])
+        location = None
+        if data.get('delivery_location_id'):
+            # Looked up here, not with get_object_or_404: Http404 would end up in the 500 handler
+            location = Location.objects.filter(pk=data['delivery_location_id'], is_active=True).first()
+            if location is None:
+                raise ValueError('Delivery location not found or inactive')
+        
+        summary = PurchaseOrderBuilder.build(alerts, user=request.user, delivery_location=location)
+        return JsonResponse({
+            'success': True,
+            'purchase_orders': [
+                {
+                    'id': po.id,
+                    'po_number': po.po_number,
+                    'supplier_id': po.supplier_id,
+                    'total_amount': float(po.total_amount),
+                    'currency': po.currency,
+                }
+                for po in summary['purchase_orders']
+            ],
+            'alerts': summary['alerts'],
+            'lines': summary['lines'],
+            'skipped': summary['skipped'],
+        })
+    except (ValueError, TypeError, PurchaseOrderBuildError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Purchase order generation failed: {str(e)}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @login_required
 @inventory_permission_required('view')  
 def supplier_contact_view(request, pk):
@@ -5890,27 +6117,6 @@ def quick_reorder_view(request):
         product.reorder_qty = max(product.reorder_level * 2 - product.total_stock, 0)
     return render(request, "inventory/quick_reorder.html", {"products": products})
 
-def _refresh_exchange_rates():
-    """Fetch latest exchange rates from public API and update Currency table."""
-    response = requests.get(
-        "https://api.exchangerate.host/latest?base=USD", timeout=10
-    )
-    response.raise_for_status()
-    data = response.json()
-    rates = data.get("rates", {})
-    updated = {}
-    for currency in Currency.objects.filter(is_active=True):
-        if currency.code == "USD":
-            currency.exchange_rate_to_usd = Decimal("1")
-        elif currency.code in rates:
-            rate = Decimal(str(rates[currency.code]))
-            currency.exchange_rate_to_usd = Decimal("1") / rate
-        else:
-            continue
-        currency.save(update_fields=["exchange_rate_to_usd", "last_updated"])
-        updated[currency.code] = float(currency.exchange_rate_to_usd)
-    return updated
-
 # --- API views ---
 
 @login_required
@@ -5987,8 +6193,11 @@ def top_products_widget_api(request):
 def update_exchange_rates_api(request):
     """Update currency exchange rates via API."""
     try:
-        updated = _refresh_exchange_rates()
-        return JsonResponse({"status": "success", "updated": updated})
+        from .tasks import request_run
+        
+        # Runs on the worker or the scheduler; nothing is updated yet
+        request_run('update_exchange_rates', force=True, all_active=True)
+        return JsonResponse({"status": "success", "refresh": "queued", "updated": {}}, status=202)
     except Exception as exc:
         return JsonResponse(
             {"status": "error", "message": str(exc)}, status=500
@@ -6018,15 +6227,11 @@ def currency_convert_api(request):
             {"status": "error", "message": "Missing parameters"}, status=400
         )
     try:
-        amount = Decimal(amount)
-        from_currency = Currency.objects.get(code=from_code)
-        to_currency = Currency.objects.get(code=to_code)
-        usd_amount = amount * from_currency.exchange_rate_to_usd
-        target_amount = usd_amount / to_currency.exchange_rate_to_usd
+        target_amount = convert(Decimal(amount), from_code.upper(), to_code.upper())
         return JsonResponse(
             {"status": "success", "result": float(target_amount)}
         )
-    except Currency.DoesNotExist:
+    except UnknownCurrency:
         return JsonResponse(
             {"status": "error", "message": "Unknown currency"}, status=404
         )
@@ -6047,13 +6252,14 @@ def bulk_price_update_api(request):
         return JsonResponse({"status": "error", "message": "Invalid payload"}, status=400)
     if not ids or percentage == 0:
         return JsonResponse({"status": "error", "message": "Invalid parameters"}, status=400)
-    multiplier = Decimal("1") + (percentage / 100)
-    with transaction.atomic():
-        products = Product.objects.filter(id__in=ids)
-        for product in products:
-            product.selling_price = product.selling_price * multiplier
-            product.save(update_fields=["selling_price"])
-    return JsonResponse({"status": "success", "updated": products.count()})
+    summary = Repricer.apply(Product.objects.filter(id__in=ids), "percent", percentage, user=request.user)
+    return JsonResponse({
+        "status": "success",
+        "updated": summary["changed"],
+        "matched": summary["matched"],
+        "total_before": float(summary["total_before"]),
+        "total_after": float(summary["total_after"]),
+    })
 
 @login_required
 def margin_analysis_api(request):
@@ -6141,10 +6347,10 @@ def qr_code_scan_api(request):
     code = payload.get("code")
     if not code:
         return JsonResponse({"status": "error", "message": "No code provided"}, status=400)
-    product = Product.objects.filter(qr_code=code).first()
-    if not product:
+    card = ProductCardCache.get_card(code, kinds=("qr_code",))
+    if not card:
         return JsonResponse({"status": "error", "message": "Product not found"}, status=404)
-    return JsonResponse({"status": "success", "product": {"id": product.id, "name": product.name}})
+    return JsonResponse({"status": "success", "product": {"id": card["product_id"], **card}})
 
 @login_required
 def reorder_recommendations_api(request):
@@ -6346,15 +6552,15 @@ def search_suggestions_api(request):
     if len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    products = Product.objects.filter(
-        Q(name__icontains=query) | Q(sku__icontains=query),
-        is_active=True
-    )[:10]
+    # Part number prefixes are answered from memory; free text falls back to ranked search
+    products = part_number_index.suggest(query, limit=10)
+    if not products:
+        products = ProductSearchService.search(query, limit=10).values('id', 'name', 'sku')
     
     suggestions = [
         {
-            'id': product.id,
-            'text': f"{product.name} ({product.sku})",
+            'id': product['id'],
+            'text': f"{product['name']} ({product['sku']})",
             'type': 'product'
         }
         for product in products
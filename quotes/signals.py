@@ -18,6 +18,7 @@ from decimal import Decimal
 
 from .models import Quote, QuoteItem, QuoteRevision
 from crm.models import Client, CustomerInteraction
+from core.events import defer, handles
 from core.utils import create_notification
 import logging
 
@@ -39,21 +40,26 @@ def handle_quote_lifecycle_changes(sender, instance, created, **kwargs):
     
     if created:
         # When a new quote is created, we need to establish the foundation
-        # for tracking this opportunity in our CRM system
-        _handle_new_quote_creation(quote)
+        # for tracking this opportunity in our CRM system, once it is committed
+        defer('quotes.quote_created', key=quote.pk)
     else:
         # When an existing quote is updated, we need to detect what changed
         # and respond appropriately
         _handle_quote_status_changes(quote)
         _handle_quote_value_changes(quote)
 
-def _handle_new_quote_creation(quote):
+@handles('quotes.quote_created')
+def _handle_new_quote_creation(quote_id):
     """
     When a new quote is created, this function ensures that all the supporting
     infrastructure is properly established. Think of it as the intake process
     for a new sales opportunity.
     """
     
+    quote = Quote.objects.select_related('client', 'created_by', 'assigned_to').filter(pk=quote_id).first()
+    if quote is None:
+        return
+    
     try:
         with transaction.atomic():
             # Create the initial CRM interaction that establishes this quote
@@ -200,7 +206,20 @@ def _handle_quote_accepted(quote):
     # Update lead scoring based on successful conversion
     client.calculate_lead_score()
     
-    # Notify the sales team about the success
+    # Notify the sales team once the acceptance is committed
+    defer('quotes.quote_accepted', key=quote.pk)
+
+@handles('quotes.quote_accepted')
+def _notify_quote_accepted(quote_id):
+    """
+    The sales team hears about an accepted quote straight away, and
+    management too when the quote is a high-value one.
+    """
+    
+    quote = Quote.objects.select_related('client', 'created_by', 'assigned_to').filter(pk=quote_id).first()
+    if quote is None:
+        return
+    
     create_notification(
         user=quote.assigned_to or quote.created_by,
         title="Quote Accepted!",
@@ -404,16 +404,13 @@ def convert_currency(amount, from_currency, to_currency, rate=None):
     if from_currency == to_currency:
         return amount
     
-    if not rate:
-        # In production, get from exchange rate API
-        # For now, use fixed rates
-        rates = {
-            ('USD', 'ZWG'): Decimal('25.0'),
-            ('ZWG', 'USD'): Decimal('0.04')
-        }
-        rate = rates.get((from_currency, to_currency), Decimal('1.0'))
+    if rate:
+        converted = amount * Decimal(str(rate))
+    else:
+        # Current rates from the shared inventory rate table
+        from inventory.conversion import convert
+        converted = convert(amount, from_currency, to_currency)
     
-    converted = amount * Decimal(str(rate))
     return PricingCalculator().round_currency(converted)
 
 # File Utilities
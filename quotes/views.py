@@ -32,6 +32,8 @@ from .forms import (
 from .email_utils import send_quote_email, send_quote_notification
 from crm.models import Client, CustomerInteraction
 from inventory.models import Product, Supplier
+from inventory.conversion import convert
+from inventory.search import ProductSearchService
 
 logger = logging.getLogger(__name__)
 
@@ -936,15 +938,12 @@ def search_products(request):
     if len(query) < 2:
         return JsonResponse({'products': []})
     
-    # Build a comprehensive search across multiple fields
-    products = Product.objects.filter(
-        is_quotable=True
-    ).filter(
-        Q(name__icontains=query) |
-        Q(sku__icontains=query) |
-        Q(description__icontains=query) |
-        Q(category__name__icontains=query)
-    ).select_related('category', 'supplier')[:20]  # Limit to 20 results for performance
+    # Ranked search across names, part numbers, descriptions and categories
+    products = ProductSearchService.search(
+        query,
+        queryset=Product.objects.filter(is_quotable=True).select_related('category', 'supplier'),
+        limit=20  # Limit to 20 results for performance
+    )
     
     # Build the response with all information needed for quote building
     product_data = []
@@ -1723,13 +1722,8 @@ def convert_currency(request):
         to_currency = request.GET.get('to', 'ZWG')
         amount = Decimal(request.GET.get('amount', '0'))
         
-        # Simple conversion - in production, use real exchange rates
-        conversion_rates = {
-            ('USD', 'ZWG'): Decimal('25.0'),  # Example rate
-            ('ZWG', 'USD'): Decimal('0.04'),  # Example rate
-        }
-        
-        rate = conversion_rates.get((from_currency, to_currency), Decimal('1.0'))
+        # Current rates from the shared inventory rate table
+        rate = convert(Decimal('1'), from_currency.upper(), to_currency.upper())
         converted_amount = amount * rate
         
         return JsonResponse({